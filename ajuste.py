@@ -0,0 +1,115 @@
+from dataclasses import dataclass, asdict
+import numpy as np
+from busca import INF, dijkstra_sementes, peso_aresta
+from espacial import GradeSegmentos
+from grafo import projetar_latlon
+
+@dataclass
+class PontoAjustado:
+    """Ponto projetado sobre uma aresta (nó fantasma), sem alterar o grafo"""
+    x: float
+    y: float
+    u: int
+    v: int
+    fracao: float     # Posição ao longo de u -> v, de 0 (em u) a 1 (em v)
+    distancia: float  # Do ponto original até a aresta
+
+    def como_dict(self):
+        return asdict(self)
+
+class AjustadorPontos:
+    """Ajusta coordenadas arbitrárias ao ponto mais próximo das arestas do grafo
+
+    Cada par de vértices ligados entra uma única vez no índice de segmentos,
+    independentemente do sentido; os custos parciais consideram depois quais
+    sentidos existem na métrica ativa do grafo.
+    """
+
+    def __init__(self, csr):
+        self.csr = csr
+        n = csr.totalVertices
+        origens = np.repeat(np.arange(n, dtype=np.int64), np.diff(csr.inicio))
+        destinos = np.asarray(csr.destinos, dtype=np.int64)
+        menor, maior = np.minimum(origens, destinos), np.maximum(origens, destinos)
+        validas = menor != maior
+        _, unicos = np.unique(menor[validas] * n + maior[validas], return_index=True)
+        self.u = menor[validas][unicos]
+        self.v = maior[validas][unicos]
+        x, y = np.asarray(csr.x), np.asarray(csr.y)
+        self.grade = GradeSegmentos(x[self.u], y[self.u], x[self.v], y[self.v])
+
+    def ajustar(self, x, y, raio_max=None):
+        """Projeta (x, y), nas coordenadas do grafo, na aresta mais próxima; None se nenhuma no raio"""
+        segmento, distancia, fracao = self.grade.mais_proximo(x, y, raio_max)
+        if segmento is None:
+            return None
+        u, v = int(self.u[segmento]), int(self.v[segmento])
+        grade = self.grade
+        return PontoAjustado(
+            x=float(grade.x1[segmento] + fracao * (grade.x2[segmento] - grade.x1[segmento])),
+            y=float(grade.y1[segmento] + fracao * (grade.y2[segmento] - grade.y1[segmento])),
+            u=u, v=v, fracao=fracao, distancia=distancia)
+
+    def ajustar_latlon(self, lat, lon, raio_max=None):
+        """Como `ajustar`, para coordenadas geográficas (requer grafo carregado do OSM)"""
+        if self.csr.projecao is None:
+            raise ValueError("O grafo não tem projeção geográfica (carregue-o a partir de um .osm)")
+        return self.ajustar(*projetar_latlon(lat, lon, self.csr.projecao), raio_max)
+
+    def ajustar_lote(self, pontos, raio_max=None):
+        """Ajusta uma sequência de pontos (x, y)"""
+        return [self.ajustar(x, y, raio_max) for x, y in pontos]
+
+def sementes_origem(csr, ponto):
+    """Vértices alcançáveis saindo do ponto, com o custo parcial da aresta"""
+    sementes = []
+    peso = peso_aresta(csr, ponto.u, ponto.v)
+    if peso < INF:
+        sementes.append((ponto.v, (1 - ponto.fracao) * peso))
+    peso = peso_aresta(csr, ponto.v, ponto.u)
+    if peso < INF:
+        sementes.append((ponto.u, ponto.fracao * peso))
+    return sementes
+
+def sementes_destino(csr, ponto):
+    """Vértices de onde se chega ao ponto, com o custo parcial da aresta"""
+    sementes = []
+    peso = peso_aresta(csr, ponto.u, ponto.v)
+    if peso < INF:
+        sementes.append((ponto.u, ponto.fracao * peso))
+    peso = peso_aresta(csr, ponto.v, ponto.u)
+    if peso < INF:
+        sementes.append((ponto.v, (1 - ponto.fracao) * peso))
+    return sementes
+
+def custo_mesma_aresta(csr, origem, destino):
+    """Custo de ir direto pela aresta quando origem e destino estão na mesma"""
+    if (origem.u, origem.v) != (destino.u, destino.v):
+        return INF
+    if destino.fracao >= origem.fracao:
+        return (destino.fracao - origem.fracao) * peso_aresta(csr, origem.u, origem.v)
+    return (origem.fracao - destino.fracao) * peso_aresta(csr, origem.v, origem.u)
+
+def rota_entre_pontos(csr, origem, destino, cancelado=None, progresso=None):
+    """Menor caminho entre dois pontos ajustados, partindo das duas pontas de cada aresta
+
+    Retorna um dicionário com os vértices do caminho (vazio se o trajeto
+    fica dentro da mesma aresta), o custo, a geometria incluindo os pontos
+    ajustados e as estatísticas da busca.
+    """
+    caminho, custo, estatisticas = dijkstra_sementes(csr, sementes_origem(csr, origem),
+                                                     sementes_destino(csr, destino), cancelado, progresso)
+    direto = custo_mesma_aresta(csr, origem, destino)
+    if direto <= custo:
+        caminho, custo = [], direto
+        estatisticas['custo_total'] = direto
+    geometria = None
+    if caminho is not None:
+        geometria = ([(origem.x, origem.y)] + [(float(csr.x[v]), float(csr.y[v])) for v in caminho]
+                     + [(destino.x, destino.y)])
+    return {
+        'caminho': caminho,
+        'custo': custo if custo < INF else None,
+        'geometria': geometria,
+        'estatisticas': estatisticas,
+    }
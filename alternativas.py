@@ -0,0 +1,199 @@
+import heapq
+import time
+from busca import INF, BuscaCancelada, espaco_da_thread, montar_estatisticas, peso_aresta, reconstruir_caminho
+
+def arvore_reversa(csr, destino):
+    """Custo de cada vértice até `destino` e o próximo salto na árvore de menores caminhos
+
+    Calculada uma vez sobre o grafo transposto e reaproveitada por todas as
+    buscas seguintes: os custos servem de heurística exata para o A* e os
+    próximos saltos completam as rotas sem nova busca.
+    """
+    reverso = csr.transposto()
+    ini = memoryview(reverso.inicio)
+    destinos = memoryview(reverso.destinos)
+    pesos = memoryview(reverso.pesos)
+    totalVertices = len(ini) - 1
+
+    dist = [INF] * totalVertices
+    seguinte = [-1] * totalVertices
+    visited = [False] * totalVertices
+    dist[destino] = 0.0
+    fila = [(0.0, destino)]
+    while fila:
+        d, u = heapq.heappop(fila)
+        if visited[u]:
+            continue
+        visited[u] = True
+        for i in range(ini[u], ini[u + 1]):
+            v = destinos[i]
+            nd = d + pesos[i]
+            if nd < dist[v]:
+                dist[v] = nd
+                seguinte[v] = u
+                heapq.heappush(fila, (nd, v))
+    return dist, seguinte
+
+def caminho_pela_arvore(u, seguinte, nos_bloqueados=(), arestas_bloqueadas=(), multiplicadores=None):
+    """Segue a árvore de `u` até o destino; None se passar por algo bloqueado ou penalizado"""
+    caminho = [u]
+    while seguinte[u] != -1:
+        v = seguinte[u]
+        if v in nos_bloqueados or (u, v) in arestas_bloqueadas:
+            return None
+        if multiplicadores and (u, v) in multiplicadores:
+            return None
+        caminho.append(v)
+        u = v
+    return caminho
+
+def custos_acumulados(csr, caminho):
+    """Custo do início do caminho até cada uma de suas posições"""
+    custos = [0.0]
+    for u, v in zip(caminho, caminho[1:]):
+        custos.append(custos[-1] + peso_aresta(csr, u, v))
+    return custos
+
+def a_estrela(csr, inicio, dist_destino, seguinte, nos_bloqueados=(), arestas_bloqueadas=(),
+              multiplicadores=None, contador=None, espaco=None):
+    """A* de `inicio` ao destino da árvore, evitando bloqueios e com pesos multiplicados
+
+    A heurística é o custo exato até o destino no grafo original, que nunca
+    superestima (bloqueios e penalidades só aumentam custos). Quando o vértice
+    retirado da fila tem o caminho da árvore livre, esse caminho completa a
+    rota ótima e a busca termina sem explorar o restante.
+    Retorna (caminho, custo) ou (None, INF). `espaco` é o EspacoBusca
+    reaproveitado (padrão: o da thread atual).
+    """
+    ini = memoryview(csr.inicio)
+    destinos = memoryview(csr.destinos)
+    pesos = memoryview(csr.pesos)
+
+    espaco = espaco if espaco is not None else espaco_da_thread()
+    with espaco.reservar(len(ini) - 1) as geracao:
+        g, prev, marca, fechado = espaco.dist, espaco.prev, espaco.marca, espaco.fechado
+        g[inicio] = 0.0
+        prev[inicio] = -1
+        marca[inicio] = geracao
+        fila = [(dist_destino[inicio], inicio)]
+        while fila:
+            _, u = heapq.heappop(fila)
+            if fechado[u] == geracao:
+                continue
+            fechado[u] = geracao
+            if contador is not None:
+                contador[0] += 1
+
+            cauda = caminho_pela_arvore(u, seguinte, nos_bloqueados, arestas_bloqueadas, multiplicadores)
+            if cauda is not None:
+                caminho = reconstruir_caminho(prev, u)
+                return caminho + cauda[1:], g[u] + dist_destino[u]
+
+            for i in range(ini[u], ini[u + 1]):
+                v = destinos[i]
+                if v in nos_bloqueados or (u, v) in arestas_bloqueadas or dist_destino[v] >= INF:
+                    continue
+                peso = pesos[i]
+                if multiplicadores:
+                    peso *= multiplicadores.get((u, v), 1.0)
+                ng = g[u] + peso
+                if marca[v] != geracao or ng < g[v]:
+                    marca[v] = geracao
+                    g[v] = ng
+                    prev[v] = u
+                    heapq.heappush(fila, (ng + dist_destino[v], v))
+        return None, INF
+
+def _verificar(cancelado, progresso, contador):
+    if cancelado is not None and cancelado.is_set():
+        raise BuscaCancelada()
+    if progresso is not None:
+        progresso(contador[0])
+
+def k_menores_caminhos(csr, origem, destino, k, cancelado=None, progresso=None):
+    """Os k menores caminhos sem ciclos entre origem e destino (Yen, com a poda de Lawler)
+
+    Cada desvio é um A* guiado pela árvore reversa do destino, calculada uma
+    única vez, em vez de um Dijkstra completo. Retorna (rotas, estatisticas),
+    com as rotas em ordem crescente de custo, cada uma com 'caminho' e 'custo'.
+    """
+    tempo_inicio = time.perf_counter_ns()
+    contador = [0]
+    dist_destino, seguinte = arvore_reversa(csr, destino)
+
+    encontrados = []  # (custo, caminho, índice do desvio)
+    if dist_destino[origem] < INF:
+        encontrados.append((dist_destino[origem], caminho_pela_arvore(origem, seguinte), 0))
+    candidatos = []
+    vistos = {tuple(encontrados[0][1])} if encontrados else set()
+
+    while encontrados and len(encontrados) < k:
+        _, anterior, indice_desvio = encontrados[-1]
+        custos_prefixo = custos_acumulados(csr, anterior)
+        # Desvios antes do ponto em que esta rota se separou da sua mãe já foram gerados
+        for i in range(indice_desvio, len(anterior) - 1):
+            _verificar(cancelado, progresso, contador)
+            raiz = anterior[:i + 1]
+            arestas_bloqueadas = {(caminho[i], caminho[i + 1]) for _, caminho, _ in encontrados
+                                  if len(caminho) > i + 1 and caminho[:i + 1] == raiz}
+            nos_bloqueados = set(raiz[:-1])
+            desvio, custo_desvio = a_estrela(csr, anterior[i], dist_destino, seguinte,
+                                             nos_bloqueados, arestas_bloqueadas, contador=contador)
+            if desvio is None:
+                continue
+            caminho = raiz[:-1] + desvio
+            if tuple(caminho) not in vistos:
+                vistos.add(tuple(caminho))
+                heapq.heappush(candidatos, (custos_prefixo[i] + custo_desvio, len(caminho), caminho, i))
+        if not candidatos:
+            break
+        custo, _, caminho, i = heapq.heappop(candidatos)
+        encontrados.append((custo, caminho, i))
+
+    rotas = [{'caminho': caminho, 'custo': custo} for custo, caminho, _ in encontrados]
+    return rotas, _estatisticas(tempo_inicio, contador, rotas)
+
+def rotas_alternativas(csr, origem, destino, k=3, sobreposicao_maxima=0.7, fator_penalidade=1.5,
+                       tentativas=None, cancelado=None, progresso=None):
+    """Rotas alternativas pelo método de penalidades, mais rápido que o de Yen
+
+    A cada rodada, as arestas da rota encontrada têm o peso multiplicado por
+    `fator_penalidade` e uma nova busca é feita. Uma rota só é aceita se a
+    fração do seu custo compartilhada com cada rota já aceita não passar de
+    `sobreposicao_maxima`. Retorna (rotas, estatisticas) como k_menores_caminhos,
+    com os custos nos pesos originais.
+    """
+    tempo_inicio = time.perf_counter_ns()
+    contador = [0]
+    dist_destino, seguinte = arvore_reversa(csr, destino)
+
+    rotas = []
+    arestas_rotas = []  # Custo de cada aresta (sem sentido) das rotas aceitas
+    multiplicadores = {}
+    if dist_destino[origem] < INF:
+        for _ in range(tentativas or 4 * k):
+            _verificar(cancelado, progresso, contador)
+            caminho, _ = a_estrela(csr, origem, dist_destino, seguinte,
+                                   multiplicadores=multiplicadores, contador=contador)
+            if caminho is None:
+                break
+            custos = custos_acumulados(csr, caminho)
+            custo = custos[-1]
+            arestas = {(min(u, v), max(u, v)): custos[i + 1] - custos[i]
+                       for i, (u, v) in enumerate(zip(caminho, caminho[1:]))}
+            if all(sum(peso for aresta, peso in arestas.items() if aresta in aceitas) <= sobreposicao_maxima * custo
+                   for aceitas in arestas_rotas):
+                rotas.append({'caminho': caminho, 'custo': custo})
+                arestas_rotas.append(arestas)
+                if len(rotas) == k:
+                    break
+            for u, v in zip(caminho, caminho[1:]):
+                multiplicadores[(u, v)] = multiplicadores.get((u, v), 1.0) * fator_penalidade
+                if not csr.direcionado:
+                    multiplicadores[(v, u)] = multiplicadores[(u, v)]
+
+    rotas.sort(key=lambda rota: rota['custo'])
+    return rotas, _estatisticas(tempo_inicio, contador, rotas)
+
+def _estatisticas(tempo_inicio, contador, rotas):
+    return montar_estatisticas(tempo_inicio, contador[0], rotas[0]['custo'] if rotas else INF)
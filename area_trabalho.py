@@ -0,0 +1,172 @@
+import mmap
+import os
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+
+ORCAMENTO_PADRAO_MB = 2048
+ESCALARES = (type(None), bool, int, float, complex, str, bytes)
+
+def assinatura_arquivo(caminho_arquivo):
+    """(mtime, tamanho) do arquivo; muda quando ele é regravado, e o grafo residente fica obsoleto"""
+    try:
+        informacoes = os.stat(caminho_arquivo)
+    except OSError:
+        return None
+    return informacoes.st_mtime_ns, informacoes.st_size
+
+def _plana(valor):
+    return isinstance(valor, (list, tuple)) and (not valor or isinstance(valor[0], ESCALARES))
+
+def _itens(itens, pendentes):
+    """Bytes dos itens de uma coleção que não precisam ser visitados; os demais vão para `pendentes`
+
+    A coleção é tratada como homogênea pelo primeiro item: escalares não
+    contam, listas e tuplas de escalares (linhas da matriz, pares de
+    coordenadas) contam direto, e o resto é visitado.
+    """
+    primeiro = next(iter(itens), None)
+    if isinstance(primeiro, ESCALARES):
+        return 0
+    if _plana(primeiro):
+        return sum(map(sys.getsizeof, itens))
+    pendentes.extend(itens)
+    return 0
+
+def estimar_bytes(valor):
+    """Memória aproximada ocupada por um valor e tudo o que ele referencia
+
+    Arrays NumPy contam o tamanho dos dados (os mapeados de arquivo não
+    contam; visões contam o array de origem uma vez), listas e tuplas o seu
+    vetor de ponteiros, e objetos os seus atributos. Coleções são tratadas
+    como homogêneas (ver _itens), o que deixa a matriz de adjacência densa
+    em O(linhas). Objetos visitados contam uma vez.
+    """
+    total = 0
+    vistos = set()
+    pendentes = [valor]
+    while pendentes:
+        valor = pendentes.pop()
+        if isinstance(valor, ESCALARES) or id(valor) in vistos:
+            continue
+        if isinstance(valor, np.ndarray):
+            raiz = valor
+            while isinstance(raiz.base, np.ndarray):
+                raiz = raiz.base
+            if id(raiz) not in vistos:
+                vistos.add(id(raiz))
+                # Dados mapeados de arquivo o sistema libera e relê sozinho
+                if not isinstance(raiz, np.memmap) and not isinstance(raiz.base, mmap.mmap):
+                    total += raiz.nbytes
+            continue
+        vistos.add(id(valor))
+        if isinstance(valor, (list, tuple, set, frozenset)):
+            total += sys.getsizeof(valor) + _itens(valor, pendentes)
+        elif isinstance(valor, dict):
+            total += sys.getsizeof(valor) + _itens(valor.keys(), pendentes) + _itens(valor.values(), pendentes)
+        elif hasattr(valor, '__dict__') or hasattr(type(valor), '__slots__'):
+            total += sys.getsizeof(valor)
+            if hasattr(valor, '__dict__'):
+                pendentes.append(vars(valor))
+            for nome in getattr(type(valor), '__slots__', ()):
+                pendentes.append(getattr(valor, nome, None))
+    return total
+
+@dataclass
+class GrafoResidente:
+    """Um grafo da área de trabalho: o estado estacionado (None enquanto ativo) e quanto ele ocupa"""
+    nome: str
+    estado: dict
+    bytes: int
+    assinatura: tuple = None
+    compactado: bool = False  # Campos descartáveis já liberados (ficam None no estado)
+
+class AreaTrabalho:
+    """Grafos carregados mantidos em memória, do usado há mais tempo ao mais recente
+
+    Cada grafo guarda o seu estado inteiro (tabelas, índices, CSR, células,
+    caches de resultados, histórico), então voltar a ele é só religar
+    referências. Acima do orçamento, os grafos inativos menos usados
+    primeiro perdem os campos `descartaveis` (estruturas refeitas a partir
+    das tabelas, como a matriz densa) e, se ainda faltar memória, saem da
+    área. O grafo ativo nunca é descartado.
+    """
+
+    def __init__(self, orcamento_bytes=ORCAMENTO_PADRAO_MB * 2**20, descartaveis=()):
+        self.orcamento_bytes = orcamento_bytes
+        self.descartaveis = tuple(descartaveis)
+        self.grafos = OrderedDict()
+        self.ativo = None
+
+    def __contains__(self, nome):
+        return nome in self.grafos
+
+    def __len__(self):
+        return len(self.grafos)
+
+    def nomes(self):
+        """Nomes dos grafos residentes, do usado há mais tempo ao mais recente"""
+        return list(self.grafos)
+
+    def total_bytes(self):
+        return sum(grafo.bytes for grafo in self.grafos.values())
+
+    def residente(self, nome, assinatura=None):
+        """True se o grafo está na área e, com `assinatura`, ainda corresponde ao arquivo"""
+        grafo = self.grafos.get(nome)
+        return grafo is not None and (assinatura is None or grafo.assinatura == assinatura)
+
+    def guardar(self, nome, estado, assinatura=None):
+        """Estaciona o estado de um grafo (o ativo, ao trocar, ou um recém-carregado)"""
+        anterior = self.grafos.get(nome)
+        if assinatura is None and anterior is not None:
+            assinatura = anterior.assinatura
+        self.grafos[nome] = GrafoResidente(nome, estado, estimar_bytes(estado), assinatura)
+        self.grafos.move_to_end(nome)
+        if self.ativo == nome:
+            self.ativo = None
+
+    def ativar(self, nome):
+        """Entrega o estado estacionado do grafo e o marca como ativo e usado mais recentemente
+
+        A área deixa de referenciar o estado enquanto o grafo está ativo,
+        para não segurar estruturas que a interface substitui; o tamanho
+        estimado continua contando no orçamento.
+        """
+        grafo = self.grafos[nome]
+        self.grafos.move_to_end(nome)
+        self.ativo = nome
+        estado, grafo.estado = grafo.estado, None
+        return estado
+
+    def medir(self, nome, estado):
+        """Reestima o tamanho do grafo ativo, que cresce com caches e volta inteiro ao ser ativado"""
+        grafo = self.grafos[nome]
+        grafo.bytes = estimar_bytes(estado)
+        grafo.compactado = any(estado.get(campo) is None for campo in self.descartaveis)
+
+    def remover(self, nome):
+        self.grafos.pop(nome, None)
+        if self.ativo == nome:
+            self.ativo = None
+
+    def ajustar(self):
+        """Libera memória até caber no orçamento; retorna [(nome, 'compactado' | 'descartado')]"""
+        acoes = []
+        inativos = [grafo for grafo in self.grafos.values() if grafo.nome != self.ativo]
+        for grafo in inativos:
+            if self.total_bytes() <= self.orcamento_bytes:
+                return acoes
+            if self.descartaveis and not grafo.compactado:
+                for campo in self.descartaveis:
+                    grafo.estado[campo] = None
+                grafo.bytes = estimar_bytes(grafo.estado)
+                grafo.compactado = True
+                acoes.append((grafo.nome, 'compactado'))
+        for grafo in inativos:
+            if self.total_bytes() <= self.orcamento_bytes:
+                break
+            self.remover(grafo.nome)
+            acoes.append((grafo.nome, 'descartado'))
+        return acoes
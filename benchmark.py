@@ -0,0 +1,441 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from busca import INF, dijkstra as dijkstra_matriz, dijkstra_csr, dijkstra_limitado
+from delta import ParticaoArestas, delta_stepping, escolher_delta
+from grafo import GrafoCSR, processar_arquivo_osm, ler_arquivo_poly, construir_matriz_adjacencia
+from indice_vertices import IndiceVertices
+from registro import configurar_registro
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+ARQUIVOS_INCLUIDOS = {
+    'campus_osm': os.path.join(PASTA, 'Campus2UFG&Regiao.osm'),
+    'campus_poly': os.path.join(PASTA, 'Campus2UFG&Regiao.poly'),
+}
+SINTETICOS = ('grade', 'geometrico')
+TAMANHOS_PADRAO = (1000, 10000, 100000)
+
+LIMITE_MATRIZ = 12000  # A matriz ocupa O(V²) memória; o campus OSM tem cerca de 11,5 mil vértices
+LIMITE_EXIBICAO = 20000  # exibir_grafo desenha cada vértice pelo networkx
+LIMITE_RENDERIZACAO = 200000
+PARES_MATRIZ = 3  # O Dijkstra sobre a matriz é O(V²) por consulta
+ARVORES = 3  # Árvores de caminhos mínimos completas por motor (heap e delta-stepping)
+ESPACAMENTO = 10.0  # Distância entre vizinhos na grade sintética
+GRAU_MEDIO = 6  # Grau médio esperado do grafo geométrico aleatório
+
+TOLERANCIA_PADRAO = 0.25
+RUIDO_MINIMO_MS = 2.0  # Diferenças menores que isso não contam como regressão
+RUIDO_MINIMO_MB = 1.0
+
+def medir(funcao, repeticoes=1, memoria=True):
+    """Executa `funcao` e retorna (resultado, medição)
+
+    O tempo é o menor de `repeticoes` execuções (a mediana também é
+    registrada). O pico de memória vem de uma execução extra com o
+    tracemalloc ligado, para que o rastreamento não distorça os tempos;
+    a memória retida é o que continua alocado ao fim dela, com o
+    resultado ainda vivo.
+    """
+    tempos = []
+    resultado = None
+    for _ in range(max(1, repeticoes)):
+        resultado = None
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    medicao = {'tempo_ms': min(tempos), 'mediana_ms': statistics.median(tempos)}
+    if memoria:
+        resultado = None
+        gc.collect()
+        tracemalloc.start()
+        try:
+            resultado = funcao()
+            retida, pico = tracemalloc.get_traced_memory()
+            medicao['pico_memoria_mb'] = pico / 2**20
+            medicao['memoria_retida_mb'] = retida / 2**20
+        finally:
+            tracemalloc.stop()
+    return resultado, medicao
+
+def ignorada(motivo):
+    return {'ignorada': motivo}
+
+# Grafos sintéticos
+
+def gerar_grade(n):
+    """Grade quadrada com cerca de n vértices e arestas entre vizinhos ortogonais"""
+    lado = max(2, math.isqrt(n))
+    ids = np.arange(lado * lado).reshape(lado, lado)
+    x = (ids % lado) * ESPACAMENTO
+    y = (ids // lado) * ESPACAMENTO
+    orig = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    dest = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    return x.ravel().astype(float), y.ravel().astype(float), orig, dest
+
+def gerar_geometrico(n, semente):
+    """Grafo geométrico aleatório: n pontos uniformes ligados aos que estão a menos de um raio
+
+    Os pontos são ordenados por célula de uma grade com lado igual ao raio;
+    os pares candidatos vêm da própria célula e de quatro vizinhas (as
+    outras quatro são cobertas pela simetria), percorrendo o k-ésimo
+    membro de cada célula de forma vetorizada.
+    """
+    rng = np.random.default_rng(semente)
+    lado = math.sqrt(n) * ESPACAMENTO
+    raio = ESPACAMENTO * math.sqrt(GRAU_MEDIO / math.pi)
+    x = rng.uniform(0, lado, n)
+    y = rng.uniform(0, lado, n)
+    colunas = int(lado // raio) + 1
+    cx = (x // raio).astype(np.int64)
+    cy = (y // raio).astype(np.int64)
+    celula = cy * colunas + cx
+    ordem = np.argsort(celula, kind='stable')
+    x, y, cx, cy, celula = x[ordem], y[ordem], cx[ordem], cy[ordem], celula[ordem]
+    total_celulas = colunas * colunas
+    inicio = np.searchsorted(celula, np.arange(total_celulas), side='left')
+    fim = np.searchsorted(celula, np.arange(total_celulas), side='right')
+    ocupacao_maxima = int((fim - inicio).max())
+    indices = np.arange(n)
+
+    origens, destinos = [], []
+    for dx, dy in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+        nx_, ny_ = cx + dx, cy + dy
+        validos = (nx_ >= 0) & (nx_ < colunas) & (ny_ < colunas)
+        vizinha = np.where(validos, ny_ * colunas + nx_, 0)
+        for k in range(ocupacao_maxima):
+            j = inicio[vizinha] + k
+            mascara = validos & (j < fim[vizinha])
+            if dx == 0 and dy == 0:
+                mascara &= j > indices
+            i_sel = indices[mascara]
+            j_sel = j[mascara]
+            proximos = np.hypot(x[i_sel] - x[j_sel], y[i_sel] - y[j_sel]) <= raio
+            origens.append(i_sel[proximos])
+            destinos.append(j_sel[proximos])
+    return x, y, np.concatenate(origens), np.concatenate(destinos)
+
+def escrever_poly(caminho, x, y, orig, dest):
+    """Grava o grafo no formato .poly, com o comprimento como peso"""
+    dist = np.hypot(x[orig] - x[dest], y[orig] - y[dest])
+    with open(caminho, 'w') as arquivo:
+        arquivo.write(f"{len(x)}\t2\t0\t1\n")
+        arquivo.writelines(f"{i}\t{xi:.5f}\t{yi:.5f}\n" for i, (xi, yi) in enumerate(zip(x.tolist(), y.tolist())))
+        arquivo.write(f"{len(orig)}\t0\n")
+        arquivo.writelines(f"{i}\t{o}\t{d}\t{w:.5f}\n"
+                           for i, (o, d, w) in enumerate(zip(orig.tolist(), dest.tolist(), dist.tolist())))
+
+# Etapas medidas
+
+def sortear_pares(total_vertices, quantidade, semente):
+    """Pares origem-destino fixos para uma semente, iguais para todos os motores"""
+    rng = random.Random(semente)
+    return [(rng.randrange(total_vertices), rng.randrange(total_vertices)) for _ in range(quantidade)]
+
+def _rotear_matriz(matrizAdj, pares):
+    return [dijkstra_matriz(matrizAdj, origem, destino)[1] for origem, destino in pares]
+
+def _rotear_csr(csr, pares):
+    return [dijkstra_csr(csr, origem, destino)[1] for origem, destino in pares]
+
+def _arvores_heap(csr, origens):
+    return [dijkstra_limitado(csr, origem, INF)[0] for origem in origens]
+
+def _arvores_delta(csr, origens, particao):
+    return [delta_stepping(csr, origem, particao=particao)[0] for origem in origens]
+
+def _ler_arquivo(caminho):
+    # O mesmo que InterfaceDijkstra.ler_arquivo, sem a construção da matriz
+    vertices, arestas = ler_arquivo_poly(caminho)
+    return vertices, arestas, IndiceVertices(vertices)
+
+def criar_interface_oculta():
+    """InterfaceDijkstra em uma janela oculta; None quando não há display"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return None
+    from dijkstra import InterfaceDijkstra
+    root.withdraw()
+    return InterfaceDijkstra(root)
+
+def _exibir_grafo(interface, vertices, arestas, caminho):
+    interface.vertices = vertices
+    interface.arestas = arestas
+    interface.posicoes_cache = None
+    interface.caminho_atual = caminho or []
+    interface.exibir_grafo(caminho)
+
+def _renderizar_fundo(vertices, arestas):
+    from renderizacao import RenderizadorRotas
+    return RenderizadorRotas(vertices, arestas)
+
+def medir_conjunto(caminho, formato, opcoes, interface=None):
+    """Mede carregamento, motores de busca e renderização de um arquivo
+
+    Retorna um dicionário com o tamanho do grafo e, por etapa, o tempo (ms)
+    e o pico de memória (MB); etapas fora dos limites de tamanho são
+    registradas como ignoradas, com o motivo.
+    """
+    repeticoes = opcoes['repeticoes']
+    memoria = opcoes['memoria']
+    etapas = {}
+
+    if formato == 'osm':
+        etapa_leitura = 'processar_arquivo_osm'
+        (vertices, arestas), etapas[etapa_leitura] = medir(
+            lambda: processar_arquivo_osm(caminho), repeticoes, memoria)
+    else:
+        etapa_leitura = 'ler_arquivo'
+        (vertices, arestas, _), etapas[etapa_leitura] = medir(lambda: _ler_arquivo(caminho), repeticoes, memoria)
+    total_vertices = len(vertices)
+    # Memória por elemento (vértice ou aresta): a das colunas e a retida pela leitura inteira
+    elementos = max(1, total_vertices + len(arestas))
+    etapas[etapa_leitura]['bytes_colunas_por_elemento'] = (vertices.nbytes + arestas.nbytes) / elementos
+    if 'memoria_retida_mb' in etapas[etapa_leitura]:
+        etapas[etapa_leitura]['bytes_por_elemento'] = etapas[etapa_leitura]['memoria_retida_mb'] * 2**20 / elementos
+
+    matrizAdj = None
+    if total_vertices <= LIMITE_MATRIZ:
+        matrizAdj, etapas['construir_grafo'] = medir(
+            lambda: construir_matriz_adjacencia(vertices, arestas, False), 1, memoria)
+    else:
+        etapas['construir_grafo'] = ignorada(f"mais de {LIMITE_MATRIZ} vértices")
+
+    csr, etapas['construir_csr'] = medir(lambda: GrafoCSR.de_arestas(vertices, arestas, False),
+                                         repeticoes, memoria)
+    descritor, compilado = tempfile.mkstemp(suffix='.grafo')
+    os.close(descritor)
+    try:
+        csr.salvar(compilado)
+        _, etapas['carregar_compilado'] = medir(lambda: GrafoCSR.carregar(compilado, mmap=False),
+                                                repeticoes, memoria)
+    finally:
+        os.remove(compilado)
+
+    pares = sortear_pares(total_vertices, opcoes['pares'], opcoes['semente'])
+    custos_csr, medicao = medir(lambda: _rotear_csr(csr, pares), repeticoes, memoria)
+    medicao['consultas'] = len(pares)
+    medicao['por_consulta_ms'] = medicao['tempo_ms'] / max(1, len(pares))
+    etapas['dijkstra_csr'] = medicao
+
+    # Árvores completas: fila de prioridade contra delta-stepping vetorizado
+    origens = [origem for origem, _ in pares[:ARVORES]]
+    arvores_heap, medicao = medir(lambda: _arvores_heap(csr, origens), repeticoes, memoria)
+    medicao['consultas'] = len(origens)
+    medicao['por_consulta_ms'] = medicao['tempo_ms'] / max(1, len(origens))
+    etapas['arvore_heap'] = medicao
+    particao, etapas['particao_delta'] = medir(lambda: ParticaoArestas(csr, escolher_delta(csr.pesos)),
+                                               repeticoes, memoria)
+    arvores_delta, medicao = medir(lambda: _arvores_delta(csr, origens, particao), repeticoes, memoria)
+    medicao['consultas'] = len(origens)
+    medicao['por_consulta_ms'] = medicao['tempo_ms'] / max(1, len(origens))
+    medicao['delta'] = particao.delta
+    medicao['custos_conferem'] = all(
+        len(heap) == int((delta < INF).sum())
+        and np.allclose(delta[list(heap)], list(heap.values()), rtol=1e-9, atol=1e-9)
+        for heap, delta in zip(arvores_heap, arvores_delta))
+    etapas['delta_stepping'] = medicao
+    del arvores_heap, arvores_delta, particao
+
+    if matrizAdj is not None:
+        pares_matriz = pares[:PARES_MATRIZ]
+        custos_matriz, medicao = medir(lambda: _rotear_matriz(matrizAdj, pares_matriz), 1, False)
+        medicao['consultas'] = len(pares_matriz)
+        medicao['por_consulta_ms'] = medicao['tempo_ms'] / max(1, len(pares_matriz))
+        # Os dois motores devem concordar nos custos dos mesmos pares
+        medicao['custos_conferem'] = all(
+            (a >= INF and b >= INF) or abs(a - b) <= 1e-6 * max(1.0, abs(a))
+            for a, b in zip(custos_matriz, custos_csr))
+        etapas['dijkstra'] = medicao
+        del matrizAdj
+    else:
+        etapas['dijkstra'] = ignorada(f"mais de {LIMITE_MATRIZ} vértices")
+
+    if interface is None:
+        etapas['exibir_grafo'] = ignorada("interface Tk indisponível")
+    elif total_vertices > LIMITE_EXIBICAO:
+        etapas['exibir_grafo'] = ignorada(f"mais de {LIMITE_EXIBICAO} vértices")
+    else:
+        # Destaca a primeira rota encontrada, como após uma busca na interface
+        alcancados = [par for par, custo in zip(pares, custos_csr) if custo < INF]
+        caminho_exibido = dijkstra_csr(csr, *alcancados[0])[0] if alcancados else None
+        _, etapas['exibir_grafo'] = medir(lambda: _exibir_grafo(interface, vertices, arestas, caminho_exibido),
+                                          repeticoes, memoria)
+
+    if total_vertices <= LIMITE_RENDERIZACAO:
+        _, etapas['renderizacao'] = medir(lambda: _renderizar_fundo(vertices, arestas), 1, memoria)
+    else:
+        etapas['renderizacao'] = ignorada(f"mais de {LIMITE_RENDERIZACAO} vértices")
+
+    return {'vertices': total_vertices, 'arestas': len(arestas), 'etapas': etapas}
+
+def executar_benchmark(conjuntos, tamanhos, opcoes, usar_interface=True, registro=None):
+    """Mede os conjuntos pedidos e retorna o resultado completo, pronto para JSON"""
+    interface = criar_interface_oculta() if usar_interface else None
+    resultado = {
+        'ambiente': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'processador': platform.processor() or platform.machine(),
+        },
+        'opcoes': dict(opcoes),
+        'conjuntos': {},
+    }
+    pasta_temporaria = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        for conjunto in conjuntos:
+            if conjunto in ARQUIVOS_INCLUIDOS:
+                caminho = ARQUIVOS_INCLUIDOS[conjunto]
+                formato = 'osm' if caminho.endswith('.osm') else 'poly'
+                nomes = [(conjunto, caminho, formato)]
+            else:
+                nomes = []
+                for n in tamanhos:
+                    caminho = os.path.join(pasta_temporaria, f"{conjunto}_{n}.poly")
+                    if conjunto == 'grade':
+                        escrever_poly(caminho, *gerar_grade(n))
+                    else:
+                        escrever_poly(caminho, *gerar_geometrico(n, opcoes['semente']))
+                    nomes.append((f"{conjunto}_{n}", caminho, 'poly'))
+            for nome, caminho, formato in nomes:
+                if registro is not None:
+                    registro(f"{nome}...")
+                resultado['conjuntos'][nome] = medir_conjunto(caminho, formato, opcoes, interface)
+                if caminho.startswith(pasta_temporaria):
+                    os.remove(caminho)
+    finally:
+        for arquivo in os.listdir(pasta_temporaria):
+            os.remove(os.path.join(pasta_temporaria, arquivo))
+        os.rmdir(pasta_temporaria)
+        if interface is not None:
+            interface.root.destroy()
+    resultado['pico_memoria_processo_mb'] = _pico_memoria_processo()
+    return resultado
+
+def _pico_memoria_processo():
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return pico / 2**20 if sys.platform == 'darwin' else pico / 2**10
+
+def comparar(resultado, referencia, tolerancia=TOLERANCIA_PADRAO):
+    """Etapas mais lentas ou com mais memória que a referência além da tolerância
+
+    Só entram etapas medidas nas duas execuções; diferenças absolutas
+    pequenas (ruído de medição) são desconsideradas.
+    """
+    regressoes = []
+    for nome, conjunto in resultado['conjuntos'].items():
+        anteriores = referencia.get('conjuntos', {}).get(nome, {}).get('etapas', {})
+        for etapa, medicao in conjunto['etapas'].items():
+            anterior = anteriores.get(etapa, {})
+            for grandeza, ruido in (('tempo_ms', RUIDO_MINIMO_MS), ('pico_memoria_mb', RUIDO_MINIMO_MB),
+                                    ('memoria_retida_mb', RUIDO_MINIMO_MB)):
+                if grandeza not in medicao or grandeza not in anterior:
+                    continue
+                atual, antes = medicao[grandeza], anterior[grandeza]
+                if atual - antes > ruido and atual > antes * (1 + tolerancia):
+                    regressoes.append({'conjunto': nome, 'etapa': etapa, 'grandeza': grandeza,
+                                       'referencia': antes, 'atual': atual,
+                                       'razao': atual / antes if antes > 0 else INF})
+    return regressoes
+
+def formatar_resumo(resultado):
+    linhas = []
+    for nome, conjunto in resultado['conjuntos'].items():
+        linhas.append(f"{nome}: {conjunto['vertices']} vértices, {conjunto['arestas']} arestas")
+        for etapa, medicao in conjunto['etapas'].items():
+            if 'ignorada' in medicao:
+                linhas.append(f"  {etapa:<22} ignorada ({medicao['ignorada']})")
+                continue
+            texto = f"  {etapa:<22} {medicao['tempo_ms']:>10.1f} ms"
+            if 'pico_memoria_mb' in medicao:
+                texto += f" {medicao['pico_memoria_mb']:>9.1f} MB"
+            if 'bytes_por_elemento' in medicao:
+                texto += f"  ({medicao['bytes_por_elemento']:.0f} B/elemento)"
+            if 'por_consulta_ms' in medicao:
+                texto += f"  ({medicao['por_consulta_ms']:.2f} ms/consulta)"
+            if medicao.get('custos_conferem') is False:
+                texto += "  CUSTOS DIVERGENTES"
+            linhas.append(texto)
+    return "\n".join(linhas)
+
+def _lista(texto, tipo=str):
+    return [tipo(item) for item in texto.split(',') if item.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="dijkstra.py benchmark",
+        description="Mede carregamento, motores de busca e renderização nos grafos incluídos e em grafos sintéticos")
+    parser.add_argument('--conjuntos', default=','.join([*ARQUIVOS_INCLUIDOS, *SINTETICOS]),
+                        help="conjuntos separados por vírgula (padrão: %(default)s)")
+    parser.add_argument('--tamanhos', default=','.join(map(str, TAMANHOS_PADRAO)),
+                        help="vértices dos grafos sintéticos, ex.: 1000,10000,1000000 (padrão: %(default)s)")
+    parser.add_argument('--pares', type=int, default=50, help="consultas origem-destino por grafo")
+    parser.add_argument('--semente', type=int, default=2025, help="semente dos pares e dos grafos aleatórios")
+    parser.add_argument('--repeticoes', type=int, default=3, help="execuções por etapa (vale a menor)")
+    parser.add_argument('--sem-memoria', action='store_true', help="não medir o pico de memória (mais rápido)")
+    parser.add_argument('--sem-interface', action='store_true', help="não medir exibir_grafo na interface Tk")
+    parser.add_argument('--saida', help="arquivo JSON com os resultados (padrão: saída padrão)")
+    parser.add_argument('--referencia', help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="aumento relativo aceito antes de acusar regressão (padrão: %(default)s)")
+    args = parser.parse_args(argv)
+    configurar_registro()
+
+    conjuntos = _lista(args.conjuntos)
+    desconhecidos = [c for c in conjuntos if c not in ARQUIVOS_INCLUIDOS and c not in SINTETICOS]
+    if desconhecidos:
+        parser.error(f"conjuntos desconhecidos: {', '.join(desconhecidos)}")
+    try:
+        tamanhos = _lista(args.tamanhos, int)
+    except ValueError:
+        parser.error("--tamanhos deve ser uma lista de inteiros")
+    referencia = None
+    if args.referencia:
+        with open(args.referencia, encoding='utf-8') as arquivo:
+            referencia = json.load(arquivo)
+
+    opcoes = {'pares': args.pares, 'semente': args.semente, 'repeticoes': args.repeticoes,
+              'memoria': not args.sem_memoria}
+    resultado = executar_benchmark(conjuntos, tamanhos, opcoes, not args.sem_interface,
+                                   registro=lambda texto: print(texto, file=sys.stderr, flush=True))
+    print(formatar_resumo(resultado), file=sys.stderr)
+
+    regressoes = []
+    if referencia is not None:
+        regressoes = comparar(resultado, referencia, args.tolerancia)
+        resultado['comparacao'] = {'referencia': args.referencia, 'tolerancia': args.tolerancia,
+                                   'regressoes': regressoes}
+        for r in regressoes:
+            print(f"REGRESSÃO {r['conjunto']}/{r['etapa']}: {r['grandeza']} "
+                  f"{r['referencia']:.1f} -> {r['atual']:.1f} ({r['razao']:.2f}x)", file=sys.stderr)
+        if not regressoes:
+            print(f"Sem regressões em relação a {args.referencia}", file=sys.stderr)
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + "\n")
+    else:
+        print(texto)
+    return 1 if regressoes else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
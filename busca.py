@@ -0,0 +1,573 @@
+import heapq
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+INF = 1e9
+
+# Bytes de cada entrada da fila: a tupla, o custo float e o ponteiro na lista
+BYTES_ENTRADA_FILA = sys.getsizeof((0.0, 0)) + sys.getsizeof(0.0) + 8
+
+
+class BuscaCancelada(Exception):
+    """Indica que a busca foi interrompida antes de terminar"""
+
+
+class EspacoBusca:
+    """Arrays de trabalho das buscas sobre CSR, reaproveitados entre consultas
+
+    Em vez de alocar e preencher `dist`, `prev` e `visited` com V posições a
+    cada consulta, cada posição guarda a geração da busca que a escreveu:
+    uma nova busca só incrementa a geração, e posições de gerações antigas
+    contam como não alcançadas. Assim a consulta só toca os vértices que
+    explora. Um espaço atende uma busca por vez; `espaco_da_thread` dá um
+    para cada thread (e, num pool de processos, um para cada processo).
+    """
+
+    def __init__(self, totalVertices=0):
+        self.dist = [INF] * totalVertices
+        self.prev = [-1] * totalVertices
+        self.marca = [0] * totalVertices    # Geração em que dist e prev foram escritos
+        self.fechado = [0] * totalVertices  # Geração em que o vértice foi fechado
+        self.geracao = 0
+        self.em_uso = False
+
+    def __len__(self):
+        return len(self.dist)
+
+    @contextmanager
+    def reservar(self, totalVertices):
+        """Inicia uma busca num grafo de `totalVertices` vértices e devolve a sua geração"""
+        if self.em_uso:
+            raise RuntimeError("O espaço de busca já está em uso por outra busca")
+        falta = totalVertices - len(self.dist)
+        if falta > 0:
+            self.dist.extend([INF] * falta)
+            self.prev.extend([-1] * falta)
+            self.marca.extend([0] * falta)
+            self.fechado.extend([0] * falta)
+        self.geracao += 1
+        self.em_uso = True
+        try:
+            yield self.geracao
+        finally:
+            self.em_uso = False
+
+_espacos = threading.local()
+
+def espaco_da_thread():
+    """Espaço de busca da thread atual; um avulso se ele já está em uso (busca aninhada)"""
+    espaco = getattr(_espacos, 'espaco', None)
+    if espaco is None:
+        espaco = _espacos.espaco = EspacoBusca()
+    return espaco if not espaco.em_uso else EspacoBusca()
+
+
+def montar_estatisticas(inicio_ns, nos_explorados, custo_total, **contadores):
+    """Estatísticas comuns aos motores, com o tempo desde `inicio_ns` (perf_counter_ns)
+
+    Os contadores extras (arestas relaxadas, operações na fila, fronteira
+    máxima, bytes estimados) são acrescentados como vieram de cada motor.
+    """
+    tempo_ns = time.perf_counter_ns() - inicio_ns
+    return {
+        'tempo_ms': tempo_ns / 1e6,
+        'tempo_ns': tempo_ns,
+        'nos_explorados': nos_explorados,
+        'custo_total': custo_total,
+        **contadores,
+    }
+
+def contadores_fila(remocoes, fechados, fila, fronteira_maxima, arestas_relaxadas, *estruturas):
+    """Contadores de uma busca com fila de prioridade preguiçosa (entradas obsoletas ficam na fila)
+
+    As inserções saem de remoções + o que sobrou na fila, sem custo por
+    aresta no laço principal. `bytes_alocados` é uma estimativa: o tamanho
+    das estruturas da busca mais a fila no seu maior tamanho.
+    """
+    return {
+        'arestas_relaxadas': arestas_relaxadas,
+        'insercoes_fila': remocoes + len(fila),
+        'remocoes_fila': remocoes,
+        'remocoes_obsoletas': remocoes - fechados,
+        'fronteira_maxima': fronteira_maxima,
+        'bytes_alocados': sum(sys.getsizeof(e) for e in estruturas) + fronteira_maxima * BYTES_ENTRADA_FILA,
+    }
+
+def dijkstra(matrizAdj, inicio, fim, cancelado=None, progresso=None, intervalo_progresso=200,
+             ao_fechar=None, ao_relaxar=None):
+    """Algoritmo de Dijkstra sobre a matriz de adjacência, com estatísticas
+
+    `cancelado` é um objeto com `is_set()` (ex.: threading.Event) consultado
+    durante a busca; `progresso(nos_explorados)` é chamado a cada
+    `intervalo_progresso` vértices fechados. `ao_fechar(u, custo)` e
+    `ao_relaxar(u, v, custo)` são chamados ao fechar um vértice e ao melhorar
+    o custo de um vizinho; desligados (None), custam só um teste por evento.
+    """
+    # Iniciar cronômetro
+    inicio_ns = time.perf_counter_ns()
+
+    totalVertices = len(matrizAdj)
+    dist = [INF] * totalVertices
+    prev = [-1] * totalVertices
+    visited = [False] * totalVertices
+
+    dist[inicio] = 0.0
+    nos_explorados = 0
+    arestas_relaxadas = 0
+
+    for _ in range(totalVertices):
+        # Encontrar vértice não visitado com menor distância
+        u = -1
+        min_dist = INF
+        for j in range(totalVertices):
+            if not visited[j] and dist[j] < min_dist:
+                u = j
+                min_dist = dist[j]
+
+        if u == -1:
+            break
+
+        visited[u] = True
+        nos_explorados += 1
+        if ao_fechar is not None:
+            ao_fechar(u, min_dist)
+
+        # Pontos de controle para cancelamento e progresso
+        if nos_explorados % intervalo_progresso == 0:
+            if cancelado is not None and cancelado.is_set():
+                raise BuscaCancelada()
+            if progresso is not None:
+                progresso(nos_explorados)
+
+        # Atualizar distâncias dos vizinhos
+        linha = matrizAdj[u]
+        for v in range(totalVertices):
+            peso = linha[v]
+            if peso < INF:
+                arestas_relaxadas += 1
+                if dist[u] + peso < dist[v]:
+                    dist[v] = dist[u] + peso
+                    prev[v] = u
+                    if ao_relaxar is not None:
+                        ao_relaxar(u, v, dist[v])
+
+    contadores = {
+        'arestas_relaxadas': arestas_relaxadas,
+        'bytes_alocados': sys.getsizeof(dist) + sys.getsizeof(prev) + sys.getsizeof(visited),
+    }
+
+    if dist[fim] == INF:
+        return None, INF, montar_estatisticas(inicio_ns, nos_explorados, INF, **contadores)
+
+    # Reconstruir caminho
+    path = []
+    v = fim
+    while v != -1:
+        path.append(v)
+        v = prev[v]
+
+    caminho_final = list(reversed(path))
+    custo_total = dist[fim]
+
+    estatisticas = montar_estatisticas(inicio_ns, nos_explorados, custo_total, **contadores)
+
+    return caminho_final, custo_total, estatisticas
+
+def reconstruir_caminho(prev, fim):
+    """Reconstrói o caminho até `fim` seguindo os predecessores"""
+    path = []
+    v = fim
+    while v != -1:
+        path.append(v)
+        v = prev[v]
+    return list(reversed(path))
+
+def peso_aresta(csr, u, v):
+    """Menor peso entre as arestas u -> v, ou INF se não houver"""
+    return min((float(csr.pesos[i]) for i in range(csr.inicio[u], csr.inicio[u + 1]) if csr.destinos[i] == v),
+               default=INF)
+
+def dijkstra_csr(csr, inicio, fim, cancelado=None, progresso=None, intervalo_progresso=200,
+                 ao_fechar=None, ao_relaxar=None, espaco=None):
+    """Dijkstra com fila de prioridade sobre a adjacência CSR, com estatísticas
+
+    Para ao fechar o destino. Os arrays são lidos por memoryview, sem cópia,
+    o que permite usar um grafo compilado aberto via mmap. Os callbacks e
+    contadores são os mesmos de `dijkstra`, mais os da fila de prioridade.
+    `espaco` é o EspacoBusca reaproveitado (padrão: o da thread atual).
+    """
+    inicio_ns = time.perf_counter_ns()
+
+    ini = memoryview(csr.inicio)
+    destinos = memoryview(csr.destinos)
+    pesos = memoryview(csr.pesos)
+    totalVertices = len(ini) - 1
+
+    espaco = espaco if espaco is not None else espaco_da_thread()
+    with espaco.reservar(totalVertices) as geracao:
+        dist, prev, marca, fechado = espaco.dist, espaco.prev, espaco.marca, espaco.fechado
+        dist[inicio] = 0.0
+        prev[inicio] = -1
+        marca[inicio] = geracao
+        fila = [(0.0, inicio)]
+        nos_explorados = 0
+        remocoes = 0
+        fronteira_maxima = 0
+        arestas_relaxadas = 0
+
+        while fila:
+            # A fila só cresce entre duas remoções, então o pico é medido aqui
+            if len(fila) > fronteira_maxima:
+                fronteira_maxima = len(fila)
+            d, u = heapq.heappop(fila)
+            remocoes += 1
+            if fechado[u] == geracao:
+                continue
+            fechado[u] = geracao
+            nos_explorados += 1
+            if ao_fechar is not None:
+                ao_fechar(u, d)
+
+            # Pontos de controle para cancelamento e progresso
+            if nos_explorados % intervalo_progresso == 0:
+                if cancelado is not None and cancelado.is_set():
+                    raise BuscaCancelada()
+                if progresso is not None:
+                    progresso(nos_explorados)
+
+            if u == fim:
+                break
+
+            # Relaxar as arestas de saída de u; posições de outra geração valem INF
+            primeira, ultima = ini[u], ini[u + 1]
+            arestas_relaxadas += ultima - primeira
+            for i in range(primeira, ultima):
+                v = destinos[i]
+                nd = d + pesos[i]
+                if marca[v] != geracao or nd < dist[v]:
+                    marca[v] = geracao
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(fila, (nd, v))
+                    if ao_relaxar is not None:
+                        ao_relaxar(u, v, nd)
+
+        # Os arrays do espaço são reaproveitados: só a fila é alocada pela consulta
+        contadores = contadores_fila(remocoes, nos_explorados, fila, fronteira_maxima, arestas_relaxadas)
+        if marca[fim] != geracao:
+            return None, INF, montar_estatisticas(inicio_ns, nos_explorados, INF, **contadores)
+
+        custo_total = dist[fim]
+        caminho = reconstruir_caminho(prev, fim)
+    estatisticas = montar_estatisticas(inicio_ns, nos_explorados, custo_total, **contadores)
+    return caminho, custo_total, estatisticas
+
+def dijkstra_um_para_muitos(csr, inicio, alvos, espaco=None):
+    """Custos de `inicio` até cada alvo em uma única busca (None se inalcançável)
+
+    A busca para assim que todos os alvos forem fechados.
+    """
+    ini = memoryview(csr.inicio)
+    destinos = memoryview(csr.destinos)
+    pesos = memoryview(csr.pesos)
+
+    espaco = espaco if espaco is not None else espaco_da_thread()
+    with espaco.reservar(len(ini) - 1) as geracao:
+        dist, marca, fechado = espaco.dist, espaco.marca, espaco.fechado
+        dist[inicio] = 0.0
+        marca[inicio] = geracao
+        restantes = set(alvos)
+        fila = [(0.0, inicio)]
+
+        while fila and restantes:
+            d, u = heapq.heappop(fila)
+            if fechado[u] == geracao:
+                continue
+            fechado[u] = geracao
+            restantes.discard(u)
+
+            for i in range(ini[u], ini[u + 1]):
+                v = destinos[i]
+                nd = d + pesos[i]
+                if marca[v] != geracao or nd < dist[v]:
+                    marca[v] = geracao
+                    dist[v] = nd
+                    heapq.heappush(fila, (nd, v))
+
+        return [dist[a] if fechado[a] == geracao else None for a in alvos]
+
+def dijkstra_limitado(csr, inicio, orcamento, cancelado=None, progresso=None, intervalo_progresso=200,
+                      ao_fechar=None, ao_relaxar=None, espaco=None):
+    """Fecha apenas os vértices com custo até `orcamento` a partir de `inicio`
+
+    Retorna (custos, estatisticas), com `custos` mapeando id -> custo de cada
+    vértice alcançado. Vértices além do orçamento nem entram na fila, então a
+    busca termina sem explorar o resto do grafo.
+    """
+    inicio_ns = time.perf_counter_ns()
+
+    ini = memoryview(csr.inicio)
+    destinos = memoryview(csr.destinos)
+    pesos = memoryview(csr.pesos)
+
+    espaco = espaco if espaco is not None else espaco_da_thread()
+    with espaco.reservar(len(ini) - 1) as geracao:
+        dist, marca, fechado = espaco.dist, espaco.marca, espaco.fechado
+        dist[inicio] = 0.0
+        marca[inicio] = geracao
+        custos = {}
+        fila = [(0.0, inicio)]
+        remocoes = 0
+        fronteira_maxima = 0
+        arestas_relaxadas = 0
+
+        while fila:
+            if len(fila) > fronteira_maxima:
+                fronteira_maxima = len(fila)
+            d, u = heapq.heappop(fila)
+            remocoes += 1
+            if fechado[u] == geracao:
+                continue
+            fechado[u] = geracao
+            custos[u] = d
+            if ao_fechar is not None:
+                ao_fechar(u, d)
+
+            if len(custos) % intervalo_progresso == 0:
+                if cancelado is not None and cancelado.is_set():
+                    raise BuscaCancelada()
+                if progresso is not None:
+                    progresso(len(custos))
+
+            primeira, ultima = ini[u], ini[u + 1]
+            arestas_relaxadas += ultima - primeira
+            for i in range(primeira, ultima):
+                v = destinos[i]
+                nd = d + pesos[i]
+                if nd <= orcamento and (marca[v] != geracao or nd < dist[v]):
+                    marca[v] = geracao
+                    dist[v] = nd
+                    heapq.heappush(fila, (nd, v))
+                    if ao_relaxar is not None:
+                        ao_relaxar(u, v, nd)
+
+    contadores = contadores_fila(remocoes, len(custos), fila, fronteira_maxima, arestas_relaxadas, custos)
+    estatisticas = montar_estatisticas(inicio_ns, len(custos), max(custos.values(), default=0.0), **contadores)
+    return custos, estatisticas
+
+def dijkstra_sementes(csr, origens, destinos, cancelado=None, progresso=None, intervalo_progresso=200,
+                      ao_fechar=None, ao_relaxar=None, espaco=None):
+    """Dijkstra com várias origens e destinos, cada um com um custo inicial ou final
+
+    `origens` e `destinos` são listas de (vértice, custo): a busca parte de
+    todas as origens ao mesmo tempo e o custo de chegar a um destino soma o
+    seu custo final. Serve para pontos no meio de arestas (nós fantasmas)
+    sem alterar o grafo. Retorna (caminho, custo, estatisticas) como dijkstra_csr.
+    """
+    inicio_ns = time.perf_counter_ns()
+
+    ini = memoryview(csr.inicio)
+    destinos_csr = memoryview(csr.destinos)
+    pesos = memoryview(csr.pesos)
+
+    espaco = espaco if espaco is not None else espaco_da_thread()
+    with espaco.reservar(len(ini) - 1) as geracao:
+        dist, prev, marca, fechado = espaco.dist, espaco.prev, espaco.marca, espaco.fechado
+        fila = []
+        for v, custo in origens:
+            if marca[v] != geracao or custo < dist[v]:
+                marca[v] = geracao
+                dist[v] = custo
+                prev[v] = -1
+                heapq.heappush(fila, (custo, v))
+        chegada = {}
+        for v, custo in destinos:
+            chegada[v] = min(chegada.get(v, INF), custo)
+
+        melhor, melhor_vertice = INF, -1
+        fechados = 0
+        remocoes = 0
+        fronteira_maxima = 0
+        arestas_relaxadas = 0
+        while fila:
+            if len(fila) > fronteira_maxima:
+                fronteira_maxima = len(fila)
+            d, u = heapq.heappop(fila)
+            remocoes += 1
+            # Nenhuma chegada futura pode ficar abaixo da melhor já encontrada
+            if d >= melhor:
+                break
+            if fechado[u] == geracao:
+                continue
+            fechado[u] = geracao
+            fechados += 1
+            if ao_fechar is not None:
+                ao_fechar(u, d)
+
+            if fechados % intervalo_progresso == 0:
+                if cancelado is not None and cancelado.is_set():
+                    raise BuscaCancelada()
+                if progresso is not None:
+                    progresso(fechados)
+
+            if u in chegada and d + chegada[u] < melhor:
+                melhor, melhor_vertice = d + chegada[u], u
+
+            primeira, ultima = ini[u], ini[u + 1]
+            arestas_relaxadas += ultima - primeira
+            for i in range(primeira, ultima):
+                v = destinos_csr[i]
+                nd = d + pesos[i]
+                if marca[v] != geracao or nd < dist[v]:
+                    marca[v] = geracao
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(fila, (nd, v))
+                    if ao_relaxar is not None:
+                        ao_relaxar(u, v, nd)
+
+        contadores = contadores_fila(remocoes, fechados, fila, fronteira_maxima, arestas_relaxadas)
+        estatisticas = montar_estatisticas(inicio_ns, fechados, melhor, **contadores)
+        if melhor_vertice == -1:
+            return None, INF, estatisticas
+        return reconstruir_caminho(prev, melhor_vertice), melhor, estatisticas
+
+def dijkstra_mais_proximos(csr, inicio, alvos, k, cancelado=None, progresso=None, intervalo_progresso=200,
+                           ao_fechar=None, ao_relaxar=None, espaco=None):
+    """Os k alvos mais próximos de `inicio`, em uma única busca
+
+    `alvos` mapeia vértice -> quantos alvos há nele (um iterável de
+    vértices conta um por vértice). A busca para quando os alvos fechados
+    somam k, em vez de uma busca ponto a ponto por alvo. Retorna
+    (encontrados, estatisticas), com `encontrados` uma lista de
+    (vértice, custo, caminho) em ordem crescente de custo.
+    """
+    inicio_ns = time.perf_counter_ns()
+
+    ini = memoryview(csr.inicio)
+    destinos = memoryview(csr.destinos)
+    pesos = memoryview(csr.pesos)
+    if not isinstance(alvos, dict):
+        alvos = dict.fromkeys(alvos, 1)
+
+    espaco = espaco if espaco is not None else espaco_da_thread()
+    with espaco.reservar(len(ini) - 1) as geracao:
+        dist, prev, marca, fechado = espaco.dist, espaco.prev, espaco.marca, espaco.fechado
+        dist[inicio] = 0.0
+        prev[inicio] = -1
+        marca[inicio] = geracao
+        fila = [(0.0, inicio)]
+        encontrados = []
+        faltam = k
+        fechados = 0
+        remocoes = 0
+        fronteira_maxima = 0
+        arestas_relaxadas = 0
+
+        while fila and faltam > 0:
+            if len(fila) > fronteira_maxima:
+                fronteira_maxima = len(fila)
+            d, u = heapq.heappop(fila)
+            remocoes += 1
+            if fechado[u] == geracao:
+                continue
+            fechado[u] = geracao
+            fechados += 1
+            if ao_fechar is not None:
+                ao_fechar(u, d)
+
+            if fechados % intervalo_progresso == 0:
+                if cancelado is not None and cancelado.is_set():
+                    raise BuscaCancelada()
+                if progresso is not None:
+                    progresso(fechados)
+
+            if u in alvos:
+                encontrados.append((u, d, reconstruir_caminho(prev, u)))
+                faltam -= alvos[u]
+                if faltam <= 0:
+                    break
+
+            primeira, ultima = ini[u], ini[u + 1]
+            arestas_relaxadas += ultima - primeira
+            for i in range(primeira, ultima):
+                v = destinos[i]
+                nd = d + pesos[i]
+                if marca[v] != geracao or nd < dist[v]:
+                    marca[v] = geracao
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(fila, (nd, v))
+                    if ao_relaxar is not None:
+                        ao_relaxar(u, v, nd)
+
+        contadores = contadores_fila(remocoes, fechados, fila, fronteira_maxima, arestas_relaxadas)
+    custo_total = encontrados[-1][1] if encontrados else INF
+    return encontrados, montar_estatisticas(inicio_ns, fechados, custo_total, **contadores)
+
+def dijkstra_multiorigem(csr, origens, cancelado=None, progresso=None, intervalo_progresso=200):
+    """Custo até a origem mais próxima e qual é ela, para todos os vértices, em uma única busca
+
+    Todas as `origens` entram na fila com custo zero e cada vértice herda a
+    origem do vértice que o alcançou: o resultado é a partição de Voronoi do
+    grafo. Para atribuir cada vértice à origem que ele alcança mais barato
+    num grafo direcionado, passe `csr.transposto()`. Retorna (custos, donos,
+    estatisticas): listas por vértice com o custo (INF se inalcançável) e o
+    índice em `origens` (-1 se inalcançável).
+    """
+    inicio_ns = time.perf_counter_ns()
+
+    ini = memoryview(csr.inicio)
+    destinos = memoryview(csr.destinos)
+    pesos = memoryview(csr.pesos)
+    totalVertices = len(ini) - 1
+
+    # O resultado cobre o grafo inteiro, então os arrays são da própria consulta
+    dist = [INF] * totalVertices
+    dono = [-1] * totalVertices
+    fechado = bytearray(totalVertices)
+    fila = []
+    for indice, v in enumerate(origens):
+        if dono[v] == -1:
+            dist[v] = 0.0
+            dono[v] = indice
+            fila.append((0.0, v))
+    heapq.heapify(fila)
+    fechados = 0
+    remocoes = 0
+    fronteira_maxima = 0
+    arestas_relaxadas = 0
+
+    while fila:
+        if len(fila) > fronteira_maxima:
+            fronteira_maxima = len(fila)
+        d, u = heapq.heappop(fila)
+        remocoes += 1
+        if fechado[u]:
+            continue
+        fechado[u] = 1
+        fechados += 1
+
+        if fechados % intervalo_progresso == 0:
+            if cancelado is not None and cancelado.is_set():
+                raise BuscaCancelada()
+            if progresso is not None:
+                progresso(fechados)
+
+        origem = dono[u]
+        primeira, ultima = ini[u], ini[u + 1]
+        arestas_relaxadas += ultima - primeira
+        for i in range(primeira, ultima):
+            v = destinos[i]
+            nd = d + pesos[i]
+            if nd < dist[v]:
+                dist[v] = nd
+                dono[v] = origem
+                heapq.heappush(fila, (nd, v))
+
+    contadores = contadores_fila(remocoes, fechados, fila, fronteira_maxima, arestas_relaxadas,
+                                 dist, dono, fechado)
+    custo_total = max((c for c in dist if c < INF), default=INF)
+    return dist, dono, montar_estatisticas(inicio_ns, fechados, custo_total, **contadores)
@@ -0,0 +1,311 @@
+import heapq
+import math
+import time
+import numpy as np
+from busca import INF, BuscaCancelada, contadores_fila, montar_estatisticas
+
+TAMANHO_CELULA = 64  # Vértices por célula do nível 1, em média
+BITS_NIVEL = 3       # Cada célula de um nível junta 2**3 = 8 células do nível de baixo
+NIVEIS = 2
+
+def bissecao(x, y, profundidade):
+    """Partição por bissecções sucessivas nas coordenadas (kd-tree pela mediana)
+
+    Cada passo divide cada grupo ao meio pela mediana do eixo mais largo; o
+    código de um vértice são os bits das escolhas, do primeiro corte ao
+    último, então as células de um nível acima são prefixos dos códigos.
+    Retorna (códigos, eixos, cortes), com os cortes em ordem de heap (os
+    filhos do nó i são 2i + 1 e 2i + 2) para localizar vértices novos.
+    """
+    n = len(x)
+    codigos = np.zeros(n, dtype=np.int64)
+    eixos = np.zeros((1 << profundidade) - 1, dtype=np.int8)
+    cortes = np.zeros((1 << profundidade) - 1)
+    grupos = [np.arange(n)]
+    for passo in range(profundidade):
+        proximos = []
+        for g, membros in enumerate(grupos):
+            no = (1 << passo) - 1 + g
+            if len(membros) < 2:
+                proximos.extend((membros, membros[:0]))
+                continue
+            xs, ys = x[membros], y[membros]
+            eixo = 0 if np.ptp(xs) >= np.ptp(ys) else 1
+            coordenadas = xs if eixo == 0 else ys
+            ordem = np.argsort(coordenadas, kind='stable')
+            meio = len(membros) // 2
+            eixos[no] = eixo
+            cortes[no] = coordenadas[ordem[meio]]
+            codigos[membros[ordem[meio:]]] |= 1 << (profundidade - 1 - passo)
+            proximos.extend((membros[ordem[:meio]], membros[ordem[meio:]]))
+        grupos = proximos
+    return codigos, eixos, cortes
+
+class SobreposicaoCRP:
+    """Roteamento multinível por células (Customizable Route Planning)
+
+    Os vértices são divididos em células pelas coordenadas, e cada célula
+    do nível 1 fica dentro de uma do nível 2, e assim por diante. Cada
+    célula guarda a clique das suas fronteiras (vértices com aresta para
+    fora dela): a distância entre cada par pelo interior da célula,
+    calculada sobre as cliques do nível de baixo. A consulta usa as arestas
+    originais só nas células de nível 1 da origem e do destino; no resto
+    anda pelas cliques do nível mais alto que não contém nenhum dos dois.
+
+    A partição só depende das coordenadas e da topologia; as cliques
+    dependem dos pesos. Trocar a métrica refaz só as cliques
+    (`personalizar`), e editar uma aresta refaz só as células que contêm
+    seus extremos (`atualizar`), em vez de todo o pré-processamento.
+    """
+
+    def __init__(self, codigos, eixos, cortes, profundidade, niveis=NIVEIS):
+        self.codigos = codigos          # Código da célula mais fina de cada vértice
+        self.eixos = eixos
+        self.cortes = cortes
+        self.profundidade = profundidade
+        self.niveis = niveis
+        self.csr = None
+        self.celula = [None] * (niveis + 1)     # Nível -> célula de cada vértice (lista)
+        self.fronteira = [None] + [{} for _ in range(niveis)]  # Nível -> célula -> vértices
+        self.posicao = [None] + [{} for _ in range(niveis)]    # Nível -> vértice -> posição na fronteira
+        self.clique = [None] + [{} for _ in range(niveis)]     # Nível -> célula -> linhas de custos
+
+    @classmethod
+    def construir(cls, csr, tamanho_celula=TAMANHO_CELULA, niveis=NIVEIS):
+        """Partição das coordenadas de `csr` e cliques na métrica ativa"""
+        n = csr.totalVertices
+        profundidade = max(BITS_NIVEL * (niveis - 1) + 1, math.ceil(math.log2(max(n / tamanho_celula, 1))))
+        codigos, eixos, cortes = bissecao(np.asarray(csr.x, dtype=float), np.asarray(csr.y, dtype=float),
+                                          profundidade)
+        sobreposicao = cls(codigos, eixos, cortes, profundidade, niveis)
+        sobreposicao.personalizar(csr)
+        return sobreposicao
+
+    def deslocamento(self, nivel):
+        """Bits descartados do código para chegar à célula do nível"""
+        return BITS_NIVEL * (nivel - 1)
+
+    def localizar(self, px, py):
+        """Código da célula mais fina de um ponto, descendo pelos cortes"""
+        no = 0
+        codigo = 0
+        for _ in range(self.profundidade):
+            coordenada = px if self.eixos[no] == 0 else py
+            lado = int(coordenada >= self.cortes[no])
+            codigo = codigo * 2 + lado
+            no = 2 * no + 1 + lado
+        return codigo
+
+    # Pré-processamento
+
+    def _preparar(self, csr):
+        n = csr.totalVertices
+        if n > len(self.codigos):
+            # Vértices novos entram na célula em que caem pelos cortes
+            novos = [self.localizar(float(csr.x[v]), float(csr.y[v])) for v in range(len(self.codigos), n)]
+            self.codigos = np.concatenate([self.codigos, np.array(novos, dtype=np.int64)])
+        self.csr = csr
+        self.inicio = np.asarray(csr.inicio).tolist()
+        self.destinos = np.asarray(csr.destinos).tolist()
+        self.pesos = np.asarray(csr.pesos).tolist()
+        self.origens_arestas = np.repeat(np.arange(n, dtype=np.int64), np.diff(np.asarray(csr.inicio)))
+        for nivel in range(1, self.niveis + 1):
+            self.celula[nivel] = (self.codigos[:n] >> self.deslocamento(nivel)).tolist()
+
+    def _calcular_fronteiras(self, nivel, celulas=None):
+        """Refaz as fronteiras do nível (só das `celulas`, se dadas)"""
+        codigo_celula = self.codigos[:self.csr.totalVertices] >> self.deslocamento(nivel)
+        destinos = np.asarray(self.csr.destinos)
+        cruza = codigo_celula[self.origens_arestas] != codigo_celula[destinos]
+        extremos = np.unique(np.concatenate([self.origens_arestas[cruza], destinos[cruza]]))
+        donos = codigo_celula[extremos]
+        if celulas is not None:
+            escolhidos = np.isin(donos, np.fromiter(celulas, dtype=np.int64))
+            extremos, donos = extremos[escolhidos], donos[escolhidos]
+        fronteira = self.fronteira[nivel]
+        posicao = self.posicao[nivel]
+        for celula in (celulas if celulas is not None else list(fronteira)):
+            for v in fronteira.pop(celula, ()):
+                posicao.pop(v, None)
+        if celulas is None:
+            posicao.clear()
+        if not len(extremos):
+            return
+        ordem = np.argsort(donos, kind='stable')
+        extremos, donos = extremos[ordem], donos[ordem]
+        limites = np.flatnonzero(np.diff(donos)) + 1
+        for primeiro, grupo in zip([0] + limites.tolist(), np.split(extremos, limites)):
+            vertices = grupo.tolist()
+            fronteira[int(donos[primeiro])] = vertices
+            for i, v in enumerate(vertices):
+                posicao[v] = i
+
+    def _calcular_clique(self, nivel, celula):
+        """Custos entre as fronteiras da célula pelo seu interior, sobre o nível de baixo"""
+        vertices = self.fronteira[nivel].get(celula, [])
+        linhas = []
+        for origem in vertices:
+            dist, _, _ = self._buscar(origem, lambda u: nivel - 1, (nivel, celula), alvos=set(vertices))
+            linhas.append([dist.get(v, INF) for v in vertices])
+        self.clique[nivel][celula] = linhas
+
+    def personalizar(self, csr):
+        """Refaz fronteiras e cliques de todas as células para o grafo e a métrica de `csr`"""
+        self._preparar(csr)
+        for nivel in range(1, self.niveis + 1):
+            self._calcular_fronteiras(nivel)
+            self.clique[nivel] = {}
+            for celula in list(self.fronteira[nivel]):
+                self._calcular_clique(nivel, celula)
+
+    def atualizar(self, csr, arestas):
+        """Leva as cliques ao grafo editado `csr`, refazendo só as células dos extremos de `arestas`
+
+        `arestas` são os pares (u, v) inseridos, removidos ou com peso novo
+        desde a última atualização. Retorna quantas células foram refeitas.
+        """
+        self._preparar(csr)
+        refeitas = 0
+        for nivel in range(1, self.niveis + 1):
+            deslocamento = self.deslocamento(nivel)
+            celulas = {int(self.codigos[v]) >> deslocamento for par in arestas for v in par}
+            if not celulas:
+                continue
+            self._calcular_fronteiras(nivel, celulas)
+            for celula in celulas:
+                self._calcular_clique(nivel, celula)
+            refeitas += len(celulas)
+        return refeitas
+
+    # Busca
+
+    def _buscar(self, origem, nivel_de, restricao=None, destino=None, alvos=None,
+                cancelado=None, progresso=None, intervalo_progresso=200, ao_fechar=None, ao_relaxar=None,
+                contadores=None):
+        """Dijkstra sobre a sobreposição: em cada vértice u, as arestas de nivel_de(u)
+
+        No nível 0 são as arestas originais; no nível k, a clique da célula
+        de u mais as arestas originais que saem dela. `restricao` = (nível,
+        célula) limita a busca ao interior da célula. Retorna (dist, prev,
+        fechados), com prev[v] = (u, nível do arco usado).
+        """
+        inicio, destinos, pesos = self.inicio, self.destinos, self.pesos
+        celula_restrita = self.celula[restricao[0]] if restricao else None
+        dist = {origem: 0.0}
+        prev = {origem: (-1, 0)}
+        fechados = set()
+        fila = [(0.0, origem)]
+        restantes = set(alvos) if alvos is not None else None
+        remocoes = 0
+        fronteira_maxima = 0
+        arestas_relaxadas = 0
+        while fila:
+            if len(fila) > fronteira_maxima:
+                fronteira_maxima = len(fila)
+            d, u = heapq.heappop(fila)
+            remocoes += 1
+            if u in fechados:
+                continue
+            fechados.add(u)
+            if ao_fechar is not None:
+                ao_fechar(u, d)
+            if len(fechados) % intervalo_progresso == 0:
+                if cancelado is not None and cancelado.is_set():
+                    raise BuscaCancelada()
+                if progresso is not None:
+                    progresso(len(fechados))
+            if u == destino:
+                break
+            if restantes is not None:
+                restantes.discard(u)
+                if not restantes:
+                    break
+
+            nivel = nivel_de(u)
+            if nivel:
+                celula = self.celula[nivel]
+                c = celula[u]
+                vizinhos = self.fronteira[nivel][c]
+                linha = self.clique[nivel][c][self.posicao[nivel][u]]
+                arestas_relaxadas += len(vizinhos)
+                for v, peso in zip(vizinhos, linha):
+                    nd = d + peso
+                    if nd < dist.get(v, INF):
+                        dist[v] = nd
+                        prev[v] = (u, nivel)
+                        heapq.heappush(fila, (nd, v))
+                        if ao_relaxar is not None:
+                            ao_relaxar(u, v, nd)
+            for i in range(inicio[u], inicio[u + 1]):
+                v = destinos[i]
+                if nivel and celula[v] == c:
+                    continue  # Dentro da célula, a clique já cobre
+                if celula_restrita is not None and celula_restrita[v] != restricao[1]:
+                    continue
+                arestas_relaxadas += 1
+                nd = d + pesos[i]
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    prev[v] = (u, 0)
+                    heapq.heappush(fila, (nd, v))
+                    if ao_relaxar is not None:
+                        ao_relaxar(u, v, nd)
+        if contadores is not None:
+            contadores.update(contadores_fila(remocoes, len(fechados), fila, fronteira_maxima, arestas_relaxadas,
+                                              dist, prev, fechados))
+        return dist, prev, fechados
+
+    def _desempacotar(self, origem, destino, prev):
+        """Caminho em vértices do grafo, trocando cada arco de clique pelo trecho que ele resume"""
+        arcos = []
+        v = destino
+        while v != origem:
+            u, nivel = prev[v]
+            arcos.append((u, v, nivel))
+            v = u
+        caminho = [origem]
+        for u, v, nivel in reversed(arcos):
+            if nivel == 0:
+                caminho.append(v)
+                continue
+            # O trecho fica dentro da célula de u no nível do arco, sobre o nível de baixo
+            _, prev_trecho, _ = self._buscar(u, lambda w: nivel - 1, (nivel, self.celula[nivel][u]), destino=v)
+            caminho.extend(self._desempacotar(u, v, prev_trecho)[1:])
+        return caminho
+
+    def rota(self, origem, destino, cancelado=None, progresso=None, intervalo_progresso=200,
+             ao_fechar=None, ao_relaxar=None):
+        """Menor caminho pela sobreposição; retorna (caminho, custo, estatisticas) como dijkstra_csr
+
+        Os callbacks veem a busca na sobreposição: as relaxações por arcos de
+        clique ligam fronteiras que não são vizinhas no grafo.
+        """
+        inicio_ns = time.perf_counter_ns()
+        niveis = range(self.niveis, 0, -1)
+        celulas_origem = [None] + [self.celula[k][origem] for k in range(1, self.niveis + 1)]
+        celulas_destino = [None] + [self.celula[k][destino] for k in range(1, self.niveis + 1)]
+
+        def nivel_de(u):
+            # O nível mais alto em que a célula de u não contém a origem nem o destino
+            for k in niveis:
+                c = self.celula[k][u]
+                if c != celulas_origem[k] and c != celulas_destino[k]:
+                    return k
+            return 0
+
+        contadores = {}
+        dist, prev, fechados = self._buscar(origem, nivel_de, destino=destino, cancelado=cancelado,
+                                            progresso=progresso, intervalo_progresso=intervalo_progresso,
+                                            ao_fechar=ao_fechar, ao_relaxar=ao_relaxar, contadores=contadores)
+        if destino not in fechados:
+            return None, INF, montar_estatisticas(inicio_ns, len(fechados), INF, **contadores)
+        caminho = self._desempacotar(origem, destino, prev)
+        return caminho, dist[destino], montar_estatisticas(inicio_ns, len(fechados), dist[destino], **contadores)
+
+    def estatisticas(self):
+        """Células, fronteiras e entradas das cliques por nível"""
+        return [{'nivel': nivel,
+                 'celulas': len(set(self.celula[nivel])),
+                 'fronteiras': sum(len(f) for f in self.fronteira[nivel].values()),
+                 'entradas_clique': sum(len(f) ** 2 for f in self.fronteira[nivel].values())}
+                for nivel in range(1, self.niveis + 1)]
@@ -0,0 +1,228 @@
+import numpy as np
+
+FLAG_VELOCIDADE = 1  # A aresta tem velocidade própria (tags do OSM); sem ela, vale a padrão
+FLAG_MAO_UNICA = 2   # Só orig -> dest no grafo direcionado (coluna do .poly, oneway do OSM)
+CAPACIDADE_MINIMA = 16
+
+class _Colunas:
+    """Colunas NumPy de mesmo tamanho, com capacidade que dobra nos acréscimos
+
+    Cada elemento é uma linha; não há um objeto Python por elemento. Os
+    itens lidos por índice ou na iteração são visões leves da linha, válidas
+    até a próxima remoção (as posições mudam).
+    """
+    CAMPOS = ()  # (nome, dtype)
+    VISAO = None
+
+    def __init__(self, **colunas):
+        tamanhos = {len(colunas[nome]) for nome, _ in self.CAMPOS if colunas.get(nome) is not None}
+        if len(tamanhos) > 1:
+            raise ValueError("As colunas devem ter o mesmo tamanho")
+        self._n = tamanhos.pop() if tamanhos else 0
+        self._dados = {}
+        for nome, dtype in self.CAMPOS:
+            coluna = colunas.get(nome)
+            self._dados[nome] = (np.zeros(self._n, dtype=dtype) if coluna is None
+                                 else np.array(coluna, dtype=dtype))
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, posicao):
+        if posicao < 0:
+            posicao += self._n
+        if not 0 <= posicao < self._n:
+            raise IndexError(posicao)
+        return self.VISAO(self, posicao)
+
+    def __iter__(self):
+        for posicao in range(self._n):
+            yield self.VISAO(self, posicao)
+
+    def coluna(self, nome):
+        """Array da coluna, só com as linhas em uso (uma visão, não uma cópia)"""
+        return self._dados[nome][:self._n]
+
+    @property
+    def nbytes(self):
+        """Bytes ocupados pelas linhas em uso"""
+        return sum(self.coluna(nome).nbytes for nome, _ in self.CAMPOS)
+
+    def _acrescentar(self, **valores):
+        capacidade = len(self._dados[self.CAMPOS[0][0]])
+        if self._n == capacidade:
+            nova = max(CAPACIDADE_MINIMA, 2 * capacidade)
+            for nome, dtype in self.CAMPOS:
+                coluna = np.zeros(nova, dtype=dtype)
+                coluna[:self._n] = self._dados[nome][:self._n]
+                self._dados[nome] = coluna
+        for nome, valor in valores.items():
+            self._dados[nome][self._n] = valor
+        self._n += 1
+
+    def remover(self, mascara):
+        """Remove as linhas marcadas na máscara booleana; retorna quantas saíram"""
+        manter = ~np.asarray(mascara, dtype=bool)
+        removidas = self._n - int(manter.sum())
+        if removidas:
+            for nome, _ in self.CAMPOS:
+                self._dados[nome] = self.coluna(nome)[manter]
+            self._n -= removidas
+        return removidas
+
+class VisaoVertice:
+    """Um vértice de uma TabelaVertices, com os mesmos atributos de Vertices"""
+    __slots__ = ('tabela', 'posicao')
+
+    def __init__(self, tabela, posicao):
+        self.tabela = tabela
+        self.posicao = posicao
+
+    @property
+    def id(self):
+        return int(self.tabela._dados['id'][self.posicao])
+
+    @property
+    def x(self):
+        return float(self.tabela._dados['x'][self.posicao])
+
+    @x.setter
+    def x(self, valor):
+        self.tabela._dados['x'][self.posicao] = valor
+
+    @property
+    def y(self):
+        return float(self.tabela._dados['y'][self.posicao])
+
+    @y.setter
+    def y(self, valor):
+        self.tabela._dados['y'][self.posicao] = valor
+
+    def __repr__(self):
+        return f"Vertices(id={self.id}, x={self.x}, y={self.y})"
+
+class VisaoAresta:
+    """Uma aresta de uma TabelaArestas, com os mesmos atributos de Arestas"""
+    __slots__ = ('tabela', 'posicao')
+
+    def __init__(self, tabela, posicao):
+        self.tabela = tabela
+        self.posicao = posicao
+
+    @property
+    def orig(self):
+        return int(self.tabela._dados['orig'][self.posicao])
+
+    @property
+    def dest(self):
+        return int(self.tabela._dados['dest'][self.posicao])
+
+    @property
+    def dist(self):
+        return float(self.tabela._dados['dist'][self.posicao])
+
+    @dist.setter
+    def dist(self, valor):
+        self.tabela._dados['dist'][self.posicao] = valor
+
+    @property
+    def velocidade(self):
+        if not self.tabela._dados['flags'][self.posicao] & FLAG_VELOCIDADE:
+            return None
+        return float(self.tabela._dados['velocidade'][self.posicao])
+
+    @property
+    def mao_unica(self):
+        return bool(self.tabela._dados['flags'][self.posicao] & FLAG_MAO_UNICA)
+
+    def __repr__(self):
+        return (f"Arestas(orig={self.orig}, dest={self.dest}, dist={self.dist}, velocidade={self.velocidade}, "
+                f"mao_unica={self.mao_unica})")
+
+class TabelaVertices(_Colunas):
+    """Vértices em colunas: id (int64), x e y (float64)"""
+    CAMPOS = (('id', np.int64), ('x', np.float64), ('y', np.float64))
+    VISAO = VisaoVertice
+
+    id = property(lambda self: self.coluna('id'))
+    x = property(lambda self: self.coluna('x'))
+    y = property(lambda self: self.coluna('y'))
+
+    @classmethod
+    def de_objetos(cls, vertices):
+        """Tabela a partir de objetos com id, x e y (ex.: Vertices); uma tabela volta ela mesma"""
+        if isinstance(vertices, cls):
+            return vertices
+        vertices = list(vertices)
+        return cls(id=[v.id for v in vertices], x=[v.x for v in vertices], y=[v.y for v in vertices])
+
+    def append(self, vertice):
+        self._acrescentar(id=vertice.id, x=vertice.x, y=vertice.y)
+
+    def posicao(self, vertice_id):
+        """Linha do vértice com esse id, ou -1"""
+        encontradas = np.flatnonzero(self.id == vertice_id)
+        return int(encontradas[0]) if len(encontradas) else -1
+
+    def linhas(self, ids):
+        """Linha de cada id de um array de ids (-1 onde não há vértice com o id)"""
+        ids = np.asarray(ids)
+        if not self._n:
+            return np.full(ids.shape, -1, dtype=np.int64)
+        ordem = np.argsort(self.id, kind='stable')
+        ordenados = self.id[ordem]
+        i = np.minimum(np.searchsorted(ordenados, ids), self._n - 1)
+        return np.where(ordenados[i] == ids, ordem[i], -1)
+
+    def por_id(self, vertice_id):
+        """Visão do vértice com esse id, ou None"""
+        posicao = self.posicao(vertice_id)
+        return self[posicao] if posicao >= 0 else None
+
+class TabelaArestas(_Colunas):
+    """Arestas em colunas: orig e dest (int64), dist e velocidade (float64) e flags (uint8)"""
+    CAMPOS = (('orig', np.int64), ('dest', np.int64), ('dist', np.float64),
+              ('velocidade', np.float64), ('flags', np.uint8))
+    VISAO = VisaoAresta
+
+    orig = property(lambda self: self.coluna('orig'))
+    dest = property(lambda self: self.coluna('dest'))
+    dist = property(lambda self: self.coluna('dist'))
+    velocidade = property(lambda self: self.coluna('velocidade'))
+    flags = property(lambda self: self.coluna('flags'))
+
+    @staticmethod
+    def _flags(aresta):
+        return ((FLAG_VELOCIDADE if getattr(aresta, 'velocidade', None) else 0)
+                | (FLAG_MAO_UNICA if getattr(aresta, 'mao_unica', False) else 0))
+
+    @classmethod
+    def de_objetos(cls, arestas):
+        """Tabela a partir de objetos com orig, dest, dist, velocidade e mao_unica (ex.: Arestas)"""
+        if isinstance(arestas, cls):
+            return arestas
+        arestas = list(arestas)
+        return cls(orig=[a.orig for a in arestas], dest=[a.dest for a in arestas],
+                   dist=[a.dist for a in arestas],
+                   velocidade=[a.velocidade or 0.0 for a in arestas],
+                   flags=[cls._flags(a) for a in arestas])
+
+    def append(self, aresta):
+        self._acrescentar(orig=aresta.orig, dest=aresta.dest, dist=aresta.dist,
+                          velocidade=getattr(aresta, 'velocidade', None) or 0.0, flags=self._flags(aresta))
+
+    def procurar(self, orig, dest, ambos_sentidos=False):
+        """Linha da aresta orig -> dest (ou dest -> orig, com ambos_sentidos), ou -1"""
+        mascara = (self.orig == orig) & (self.dest == dest)
+        if ambos_sentidos:
+            mascara |= (self.orig == dest) & (self.dest == orig)
+        encontradas = np.flatnonzero(mascara)
+        return int(encontradas[0]) if len(encontradas) else -1
+
+    def mao_unica(self):
+        """Máscara das arestas de mão única"""
+        return (self.flags & FLAG_MAO_UNICA) != 0
+
+    def velocidades(self, padrao):
+        """Velocidade por aresta, com `padrao` nas que não têm velocidade própria"""
+        return np.where(self.flags & FLAG_VELOCIDADE, self.velocidade, padrao)
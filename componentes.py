@@ -0,0 +1,250 @@
+import time
+import numpy as np
+from busca import INF, montar_estatisticas
+
+# Nomes dos arrays guardados em GrafoCSR.indices (e no formato compilado)
+INDICE_FRACAS = 'componentes_fracas'
+INDICE_FORTES = 'componentes_fortes'
+INDICE_SEM_SAIDA = 'componentes_sem_saida'
+INDICE_SEM_ENTRADA = 'componentes_sem_entrada'
+
+class UniaoBusca:
+    """Conjuntos disjuntos com união por tamanho e compressão de caminho por divisão"""
+
+    def __init__(self, n=0):
+        self.pai = list(range(n))
+        self.tamanho = [1] * n
+
+    def __len__(self):
+        return len(self.pai)
+
+    def adicionar(self):
+        """Cria um conjunto unitário e devolve seu número"""
+        self.pai.append(len(self.pai))
+        self.tamanho.append(1)
+        return len(self.pai) - 1
+
+    def encontrar(self, x):
+        pai = self.pai
+        while pai[x] != x:
+            pai[x] = pai[pai[x]]
+            x = pai[x]
+        return x
+
+    def unir(self, a, b):
+        """Junta os conjuntos de a e b; False se já eram o mesmo"""
+        a, b = self.encontrar(a), self.encontrar(b)
+        if a == b:
+            return False
+        if self.tamanho[a] < self.tamanho[b]:
+            a, b = b, a
+        self.pai[b] = a
+        self.tamanho[a] += self.tamanho[b]
+        return True
+
+def _origens(csr):
+    return np.repeat(np.arange(csr.totalVertices, dtype=np.int32), np.diff(csr.inicio))
+
+def componentes_fracas(csr):
+    """Rótulo da componente fracamente conexa de cada vértice (o menor id da componente)
+
+    Cada rodada liga a raiz de cada extremo de aresta à menor das duas e
+    depois encurta os ponteiros até todos apontarem para a raiz; tudo em
+    operações vetorizadas sobre os arrays do CSR.
+    """
+    n = csr.totalVertices
+    rotulo = np.arange(n, dtype=np.int32)
+    origens = _origens(csr)
+    destinos = np.asarray(csr.destinos)
+    while len(origens):
+        ru, rv = rotulo[origens], rotulo[destinos]
+        diferentes = ru != rv
+        if not diferentes.any():
+            break
+        ru, rv = ru[diferentes], rv[diferentes]
+        menor = np.minimum(ru, rv)
+        np.minimum.at(rotulo, ru, menor)
+        np.minimum.at(rotulo, rv, menor)
+        while True:
+            saltado = rotulo[rotulo]
+            if np.array_equal(saltado, rotulo):
+                break
+            rotulo = saltado
+        # Só as arestas ainda entre componentes distintas importam na próxima rodada
+        origens, destinos = origens[diferentes], destinos[diferentes]
+    return rotulo
+
+def componentes_fortes(csr):
+    """Rótulo da componente fortemente conexa de cada vértice (Tarjan iterativo)
+
+    Os rótulos saem em ordem topológica reversa da condensação: se há
+    aresta da componente A para outra B, então B < A.
+    """
+    n = csr.totalVertices
+    inicio = np.asarray(csr.inicio).tolist()
+    destinos = np.asarray(csr.destinos).tolist()
+    ordem = [-1] * n    # Ordem de descoberta
+    baixo = [0] * n     # Menor ordem alcançável pela subárvore
+    rotulo = [-1] * n   # -1 enquanto o vértice está na pilha ou não foi visto
+    pilha = []
+    contador = 0
+    componentes = 0
+    for raiz in range(n):
+        if ordem[raiz] != -1:
+            continue
+        ordem[raiz] = baixo[raiz] = contador
+        contador += 1
+        pilha.append(raiz)
+        chamadas = [[raiz, inicio[raiz]]]
+        while chamadas:
+            quadro = chamadas[-1]
+            u, i = quadro
+            if i < inicio[u + 1]:
+                quadro[1] = i + 1
+                w = destinos[i]
+                if ordem[w] == -1:
+                    ordem[w] = baixo[w] = contador
+                    contador += 1
+                    pilha.append(w)
+                    chamadas.append([w, inicio[w]])
+                elif rotulo[w] == -1 and ordem[w] < baixo[u]:
+                    baixo[u] = ordem[w]
+                continue
+            chamadas.pop()
+            if chamadas:
+                pai = chamadas[-1][0]
+                if baixo[u] < baixo[pai]:
+                    baixo[pai] = baixo[u]
+            if baixo[u] == ordem[u]:
+                while True:
+                    w = pilha.pop()
+                    rotulo[w] = componentes
+                    if w == u:
+                        break
+                componentes += 1
+    return np.array(rotulo, dtype=np.int32)
+
+class IndiceComponentes:
+    """Componentes do grafo para responder em O(1) que um par não tem caminho
+
+    Vértices em componentes fracas distintas nunca se alcançam. No grafo
+    direcionado, as componentes fortes acrescentam três testes: a ordem
+    topológica da condensação e as componentes sem aresta de saída ou de
+    entrada. `alcancavel` só responde False quando não há caminho; True
+    significa que a busca é necessária.
+
+    Acrescentar vértices e arestas atualiza o índice sem recalculá-lo
+    (união-busca sobre as componentes fracas). Remoções só reduzem o
+    alcance, então as respostas continuam corretas, mas menos precisas:
+    quem remove deve montar o índice de novo.
+    """
+
+    def __init__(self, fracas, direcionado=False, fortes=None, sem_saida=None, sem_entrada=None):
+        self.fracas = fracas
+        self.direcionado = direcionado
+        self.fortes = fortes
+        self.sem_saida = sem_saida      # Por componente forte: nenhuma aresta para outra
+        self.sem_entrada = sem_entrada  # Por componente forte: nenhuma aresta vinda de outra
+        self.ordem_valida = True        # Rótulos fortes ainda em ordem topológica reversa
+        self.uniao = None               # Criada na primeira edição, sobre os rótulos fracos
+
+    @classmethod
+    def do_grafo(cls, csr):
+        """Índice de um GrafoCSR, reaproveitando os rótulos guardados em csr.indices
+
+        Os rótulos calculados ficam em csr.indices, e assim entram no
+        arquivo compilado quando o grafo é salvo.
+        """
+        indices = csr.indices
+        if INDICE_FRACAS not in indices:
+            indices[INDICE_FRACAS] = componentes_fracas(csr)
+        if csr.direcionado and INDICE_FORTES not in indices:
+            fortes = componentes_fortes(csr)
+            total = int(fortes.max()) + 1 if len(fortes) else 0
+            a, b = fortes[_origens(csr)], fortes[np.asarray(csr.destinos)]
+            entre = a != b
+            sem_saida = np.ones(total, dtype=bool)
+            sem_entrada = np.ones(total, dtype=bool)
+            sem_saida[a[entre]] = False
+            sem_entrada[b[entre]] = False
+            indices[INDICE_FORTES] = fortes
+            indices[INDICE_SEM_SAIDA] = sem_saida
+            indices[INDICE_SEM_ENTRADA] = sem_entrada
+        if not csr.direcionado:
+            return cls(indices[INDICE_FRACAS])
+        return cls(indices[INDICE_FRACAS], True, indices[INDICE_FORTES],
+                   indices[INDICE_SEM_SAIDA], indices[INDICE_SEM_ENTRADA])
+
+    @property
+    def totalVertices(self):
+        return len(self.fracas)
+
+    def componente(self, u):
+        """Representante da componente fraca de u"""
+        rotulo = int(self.fracas[u])
+        return rotulo if self.uniao is None else self.uniao.encontrar(rotulo)
+
+    def alcancavel(self, u, v):
+        """False se com certeza não há caminho de u até v"""
+        if u == v:
+            return True
+        if self.componente(u) != self.componente(v):
+            return False
+        if self.direcionado:
+            a, b = int(self.fortes[u]), int(self.fortes[v])
+            if a != b and (self.sem_saida[a] or self.sem_entrada[b] or (self.ordem_valida and a < b)):
+                return False
+        return True
+
+    def rotulos(self):
+        """Representante da componente fraca de cada vértice (array)"""
+        if self.uniao is None:
+            return np.asarray(self.fracas)
+        representantes = np.array([self.uniao.encontrar(i) for i in range(len(self.uniao))], dtype=np.int32)
+        return representantes[self.fracas]
+
+    def principal(self):
+        """Máscara dos vértices da maior componente fraca; os demais são ilhas"""
+        rotulos = self.rotulos()
+        if not len(rotulos):
+            return np.zeros(0, dtype=bool)
+        return rotulos == np.bincount(rotulos).argmax()
+
+    # Atualização incremental
+
+    def _editar(self):
+        if self.uniao is None:
+            self.uniao = UniaoBusca(len(self.fracas))
+            self.fracas = np.array(self.fracas)
+            if self.direcionado:
+                self.fortes = np.array(self.fortes)
+                self.sem_saida = np.array(self.sem_saida)
+                self.sem_entrada = np.array(self.sem_entrada)
+
+    def adicionar_vertice(self, u):
+        """Registra o vértice u, isolado; ids intermediários ausentes viram vértices isolados"""
+        self._editar()
+        while len(self.fracas) <= u:
+            self.fracas = np.append(self.fracas, np.int32(self.uniao.adicionar()))
+            if self.direcionado:
+                self.fortes = np.append(self.fortes, np.int32(len(self.sem_saida)))
+                self.sem_saida = np.append(self.sem_saida, True)
+                self.sem_entrada = np.append(self.sem_entrada, True)
+
+    def adicionar_aresta(self, u, v, direcionada=None):
+        """Registra a aresta u -> v (nos dois sentidos se o índice não é direcionado)"""
+        self.adicionar_vertice(max(u, v))
+        self.uniao.unir(int(self.fracas[u]), int(self.fracas[v]))
+        if self.direcionado:
+            a, b = int(self.fortes[u]), int(self.fortes[v])
+            if a != b:
+                # A aresta pode fechar um ciclo entre componentes; sem recalcular,
+                # elas continuam separadas, mas nenhuma delas fica sem saída ou entrada
+                self.sem_saida[a] = False
+                self.sem_entrada[b] = False
+                if a < b:
+                    self.ordem_valida = False
+
+def resposta_sem_caminho():
+    """Resultado de uma busca ponto a ponto que o índice já descartou"""
+    return None, INF, montar_estatisticas(time.perf_counter_ns(), 0, INF)
@@ -0,0 +1,216 @@
+import heapq
+import time
+import numpy as np
+from busca import INF, BuscaCancelada, contadores_fila, espaco_da_thread, montar_estatisticas
+
+CAMPOS = ('de', 'via', 'para', 'custo')
+TANGENTE_RETA = 0.58  # tan(30°): desvios menores que isso contam como seguir em frente
+
+def vizinhos_na_via(nos_via, via):
+    """Vizinhos de `via` na sequência de nós de uma via do OSM, se ela começa ou termina nele
+
+    Uma restrição só é inequívoca quando as vias de origem e destino
+    terminam no nó de passagem; passando pelo meio, não dá para saber de
+    que lado vem o movimento, e a lista volta vazia.
+    """
+    if nos_via[0] == via:
+        return [nos_via[1]]
+    if nos_via[-1] == via:
+        return [nos_via[-2]]
+    return []
+
+class TabelaConversoes:
+    """Custos de conversão por trio de vértices (de, via, para): chegar a `via` vindo de `de` e sair para `para`
+
+    Custo INF proíbe a conversão. Os trios são de vértices, não de arestas,
+    então a tabela sobrevive a reconstruções do CSR (edição, troca de
+    métrica) e ocupa espaço proporcional ao número de restrições.
+    """
+
+    def __init__(self, de, via, para, custo):
+        self.de = de        # int32, por trio
+        self.via = via
+        self.para = para
+        self.custo = custo  # float64, INF = proibida
+        self._por_via = None
+
+    @classmethod
+    def montar(cls, trios):
+        """Tabela a partir de (de, via, para, custo); num trio repetido vale o maior custo"""
+        custos = {}
+        for de, via, para, custo in trios:
+            chave = (int(de), int(via), int(para))
+            custos[chave] = max(custo, custos.get(chave, 0.0))
+        chaves = sorted(custos)
+        colunas = np.array(chaves, dtype=np.int32).reshape(-1, 3)
+        return cls(colunas[:, 0].copy(), colunas[:, 1].copy(), colunas[:, 2].copy(),
+                   np.array([custos[chave] for chave in chaves], dtype=np.float64))
+
+    @classmethod
+    def do_osm(cls, restricoes, csr):
+        """Conversões proibidas pelas relações de restrição do OSM, sobre os vizinhos de `csr`
+
+        `restricoes` são (tipo, vizinhos de origem, via, vizinhos de destino)
+        como em NosOSM.restricoes. 'no_*' proíbe as conversões citadas;
+        'only_*' proíbe todas as outras saídas do nó de passagem.
+        """
+        trios = []
+        for tipo, de, via, para in restricoes:
+            if via + 1 >= len(csr.inicio):
+                continue
+            if tipo.startswith('only_'):
+                saidas = set(np.asarray(csr.destinos[csr.inicio[via]:csr.inicio[via + 1]]).tolist())
+                para = saidas - set(para)
+            elif not tipo.startswith('no_'):
+                continue
+            trios.extend((u, via, w, INF) for u in de for w in para)
+        return cls.montar(trios)
+
+    # Formato compilado: arrays em csr.indices
+
+    def anexar(self, csr):
+        """Guarda a tabela em csr.indices, para ir ao arquivo compilado"""
+        for campo in CAMPOS:
+            csr.indices[f'conversao_{campo}'] = getattr(self, campo)
+
+    @classmethod
+    def do_grafo(cls, csr):
+        """Tabela lida de csr.indices; None se o grafo não tem restrições de conversão"""
+        if 'conversao_via' not in csr.indices:
+            return None
+        return cls(*(csr.indices[f'conversao_{campo}'] for campo in CAMPOS))
+
+    def __len__(self):
+        return len(self.via)
+
+    def por_via(self):
+        """Dicionário via -> {(de, para): custo}, montado na primeira consulta"""
+        if self._por_via is None:
+            self._por_via = {}
+            for de, via, para, custo in zip(self.de.tolist(), self.via.tolist(), self.para.tolist(),
+                                            self.custo.tolist()):
+                self._por_via.setdefault(via, {})[de, para] = custo
+        return self._por_via
+
+def dijkstra_conversoes(csr, inicio, fim, conversoes=None, custo_retorno=0.0, custo_esquerda=0.0,
+                        custo_direita=0.0, cancelado=None, progresso=None, intervalo_progresso=200,
+                        ao_fechar=None, ao_relaxar=None, espaco=None):
+    """Dijkstra sobre as arestas (grafo de arestas implícito), com restrições e custos de conversão
+
+    Sair da aresta u -> v pela aresta v -> w custa o peso de v -> w mais o
+    da conversão (u, v, w). O grafo de arestas não é montado: os sucessores
+    de u -> v são as arestas de v no próprio CSR, e os estados da busca são
+    posições nos arrays do EspacoBusca. Só a chegada a um vértice com
+    conversões na tabela precisa lembrar a aresta de entrada (um estado por
+    aresta, 0..E-1); nos demais todas as entradas levam às mesmas saídas
+    com o mesmo custo, e o estado é o próprio vértice (E + v). Assim a
+    memória fica em O(E + V) e, com poucas restrições, a busca fecha quase
+    os mesmos estados que a busca por vértices.
+
+    `conversoes` é uma TabelaConversoes (INF proíbe). Os custos por tipo
+    valem para todas as conversões e tornam todos os estados arestas:
+    retorno (w == u) e, pelas coordenadas (y para baixo, como no OSM
+    projetado), esquerda e direita; desvios de até 30° contam como seguir
+    em frente. Retorna o mesmo que dijkstra_csr; `nos_explorados` conta
+    estados fechados.
+    """
+    inicio_ns = time.perf_counter_ns()
+
+    ini = memoryview(csr.inicio)
+    destinos = memoryview(csr.destinos)
+    pesos = memoryview(csr.pesos)
+    totalArestas = len(destinos)
+    tabela = conversoes.por_via() if conversoes is not None else {}
+    angulos = bool(custo_esquerda or custo_direita)
+    por_aresta = angulos or bool(custo_retorno)  # Todo vértice precisa da aresta de entrada
+    if angulos:
+        x = memoryview(np.ascontiguousarray(csr.x, dtype=np.float64))
+        y = memoryview(np.ascontiguousarray(csr.y, dtype=np.float64))
+
+    if inicio == fim:
+        return [inicio], 0.0, montar_estatisticas(inicio_ns, 0, 0.0, **contadores_fila(0, 0, [], 0, 0))
+
+    espaco = espaco if espaco is not None else espaco_da_thread()
+    with espaco.reservar(totalArestas + len(ini) - 1) as geracao:
+        dist, prev, marca, fechado = espaco.dist, espaco.prev, espaco.marca, espaco.fechado
+        # Entradas da fila: (custo, estado, vértice de onde se chegou); o estado -1 é a origem
+        fila = [(0.0, -1, inicio)]
+        nos_explorados = 0
+        remocoes = 0
+        fronteira_maxima = 0
+        arestas_relaxadas = 0
+        chegada = None
+
+        while fila:
+            if len(fila) > fronteira_maxima:
+                fronteira_maxima = len(fila)
+            d, estado, u = heapq.heappop(fila)
+            remocoes += 1
+            if estado >= 0:
+                if fechado[estado] == geracao:
+                    continue
+                fechado[estado] = geracao
+                v = destinos[estado] if estado < totalArestas else estado - totalArestas
+            else:
+                v = inicio
+            nos_explorados += 1
+            if ao_fechar is not None:
+                ao_fechar(v, d)
+
+            if nos_explorados % intervalo_progresso == 0:
+                if cancelado is not None and cancelado.is_set():
+                    raise BuscaCancelada()
+                if progresso is not None:
+                    progresso(nos_explorados)
+
+            # Custos de conversão são não negativos: o primeiro estado fechado no fim é o melhor
+            if v == fim:
+                chegada = estado
+                break
+
+            restricoes = tabela.get(v) if estado >= 0 else None
+            if angulos and estado >= 0:
+                ax, ay = x[v] - x[u], y[v] - y[u]
+            primeira, ultima = ini[v], ini[v + 1]
+            arestas_relaxadas += ultima - primeira
+            for f in range(primeira, ultima):
+                w = destinos[f]
+                extra = 0.0
+                if restricoes is not None:
+                    extra = restricoes.get((u, w), 0.0)
+                    if extra >= INF:
+                        continue
+                if estado >= 0 and por_aresta:
+                    if w == u:
+                        extra += custo_retorno
+                    elif angulos:
+                        bx, by = x[w] - x[v], y[w] - y[v]
+                        vetorial = ax * by - ay * bx
+                        escalar = ax * bx + ay * by
+                        if escalar <= 0 or abs(vetorial) > TANGENTE_RETA * escalar:
+                            # Com y para baixo, produto vetorial negativo é conversão à esquerda
+                            extra += custo_esquerda if vetorial < 0 else custo_direita
+                nd = d + extra + pesos[f]
+                seguinte = f if por_aresta or w in tabela else totalArestas + w
+                if marca[seguinte] != geracao or nd < dist[seguinte]:
+                    marca[seguinte] = geracao
+                    dist[seguinte] = nd
+                    prev[seguinte] = estado
+                    heapq.heappush(fila, (nd, seguinte, v))
+                    if ao_relaxar is not None:
+                        ao_relaxar(v, w, nd)
+
+        contadores = contadores_fila(remocoes, nos_explorados, fila, fronteira_maxima, arestas_relaxadas)
+        if chegada is None:
+            return None, INF, montar_estatisticas(inicio_ns, nos_explorados, INF, **contadores)
+
+        custo_total = dist[chegada]
+        caminho = []
+        estado = chegada
+        while estado != -1:
+            caminho.append(destinos[estado] if estado < totalArestas else estado - totalArestas)
+            estado = prev[estado]
+        caminho.append(inicio)
+        caminho.reverse()
+    estatisticas = montar_estatisticas(inicio_ns, nos_explorados, custo_total, **contadores)
+    return caminho, custo_total, estatisticas
@@ -0,0 +1,158 @@
+import time
+import numpy as np
+from busca import INF, BuscaCancelada, montar_estatisticas
+
+FATOR_DELTA = 2.0     # Delta = fator × quantil QUANTIL_DELTA dos pesos das arestas
+QUANTIL_DELTA = 0.99
+
+def escolher_delta(pesos, fator=FATOR_DELTA, quantil=QUANTIL_DELTA):
+    """Largura dos buckets a partir da distribuição dos pesos
+
+    Buckets estreitos fecham os vértices quase em ordem (pouco trabalho
+    refeito), mas cada bucket e cada fase leve custam algumas chamadas ao
+    NumPy; buckets largos são o contrário. Com a relaxação vetorizada vale
+    inclinar para os largos: alguns pesos do quantil 99%, o que deixa quase
+    todas as arestas leves e faz cada fase avançar a fronteira inteira do
+    bucket. O quantil, e não o máximo, para que poucas arestas muito longas
+    não alarguem os buckets. Pesos zero são ignorados.
+    """
+    pesos = np.asarray(pesos)
+    positivos = pesos[pesos > 0]
+    if not len(positivos):
+        return 1.0
+    return float(np.quantile(positivos, quantil)) * fator
+
+class ParticaoArestas:
+    """Arestas do CSR separadas em leves (peso <= delta) e pesadas, cada grupo em CSR próprio
+
+    Montada uma vez por grafo e delta e reaproveitada entre buscas.
+    """
+
+    def __init__(self, csr, delta):
+        self.delta = delta
+        inicio = np.asarray(csr.inicio)
+        destinos = np.asarray(csr.destinos)
+        pesos = np.asarray(csr.pesos)
+        n = len(inicio) - 1
+        origens = np.repeat(np.arange(n, dtype=np.int64), np.diff(inicio))
+        leve = pesos <= delta
+        self.leves = self._csr(n, origens[leve], destinos[leve], pesos[leve])
+        self.pesadas = self._csr(n, origens[~leve], destinos[~leve], pesos[~leve])
+
+    @staticmethod
+    def _csr(n, origens, destinos, pesos):
+        inicio = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origens, minlength=n), out=inicio[1:])
+        return inicio, destinos, pesos.astype(np.float64)
+
+def _arestas_de(grupo, vertices):
+    """Índices (no grupo) das arestas que saem dos vértices e a origem de cada uma"""
+    inicio, _, _ = grupo
+    primeiras = inicio[vertices]
+    quantidades = inicio[vertices + 1] - primeiras
+    total = int(quantidades.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    origens = np.repeat(vertices, quantidades)
+    # Posição de cada aresta: a primeira do vértice mais o deslocamento dentro dele
+    deslocamentos = np.arange(total) - np.repeat(np.cumsum(quantidades) - quantidades, quantidades)
+    return np.repeat(primeiras, quantidades) + deslocamentos, origens
+
+def _relaxar(grupo, vertices, dist, pai):
+    """Relaxa de uma vez as arestas do grupo que saem dos vértices; retorna os vértices melhorados"""
+    arestas, origens = _arestas_de(grupo, vertices)
+    if not len(arestas):
+        return arestas, 0
+    _, destinos, pesos = grupo
+    alvos = destinos[arestas]
+    candidatos = dist[origens] + pesos[arestas]
+    melhora = candidatos < dist[alvos]
+    if not melhora.any():
+        return np.zeros(0, dtype=np.int64), len(arestas)
+    alvos, candidatos, origens = alvos[melhora], candidatos[melhora], origens[melhora]
+    np.minimum.at(dist, alvos, candidatos)
+    # Entre as arestas que chegaram ao mesmo vértice, o pai é uma das que deram o mínimo
+    vencedoras = candidatos == dist[alvos]
+    pai[alvos[vencedoras]] = origens[vencedoras]
+    return np.unique(alvos[vencedoras]), len(arestas)
+
+def delta_stepping(csr, inicio, delta=None, orcamento=INF, particao=None, cancelado=None, progresso=None):
+    """Árvore de caminhos mínimos completa a partir de `inicio` por delta-stepping
+
+    Os vértices são agrupados em buckets de largura `delta` pelo custo
+    provisório; cada bucket é resolvido relaxando, em operações vetorizadas
+    sobre o CSR, as arestas leves de todos os seus vértices de uma vez
+    (repetindo enquanto algum custo dentro do bucket melhorar) e depois as
+    pesadas, que só alcançam buckets seguintes. Troca a fila de prioridade,
+    um vértice por vez, por poucas chamadas ao NumPy por bucket; compensa
+    quando a busca fecha boa parte do grafo (isócronas, tabelas, árvores
+    inteiras). Vértices além do `orcamento` ficam como não alcançados.
+
+    `particao` é uma ParticaoArestas já montada para o grafo (e define o
+    delta). Retorna (custos, pais, estatisticas): arrays por vértice com o
+    custo (INF se não alcançado) e o predecessor (-1 na origem e nos não
+    alcançados).
+    """
+    inicio_ns = time.perf_counter_ns()
+    if particao is None:
+        particao = ParticaoArestas(csr, delta if delta is not None else escolher_delta(csr.pesos))
+    delta = particao.delta
+    n = csr.totalVertices
+    dist = np.full(n, np.inf)
+    pai = np.full(n, -1, dtype=np.int64)
+    dist[inicio] = 0.0
+    pendentes = np.array([inicio], dtype=np.int64)  # Alcançados e ainda não resolvidos em um bucket
+    buckets = 0
+    fases_leves = 0
+    arestas_relaxadas = 0
+    fechados = 0
+    fronteira_maxima = 1
+
+    while len(pendentes):
+        custos_pendentes = dist[pendentes]
+        menor = float(custos_pendentes.min())
+        if menor > orcamento:
+            break
+        limite = (np.floor(menor / delta) + 1) * delta
+        no_bucket = custos_pendentes < limite
+        atual = pendentes[no_bucket]
+        pendentes = pendentes[~no_bucket]
+        resolvidos = [atual]
+        buckets += 1
+
+        # Fase leve: repete enquanto algum vértice cair (ou melhorar) dentro deste bucket
+        while len(atual):
+            fases_leves += 1
+            melhorados, relaxadas = _relaxar(particao.leves, atual, dist, pai)
+            arestas_relaxadas += relaxadas
+            if not len(melhorados):
+                break
+            dentro = dist[melhorados] < limite
+            atual = melhorados[dentro]
+            resolvidos.append(atual)
+            pendentes = np.concatenate([pendentes, melhorados[~dentro]])
+
+        resolvidos = np.unique(np.concatenate(resolvidos))
+        fechados += len(resolvidos)
+        # Fase pesada: as arestas pesadas saem do bucket, então uma passada basta
+        melhorados, relaxadas = _relaxar(particao.pesadas, resolvidos, dist, pai)
+        arestas_relaxadas += relaxadas
+        # Quem entrou nos pendentes e depois melhorou para dentro do bucket já foi resolvido
+        pendentes = np.unique(np.concatenate([pendentes, melhorados]))
+        pendentes = pendentes[dist[pendentes] >= limite]
+        if len(pendentes) > fronteira_maxima:
+            fronteira_maxima = len(pendentes)
+
+        if cancelado is not None and cancelado.is_set():
+            raise BuscaCancelada()
+        if progresso is not None:
+            progresso(fechados)
+
+    alcancados = dist <= orcamento
+    custos = np.where(alcancados, dist, INF)
+    pai[~alcancados] = -1
+    estatisticas = montar_estatisticas(
+        inicio_ns, int(alcancados.sum()), float(dist[alcancados].max()) if alcancados.any() else INF,
+        arestas_relaxadas=arestas_relaxadas, buckets=buckets, fases_leves=fases_leves, delta=delta,
+        fronteira_maxima=fronteira_maxima, bytes_alocados=dist.nbytes + pai.nbytes)
+    return custos, pai, estatisticas
@@ -6,174 +6,136 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import networkx as nx
 import numpy as np
 import math
-from dataclasses import dataclass
 import os
+import sys
 import time
+import threading
+import queue
 from PIL import Image, ImageTk
 import io
-import xml.etree.ElementTree as ET
+import itertools
+from busca import INF, BuscaCancelada, dijkstra as dijkstra_matriz, dijkstra_csr
+from celulas import SobreposicaoCRP
+from conversoes import TabelaConversoes, dijkstra_conversoes
+from retratos import Retrato, HistoricoRetratos, comparar_retratos
+from area_trabalho import AreaTrabalho, ORCAMENTO_PADRAO_MB, assinatura_arquivo
+from colunas import TabelaVertices, TabelaArestas
+from componentes import IndiceComponentes, resposta_sem_caminho
+from grafo import (Vertices, Arestas, FASES_CARREGAMENTO, CarregamentoCancelado,
+                   carregar_grafo, ler_arquivo_poly, construir_matriz_adjacencia,
+                   normalizar_posicoes, normalizar_colunas, GrafoCSR)
+from indice_vertices import IndiceVertices
+from isocrona import calcular_isocronas
+from alternativas import k_menores_caminhos, rotas_alternativas
+from metricas import METRICAS, METRICA_PADRAO
+from rastreamento import ExportadorRastros
+from registro import obter_logger, configurar_registro, cronometrar
+from matplotlib.collections import LineCollection
 
-INF = 1e9
+log = obter_logger('interface')
 
-# Parâmetros da zona UTM 23S (baseado no código C)
-A = 6378137.0            # Semi-eixo maior WGS84
-F = 1.0 / 298.257223563  # Achatamento
-K0 = 0.9996
-LON0_DEG = -45.0         # longitude central da zona 23S
-PI = 3.14159265358979323846
+# Cores das faixas da área de alcance, da menor para a maior distância
+CORES_ALCANCE = ['#2ca02c', '#bcbd22', '#ff7f0e', '#d62728', '#9467bd', '#8c564b']
+# Cores das rotas alternativas, a primeira é a do menor caminho
+CORES_ROTAS = [('red', 'vermelho'), ('blue', 'azul'), ('darkorange', 'laranja'), ('purple', 'roxo'),
+               ('magenta', 'magenta'), ('saddlebrown', 'marrom'), ('teal', 'verde-azulado'),
+               ('olive', 'oliva'), ('navy', 'azul-marinho'), ('deeppink', 'rosa')]
+# Cores dos vértices das ilhas (fora da maior componente) quando destacadas
+CORES_ILHAS = ['#ff9896', '#c5b0d5', '#c49c94', '#f7b6d2', '#dbdb8d', '#9edae5', '#ffbb78', '#98df8a']
+# Contadores detalhados dos motores de busca exibidos nas estatísticas
+ROTULOS_CONTADORES = [('arestas_relaxadas', "Arestas relaxadas"), ('insercoes_fila', "Inserções na fila"),
+                      ('remocoes_fila', "Remoções da fila"), ('remocoes_obsoletas', "Remoções obsoletas"),
+                      ('fronteira_maxima', "Fronteira máxima")]
+# Atributos que pertencem ao grafo aberto, guardados na área de trabalho ao trocar de grafo
+CAMPOS_GRAFO = ('vertices', 'arestas', 'matrizAdj', 'totalVertices', 'totalArestas', 'arquivo_carregado',
+                'caminho_atual', 'vertice_origem', 'vertice_destino', 'posicoes_cache', 'indice_vertices',
+                'matriz_direcionada', 'versao_grafo', 'csr_cache', 'celulas', 'restricoes_conversao',
+                'conversoes_cache', 'componentes', 'ilhas_cache', 'alcance_atual', 'rotas_alternativas',
+                'historico', 'retrato_marcado', 'nomes_removidos')
 
-def converter_para_utm(lat_deg, lon_deg):
-    """Converte coordenadas geográficas para UTM (baseado no código C)"""
-    e2 = F * (2 - F)                    # excentricidade ao quadrado
-    ep2 = e2 / (1 - e2)                 # excentricidade secundária ao quadrado
-    lat = lat_deg * PI / 180.0
-    lon = lon_deg * PI / 180.0
-    lon0 = LON0_DEG * PI / 180.0
+class SeletorVertice(ttk.Frame):
+    """Campo de busca de vértices por id ou nome, com lista de resultados virtualizada
 
-    N = A / math.sqrt(1 - e2 * math.sin(lat) * math.sin(lat))
-    T = math.tan(lat) * math.tan(lat)
-    C = ep2 * math.cos(lat) * math.cos(lat)
-    A_val = (lon - lon0) * math.cos(lat)
-
-    # Cálculo do arco meridional com mais termos
-    M = A * ((1 - e2/4 - 3*e2*e2/64 - 5*e2*e2*e2/256) * lat
-      - (3*e2/8 + 3*e2*e2/32 + 45*e2*e2*e2/1024) * math.sin(2*lat)
-      + (15*e2*e2/256 + 45*e2*e2*e2/1024) * math.sin(4*lat)
-      - (35*e2*e2*e2/3072) * math.sin(6*lat))
-
-    # Coordenada leste (X)
-    x = K0 * N * (A_val + (1 - T + C) * math.pow(A_val,3)/6
-         + (5 - 18*T + T*T + 72*C - 58*ep2) * math.pow(A_val,5)/120) + 500000.0
-
-    # Coordenada norte (Y)
-    y = K0 * (M + N * math.tan(lat) * (A_val*A_val/2 + (5 - T + 9*C + 4*C*C) * math.pow(A_val,4)/24
-         + (61 - 58*T + T*T + 600*C - 330*ep2) * math.pow(A_val,6)/720))
-
-    # Ajusta para hemisfério sul
-    if lat_deg < 0:
-        y += 10000000.0
+    Os resultados vêm de um gerador do IndiceVertices e são inseridos na
+    lista em páginas, apenas quando a rolagem se aproxima do fim.
+    """
+    TAMANHO_PAGINA = 50
+    ATRASO_BUSCA_MS = 150  # Espera a digitação parar antes de buscar
     
-    return x, y
-
-def reduzir_escala(pontos, redutor=2):
-    """Reduz a escala dos pontos (baseado no código C)"""
-    if not pontos:
-        return
-    
-    min_x = min(ponto['x'] for ponto in pontos)
-    min_y = min(ponto['y'] for ponto in pontos)
-    
-    for ponto in pontos:
-        ponto['x'] = (ponto['x'] - min_x) / redutor
-        ponto['y'] = (ponto['y'] - min_y) / redutor
-    
-    # Rotação vertical para que (0,0) seja no canto superior esquerdo
-    max_y = max(ponto['y'] for ponto in pontos)
-    for ponto in pontos:
-        ponto['y'] = max_y - ponto['y']
-
-def processar_arquivo_osm(caminho_arquivo):
-    """Processa arquivo OSM e retorna dados no formato .poly"""
-    try:
-        tree = ET.parse(caminho_arquivo)
-        root = tree.getroot()
-        
-        # Dicionários para armazenar nós e vias
-        nodes = {}  # id_original -> {lat, lon, x, y, id_interno}
-        ways = []   # lista de vias com nós
-        
-        # Processar nós
-        id_interno = 0
-        for node in root.findall('.//node'):
-            node_id_attr = node.get('id')
-            lat_attr = node.get('lat')
-            lon_attr = node.get('lon')
-            
-            if node_id_attr is None or lat_attr is None or lon_attr is None:
-                continue
-                
-            node_id = int(node_id_attr)
-            lat = float(lat_attr)
-            lon = float(lon_attr)
-            
-            # Converter para UTM
-            x, y = converter_para_utm(lat, lon)
-            
-            nodes[node_id] = {
-                'lat': lat,
-                'lon': lon,
-                'x': x,
-                'y': y,
-                'id_interno': id_interno
-            }
-            id_interno += 1
-        
-        # Processar vias
-        for way in root.findall('.//way'):
-            way_nodes = []
-            for nd in way.findall('nd'):
-                ref_attr = nd.get('ref')
-                if ref_attr is None:
-                    continue
-                    
-                ref_id = int(ref_attr)
-                if ref_id in nodes:
-                    way_nodes.append(nodes[ref_id]['id_interno'])
-            
-            if len(way_nodes) > 1:
-                ways.append(way_nodes)
-        
-        # Reduzir escala
-        reduzir_escala(nodes.values())
-        
-        # Converter para formato .poly
-        vertices = []
-        arestas = []
-        
-        # Criar lista de vértices ordenados por id_interno
-        vertices_ordenados = sorted(nodes.values(), key=lambda x: x['id_interno'])
-        
-        for node in vertices_ordenados:
-            vertices.append({
-                'id': node['id_interno'],
-                'x': node['x'],
-                'y': node['y']
-            })
-        
-        # Criar arestas a partir das vias
-        aresta_id = 0
-        for way in ways:
-            for i in range(len(way) - 1):
-                from_node = way[i]
-                to_node = way[i + 1]
-                # Calcular distância
-                v1 = vertices[from_node]
-                v2 = vertices[to_node]
-                distancia = math.sqrt((v2['x'] - v1['x'])**2 + (v2['y'] - v1['y'])**2)
-                arestas.append({
-                    'id': aresta_id,
-                    'orig': from_node,
-                    'dest': to_node,
-                    'dist': distancia
-                })
-                aresta_id += 1
-        
-        return vertices, arestas
-        
-    except Exception as e:
-        raise Exception(f"Erro ao processar arquivo OSM: {str(e)}")
-
-@dataclass
-class Vertices:
-    id: int
-    x: float
-    y: float
-
-@dataclass
-class Arestas:
-    orig: int
-    dest: int
-    dist: float  # Peso da aresta (último campo)
+    def __init__(self, master, variavel):
+        super().__init__(master)
+        self.variavel = variavel  # StringVar com a descrição do vértice escolhido
+        self.indice = None
+        self.filtro = None  # Função id -> bool; ids recusados não aparecem na lista
+        self.resultados = iter(())
+        self.ids_listados = []
+        self.busca_agendada = None
+        
+        self.texto_busca = tk.StringVar()
+        self.entrada = ttk.Entry(self, textvariable=self.texto_busca)
+        self.entrada.pack(fill=tk.X)
+        self.texto_busca.trace_add('write', lambda *args: self.agendar_busca())
+        
+        lista_frame = ttk.Frame(self)
+        lista_frame.pack(fill=tk.X, pady=(2, 0))
+        self.lista = tk.Listbox(lista_frame, height=5, exportselection=False)
+        self.barra = ttk.Scrollbar(lista_frame, orient="vertical", command=self.lista.yview)
+        self.lista.configure(yscrollcommand=self.ao_rolar)
+        self.lista.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.barra.pack(side=tk.RIGHT, fill=tk.Y)
+        self.lista.bind('<<ListboxSelect>>', self.ao_clicar_resultado)
+        
+        ttk.Label(self, textvariable=self.variavel, font=("Arial", 8)).pack(anchor=tk.W)
+    
+    def definir_indice(self, indice):
+        """Associa o índice do grafo atual e refaz a busca"""
+        self.indice = indice
+        self.nova_busca()
+    
+    def definir_filtro(self, filtro):
+        """Restringe os resultados aos ids aceitos por `filtro` (None para todos)"""
+        self.filtro = filtro
+        self.nova_busca()
+    
+    def agendar_busca(self):
+        if self.busca_agendada is not None:
+            self.after_cancel(self.busca_agendada)
+        self.busca_agendada = self.after(self.ATRASO_BUSCA_MS, self.nova_busca)
+    
+    def nova_busca(self):
+        """Reinicia a lista com os resultados do prefixo digitado"""
+        self.busca_agendada = None
+        self.lista.delete(0, tk.END)
+        self.ids_listados = []
+        if self.indice is None:
+            self.resultados = iter(())
+            return
+        self.resultados = self.indice.buscar(self.texto_busca.get())
+        if self.filtro is not None:
+            self.resultados = filter(self.filtro, self.resultados)
+        self.carregar_pagina()
+    
+    def carregar_pagina(self):
+        """Insere a próxima página de resultados na lista"""
+        for vertice_id in itertools.islice(self.resultados, self.TAMANHO_PAGINA):
+            self.ids_listados.append(vertice_id)
+            self.lista.insert(tk.END, self.indice.descrever(vertice_id))
+    
+    def ao_rolar(self, inicio, fim):
+        self.barra.set(inicio, fim)
+        # Próximo do fim da lista: buscar mais resultados
+        if float(fim) > 0.9:
+            self.carregar_pagina()
+    
+    def ao_clicar_resultado(self, event):
+        selecao = self.lista.curselection()
+        if not selecao:
+            return
+        self.definir(self.ids_listados[selecao[0]])
+    
+    def definir(self, vertice_id):
+        """Mostra o vértice como escolhido, sem percorrer a lista de vértices"""
+        self.variavel.set(self.indice.descrever(vertice_id) if self.indice is not None else str(vertice_id))
 
 class InterfaceDijkstra:
     def __init__(self, root):
@@ -182,9 +144,10 @@ class InterfaceDijkstra:
         self.root.geometry("1600x1200")  # Janela ainda maior para acomodar todos os controles
         
         # Variáveis globais
-        self.vertices = []
-        self.arestas = []
+        self.vertices = TabelaVertices()
+        self.arestas = TabelaArestas()
         self.matrizAdj = []
+        self.matriz_direcionada = False  # Tipo com que a matriz foi montada (as buscas pelo CSR seguem o atual)
         self.totalVertices = 0
         self.totalArestas = 0
         self.arquivo_carregado = False
@@ -210,6 +173,44 @@ class InterfaceDijkstra:
         # NOVO: Variável para tipo global do grafo
         self.grafo_direcionado = tk.BooleanVar(value=False)
         
+        # Variáveis para a busca em segundo plano
+        self.fila_busca = queue.Queue()  # Mensagens da thread de trabalho para o Tk
+        self.busca_atual = None  # (id da busca, evento de cancelamento)
+        self.contador_buscas = 0
+        self.consultando_fila = False
+        
+        # Variáveis para o carregamento em segundo plano
+        self.fila_carregamento = queue.Queue()
+        self.carregamento_atual = None  # (id do carregamento, evento de cancelamento, arquivo)
+        self.consulta_carregamento = None  # Id do root.after que consulta a fila de carregamento
+        self.contador_carregamentos = 0
+        self.posicoes_cache = None  # Posições normalizadas dos vértices
+        self.indice_vertices = IndiceVertices()  # Busca de vértices por id ou nome
+        self.versao_grafo = 0  # Incrementada a cada mudança no grafo
+        self.csr_cache = None  # (versão, GrafoCSR completo) de onde saem as visões das buscas sobre CSR
+        self.celulas = {}  # direcionado -> (métrica, SobreposicaoCRP, pares (u, v) editados desde então)
+        self.restricoes_conversao = []  # Restrições de conversão do OSM carregado, como em NosOSM
+        self.conversoes_cache = None  # (versão, direcionado, TabelaConversoes)
+        self.componentes = None  # IndiceComponentes, atualizado nas inserções e refeito nas remoções
+        self.ilhas_cache = None  # (versão, direcionado, máscara dos vértices fora da maior componente)
+        self.alcance_atual = None  # Faixas da área de alcance exibidas
+        self.rotas_alternativas = []  # Caminhos exibidos em cores distintas
+        self.historico = None  # HistoricoRetratos: versões do grafo para desfazer, refazer e comparar
+        self.retrato_marcado = None  # Versão guardada para comparar rotas com a atual
+        self.nomes_removidos = {}  # Nomes de vértices removidos, devolvidos ao desfazer
+        self.iniciar_historico()
+        self.exportador_rastros = None  # Grava o rastro de cada busca quando ligado
+        # Grafos abertos; acima do orçamento, os inativos perdem a matriz densa e depois saem da área
+        self.area_trabalho = AreaTrabalho(ORCAMENTO_PADRAO_MB * 2**20, descartaveis=('matrizAdj',))
+        self.nome_grafo = None  # Arquivo do grafo ativo
+        self.rotulos_grafos = {}  # Rótulo exibido -> arquivo, para a lista de grafos abertos
+        
+        # Variáveis do agendador de redesenho
+        self.redesenho_agendado = False
+        self.redesenho_layout = False  # Requer redesenhar o grafo inteiro
+        self.redesenho_estilo = False  # Apenas tamanhos, fontes e rótulos mudaram
+        self.artistas = {}
+        
         # Configurar interface
         self.criar_interface()
         
@@ -262,6 +263,35 @@ class InterfaceDijkstra:
         self.lbl_arestas = ttk.Label(info_frame, text="Arestas: 0")
         self.lbl_arestas.pack(anchor=tk.W)
         
+        # Progresso do carregamento
+        self.lbl_fase_carregamento = ttk.Label(info_frame, text="Carregamento: -")
+        self.lbl_fase_carregamento.pack(anchor=tk.W, pady=(5, 0))
+        self.barra_carregamento = ttk.Progressbar(info_frame, mode="determinate", maximum=100)
+        self.barra_carregamento.pack(fill=tk.X, pady=2)
+        self.btn_cancelar_carregamento = ttk.Button(info_frame, text="Cancelar Carregamento", 
+                                                   command=self.cancelar_carregamento, state="disabled")
+        self.btn_cancelar_carregamento.pack(fill=tk.X, pady=2)
+        self.lbl_tempos_carregamento = ttk.Label(info_frame, text="", font=("Arial", 8), justify=tk.LEFT)
+        self.lbl_tempos_carregamento.pack(anchor=tk.W)
+        
+        # Grafos abertos: trocar entre eles não relê o arquivo
+        ttk.Label(info_frame, text="Grafos abertos:").pack(anchor=tk.W, pady=(5, 0))
+        self.grafo_aberto_var = tk.StringVar()
+        self.combo_grafos = ttk.Combobox(info_frame, textvariable=self.grafo_aberto_var, state="readonly")
+        self.combo_grafos.pack(fill=tk.X, pady=2)
+        self.combo_grafos.bind('<<ComboboxSelected>>', lambda evento: self.trocar_grafo_selecionado())
+        orcamento_frame = ttk.Frame(info_frame)
+        orcamento_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(orcamento_frame, text="Memória (MB):").pack(side=tk.LEFT)
+        self.orcamento_var = tk.IntVar(value=ORCAMENTO_PADRAO_MB)
+        orcamento = tk.Spinbox(orcamento_frame, from_=128, to=65536, increment=256, textvariable=self.orcamento_var,
+                               width=6, command=self.alterar_orcamento)
+        orcamento.pack(side=tk.LEFT, padx=5)
+        orcamento.bind('<Return>', lambda evento: self.alterar_orcamento())
+        ttk.Button(orcamento_frame, text="Fechar", command=self.fechar_grafo_selecionado).pack(side=tk.LEFT)
+        self.lbl_memoria_grafos = ttk.Label(info_frame, text="Memória: -", font=("Arial", 8))
+        self.lbl_memoria_grafos.pack(anchor=tk.W)
+        
         # Frame para seleção de vértices
         vertices_frame = ttk.LabelFrame(left_scrollable_frame, text="Seleção de Vértices", padding=10)
         vertices_frame.pack(pady=10, fill=tk.X, padx=5)
@@ -274,17 +304,17 @@ class InterfaceDijkstra:
         ttk.Label(vertices_frame, text="• Segundo clique: Vértice de destino", 
                  font=("Arial", 8)).pack(anchor=tk.W, pady=(0, 10))
         
-        ttk.Label(vertices_frame, text="Ou use os comboboxes abaixo:").pack(anchor=tk.W, pady=(10, 0))
+        ttk.Label(vertices_frame, text="Ou busque por id ou nome abaixo:").pack(anchor=tk.W, pady=(10, 0))
         
         ttk.Label(vertices_frame, text="Vértice de origem:").pack(anchor=tk.W, pady=(5, 0))
         self.origem_var = tk.StringVar()
-        self.combo_origem = ttk.Combobox(vertices_frame, textvariable=self.origem_var, state="readonly")
-        self.combo_origem.pack(fill=tk.X, pady=2)
+        self.seletor_origem = SeletorVertice(vertices_frame, self.origem_var)
+        self.seletor_origem.pack(fill=tk.X, pady=2)
         
         ttk.Label(vertices_frame, text="Vértice de destino:").pack(anchor=tk.W, pady=(10, 0))
         self.destino_var = tk.StringVar()
-        self.combo_destino = ttk.Combobox(vertices_frame, textvariable=self.destino_var, state="readonly")
-        self.combo_destino.pack(fill=tk.X, pady=2)
+        self.seletor_destino = SeletorVertice(vertices_frame, self.destino_var)
+        self.seletor_destino.pack(fill=tk.X, pady=2)
         
         # Labels para mostrar vértices selecionados
         self.lbl_origem_selecionada = ttk.Label(vertices_frame, text="Origem: Nenhuma", 
@@ -300,6 +330,11 @@ class InterfaceDijkstra:
                                       command=self.calcular_caminho, width=25, state="disabled")
         self.btn_calcular.pack(pady=10)
         
+        # Botão para cancelar a busca em andamento
+        self.btn_cancelar_busca = ttk.Button(left_scrollable_frame, text="Cancelar Busca", 
+                                            command=self.cancelar_busca, width=25, state="disabled")
+        self.btn_cancelar_busca.pack(pady=5)
+        
         # Botão para limpar caminho
         self.btn_limpar = ttk.Button(left_scrollable_frame, text="Limpar Caminho", 
                                     command=self.limpar_caminho, width=25, state="disabled")
@@ -310,6 +345,42 @@ class InterfaceDijkstra:
                                            command=self.copiar_imagem_grafo, width=25, state="disabled")
         self.btn_copiar_imagem.pack(pady=5)
         
+        # Frame para a área de alcance a partir da origem
+        alcance_frame = ttk.LabelFrame(left_scrollable_frame, text="Área de Alcance", padding=10)
+        alcance_frame.pack(pady=10, fill=tk.X, padx=5)
+        ttk.Label(alcance_frame, text="Distâncias a partir da origem (separadas por vírgula):", 
+                 font=("Arial", 8)).pack(anchor=tk.W)
+        self.orcamentos_var = tk.StringVar(value="500, 1000, 2000")
+        ttk.Entry(alcance_frame, textvariable=self.orcamentos_var).pack(fill=tk.X, pady=2)
+        self.btn_alcance = ttk.Button(alcance_frame, text="Calcular Alcance", 
+                                     command=self.calcular_alcance, state="disabled")
+        self.btn_alcance.pack(fill=tk.X, pady=2)
+        self.lbl_alcance = ttk.Label(alcance_frame, text="", font=("Arial", 8), justify=tk.LEFT)
+        self.lbl_alcance.pack(anchor=tk.W)
+        
+        # Frame para rotas alternativas entre origem e destino
+        alternativas_frame = ttk.LabelFrame(left_scrollable_frame, text="Rotas Alternativas", padding=10)
+        alternativas_frame.pack(pady=10, fill=tk.X, padx=5)
+        quantidade_frame = ttk.Frame(alternativas_frame)
+        quantidade_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(quantidade_frame, text="Quantidade:").pack(side=tk.LEFT)
+        self.k_rotas_var = tk.IntVar(value=3)
+        tk.Spinbox(quantidade_frame, from_=2, to=len(CORES_ROTAS), textvariable=self.k_rotas_var, 
+                   width=4).pack(side=tk.LEFT, padx=5)
+        self.metodo_alternativas_var = tk.StringVar(value="k menores")
+        ttk.Radiobutton(alternativas_frame, text="K menores caminhos (Yen)", 
+                       variable=self.metodo_alternativas_var, value="k menores").pack(anchor=tk.W)
+        ttk.Radiobutton(alternativas_frame, text="Penalidade (mais rápido)", 
+                       variable=self.metodo_alternativas_var, value="penalidade").pack(anchor=tk.W)
+        sobreposicao_frame = ttk.Frame(alternativas_frame)
+        sobreposicao_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(sobreposicao_frame, text="Sobreposição máxima:").pack(side=tk.LEFT)
+        self.sobreposicao_var = tk.StringVar(value="0.7")
+        ttk.Entry(sobreposicao_frame, textvariable=self.sobreposicao_var, width=6).pack(side=tk.LEFT, padx=5)
+        self.btn_alternativas = ttk.Button(alternativas_frame, text="Calcular Alternativas", 
+                                          command=self.calcular_alternativas, state="disabled")
+        self.btn_alternativas.pack(fill=tk.X, pady=2)
+        
         # Frame para resultados
         resultado_frame = ttk.LabelFrame(left_scrollable_frame, text="Resultado", padding=10)
         resultado_frame.pack(pady=10, fill=tk.X, padx=5)
@@ -344,8 +415,37 @@ class InterfaceDijkstra:
         self.lbl_custo_total = ttk.Label(estatisticas_frame, text="Custo total: -")
         self.lbl_custo_total.pack(anchor=tk.W)
         
+        self.lbl_contadores = ttk.Label(estatisticas_frame, text="", font=("Arial", 8), justify=tk.LEFT)
+        self.lbl_contadores.pack(anchor=tk.W)
+        
+        self.lbl_status_busca = ttk.Label(estatisticas_frame, text="Status: -")
+        self.lbl_status_busca.pack(anchor=tk.W)
+        
         # Mover o checkbox do grafo direcionado para cá
-        ttk.Checkbutton(estatisticas_frame, text="Grafo Direcionado", variable=self.grafo_direcionado, command=self.exibir_grafo).pack(anchor=tk.W, pady=(5, 2))
+        ttk.Checkbutton(estatisticas_frame, text="Grafo Direcionado", variable=self.grafo_direcionado, command=self.agendar_redesenho).pack(anchor=tk.W, pady=(5, 2))
+        
+        # Métrica dos pesos usada nas buscas (comprimento, tempo de percurso, pesos do arquivo)
+        metrica_frame = ttk.Frame(estatisticas_frame)
+        metrica_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(metrica_frame, text="Métrica:").pack(side=tk.LEFT)
+        self.metrica_var = tk.StringVar(value=METRICA_PADRAO)
+        ttk.Combobox(metrica_frame, textvariable=self.metrica_var, values=list(METRICAS), 
+                     state="readonly", width=14).pack(side=tk.LEFT, padx=5)
+        
+        # Busca sobre a partição em células, que absorve edições e trocas de métrica sem refazer tudo
+        self.usar_celulas_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(estatisticas_frame, text="Buscar por células (multinível)",
+                        variable=self.usar_celulas_var).pack(anchor=tk.W, pady=2)
+        
+        # Busca por arestas que respeita as conversões proibidas do OSM (type=restriction)
+        self.usar_conversoes_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(estatisticas_frame, text="Respeitar restrições de conversão",
+                        variable=self.usar_conversoes_var).pack(anchor=tk.W, pady=2)
+        
+        # Rastro de cada busca (vértices fechados e relaxações) em JSON Lines
+        self.gravar_rastros_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(estatisticas_frame, text="Gravar rastro das buscas", variable=self.gravar_rastros_var,
+                        command=self.alternar_rastros).pack(anchor=tk.W, pady=2)
         
         # Frame para edição do grafo
         edicao_frame = ttk.LabelFrame(left_scrollable_frame, text="Edição do Grafo", padding=10)
@@ -379,6 +479,23 @@ class InterfaceDijkstra:
         # Label para mostrar modo atual
         self.lbl_modo_atual = ttk.Label(edicao_frame, text="Modo: Navegação", font=("Arial", 9, "bold"), foreground="blue")
         self.lbl_modo_atual.pack(anchor=tk.W, pady=(5, 0))
+        # 6. Versões do grafo: desfazer/refazer (Ctrl+Z/Ctrl+Y) e comparação de rotas com uma versão marcada
+        historico_frame = ttk.Frame(edicao_frame)
+        historico_frame.pack(fill=tk.X, pady=(10, 2))
+        self.btn_desfazer = ttk.Button(historico_frame, text="↶ Desfazer", command=self.desfazer, width=12, state="disabled")
+        self.btn_desfazer.pack(side=tk.LEFT, padx=2)
+        self.btn_refazer = ttk.Button(historico_frame, text="↷ Refazer", command=self.refazer, width=12, state="disabled")
+        self.btn_refazer.pack(side=tk.LEFT, padx=2)
+        versao_frame = ttk.Frame(edicao_frame)
+        versao_frame.pack(fill=tk.X, pady=2)
+        ttk.Button(versao_frame, text="Marcar versão", command=self.marcar_versao, width=12).pack(side=tk.LEFT, padx=2)
+        self.btn_comparar_versoes = ttk.Button(versao_frame, text="Comparar rotas", command=self.comparar_versoes,
+                                               width=12, state="disabled")
+        self.btn_comparar_versoes.pack(side=tk.LEFT, padx=2)
+        self.lbl_versao = ttk.Label(edicao_frame, text="Versão marcada: nenhuma")
+        self.lbl_versao.pack(anchor=tk.W, pady=(2, 0))
+        self.root.bind('<Control-z>', lambda evento: self.desfazer())
+        self.root.bind('<Control-y>', lambda evento: self.refazer())
         
         # Frame para opções de visualização
         visualizacao_frame = ttk.LabelFrame(left_scrollable_frame, text="Opções de Visualização", padding=10)
@@ -388,13 +505,22 @@ class InterfaceDijkstra:
         self.mostrar_numeracao_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(visualizacao_frame, text="Mostrar numeração dos vértices", 
                        variable=self.mostrar_numeracao_var,
-                       command=self.exibir_grafo).pack(anchor=tk.W, pady=2)
+                       command=lambda: self.agendar_redesenho(layout=False)).pack(anchor=tk.W, pady=2)
         
         # Checkbox para mostrar rótulos das arestas
         self.mostrar_rotulos_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(visualizacao_frame, text="Mostrar pesos das arestas", 
                        variable=self.mostrar_rotulos_var,
-                       command=self.exibir_grafo).pack(anchor=tk.W, pady=2)
+                       command=lambda: self.agendar_redesenho(layout=False)).pack(anchor=tk.W, pady=2)
+        
+        # Vértices fora da maior componente (ilhas): exibir, destacar em cores ou ocultar
+        self.ilhas_var = tk.StringVar(value="mostrar")
+        ilhas_frame = ttk.Frame(visualizacao_frame)
+        ilhas_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(ilhas_frame, text="Ilhas:").pack(side=tk.LEFT)
+        for texto, valor in (("Mostrar", "mostrar"), ("Destacar", "destacar"), ("Ocultar", "ocultar")):
+            ttk.Radiobutton(ilhas_frame, text=texto, variable=self.ilhas_var, value=valor,
+                            command=self.alterar_ilhas).pack(side=tk.LEFT)
         
         # Separador
         ttk.Separator(visualizacao_frame, orient='horizontal').pack(fill=tk.X, pady=10)
@@ -479,9 +605,7 @@ class InterfaceDijkstra:
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         
         # Conectar evento de clique uma única vez
-        print("Conectando evento de clique na inicialização...")
         self.canvas.mpl_connect('button_press_event', self.on_click)
-        print("Evento de clique conectado na inicialização!")
         
         # Texto inicial
         self.ax.text(0.5, 0.5, "Carregue um arquivo .poly para visualizar o grafo", 
@@ -497,85 +621,274 @@ class InterfaceDijkstra:
             filetypes=[("Arquivos .poly", "*.poly"), ("Arquivos .osm", "*.osm"), ("Todos os arquivos", "*.*")]
         )
         if arquivo:
+            self.iniciar_carregamento(arquivo)
+    
+    def iniciar_carregamento(self, arquivo):
+        """Carrega o arquivo em uma thread de trabalho; o grafo atual continua em uso até a troca
+
+        Um arquivo que já está aberto na área de trabalho (e não mudou no
+        disco) só é ativado; reabrir o grafo ativo o relê.
+        """
+        self.cancelar_carregamento()
+        if arquivo != self.nome_grafo and self.area_trabalho.residente(arquivo, assinatura_arquivo(arquivo)):
+            self.trocar_grafo(arquivo)
+            return
+        self.contador_carregamentos += 1
+        id_carregamento = self.contador_carregamentos
+        cancelado = threading.Event()
+        self.carregamento_atual = (id_carregamento, cancelado, arquivo)
+        
+        self.barra_carregamento['value'] = 0
+        self.lbl_tempos_carregamento.config(text="")
+        self.btn_cancelar_carregamento.config(state="normal")
+        log.info("Carregando arquivo: %s", arquivo)
+        
+        thread = threading.Thread(target=self.executar_carregamento,
+                                  args=(id_carregamento, cancelado, arquivo, self.grafo_direcionado.get()),
+                                  daemon=True)
+        thread.start()
+        # Um só laço de consulta à fila: o do carregamento anterior, se ainda agendado, é descartado
+        if self.consulta_carregamento is not None:
+            self.root.after_cancel(self.consulta_carregamento)
+        self.consulta_carregamento = self.root.after(50, self.processar_fila_carregamento)
+    
+    def executar_carregamento(self, id_carregamento, cancelado, arquivo, direcionado):
+        """Executa as fases do carregamento fora da thread do Tk"""
+        def progresso(fase, fracao, tempo_ms):
+            self.fila_carregamento.put(('progresso', id_carregamento, (fase, fracao, tempo_ms)))
+        try:
+            grafo = carregar_grafo(arquivo, direcionado, progresso, cancelado)
+        except CarregamentoCancelado:
+            self.fila_carregamento.put(('cancelado', id_carregamento, None))
+            return
+        except Exception as e:
+            self.fila_carregamento.put(('erro', id_carregamento, e))
+            return
+        self.fila_carregamento.put(('resultado', id_carregamento, grafo))
+    
+    def processar_fila_carregamento(self):
+        """Aplica na interface as mensagens enviadas pela thread de carregamento"""
+        self.consulta_carregamento = None  # Esta consulta já saiu da agenda
+        fases = FASES_CARREGAMENTO + ['renderizacao']
+        while True:
             try:
-                # Verificar se é arquivo .osm
-                if arquivo.lower().endswith('.osm'):
-                    print(f"Processando arquivo OSM: {arquivo}")
-                    vertices_osm, arestas_osm = processar_arquivo_osm(arquivo)
-                    self.vertices = []
-                    self.arestas = []
-                    for v in vertices_osm:
-                        vertice = Vertices(id=v['id'], x=v['x'], y=v['y'])
-                        self.vertices.append(vertice)
-                    for a in arestas_osm:
-                        aresta = Arestas(orig=a['orig'], dest=a['dest'], dist=a['dist'])
-                        self.arestas.append(aresta)
-                    self.totalVertices = len(self.vertices)
-                    self.totalArestas = len(self.arestas)
-                    # Desmarcar checkbox de grafo direcionado para arquivos OSM
-                    self.grafo_direcionado.set(False)
-                    self.construir_grafo()
-                    self.arquivo_carregado = True
-                    self.atualizar_interface()
-                    self.exibir_grafo()
-                    messagebox.showinfo("Sucesso", 
-                        f"Arquivo OSM processado com sucesso!\n"
-                        f"Vértices: {self.totalVertices}\n"
-                        f"Arestas: {self.totalArestas}\n"
-                        f"Coordenadas convertidas para UTM zona 23S\n"
-                        f"Grafo configurado como não direcionado por padrão")
-                else:
-                    # Processar arquivo .poly normalmente
-                    self.ler_arquivo(arquivo)
-                    self.arquivo_carregado = True
-                    self.atualizar_interface()
-                    self.exibir_grafo()
-                    messagebox.showinfo("Sucesso", f"Arquivo carregado com sucesso!\nVértices: {self.totalVertices}\nArestas: {self.totalArestas}")
-            except Exception as e:
-                messagebox.showerror("Erro", f"Erro ao carregar arquivo: {str(e)}")
+                tipo, id_carregamento, dados = self.fila_carregamento.get_nowait()
+            except queue.Empty:
+                break
+            # Ignorar mensagens de carregamentos cancelados ou substituídos
+            if self.carregamento_atual is None or id_carregamento != self.carregamento_atual[0]:
+                continue
+            if tipo == 'progresso':
+                fase, fracao, tempo_ms = dados
+                total = (fases.index(fase) + fracao) / len(fases) * 100
+                self.barra_carregamento['value'] = total
+                self.lbl_fase_carregamento.config(text=f"Carregamento: {fase} ({fracao * 100:.0f}%)")
+            elif tipo == 'resultado':
+                arquivo = self.carregamento_atual[2]
+                self.finalizar_carregamento()
+                self.aplicar_grafo_carregado(dados, arquivo)
+                return
+            elif tipo == 'erro':
+                self.finalizar_carregamento("erro")
+                messagebox.showerror("Erro", f"Erro ao carregar arquivo: {str(dados)}")
+                return
+            elif tipo == 'cancelado':
+                self.finalizar_carregamento("cancelado")
+                return
+        
+        if self.carregamento_atual is not None:
+            self.consulta_carregamento = self.root.after(50, self.processar_fila_carregamento)
+    
+    def finalizar_carregamento(self, status=None):
+        """Marca o carregamento atual como encerrado"""
+        self.carregamento_atual = None
+        self.btn_cancelar_carregamento.config(state="disabled")
+        if status is not None:
+            self.barra_carregamento['value'] = 0
+            self.lbl_fase_carregamento.config(text=f"Carregamento: {status}")
+    
+    def cancelar_carregamento(self):
+        """Cancela o carregamento em andamento, se houver"""
+        if self.carregamento_atual is not None:
+            self.carregamento_atual[1].set()
+            self.finalizar_carregamento("cancelado")
+    
+    def aplicar_grafo_carregado(self, grafo, arquivo=None):
+        """Troca o grafo atual pelo recém-carregado de uma só vez e faz a primeira renderização
+
+        O grafo anterior fica estacionado na área de trabalho, e o novo entra
+        nela com o nome do arquivo.
+        """
+        self.cancelar_busca()
+        self.guardar_grafo_ativo()
+        self.grafo_modificado()
+        self.componentes = None
+        self.vertices = grafo.vertices
+        self.arestas = grafo.arestas
+        self.matrizAdj = grafo.matrizAdj
+        self.matriz_direcionada = grafo.direcionado
+        self.posicoes_cache = grafo.posicoes
+        self.indice_vertices = grafo.indice
+        self.restricoes_conversao = grafo.restricoes
+        self.iniciar_historico()
+        self.origem_var.set("")
+        self.destino_var.set("")
+        self.totalVertices = len(self.vertices)
+        self.totalArestas = len(self.arestas)
+        self.arquivo_carregado = True
+        # Seleções e caminho pertencem ao grafo anterior
+        self.caminho_atual = []
+        self.vertice_origem = None
+        self.vertice_destino = None
+        self.lbl_origem_selecionada.config(text="Origem: Nenhuma")
+        self.lbl_destino_selecionado.config(text="Destino: Nenhum")
+        if arquivo is not None:
+            self.area_trabalho.guardar(arquivo, self.estado_grafo(), assinatura_arquivo(arquivo))
+            self.ativar_grafo(arquivo)
+        
+        inicio = time.perf_counter()
+        self.atualizar_interface()
+        self.executar_redesenho()
+        tempos_ms = dict(grafo.tempos_ms)
+        tempos_ms['renderizacao'] = (time.perf_counter() - inicio) * 1000
+        
+        self.barra_carregamento['value'] = 100
+        self.lbl_fase_carregamento.config(text="Carregamento: concluído")
+        self.lbl_tempos_carregamento.config(
+            text="\n".join(f"{fase}: {tempo:.1f} ms" for fase, tempo in tempos_ms.items()))
+        
+        if grafo.formato == 'osm':
+            messagebox.showinfo("Sucesso", 
+                f"Arquivo OSM processado com sucesso!\n"
+                f"Vértices: {self.totalVertices}\n"
+                f"Arestas: {self.totalArestas}\n"
+                f"Arestas de mão única (oneway): {int(self.arestas.mao_unica().sum())}\n"
+                f"Coordenadas convertidas para UTM zona 23S\n"
+                f"Grafo {'direcionado' if grafo.direcionado else 'não direcionado'}")
+        else:
+            messagebox.showinfo("Sucesso", f"Arquivo carregado com sucesso!\nVértices: {self.totalVertices}\nArestas: {self.totalArestas}")
+    
+    # Área de trabalho: vários grafos abertos, troca sem reler o arquivo
+    
+    def estado_grafo(self):
+        """Tudo o que pertence ao grafo ativo, para estacioná-lo na área de trabalho"""
+        estado = {campo: getattr(self, campo) for campo in CAMPOS_GRAFO}
+        estado['direcionado'] = self.grafo_direcionado.get()
+        estado['origem'] = self.origem_var.get()
+        estado['destino'] = self.destino_var.get()
+        return estado
+    
+    def guardar_grafo_ativo(self):
+        """Estaciona o grafo ativo na área de trabalho, com índices, caches e histórico"""
+        if self.nome_grafo is not None:
+            self.area_trabalho.guardar(self.nome_grafo, self.estado_grafo())
+            self.nome_grafo = None
+    
+    def ativar_grafo(self, arquivo):
+        """Religa a interface ao estado estacionado do grafo; a matriz densa é refeita se foi liberada"""
+        estado = self.area_trabalho.ativar(arquivo)
+        self.nome_grafo = arquivo
+        for campo in CAMPOS_GRAFO:
+            setattr(self, campo, estado[campo])
+        self.grafo_direcionado.set(estado['direcionado'])
+        self.origem_var.set(estado['origem'])
+        self.destino_var.set(estado['destino'])
+        if self.matrizAdj is None:
+            with cronometrar(log, 'construcao', estrutura='matriz', vertices=len(self.vertices)):
+                self.matrizAdj = construir_matriz_adjacencia(self.vertices, self.arestas,
+                                                             self.matriz_direcionada)
+        self.ajustar_area_trabalho()
+    
+    def ajustar_area_trabalho(self):
+        """Aplica o orçamento de memória aos grafos inativos e atualiza a lista de grafos abertos"""
+        if self.nome_grafo is not None:
+            self.area_trabalho.medir(self.nome_grafo, self.estado_grafo())
+        for nome, acao in self.area_trabalho.ajustar():
+            log.info("Grafo %s %s para caber no orçamento de memória", nome, acao)
+        nomes = self.area_trabalho.nomes()[::-1]
+        bases = [os.path.basename(nome) for nome in nomes]
+        # Arquivos de mesmo nome em pastas diferentes aparecem com o caminho inteiro
+        self.rotulos_grafos = {(base if bases.count(base) == 1 else nome): nome for base, nome in zip(bases, nomes)}
+        self.combo_grafos.config(values=list(self.rotulos_grafos))
+        self.grafo_aberto_var.set(next((rotulo for rotulo, nome in self.rotulos_grafos.items()
+                                        if nome == self.nome_grafo), ""))
+        self.lbl_memoria_grafos.config(
+            text=f"Memória estimada: {self.area_trabalho.total_bytes() / 2**20:.0f} de "
+                 f"{self.area_trabalho.orcamento_bytes / 2**20:.0f} MB ({len(self.area_trabalho)} grafos)")
+    
+    def trocar_grafo(self, arquivo):
+        """Passa para outro grafo aberto: só troca referências, sem reler nem refazer estruturas"""
+        if arquivo is None or arquivo == self.nome_grafo or arquivo not in self.area_trabalho:
+            return
+        self.cancelar_busca()
+        inicio = time.perf_counter()
+        self.guardar_grafo_ativo()
+        self.ativar_grafo(arquivo)
+        self.vertices_selecionados = []
+        self.vertice_temporario = None
+        self.lbl_origem_selecionada.config(
+            text=f"Origem: {self.vertice_origem}" if self.vertice_origem is not None else "Origem: Nenhuma")
+        self.lbl_destino_selecionado.config(
+            text=f"Destino: {self.vertice_destino}" if self.vertice_destino is not None else "Destino: Nenhum")
+        self.atualizar_interface()
+        tempos_ms = {'troca': (time.perf_counter() - inicio) * 1000}
+        inicio = time.perf_counter()
+        self.executar_redesenho()
+        tempos_ms['renderizacao'] = (time.perf_counter() - inicio) * 1000
+        log.info("Grafo %s ativado em %.1f ms", arquivo, tempos_ms['troca'])
+        self.barra_carregamento['value'] = 100
+        self.lbl_fase_carregamento.config(text="Carregamento: grafo já aberto")
+        self.lbl_tempos_carregamento.config(
+            text="\n".join(f"{fase}: {tempo:.1f} ms" for fase, tempo in tempos_ms.items()))
+    
+    def trocar_grafo_selecionado(self):
+        self.trocar_grafo(self.rotulos_grafos.get(self.grafo_aberto_var.get()))
+    
+    def fechar_grafo_selecionado(self):
+        """Tira o grafo ativo da área de trabalho e volta ao aberto mais recentemente"""
+        outros = [nome for nome in self.area_trabalho.nomes() if nome != self.nome_grafo]
+        if self.nome_grafo is None or not outros:
+            messagebox.showinfo("Aviso", "Não há outro grafo aberto para onde voltar!")
+            return
+        fechado = self.nome_grafo
+        self.trocar_grafo(outros[-1])
+        self.area_trabalho.remover(fechado)
+        self.ajustar_area_trabalho()
+        log.info("Grafo %s fechado", fechado)
+    
+    def alterar_orcamento(self):
+        """Novo orçamento de memória para os grafos abertos"""
+        try:
+            megabytes = int(self.orcamento_var.get())
+        except (ValueError, tk.TclError):
+            return
+        if megabytes > 0:
+            self.area_trabalho.orcamento_bytes = megabytes * 2**20
+            self.ajustar_area_trabalho()
     
     def ler_arquivo(self, caminho_arquivo):
         """Lê o arquivo .poly e carrega os dados"""
-        self.vertices = []
-        self.arestas = []
-        with open(caminho_arquivo, 'r') as arquivo:
-            linhas = [linha.strip() for linha in arquivo.readlines()]
-        self.totalVertices = int(linhas[0].split()[0])
-        for i in range(1, self.totalVertices + 1):
-            dados = linhas[i].split()
-            vertice = Vertices(
-                id=int(dados[0]),
-                x=float(dados[1]),
-                y=float(dados[2])
-            )
-            self.vertices.append(vertice)
-        pos_arestas = self.totalVertices + 1
-        self.totalArestas = int(linhas[pos_arestas].split()[0])
-        for i in range(pos_arestas + 1, pos_arestas + self.totalArestas + 1):
-            dados = linhas[i].split()
-            aresta = Arestas(
-                orig=int(dados[1]),
-                dest=int(dados[2]),
-                dist=float(dados[3]) if len(dados) > 3 else 0.0
-            )
-            self.arestas.append(aresta)
+        self.vertices, self.arestas = ler_arquivo_poly(caminho_arquivo)
+        self.indice_vertices = IndiceVertices(self.vertices)
+        self.restricoes_conversao = []
+        self.iniciar_historico()
+        self.totalVertices = len(self.vertices)
+        self.totalArestas = len(self.arestas)
         self.construir_grafo()
     
-    def construir_grafo(self):
+    def construir_grafo(self, alteradas=None):
         """Constrói a matriz de adjacência"""
-        self.matrizAdj = [[INF for _ in range(self.totalVertices)] for _ in range(self.totalVertices)]
-        for aresta in self.arestas:
-            if aresta.orig < self.totalVertices and aresta.dest < self.totalVertices:
-                dist = self.calc_dist(aresta.orig, aresta.dest)
-                self.matrizAdj[aresta.orig][aresta.dest] = dist
-                # Se o grafo não é direcionado, adicionar também no sentido contrário
-                if not self.grafo_direcionado.get():
-                    self.matrizAdj[aresta.dest][aresta.orig] = dist
+        self.posicoes_cache = None
+        self.grafo_modificado(alteradas)
+        self.componentes = None
+        with cronometrar(log, 'construcao', estrutura='matriz', vertices=len(self.vertices)):
+            self.matriz_direcionada = self.grafo_direcionado.get()
+            self.matrizAdj = construir_matriz_adjacencia(self.vertices, self.arestas, self.matriz_direcionada)
     
     def calc_dist(self, v1_id, v2_id):
         """Calcula a distância entre dois vértices pelos seus IDs"""
-        v1 = next((v for v in self.vertices if v.id == v1_id), None)
-        v2 = next((v for v in self.vertices if v.id == v2_id), None)
+        v1 = self.vertices.por_id(v1_id)
+        v2 = self.vertices.por_id(v2_id)
         
         if v1 and v2:
             return math.sqrt((v1.x - v2.x)**2 + (v1.y - v2.y)**2)
@@ -587,16 +900,22 @@ class InterfaceDijkstra:
         self.lbl_vertices.config(text=f"Vértices: {self.totalVertices}")
         self.lbl_arestas.config(text=f"Arestas: {self.totalArestas}")
         self.lbl_tamanho.config(text=f"Tamanho: {self.tamanho_vertices}")
+        self.atualizar_botoes_historico()
         
-        # Atualizar comboboxes
-        opcoes = []
+        # Atualizar seletores de vértices
+        if self.seletor_origem.indice is not self.indice_vertices:
+            self.seletor_origem.definir_indice(self.indice_vertices)
+            self.seletor_destino.definir_indice(self.indice_vertices)
         if self.vertices:
-            opcoes = [f"{v.id} ({v.x:.1f}, {v.y:.1f})" for v in self.vertices]
-            self.combo_origem['values'] = opcoes
-            self.combo_destino['values'] = opcoes
+            if not self.origem_var.get():
+                self.seletor_origem.definir(self.vertices[0].id)
+            if not self.destino_var.get():
+                self.seletor_destino.definir(self.vertices[-1].id)
             
             # Habilitar botões
             self.btn_calcular.config(state="normal")
+            self.btn_alcance.config(state="normal")
+            self.btn_alternativas.config(state="normal")
             self.btn_limpar.config(state="normal")
             self.btn_copiar_imagem.config(state="normal")
             
@@ -608,6 +927,8 @@ class InterfaceDijkstra:
         else:
             # Desabilitar botões
             self.btn_calcular.config(state="disabled")
+            self.btn_alcance.config(state="disabled")
+            self.btn_alternativas.config(state="disabled")
             self.btn_limpar.config(state="disabled")
             self.btn_copiar_imagem.config(state="disabled")
             
@@ -616,32 +937,136 @@ class InterfaceDijkstra:
             self.btn_remover_vertice.config(state="disabled")
             self.btn_remover_aresta.config(state="disabled")
         
-        if opcoes:
-            self.combo_origem.set(opcoes[0])
-            self.combo_destino.set(opcoes[-1])
-        
         # Exibir grafo inicial
-        self.exibir_grafo()
+        self.agendar_redesenho()
     
     def get_normalized_positions(self):
         """Retorna um dicionário com as posições dos vértices normalizadas para [0, 1]"""
-        if not self.vertices:
-            return {}
-        xs = [v.x for v in self.vertices]
-        ys = [v.y for v in self.vertices]
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
-        def norm(val, minv, maxv):
-            if maxv - minv == 0:
-                return 0.5
-            return (val - minv) / (maxv - minv)
-        return {v.id: (norm(v.x, min_x, max_x), norm(v.y, min_y, max_y)) for v in self.vertices}
+        if self.posicoes_cache is None:
+            self.posicoes_cache = normalizar_posicoes(self.vertices)
+        return self.posicoes_cache
+
+    def grafo_modificado(self, alteradas=None):
+        """Invalida os dados derivados do grafo (CSR e área de alcance)
+
+        `alteradas` são os pares (u, v) das arestas editadas, para que as
+        células só refaçam o que mudou; sem eles, as células são descartadas.
+        """
+        if alteradas is None:
+            self.celulas = {}
+        else:
+            for _, _, pendentes in self.celulas.values():
+                pendentes.extend(alteradas)
+        self.versao_grafo += 1
+        self.csr_cache = None
+        self.alcance_atual = None
+        self.rotas_alternativas = []
+        self.lbl_alcance.config(text="")
+
+    def obter_csr(self):
+        """Adjacência CSR do grafo atual na métrica escolhida
+
+        A topologia só é refeita quando o grafo muda: alternar o tipo escolhe
+        outra visão do mesmo CSR completo (pela mão única de cada aresta), e
+        trocar de métrica apenas seleciona outro array de pesos.
+        """
+        if self.csr_cache is None or self.csr_cache[0] != self.versao_grafo:
+            with cronometrar(log, 'construcao', estrutura='csr', vertices=len(self.vertices)):
+                csr = GrafoCSR.de_arestas(self.vertices, self.arestas)
+            self.csr_cache = (self.versao_grafo, csr)
+        csr = self.csr_cache[1].visao_sentido(self.grafo_direcionado.get())
+        return csr.com_metrica(self.metrica_var.get())
+
+    def obter_celulas(self):
+        """Partição em células do grafo atual, com as cliques na métrica escolhida
 
+        A partição é montada uma vez por grafo e tipo, e as dos dois tipos
+        ficam guardadas para alternar sem refazer; trocar de métrica refaz só
+        as cliques, e as edições refazem só as células que tocaram.
+        """
+        csr = self.obter_csr()
+        direcionado = self.grafo_direcionado.get()
+        if direcionado not in self.celulas:
+            with cronometrar(log, 'construcao', estrutura='celulas', vertices=len(self.vertices)):
+                sobreposicao = SobreposicaoCRP.construir(csr)
+        else:
+            metrica, sobreposicao, pendentes = self.celulas[direcionado]
+            if metrica != csr.metrica:
+                with cronometrar(log, 'construcao', estrutura='celulas_metrica', metrica=csr.metrica):
+                    sobreposicao.personalizar(csr)
+            elif pendentes:
+                with cronometrar(log, 'construcao', estrutura='celulas_edicao',
+                                 arestas=len(pendentes)) as campos:
+                    campos['celulas'] = sobreposicao.atualizar(csr, pendentes)
+        self.celulas[direcionado] = (csr.metrica, sobreposicao, [])
+        return sobreposicao
+
+    def obter_conversoes(self):
+        """Conversões proibidas do grafo atual, refeitas quando ele muda ('only_*' depende dos vizinhos)"""
+        direcionado = self.grafo_direcionado.get()
+        if self.conversoes_cache is None or self.conversoes_cache[:2] != (self.versao_grafo, direcionado):
+            tabela = TabelaConversoes.do_osm(self.restricoes_conversao, self.obter_csr())
+            self.conversoes_cache = (self.versao_grafo, direcionado, tabela)
+        return self.conversoes_cache[2]
+
+    def obter_componentes(self):
+        """Índice de componentes do grafo atual, montado só quando falta ou o tipo do grafo mudou"""
+        direcionado = self.grafo_direcionado.get()
+        if self.componentes is None or self.componentes.direcionado != direcionado:
+            csr = self.obter_csr()
+            with cronometrar(log, 'construcao', estrutura='componentes', vertices=len(self.vertices)):
+                self.componentes = IndiceComponentes.do_grafo(csr)
+        return self.componentes
+
+    def obter_ilhas(self):
+        """Máscara, por id, dos vértices fora da maior componente fraca"""
+        chave = (self.versao_grafo, self.grafo_direcionado.get())
+        if self.ilhas_cache is None or self.ilhas_cache[:2] != chave:
+            self.ilhas_cache = (*chave, ~self.obter_componentes().principal())
+        return self.ilhas_cache[2]
+
+    def vertice_visivel(self, vertice_id):
+        """False para os vértices das ilhas quando a opção de ocultá-las está ativa"""
+        if self.ilhas_var.get() != "ocultar":
+            return True
+        ilhas = self.obter_ilhas()
+        return vertice_id >= len(ilhas) or not ilhas[vertice_id]
+
+    def alterar_ilhas(self):
+        """Aplica a opção de ilhas ao desenho e aos seletores de origem e destino"""
+        filtro = self.vertice_visivel if self.ilhas_var.get() == "ocultar" and self.vertices else None
+        self.seletor_origem.definir_filtro(filtro)
+        self.seletor_destino.definir_filtro(filtro)
+        self.agendar_redesenho()
+
+    def agendar_redesenho(self, layout=True):
+        """Marca o grafo como sujo; as mudanças acumuladas geram no máximo uma renderização"""
+        if layout:
+            self.redesenho_layout = True
+        else:
+            self.redesenho_estilo = True
+        if not self.redesenho_agendado:
+            self.redesenho_agendado = True
+            self.root.after_idle(self.executar_redesenho)
+    
+    def executar_redesenho(self):
+        """Aplica as mudanças pendentes: redesenho completo ou apenas de estilo"""
+        self.redesenho_agendado = False
+        if self.redesenho_layout:
+            self.redesenho_layout = False
+            self.redesenho_estilo = False
+            with cronometrar(log, 'renderizacao', tipo='layout', vertices=len(self.vertices)):
+                self.exibir_grafo(self.caminho_atual or None)
+        elif self.redesenho_estilo:
+            self.redesenho_estilo = False
+            with cronometrar(log, 'renderizacao', tipo='estilo', vertices=len(self.vertices)):
+                self.aplicar_estilo()
+    
     def exibir_grafo(self, caminho=None):
         """Exibe o grafo no canvas"""
-        print(f"Exibindo grafo - caminho: {caminho}")
-        print(f"Caminho atual: {self.caminho_atual}")
+        log.debug("Exibindo grafo - caminho: %s", caminho)
         self.ax.clear()
+        self.artistas = {}
         if not self.vertices:
             self.ax.text(0.5, 0.5, "Nenhum grafo carregado", 
                         ha='center', va='center', transform=self.ax.transAxes)
@@ -649,39 +1074,45 @@ class InterfaceDijkstra:
             return
         pos = self.get_normalized_positions()
         
-        # Criar dois grafos: um para arestas bidirecionais e outro para unidirecionais
-        G_bidirecional = nx.DiGraph()  # Mudança: usar DiGraph para poder desenhar setas nos dois sentidos
-        G_unidirecional = nx.DiGraph()  # Para mão única (com setas)
-        
-        for v in self.vertices:
-            G_bidirecional.add_node(v.id, pos=pos[v.id])
-            G_unidirecional.add_node(v.id, pos=pos[v.id])
-        
-        # Separar arestas por tipo
-        arestas_bidirecionais = []
-        arestas_unidirecionais = []
-        
-        for aresta in self.arestas:
-            if self.grafo_direcionado.get():
-                # Se o grafo é direcionado, todas as arestas são unidirecionais
-                arestas_unidirecionais.append(aresta)
-            else:
-                # Se o grafo não é direcionado, verificar o tipo da aresta
-                if self.tipo_aresta_var.get() == "mão única":
-                    arestas_unidirecionais.append(aresta)
-                else:
-                    arestas_bidirecionais.append(aresta)
-        
-        # Adicionar arestas aos grafos correspondentes
-        for aresta in arestas_bidirecionais:
-            # Para mão dupla, adicionar aresta nos dois sentidos
-            G_bidirecional.add_edge(aresta.orig, aresta.dest)
-            G_bidirecional.add_edge(aresta.dest, aresta.orig)
-        
-        for aresta in arestas_unidirecionais:
-            G_unidirecional.add_edge(aresta.orig, aresta.dest)
-        
-        # Cores dos vértices (usar o mesmo para ambos os grafos)
+        # Faixas da área de alcance ao fundo, da maior para a menor
+        if self.alcance_atual:
+            for i in reversed(range(len(self.alcance_atual))):
+                poligono = self.alcance_atual[i]['poligono']
+                if poligono:
+                    cor = CORES_ALCANCE[i % len(CORES_ALCANCE)]
+                    self.ax.add_patch(patches.Polygon(poligono, closed=True, facecolor=cor,
+                                                      edgecolor=cor, alpha=0.25, zorder=0))
+        
+        # Ilhas: vértices fora da maior componente, ocultados ou destacados
+        ids = self.vertices.id
+        orig, dest = self.arestas.orig, self.arestas.dest
+        # Com o grafo direcionado, as arestas de mão única ganham setas; sem ele, todas valem nos dois sentidos
+        unica = self.arestas.mao_unica() if self.grafo_direcionado.get() else np.zeros(len(orig), dtype=bool)
+        cores_ilhas = {}
+        if self.ilhas_var.get() == "ocultar":
+            ilhas = self.obter_ilhas()
+            ids = ids[~ilhas[ids]]
+            manter = ~ilhas[orig] & ~ilhas[dest]
+            orig, dest, unica = orig[manter], dest[manter], unica[manter]
+        elif self.ilhas_var.get() == "destacar":
+            ilhas = self.obter_ilhas()
+            rotulos = self.obter_componentes().rotulos()
+            for vid in np.flatnonzero(ilhas).tolist():
+                cores_ilhas[vid] = CORES_ILHAS[rotulos[vid] % len(CORES_ILHAS)]
+        
+        arestas_bidirecionais = list(zip(orig[~unica].tolist(), dest[~unica].tolist()))
+        arestas_unidirecionais = list(zip(orig[unica].tolist(), dest[unica].tolist()))
+        
+        # Grafo sem setas para mão dupla e com setas para mão única
+        G_bidirecional = nx.Graph()
+        G_unidirecional = nx.DiGraph()
+        nos_posicionados = [(vid, {'pos': pos[vid]}) for vid in ids.tolist()]
+        G_bidirecional.add_nodes_from(nos_posicionados)
+        G_unidirecional.add_nodes_from(nos_posicionados)
+        G_bidirecional.add_edges_from(arestas_bidirecionais)
+        G_unidirecional.add_edges_from(arestas_unidirecionais)
+        
+        # Cores dos vértices
         node_colors = []
         for node in G_bidirecional.nodes():
             if caminho:
@@ -692,101 +1123,107 @@ class InterfaceDijkstra:
                 elif node in caminho:
                     node_colors.append('yellow') # Intermediário
                 else:
-                    node_colors.append('lightblue')
+                    node_colors.append(cores_ilhas.get(node, 'lightblue'))
             else:
                 if node == self.vertice_origem:
                     node_colors.append('green')
                 elif node == self.vertice_destino:
                     node_colors.append('red')
                 else:
-                    node_colors.append('lightblue')
+                    node_colors.append(cores_ilhas.get(node, 'lightblue'))
         
-        # Cores das arestas
-        caminho_arestas = self.criar_arestas_caminho(caminho) if caminho else []
+        # Arestas do caminho, em ambos os sentidos para mão dupla
+        caminho_arestas = set(self.criar_arestas_caminho(caminho)) if caminho else set()
         
-        # Desenhar arestas bidirecionais (com setas nos dois sentidos)
+        setas = []
         if len(arestas_bidirecionais) > 0:
-            # Para arestas bidirecionais, usar Graph (sem setas) em vez de DiGraph
-            G_bidirecional_sem_setas = nx.Graph()
-            for v in self.vertices:
-                G_bidirecional_sem_setas.add_node(v.id, pos=pos[v.id])
-            for aresta in arestas_bidirecionais:
-                G_bidirecional_sem_setas.add_edge(aresta.orig, aresta.dest)
-            
             edge_colors_bidirecional = []
-            edges_bidirecionais_list = list(G_bidirecional_sem_setas.edges())
-            
-            for edge in edges_bidirecionais_list:
-                # Verificar se a aresta está no caminho (em qualquer direção)
-                no_caminho = False
-                if caminho:
-                    for caminho_edge in caminho_arestas:
-                        if (edge[0] == caminho_edge[0] and edge[1] == caminho_edge[1]) or \
-                           (edge[0] == caminho_edge[1] and edge[1] == caminho_edge[0]):
-                            no_caminho = True
-                            break
-                
-                if no_caminho:
-                    edge_colors_bidirecional.append('red')
-                else:
-                    edge_colors_bidirecional.append('black')  # Cor preta para mão dupla
-            
-            # Verificar se temos cores para todas as arestas
-            if len(edge_colors_bidirecional) == len(edges_bidirecionais_list):
-                nx.draw(G_bidirecional_sem_setas, pos, ax=self.ax,
-                        node_color=node_colors,
-                        edge_color=edge_colors_bidirecional,
-                        with_labels=self.mostrar_numeracao_var.get(),
-                        node_size=self.tamanho_vertices,
-                        font_size=self.tamanho_fonte_vertices,
-                        font_weight='bold',
-                        width=1.5,  # Linha mais fina para mão dupla
-                        arrows=False)  # Sem setas para arestas bidirecionais
-        
-        # Desenhar arestas unidirecionais (com setas)
+            for edge in G_bidirecional.edges():
+                no_caminho = (edge[0], edge[1]) in caminho_arestas or (edge[1], edge[0]) in caminho_arestas
+                edge_colors_bidirecional.append('red' if no_caminho else 'black')  # Cor preta para mão dupla
+            nx.draw_networkx_edges(G_bidirecional, pos, ax=self.ax,
+                                   edge_color=edge_colors_bidirecional,
+                                   node_size=self.tamanho_vertices,
+                                   width=1.5,  # Linha mais fina para mão dupla
+                                   arrows=False)  # Sem setas para arestas bidirecionais
+        
         if len(arestas_unidirecionais) > 0:
             edge_colors_unidirecional = []
-            edges_unidirecionais_list = list(G_unidirecional.edges())
-            
-            for edge in edges_unidirecionais_list:
-                # Verificar se a aresta está no caminho
-                no_caminho = False
-                if caminho:
-                    for caminho_edge in caminho_arestas:
-                        if edge[0] == caminho_edge[0] and edge[1] == caminho_edge[1]:
-                            no_caminho = True
-                            break
-                
-                if no_caminho:
-                    edge_colors_unidirecional.append('red')
-                else:
-                    edge_colors_unidirecional.append('black')
-            
-            # Verificar se temos cores para todas as arestas
-            if len(edge_colors_unidirecional) == len(edges_unidirecionais_list):
-                nx.draw(G_unidirecional, pos, ax=self.ax,
-                        node_color=node_colors,
-                        edge_color=edge_colors_unidirecional,
-                        with_labels=False,  # Não desenhar labels duas vezes
-                        node_size=self.tamanho_vertices,
-                        font_size=self.tamanho_fonte_vertices,
-                        font_weight='bold',
-                        width=2,
-                        arrows=True)  # Com setas para arestas unidirecionais
-        
-        # Adicionar rótulos das arestas se checkbox estiver marcado
-        if self.mostrar_rotulos_var.get():
-            edge_labels = {}
-            for aresta in self.arestas:
-                edge_labels[(aresta.orig, aresta.dest)] = f"{aresta.dist:.1f}"
-                if not self.grafo_direcionado.get() and self.tipo_aresta_var.get() == "mão dupla":
-                    edge_labels[(aresta.dest, aresta.orig)] = f"{aresta.dist:.1f}"
-            nx.draw_networkx_edge_labels(G_bidirecional if len(arestas_bidirecionais) > 0 else G_unidirecional, 
-                                        pos, edge_labels=edge_labels, font_size=self.tamanho_fonte_arestas)
+            for edge in G_unidirecional.edges():
+                edge_colors_unidirecional.append('red' if edge in caminho_arestas else 'black')
+            setas = nx.draw_networkx_edges(G_unidirecional, pos, ax=self.ax,
+                                           edge_color=edge_colors_unidirecional,
+                                           node_size=self.tamanho_vertices,
+                                           width=2,
+                                           arrows=True)  # Com setas para arestas unidirecionais
+        
+        # Rotas alternativas em cores distintas, a de menor custo por cima
+        for i in reversed(range(len(self.rotas_alternativas))):
+            rota = self.rotas_alternativas[i]
+            segmentos = [(pos[u], pos[v]) for u, v in zip(rota, rota[1:]) if u in pos and v in pos]
+            self.ax.add_collection(LineCollection(segmentos, colors=CORES_ROTAS[i % len(CORES_ROTAS)][0],
+                                                  linewidths=3, alpha=0.8, zorder=1.5))
+        
+        nos = nx.draw_networkx_nodes(G_bidirecional, pos, ax=self.ax,
+                                     node_color=node_colors,
+                                     node_size=self.tamanho_vertices)
+        self.ax.set_axis_off()
+        
+        # Guardar os artistas para mudanças apenas de estilo
+        self.artistas = {
+            'nos': nos,
+            'setas': setas,
+            'pos': pos,
+            'G_rotulos': G_bidirecional if len(arestas_bidirecionais) > 0 else G_unidirecional,
+            'rotulos_vertices': None,
+            'rotulos_arestas': None,
+        }
+        self.aplicar_estilo(desenhar=False)
         
         self.canvas.draw()
         self.canvas.flush_events()
-        print("Grafo desenhado com sucesso")
+        log.debug("Grafo desenhado com sucesso")
+    
+    def aplicar_estilo(self, desenhar=True):
+        """Atualiza tamanhos, fontes e rótulos dos artistas já desenhados, sem refazer o layout"""
+        artistas = self.artistas
+        if not artistas:
+            return
+        
+        artistas['nos'].set_sizes([self.tamanho_vertices])
+        # As setas recuam até a borda do marcador do vértice
+        recuo = math.sqrt(self.tamanho_vertices) / 2
+        for seta in artistas['setas']:
+            seta.shrinkA = recuo
+            seta.shrinkB = recuo
+        
+        # Numeração dos vértices, criada apenas na primeira vez em que é exibida
+        if self.mostrar_numeracao_var.get() and artistas['rotulos_vertices'] is None:
+            artistas['rotulos_vertices'] = nx.draw_networkx_labels(
+                artistas['G_rotulos'], artistas['pos'], ax=self.ax,
+                font_size=self.tamanho_fonte_vertices, font_weight='bold')
+        for texto in (artistas['rotulos_vertices'] or {}).values():
+            texto.set_visible(self.mostrar_numeracao_var.get())
+            texto.set_fontsize(self.tamanho_fonte_vertices)
+        
+        # Rótulos das arestas
+        if self.mostrar_rotulos_var.get() and artistas['rotulos_arestas'] is None:
+            edge_labels = {}
+            direcionado = self.grafo_direcionado.get()
+            for orig, dest, dist, unica in zip(self.arestas.orig.tolist(), self.arestas.dest.tolist(),
+                                               self.arestas.dist.tolist(), self.arestas.mao_unica().tolist()):
+                edge_labels[(orig, dest)] = f"{dist:.1f}"
+                if not (direcionado and unica):
+                    edge_labels[(dest, orig)] = f"{dist:.1f}"
+            artistas['rotulos_arestas'] = nx.draw_networkx_edge_labels(
+                artistas['G_rotulos'], artistas['pos'], ax=self.ax,
+                edge_labels=edge_labels, font_size=self.tamanho_fonte_arestas)
+        for texto in (artistas['rotulos_arestas'] or {}).values():
+            texto.set_visible(self.mostrar_rotulos_var.get())
+            texto.set_fontsize(self.tamanho_fonte_arestas)
+        
+        if desenhar:
+            self.canvas.draw_idle()
     
     def criar_arestas_caminho(self, caminho):
         """Cria lista de arestas do caminho"""
@@ -807,9 +1244,9 @@ class InterfaceDijkstra:
         if self.vertice_origem is not None and self.vertice_destino is not None:
             origem_id = self.vertice_origem
             destino_id = self.vertice_destino
-            print(f"Usando vértices selecionados por clique: {origem_id} -> {destino_id}")
+            log.debug("Usando vértices selecionados por clique: %s -> %s", origem_id, destino_id)
         else:
-            # Usar comboboxes como fallback
+            # Usar seletores como fallback
             origem_str = self.origem_var.get()
             destino_str = self.destino_var.get()
             
@@ -821,17 +1258,146 @@ class InterfaceDijkstra:
             origem_id = int(origem_str.split()[0])
             destino_id = int(destino_str.split()[0])
         
-        print(f"Calculando caminho de {origem_id} para {destino_id}")
+        log.info("Calculando caminho de %s para %s", origem_id, destino_id)
         
-        # Executar Dijkstra
-        caminho, distancia, estatisticas = self.dijkstra(origem_id, destino_id)
-        
-        print(f"Caminho encontrado: {caminho}")
-        print(f"Distância: {distancia}")
+        # Executar Dijkstra em segundo plano
+        self.iniciar_busca(origem_id, destino_id)
+    
+    def iniciar_busca(self, origem_id, destino_id):
+        """Dispara o Dijkstra em uma thread de trabalho, cancelando a busca anterior"""
+        if not self.obter_componentes().alcancavel(origem_id, destino_id):
+            # Componentes distintas: sem caminho, e sem busca
+            self.cancelar_busca()
+            log.info("Sem caminho de %s para %s (componentes distintas)", origem_id, destino_id)
+            self.lbl_status_busca.config(text="Status: concluída (componentes distintas)")
+            self.exibir_resultado_busca(*resposta_sem_caminho())
+            return
+        if self.usar_conversoes_var.get():
+            funcao = dijkstra_conversoes
+            argumentos = (self.obter_csr(), origem_id, destino_id, self.obter_conversoes())
+        elif self.usar_celulas_var.get():
+            funcao, argumentos = SobreposicaoCRP.rota, (self.obter_celulas(), origem_id, destino_id)
+        elif self.metrica_var.get() == METRICA_PADRAO and self.matriz_direcionada == self.grafo_direcionado.get():
+            # A matriz de adjacência já tem os comprimentos euclidianos (se foi montada com o tipo atual)
+            funcao, argumentos = dijkstra_matriz, (self.matrizAdj, origem_id, destino_id)
+        else:
+            funcao, argumentos = dijkstra_csr, (self.obter_csr(), origem_id, destino_id)
+        if self.exportador_rastros is not None:
+            funcao = self.exportador_rastros.envolver(funcao)
+        self.disparar_busca(funcao, argumentos, lambda resultado: self.exibir_resultado_busca(*resultado))
+    
+    def disparar_busca(self, funcao, argumentos, ao_concluir):
+        """Executa funcao(*argumentos) em uma thread de trabalho e entrega o resultado a `ao_concluir`
+
+        A função recebe também `cancelado` e `progresso` como argumentos nomeados.
+        """
+        self.cancelar_busca()
+        self.contador_buscas += 1
+        id_busca = self.contador_buscas
+        cancelado = threading.Event()
+        self.busca_atual = (id_busca, cancelado, ao_concluir)
+        
+        self.lbl_status_busca.config(text="Status: buscando...")
+        self.lbl_nos_explorados.config(text="Nós explorados: 0")
+        self.btn_cancelar_busca.config(state="normal")
+        
+        thread = threading.Thread(target=self.executar_busca,
+                                  args=(id_busca, cancelado, funcao, argumentos),
+                                  daemon=True)
+        thread.start()
+        
+        # Consultar a fila de mensagens periodicamente pelo loop do Tk
+        if not self.consultando_fila:
+            self.consultando_fila = True
+            self.root.after(50, self.processar_fila_busca)
+    
+    def executar_busca(self, id_busca, cancelado, funcao, argumentos):
+        """Executa a busca fora da thread do Tk e envia o resultado pela fila"""
+        def progresso(nos_explorados):
+            self.fila_busca.put(('progresso', id_busca, nos_explorados))
+        with cronometrar(log, 'consulta', motor=getattr(funcao, '__name__', 'busca')) as campos:
+            try:
+                resultado = funcao(*argumentos, cancelado=cancelado, progresso=progresso)
+            except BuscaCancelada:
+                campos['status'] = 'cancelada'
+                self.fila_busca.put(('cancelada', id_busca, None))
+                return
+            except Exception as e:
+                campos['status'] = 'erro'
+                log.exception("Erro na busca")
+                self.fila_busca.put(('erro', id_busca, e))
+                return
+            campos['status'] = 'concluida'
+        self.fila_busca.put(('resultado', id_busca, resultado))
+    
+    def processar_fila_busca(self):
+        """Aplica na interface as mensagens enviadas pela thread de busca"""
+        while True:
+            try:
+                tipo, id_busca, dados = self.fila_busca.get_nowait()
+            except queue.Empty:
+                break
+            # Ignorar mensagens de buscas que já foram canceladas ou substituídas
+            if self.busca_atual is None or id_busca != self.busca_atual[0]:
+                continue
+            if tipo == 'progresso':
+                self.lbl_nos_explorados.config(text=f"Nós explorados: {dados}")
+            elif tipo == 'resultado':
+                ao_concluir = self.busca_atual[2]
+                self.finalizar_busca("concluída")
+                ao_concluir(dados)
+            elif tipo == 'erro':
+                self.finalizar_busca("erro")
+                messagebox.showerror("Erro", f"Erro ao calcular caminho: {str(dados)}")
+            elif tipo == 'cancelada':
+                self.finalizar_busca("cancelada")
+        
+        if self.busca_atual is not None:
+            self.root.after(50, self.processar_fila_busca)
+        else:
+            self.consultando_fila = False
+    
+    def finalizar_busca(self, status):
+        """Marca a busca atual como encerrada"""
+        self.busca_atual = None
+        self.btn_cancelar_busca.config(state="disabled")
+        self.lbl_status_busca.config(text=f"Status: {status}")
+    
+    def cancelar_busca(self):
+        """Cancela a busca em andamento, se houver"""
+        if self.busca_atual is not None:
+            self.busca_atual[1].set()
+            self.finalizar_busca("cancelada")
+    
+    def alternar_rastros(self):
+        """Liga a gravação dos rastros das buscas em um arquivo escolhido, ou a desliga"""
+        if self.exportador_rastros is not None:
+            self.exportador_rastros.fechar()
+            self.exportador_rastros = None
+        if not self.gravar_rastros_var.get():
+            return
+        arquivo = filedialog.asksaveasfilename(title="Gravar rastros das buscas", defaultextension=".jsonl",
+                                               filetypes=[("JSON Lines", "*.jsonl"), ("Todos os arquivos", "*.*")])
+        if not arquivo:
+            self.gravar_rastros_var.set(False)
+            return
+        self.exportador_rastros = ExportadorRastros(arquivo)
+    
+    def mostrar_contadores(self, estatisticas):
+        """Mostra os contadores detalhados do motor de busca, quando houver"""
+        linhas = [f"{rotulo}: {estatisticas[chave]}" for chave, rotulo in ROTULOS_CONTADORES
+                  if chave in estatisticas]
+        if 'bytes_alocados' in estatisticas:
+            linhas.append(f"Memória estimada: {estatisticas['bytes_alocados'] / 1024:.1f} KB")
+        self.lbl_contadores.config(text="\n".join(linhas))
+    
+    def exibir_resultado_busca(self, caminho, distancia, estatisticas):
+        """Mostra o caminho e as estatísticas retornados pelo Dijkstra"""
+        log.debug("Caminho encontrado: %s (distância: %s)", caminho, distancia)
         
+        self.rotas_alternativas = []
         if caminho:
             self.caminho_atual = caminho
-            print("Exibindo grafo com caminho...")
             
             # Atualizar resultados primeiro
             caminho_str = " → ".join(map(str, caminho))
@@ -844,11 +1410,10 @@ class InterfaceDijkstra:
             self.lbl_tempo.config(text=f"Tempo: {estatisticas['tempo_ms']:.2f} ms")
             self.lbl_nos_explorados.config(text=f"Nós explorados: {estatisticas['nos_explorados']}")
             self.lbl_custo_total.config(text=f"Custo total: {estatisticas['custo_total']:.2f}")
+            self.mostrar_contadores(estatisticas)
             
             # Depois exibir o grafo com o caminho
-            self.exibir_grafo(caminho)
-            
-            print("Grafo atualizado com sucesso!")
+            self.agendar_redesenho()
         else:
             messagebox.showinfo("Resultado", "Não há caminho entre os vértices selecionados!")
             
@@ -856,75 +1421,117 @@ class InterfaceDijkstra:
             self.lbl_tempo.config(text=f"Tempo: {estatisticas['tempo_ms']:.2f} ms")
             self.lbl_nos_explorados.config(text=f"Nós explorados: {estatisticas['nos_explorados']}")
             self.lbl_custo_total.config(text=f"Custo total: {estatisticas['custo_total']}")
+            self.mostrar_contadores(estatisticas)
+    
+    def vertice_escolhido(self, vertice_clicado, variavel):
+        """Vértice selecionado por clique ou, na falta dele, pelo seletor"""
+        if vertice_clicado is not None:
+            return vertice_clicado
+        if variavel.get():
+            return int(variavel.get().split()[0])
+        return None
+    
+    def calcular_alternativas(self):
+        """Calcula várias rotas entre origem e destino pelo método escolhido"""
+        if not self.arquivo_carregado:
+            messagebox.showwarning("Aviso", "Carregue um arquivo primeiro!")
+            return
+        origem_id = self.vertice_escolhido(self.vertice_origem, self.origem_var)
+        destino_id = self.vertice_escolhido(self.vertice_destino, self.destino_var)
+        if origem_id is None or destino_id is None or origem_id == destino_id:
+            messagebox.showwarning("Aviso", "Selecione origem e destino diferentes!")
+            return
+        try:
+            k = max(2, min(int(self.k_rotas_var.get()), len(CORES_ROTAS)))
+            sobreposicao = float(self.sobreposicao_var.get())
+        except (ValueError, tk.TclError):
+            messagebox.showwarning("Aviso", "Quantidade ou sobreposição inválida!")
+            return
+        
+        csr = self.obter_csr()
+        if self.metodo_alternativas_var.get() == "penalidade":
+            funcao, argumentos = rotas_alternativas, (csr, origem_id, destino_id, k, sobreposicao)
+        else:
+            funcao, argumentos = k_menores_caminhos, (csr, origem_id, destino_id, k)
+        self.lbl_status_busca.config(text="Status: buscando alternativas...")
+        self.disparar_busca(funcao, argumentos, self.exibir_resultado_alternativas)
+    
+    def exibir_resultado_alternativas(self, resultado):
+        """Desenha as rotas em cores distintas e lista cada uma com seu custo"""
+        rotas, estatisticas = resultado
+        self.lbl_tempo.config(text=f"Tempo: {estatisticas['tempo_ms']:.2f} ms")
+        self.lbl_nos_explorados.config(text=f"Nós explorados: {estatisticas['nos_explorados']}")
+        self.mostrar_contadores(estatisticas)
+        if not rotas:
+            messagebox.showinfo("Resultado", "Não há caminho entre os vértices selecionados!")
+            return
+        self.caminho_atual = rotas[0]['caminho']
+        self.rotas_alternativas = [rota['caminho'] for rota in rotas]
+        self.lbl_custo_total.config(text=f"Custo total: {rotas[0]['custo']:.2f}")
+        
+        linhas = []
+        for i, rota in enumerate(rotas):
+            nome_cor = CORES_ROTAS[i % len(CORES_ROTAS)][1]
+            linhas.append(f"Rota {i + 1} ({nome_cor}, custo {rota['custo']:.2f}): "
+                          + " → ".join(map(str, rota['caminho'])))
+        self.text_caminho.config(state=tk.NORMAL)
+        self.text_caminho.delete(1.0, tk.END)
+        self.text_caminho.insert(tk.END, "\n\n".join(linhas))
+        self.text_caminho.config(state=tk.DISABLED)
+        self.agendar_redesenho()
+    
+    def calcular_alcance(self):
+        """Calcula as faixas de distância alcançáveis a partir da origem em uma única busca"""
+        if not self.arquivo_carregado:
+            messagebox.showwarning("Aviso", "Carregue um arquivo primeiro!")
+            return
+        origem_id = self.vertice_escolhido(self.vertice_origem, self.origem_var)
+        if origem_id is None:
+            messagebox.showwarning("Aviso", "Selecione a origem!")
+            return
+        try:
+            orcamentos = [float(parte) for parte in self.orcamentos_var.get().replace(';', ',').split(',')
+                          if parte.strip()]
+        except ValueError:
+            orcamentos = []
+        if not orcamentos or min(orcamentos) <= 0:
+            messagebox.showwarning("Aviso", "Informe distâncias positivas separadas por vírgula!")
+            return
+        
+        # Contornos calculados direto nas posições normalizadas do desenho
+        csr = self.obter_csr()
+        pos = self.get_normalized_positions()
+        x = [0.0] * csr.totalVertices
+        y = [0.0] * csr.totalVertices
+        for vertice_id, (px, py) in pos.items():
+            x[vertice_id], y[vertice_id] = px, py
+        
+        self.lbl_status_busca.config(text="Status: calculando alcance...")
+        self.disparar_busca(calcular_isocronas, (csr, origem_id, orcamentos, x, y),
+                            self.exibir_resultado_alcance)
+    
+    def exibir_resultado_alcance(self, resultado):
+        """Desenha as faixas da área de alcance e mostra quantos vértices cada uma cobre"""
+        self.alcance_atual = resultado['faixas']
+        estatisticas = resultado['estatisticas']
+        self.lbl_tempo.config(text=f"Tempo: {estatisticas['tempo_ms']:.2f} ms")
+        self.lbl_nos_explorados.config(text=f"Nós explorados: {estatisticas['nos_explorados']}")
+        self.mostrar_contadores(estatisticas)
+        self.lbl_alcance.config(text="\n".join(
+            f"até {faixa['orcamento']:g}: {len(faixa['vertices'])} vértices" for faixa in self.alcance_atual))
+        self.agendar_redesenho()
     
     def dijkstra(self, inicio, fim):
         """Implementação do algoritmo de Dijkstra com estatísticas"""
-        import time
-        
-        # Iniciar cronômetro
-        tempo_inicio = time.time()
-        
-        dist = [INF] * self.totalVertices
-        prev = [-1] * self.totalVertices
-        visited = [False] * self.totalVertices
-        
-        dist[inicio] = 0
-        nos_explorados = 0
-        
-        for _ in range(self.totalVertices):
-            # Encontrar vértice não visitado com menor distância
-            u = -1
-            min_dist = INF
-            for j in range(self.totalVertices):
-                if not visited[j] and dist[j] < min_dist:
-                    u = j
-                    min_dist = dist[j]
-            
-            if u == -1:
-                break
-            
-            visited[u] = True
-            nos_explorados += 1
-            
-            # Atualizar distâncias dos vizinhos
-            for v in range(self.totalVertices):
-                if (self.matrizAdj[u][v] < INF and 
-                    dist[u] + self.matrizAdj[u][v] < dist[v]):
-                    dist[v] = dist[u] + self.matrizAdj[u][v]
-                    prev[v] = u
-        
-        # Calcular tempo de processamento
-        tempo_fim = time.time()
-        tempo_processamento = (tempo_fim - tempo_inicio) * 1000  # Converter para milissegundos
-        
-        if dist[fim] == INF:
-            return None, INF, {
-                'tempo_ms': tempo_processamento,
-                'nos_explorados': nos_explorados,
-                'custo_total': INF
-            }
-        
-        # Reconstruir caminho
-        path = []
-        v = fim
-        while v != -1:
-            path.append(v)
-            v = prev[v]
-        
-        caminho_final = list(reversed(path))
-        custo_total = dist[fim]
-        
-        estatisticas = {
-            'tempo_ms': tempo_processamento,
-            'nos_explorados': nos_explorados,
-            'custo_total': custo_total
-        }
-        
-        return caminho_final, custo_total, estatisticas
+        return dijkstra_matriz(self.matrizAdj, inicio, fim)
     
     def limpar_caminho(self):
         """Limpa o caminho atual e as seleções de vértices"""
+        self.cancelar_busca()
         self.caminho_atual = []
+        self.alcance_atual = None
+        self.rotas_alternativas = []
+        self.lbl_alcance.config(text="")
         self.vertice_origem = None
         self.vertice_destino = None
         
@@ -932,12 +1539,12 @@ class InterfaceDijkstra:
         self.lbl_origem_selecionada.config(text="Origem: Nenhuma")
         self.lbl_destino_selecionado.config(text="Destino: Nenhum")
         
-        # Limpar comboboxes
+        # Limpar seletores
         if self.vertices:
             self.origem_var.set("")
             self.destino_var.set("")
         
-        self.exibir_grafo()
+        self.agendar_redesenho()
         self.text_caminho.config(state=tk.NORMAL)
         self.text_caminho.delete(1.0, tk.END)
         self.text_caminho.config(state=tk.DISABLED)
@@ -946,19 +1553,19 @@ class InterfaceDijkstra:
         self.lbl_tempo.config(text="Tempo: -")
         self.lbl_nos_explorados.config(text="Nós explorados: -")
         self.lbl_custo_total.config(text="Custo total: -")
+        self.lbl_contadores.config(text="")
     
     def on_click(self, event):
-        print(f"Clique detectado: x={event.xdata}, y={event.ydata}")
+        log.debug("Clique detectado: x=%s, y=%s", event.xdata, event.ydata)
         if event.inaxes != self.ax:
-            print("Clique fora do gráfico")
+            log.debug("Clique fora do gráfico")
             return
         
         x, y = event.xdata, event.ydata
-        print(f"Coordenadas do clique: ({x}, {y})")
         
         # Verificar se há um arquivo carregado ou se estamos no modo de adicionar vértice
         if not self.arquivo_carregado and self.modo_edicao != "adicionar_vertice":
-            print("Arquivo não carregado e não no modo de adicionar vértice")
+            log.debug("Arquivo não carregado e não no modo de adicionar vértice")
             return
         
         # Lidar com diferentes modos de edição
@@ -993,22 +1600,20 @@ class InterfaceDijkstra:
         x_norm = norm(x, 0, 1)
         y_norm = norm(y, 0, 1)
             
-        vertice_clicado = self.encontrar_vertice_proximo_normalizado(x_norm, y_norm)
-        print(f"Vértice encontrado: {vertice_clicado}")
+        vertice_clicado = self.encontrar_vertice_proximo_normalizado(x_norm, y_norm, filtro=self.vertice_visivel)
+        log.debug("Vértice encontrado: %s", vertice_clicado)
         if vertice_clicado is not None:
             self.selecionar_vertice(vertice_clicado)
         else:
-            print("Nenhum vértice próximo encontrado")
+            log.debug("Nenhum vértice próximo encontrado")
     
     def on_click_adicionar_vertice(self, x, y):
         """Manipula cliques para adicionar vértices"""
         # Normalizar coordenadas do clique para o sistema de coordenadas dos vértices
         if self.vertices:
             # Encontrar os limites atuais dos vértices
-            min_x = min(v.x for v in self.vertices)
-            max_x = max(v.x for v in self.vertices)
-            min_y = min(v.y for v in self.vertices)
-            max_y = max(v.y for v in self.vertices)
+            min_x, max_x = float(self.vertices.x.min()), float(self.vertices.x.max())
+            min_y, max_y = float(self.vertices.y.min()), float(self.vertices.y.max())
             
             # Converter coordenadas do matplotlib para coordenadas reais dos vértices
             # O matplotlib pode estar usando um sistema de coordenadas diferente
@@ -1026,7 +1631,7 @@ class InterfaceDijkstra:
             x_real = x
             y_real = y
         
-        print(f"Adicionando vértice em coordenadas reais: ({x_real:.2f}, {y_real:.2f})")
+        log.debug("Adicionando vértice em coordenadas reais: (%.2f, %.2f)", x_real, y_real)
         self.adicionar_vertice(x_real, y_real)
     
     def on_click_adicionar_aresta(self, x, y):
@@ -1054,16 +1659,16 @@ class InterfaceDijkstra:
             if self.vertice_temporario is None:
                 # Primeiro clique - selecionar primeiro vértice
                 self.vertice_temporario = vertice_clicado
-                print(f"Primeiro vértice selecionado: {vertice_clicado}")
+                log.debug("Primeiro vértice selecionado: %s", vertice_clicado)
                 # Destacar o vértice temporariamente
-                self.exibir_grafo()
+                self.agendar_redesenho()
             else:
                 # Segundo clique - adicionar aresta
                 if self.vertice_temporario != vertice_clicado:
                     self.adicionar_aresta(self.vertice_temporario, vertice_clicado)
                 self.vertice_temporario = None
         else:
-            print("Nenhum vértice próximo encontrado")
+            log.debug("Nenhum vértice próximo encontrado")
     
     def on_click_remover_vertice(self, x, y):
         """Manipula cliques para remover vértices"""
@@ -1089,7 +1694,7 @@ class InterfaceDijkstra:
             if resposta:
                 self.remover_vertice(vertice_clicado)
         else:
-            print("Nenhum vértice próximo encontrado")
+            log.debug("Nenhum vértice próximo encontrado")
     
     def on_click_remover_aresta(self, x, y):
         """Manipula cliques para remover arestas"""
@@ -1116,85 +1721,71 @@ class InterfaceDijkstra:
             if resposta:
                 self.remover_aresta(aresta_proxima[0], aresta_proxima[1])
         else:
-            print("Nenhuma aresta próxima encontrada")
+            log.debug("Nenhuma aresta próxima encontrada")
     
     def encontrar_aresta_proxima(self, x, y, raio=0.05):
         """Encontra a aresta mais próxima das coordenadas do clique"""
         if not self.arestas:
             return None
             
-        pos = self.get_normalized_positions()
-        aresta_mais_proxima = None
-        menor_distancia = float('inf')
-        
-        for aresta in self.arestas:
-            # Obter posições dos vértices da aresta
-            v1_pos = pos.get(aresta.orig)
-            v2_pos = pos.get(aresta.dest)
-            
-            if v1_pos and v2_pos:
-                # Calcular ponto médio da aresta
-                meio_x = (v1_pos[0] + v2_pos[0]) / 2
-                meio_y = (v1_pos[1] + v2_pos[1]) / 2
-                
-                # Calcular distância do clique ao ponto médio
-                distancia = math.sqrt((x - meio_x)**2 + (y - meio_y)**2)
-                
-                if distancia < menor_distancia and distancia < raio:
-                    menor_distancia = distancia
-                    aresta_mais_proxima = (aresta.orig, aresta.dest)
-        
-        return aresta_mais_proxima
+        # Distância do clique ao ponto médio de cada aresta, nas posições normalizadas
+        xs, ys = normalizar_colunas(self.vertices)
+        linha_orig = self.vertices.linhas(self.arestas.orig)
+        linha_dest = self.vertices.linhas(self.arestas.dest)
+        meio_x = (xs[linha_orig] + xs[linha_dest]) / 2
+        meio_y = (ys[linha_orig] + ys[linha_dest]) / 2
+        distancias = np.sqrt((x - meio_x)**2 + (y - meio_y)**2)
+        distancias[(linha_orig < 0) | (linha_dest < 0)] = INF
+        
+        mais_proxima = int(np.argmin(distancias))
+        if distancias[mais_proxima] >= raio:
+            return None
+        return (int(self.arestas.orig[mais_proxima]), int(self.arestas.dest[mais_proxima]))
     
-    def encontrar_vertice_proximo_normalizado(self, x, y, raio=0.05):
+    def encontrar_vertice_proximo_normalizado(self, x, y, raio=0.05, filtro=None):
         """Encontra o vértice mais próximo das coordenadas do clique, usando posições normalizadas"""
         pos = self.get_normalized_positions()
         vertice_mais_proximo = None
         menor_distancia = float('inf')
         for vid, (vx, vy) in pos.items():
+            if filtro is not None and not filtro(vid):
+                continue
             distancia = math.sqrt((x - vx)**2 + (y - vy)**2)
-            print(f"Vértice {vid} em ({vx}, {vy}) - distância: {distancia}")
             if distancia < menor_distancia and distancia < raio:
                 menor_distancia = distancia
                 vertice_mais_proximo = vid
-                print(f"Novo vértice mais próximo: {vertice_mais_proximo} (distância: {distancia})")
         return vertice_mais_proximo
     
     def selecionar_vertice(self, vertice_id):
         """Seleciona um vértice como origem ou destino"""
-        print(f"Selecionando vértice: {vertice_id}")
+        log.debug("Selecionando vértice: %s", vertice_id)
         
         if self.vertice_origem is None:
             # Primeiro clique - selecionar origem
             self.vertice_origem = vertice_id
             self.lbl_origem_selecionada.config(text=f"Origem: {vertice_id}")
             
-            # Atualizar combobox
-            for i, vertice in enumerate(self.vertices):
-                if vertice.id == vertice_id:
-                    self.origem_var.set(f"{vertice.id} ({vertice.x:.1f}, {vertice.y:.1f})")
-                    break
+            # Atualizar seletor
+            self.seletor_origem.definir(vertice_id)
             
-            print(f"Vértice {vertice_id} selecionado como origem")
+            log.info("Vértice %s selecionado como origem", vertice_id)
             
         elif self.vertice_destino is None and vertice_id != self.vertice_origem:
             # Segundo clique - selecionar destino
             self.vertice_destino = vertice_id
             self.lbl_destino_selecionado.config(text=f"Destino: {vertice_id}")
             
-            # Atualizar combobox
-            for i, vertice in enumerate(self.vertices):
-                if vertice.id == vertice_id:
-                    self.destino_var.set(f"{vertice.id} ({vertice.x:.1f}, {vertice.y:.1f})")
-                    break
+            # Atualizar seletor
+            self.seletor_destino.definir(vertice_id)
             
-            print(f"Vértice {vertice_id} selecionado como destino")
+            log.info("Vértice %s selecionado como destino", vertice_id)
             
             # Pequeno delay para evitar conflitos
             self.root.after(100, self.calcular_caminho_automatico)
             
         else:
             # Resetar seleção - novo vértice vira origem
+            self.cancelar_busca()
             self.vertice_origem = vertice_id
             self.vertice_destino = None
             self.lbl_origem_selecionada.config(text=f"Origem: {vertice_id}")
@@ -1202,24 +1793,22 @@ class InterfaceDijkstra:
             
             # Limpar caminho anterior
             self.caminho_atual = []
+            self.rotas_alternativas = []
             self.text_caminho.config(state=tk.NORMAL)
             self.text_caminho.delete(1.0, tk.END)
             self.text_caminho.config(state=tk.DISABLED)
             
-            # Atualizar combobox
-            for i, vertice in enumerate(self.vertices):
-                if vertice.id == vertice_id:
-                    self.origem_var.set(f"{vertice.id} ({vertice.x:.1f}, {vertice.y:.1f})")
-                    break
+            # Atualizar seletor
+            self.seletor_origem.definir(vertice_id)
             
-            print(f"Nova origem selecionada: {vertice_id}")
+            log.info("Nova origem selecionada: %s", vertice_id)
             
             # Atualizar visualização sem caminho
-            self.exibir_grafo()
+            self.agendar_redesenho()
     
     def calcular_caminho_automatico(self):
         """Função separada para calcular caminho automaticamente"""
-        print("Calculando caminho automaticamente...")
+        log.debug("Calculando caminho automaticamente...")
         self.calcular_caminho()
     
     def definir_modo(self, modo):
@@ -1254,19 +1843,28 @@ class InterfaceDijkstra:
         elif modo == "remover_aresta":
             self.btn_remover_aresta.config(style='Accent.TButton')
         
-        print(f"Modo alterado para: {modo}")
+        log.info("Modo alterado para: %s", modo)
     
     def adicionar_vertice(self, x, y):
         """Adiciona um novo vértice na posição especificada"""
+        self.cancelar_busca()
         # Encontrar próximo ID disponível
         if self.vertices:
-            self.proximo_id_vertice = max(v.id for v in self.vertices) + 1
+            self.proximo_id_vertice = int(self.vertices.id.max()) + 1
         else:
             self.proximo_id_vertice = 0
         
         # Criar novo vértice
         novo_vertice = Vertices(self.proximo_id_vertice, x, y)
         self.vertices.append(novo_vertice)
+        self.posicoes_cache = None
+        self.grafo_modificado([])
+        self.registrar_edicao(self.historico.atual.com_vertice(novo_vertice.id, x, y))
+        self.indice_vertices.adicionar(novo_vertice)
+        if self.componentes is not None:
+            self.componentes.adicionar_vertice(novo_vertice.id)
+        self.seletor_origem.nova_busca()
+        self.seletor_destino.nova_busca()
         self.totalVertices += 1
         
         # Marcar como arquivo carregado se for o primeiro vértice
@@ -1279,78 +1877,207 @@ class InterfaceDijkstra:
         self.matrizAdj.append([INF] * self.totalVertices)
         self.matrizAdj[self.proximo_id_vertice][self.proximo_id_vertice] = 0
         
-        print(f"Vértice {self.proximo_id_vertice} adicionado em ({x:.2f}, {y:.2f})")
+        log.info("Vértice %s adicionado em (%.2f, %.2f)", self.proximo_id_vertice, x, y)
         self.atualizar_interface()
-        self.exibir_grafo()
     
     def remover_vertice(self, vertice_id):
         """Remove um vértice e suas arestas"""
+        self.cancelar_busca()
         if vertice_id >= len(self.vertices):
             return
         
-        # Remover vértice da lista
-        self.vertices = [v for v in self.vertices if v.id != vertice_id]
+        # Remover vértice da tabela
+        self.vertices.remover(self.vertices.id == vertice_id)
+        self.registrar_edicao(self.historico.atual.sem_vertice(vertice_id))
+        self.nomes_removidos[vertice_id] = self.indice_vertices.nomes.get(vertice_id)
+        self.indice_vertices.remover(vertice_id)
+        self.seletor_origem.nova_busca()
+        self.seletor_destino.nova_busca()
+        for variavel in (self.origem_var, self.destino_var):
+            if variavel.get().split(" ", 1)[0] == str(vertice_id):
+                variavel.set("")
         self.totalVertices -= 1
         
         # Remover arestas relacionadas
-        self.arestas = [a for a in self.arestas if a.orig != vertice_id and a.dest != vertice_id]
+        incidentes = (self.arestas.orig == vertice_id) | (self.arestas.dest == vertice_id)
+        alteradas = list(zip(self.arestas.orig[incidentes].tolist(), self.arestas.dest[incidentes].tolist()))
+        self.arestas.remover(incidentes)
         
         # Reconstruir matriz de adjacência
-        self.construir_grafo()
+        self.construir_grafo(alteradas)
         
-        print(f"Vértice {vertice_id} removido")
+        log.info("Vértice %s removido", vertice_id)
         self.atualizar_interface()
-        self.exibir_grafo()
     
     def adicionar_aresta(self, vertice1_id, vertice2_id):
         """Adiciona uma aresta entre dois vértices"""
         if vertice1_id == vertice2_id:
             return
-        v1 = next((v for v in self.vertices if v.id == vertice1_id), None)
-        v2 = next((v for v in self.vertices if v.id == vertice2_id), None)
+        v1 = self.vertices.por_id(vertice1_id)
+        v2 = self.vertices.por_id(vertice2_id)
         if v1 and v2:
             distancia = self.calc_dist(v1.id, v2.id)
-            # O tipo de aresta depende apenas do tipo global do grafo
-            direcionada = self.grafo_direcionado.get() or self.tipo_aresta_var.get() == "mão única"
+            # O sentido é da própria aresta; só conta quando o grafo é tratado como direcionado
+            direcionada = self.tipo_aresta_var.get() == "mão única"
             # Verificar se a aresta já existe
-            aresta_existente = next((a for a in self.arestas 
-                                   if (a.orig == vertice1_id and a.dest == vertice2_id) or
-                                      (a.orig == vertice2_id and a.dest == vertice1_id and not direcionada)), None)
+            aresta_existente = self.arestas.procurar(vertice1_id, vertice2_id, ambos_sentidos=not direcionada) >= 0
             if not aresta_existente:
-                nova_aresta = Arestas(vertice1_id, vertice2_id, distancia)
+                self.cancelar_busca()
+                nova_aresta = Arestas(vertice1_id, vertice2_id, distancia, mao_unica=direcionada)
                 self.arestas.append(nova_aresta)
                 self.totalArestas += 1
+                self.grafo_modificado([(vertice1_id, vertice2_id)])
+                self.registrar_edicao(self.historico.atual.com_aresta(vertice1_id, vertice2_id, distancia,
+                                                                      mao_unica=direcionada))
+                if self.componentes is not None:
+                    self.componentes.adicionar_aresta(vertice1_id, vertice2_id)
+                    if self.componentes.direcionado and not direcionada:
+                        self.componentes.adicionar_aresta(vertice2_id, vertice1_id)
                 # Atualizar matriz de adjacência
                 self.matrizAdj[vertice1_id][vertice2_id] = distancia
-                if not direcionada:
+                if not (self.matriz_direcionada and direcionada):
                     self.matrizAdj[vertice2_id][vertice1_id] = distancia
-                print(f"Aresta adicionada: {vertice1_id} - {vertice2_id} (distância: {distancia:.2f}, {'direcionada' if direcionada else 'não direcionada'})")
+                log.info("Aresta adicionada: %s - %s (distância: %.2f, %s)", vertice1_id, vertice2_id, distancia,
+                         "mão única" if direcionada else "mão dupla")
                 self.atualizar_interface()
-                self.exibir_grafo()
             else:
-                print("Aresta já existe!")
+                log.info("Aresta já existe: %s - %s", vertice1_id, vertice2_id)
         else:
-            print(f"Vértices {vertice1_id} ou {vertice2_id} não encontrados!")
+            log.warning("Vértices %s ou %s não encontrados", vertice1_id, vertice2_id)
     
     def remover_aresta(self, vertice1_id, vertice2_id):
         """Remove uma aresta entre dois vértices"""
         # Encontrar e remover aresta
-        aresta_para_remover = next((a for a in self.arestas 
-                                   if (a.orig == vertice1_id and a.dest == vertice2_id) or
-                                      (a.orig == vertice2_id and a.dest == vertice1_id)), None)
+        aresta_para_remover = self.arestas.procurar(vertice1_id, vertice2_id, ambos_sentidos=True)
         
-        if aresta_para_remover:
-            self.arestas.remove(aresta_para_remover)
+        if aresta_para_remover >= 0:
+            self.cancelar_busca()
+            self.arestas.remover(np.arange(len(self.arestas)) == aresta_para_remover)
             self.totalArestas -= 1
+            self.grafo_modificado([(vertice1_id, vertice2_id)])
+            self.registrar_edicao(self.historico.atual.sem_aresta(vertice1_id, vertice2_id, ambos_sentidos=True))
+            self.componentes = None  # A remoção pode separar componentes
             
             # Atualizar matriz de adjacência
             self.matrizAdj[vertice1_id][vertice2_id] = INF
             self.matrizAdj[vertice2_id][vertice1_id] = INF
             
-            print(f"Aresta removida: {vertice1_id} - {vertice2_id}")
-            self.exibir_grafo()
+            log.info("Aresta removida: %s - %s", vertice1_id, vertice2_id)
+            self.agendar_redesenho()
+        else:
+            log.info("Aresta não encontrada: %s - %s", vertice1_id, vertice2_id)
+    
+    # Versões do grafo (retratos): desfazer, refazer e comparar rotas
+    
+    def iniciar_historico(self):
+        """Torna as tabelas atuais a base das versões; a interface passa a editar uma cópia delas"""
+        retrato = Retrato.do_grafo(self.vertices, self.arestas)
+        self.vertices, self.arestas = retrato.tabelas()
+        self.historico = HistoricoRetratos(retrato)
+        self.retrato_marcado = None
+        self.nomes_removidos = {}
+    
+    def registrar_edicao(self, retrato):
+        """Guarda a versão produzida por uma edição já aplicada às tabelas e à matriz"""
+        self.historico.registrar(retrato)
+        self.atualizar_botoes_historico()
+    
+    def atualizar_botoes_historico(self):
+        self.btn_desfazer.config(state="normal" if self.historico.pode_desfazer() else "disabled")
+        self.btn_refazer.config(state="normal" if self.historico.pode_refazer() else "disabled")
+        self.btn_comparar_versoes.config(state="normal" if self.retrato_marcado is not None else "disabled")
+    
+    def desfazer(self):
+        if self.historico.pode_desfazer():
+            anterior = self.historico.atual
+            self.ir_para_retrato(anterior, self.historico.desfazer())
+    
+    def refazer(self):
+        if self.historico.pode_refazer():
+            anterior = self.historico.atual
+            self.ir_para_retrato(anterior, self.historico.refazer())
+    
+    def ir_para_retrato(self, anterior, retrato):
+        """Troca o grafo exibido pelo de outra versão aplicando só a diferença entre as duas
+        
+        As tabelas saem do retrato; na matriz de adjacência só as posições das
+        arestas que mudaram são reescritas. Se o conjunto de vértices muda, a
+        matriz é refeita, como na remoção de um vértice.
+        """
+        self.cancelar_busca()
+        pares, saem, entram = anterior.diferenca(retrato)
+        self.vertices, self.arestas = retrato.tabelas()
+        self.totalVertices = len(self.vertices)
+        self.totalArestas = len(self.arestas)
+        for vertice_id in saem:
+            self.nomes_removidos[vertice_id] = self.indice_vertices.nomes.get(vertice_id)
+            self.indice_vertices.remover(vertice_id)
+            for variavel in (self.origem_var, self.destino_var):
+                if variavel.get().split(" ", 1)[0] == str(vertice_id):
+                    variavel.set("")
+        for vertice_id, x, y in entram:
+            self.indice_vertices.adicionar(Vertices(vertice_id, x, y), self.nomes_removidos.get(vertice_id))
+        if saem or entram:
+            self.seletor_origem.nova_busca()
+            self.seletor_destino.nova_busca()
+            self.construir_grafo(pares)
         else:
-            print("Aresta não encontrada!")
+            mao_unica = self.arestas.mao_unica()
+            for u, v in pares:
+                for a, b in [(u, v), (v, u)]:
+                    # a -> b existe pela própria aresta ou pela b -> a, se esta vale nos dois sentidos
+                    contraria = self.arestas.procurar(b, a)
+                    existe = self.arestas.procurar(a, b) >= 0 or (
+                        contraria >= 0 and not (self.matriz_direcionada and mao_unica[contraria]))
+                    self.matrizAdj[a][b] = self.calc_dist(a, b) if existe else INF
+            self.grafo_modificado(pares)
+            self.componentes = None
+        log.info("Versão %d de %d (%d arestas e %d vértices mudaram)", self.historico.posicao + 1,
+                 len(self.historico.retratos), len(pares), len(saem) + len(entram))
+        self.atualizar_interface()
+        self.agendar_redesenho()
+    
+    def marcar_versao(self):
+        """Guarda a versão atual para comparar rotas com as edições seguintes"""
+        self.retrato_marcado = self.historico.atual
+        self.lbl_versao.config(text=f"Versão marcada: {self.retrato_marcado.edicoes} alterações sobre o original")
+        self.atualizar_botoes_historico()
+    
+    def comparar_versoes(self):
+        """Calcula a rota entre origem e destino na versão marcada e na atual"""
+        if self.retrato_marcado is None:
+            return
+        origem_id = self.vertice_escolhido(self.vertice_origem, self.origem_var)
+        destino_id = self.vertice_escolhido(self.vertice_destino, self.destino_var)
+        if origem_id is None or destino_id is None or origem_id == destino_id:
+            messagebox.showwarning("Aviso", "Selecione origem e destino diferentes!")
+            return
+        argumentos = ([self.retrato_marcado, self.historico.atual], origem_id, destino_id, self.metrica_var.get(),
+                      self.grafo_direcionado.get())
+        self.lbl_status_busca.config(text="Status: comparando versões...")
+        self.disparar_busca(comparar_retratos, argumentos, self.exibir_comparacao)
+    
+    def exibir_comparacao(self, resultado):
+        """Desenha a rota de cada versão em uma cor e lista os custos"""
+        rotas, estatisticas = resultado
+        self.lbl_tempo.config(text=f"Tempo: {estatisticas['tempo_ms']:.2f} ms")
+        self.lbl_nos_explorados.config(text=f"Nós explorados: {estatisticas['nos_explorados']}")
+        self.mostrar_contadores(estatisticas)
+        self.caminho_atual = rotas[1]['caminho']
+        self.rotas_alternativas = [rota['caminho'] for rota in rotas]
+        linhas = []
+        for i, (nome, rota) in enumerate(zip(("Versão marcada", "Versão atual"), rotas)):
+            nome_cor = CORES_ROTAS[i % len(CORES_ROTAS)][1]
+            if rota['caminho']:
+                linhas.append(f"{nome} ({nome_cor}, custo {rota['custo']:.2f}): "
+                              + " → ".join(map(str, rota['caminho'])))
+            else:
+                linhas.append(f"{nome}: sem caminho")
+        self.text_caminho.config(state=tk.NORMAL)
+        self.text_caminho.delete(1.0, tk.END)
+        self.text_caminho.insert(tk.END, "\n\n".join(linhas))
+        self.text_caminho.config(state=tk.DISABLED)
+        self.agendar_redesenho()
     
     def copiar_imagem_grafo(self):
         """Função para copiar a imagem do grafo para o clipboard"""
@@ -1405,7 +2132,7 @@ class InterfaceDijkstra:
                     
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao copiar imagem: {str(e)}")
-            print(f"Erro ao copiar imagem: {e}")
+            log.exception("Erro ao copiar imagem")
 
     def diminuir_tamanho_vertices(self):
         """Diminui o tamanho dos vértices conforme as regras especificadas"""
@@ -1423,7 +2150,7 @@ class InterfaceDijkstra:
             novo_tamanho = 0
         self.tamanho_vertices = novo_tamanho
         self.lbl_tamanho.config(text=f"Tamanho: {self.tamanho_vertices}")
-        self.exibir_grafo()
+        self.agendar_redesenho(layout=False)
 
     def aumentar_tamanho_vertices(self):
         """Aumenta o tamanho dos vértices conforme as regras especificadas, até o máximo de 100"""
@@ -1439,7 +2166,7 @@ class InterfaceDijkstra:
             novo_tamanho = 100
         self.tamanho_vertices = novo_tamanho
         self.lbl_tamanho.config(text=f"Tamanho: {self.tamanho_vertices}")
-        self.exibir_grafo()
+        self.agendar_redesenho(layout=False)
 
     # NOVO: Funções para controlar tamanho da fonte dos vértices
     def diminuir_tamanho_fonte_vertices(self):
@@ -1447,14 +2174,14 @@ class InterfaceDijkstra:
         if self.tamanho_fonte_vertices > 1:
             self.tamanho_fonte_vertices -= 1
             self.lbl_tamanho_fonte_vertices.config(text=f"Tamanho: {self.tamanho_fonte_vertices}")
-            self.exibir_grafo()
+            self.agendar_redesenho(layout=False)
 
     def aumentar_tamanho_fonte_vertices(self):
         """Aumenta o tamanho da fonte dos vértices"""
         if self.tamanho_fonte_vertices < 20:
             self.tamanho_fonte_vertices += 1
             self.lbl_tamanho_fonte_vertices.config(text=f"Tamanho: {self.tamanho_fonte_vertices}")
-            self.exibir_grafo()
+            self.agendar_redesenho(layout=False)
 
     # NOVO: Funções para controlar tamanho da fonte das arestas
     def diminuir_tamanho_fonte_arestas(self):
@@ -1462,19 +2189,40 @@ class InterfaceDijkstra:
         if self.tamanho_fonte_arestas > 1:
             self.tamanho_fonte_arestas -= 1
             self.lbl_tamanho_fonte_arestas.config(text=f"Tamanho: {self.tamanho_fonte_arestas}")
-            self.exibir_grafo()
+            self.agendar_redesenho(layout=False)
 
     def aumentar_tamanho_fonte_arestas(self):
         """Aumenta o tamanho da fonte das arestas"""
         if self.tamanho_fonte_arestas < 20:
             self.tamanho_fonte_arestas += 1
             self.lbl_tamanho_fonte_arestas.config(text=f"Tamanho: {self.tamanho_fonte_arestas}")
-            self.exibir_grafo()
+            self.agendar_redesenho(layout=False)
 
 def main():
+    configurar_registro()
+    # Modo de linha de comando para roteamento em lote: python dijkstra.py lote ...
+    if len(sys.argv) > 1 and sys.argv[1] == 'lote':
+        from lote import main as main_lote
+        return main_lote(sys.argv[2:])
+    # Serviço HTTP local de rotas: python dijkstra.py servir ...
+    if len(sys.argv) > 1 and sys.argv[1] == 'servir':
+        from servidor import main as main_servidor
+        return main_servidor(sys.argv[2:])
+    # Rótulos de hubs para consultas de distância: python dijkstra.py rotulos ...
+    if len(sys.argv) > 1 and sys.argv[1] == 'rotulos':
+        from rotulos import main as main_rotulos
+        return main_rotulos(sys.argv[2:])
+    # Pontos de interesse mais próximos: python dijkstra.py pois ...
+    if len(sys.argv) > 1 and sys.argv[1] == 'pois':
+        from pois import main as main_pois
+        return main_pois(sys.argv[2:])
+    # Medição de desempenho: python dijkstra.py benchmark ...
+    if len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        from benchmark import main as main_benchmark
+        return main_benchmark(sys.argv[2:])
     root = tk.Tk()
     app = InterfaceDijkstra(root)
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import math
+import numpy as np
+
+def aneis_na_grade(cx, cy, colunas, linhas):
+    """(primeiro, último) anel em torno da célula (cx, cy) que tocam a grade colunas × linhas
+
+    Com a consulta fora da grade, os anéis anteriores ao primeiro são todos
+    vazios; depois do último, nenhum anel tem células da grade.
+    """
+    fora_x = max(-cx, cx - (colunas - 1), 0)
+    fora_y = max(-cy, cy - (linhas - 1), 0)
+    return max(fora_x, fora_y), max(cx, colunas - 1 - cx, cy, linhas - 1 - cy)
+
+class GradeEspacial:
+    """Índice espacial em grade uniforme para encontrar o ponto mais próximo
+
+    Os ids são ordenados pela célula da grade; cada célula guarda apenas o
+    intervalo correspondente nesse vetor ordenado.
+    """
+
+    def __init__(self, ids, x, y, pontos_por_celula=4):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        n = len(self.ids)
+        if n == 0:
+            self.min_x = self.min_y = 0.0
+            self.celula = 1.0
+            self.colunas = 1
+            self.linhas = 1
+            self.celulas = {}
+            return
+        self.min_x, self.min_y = float(self.x.min()), float(self.y.min())
+        largura = max(float(self.x.max()) - self.min_x, 1e-9)
+        altura = max(float(self.y.max()) - self.min_y, 1e-9)
+        # Tamanho da célula para ~pontos_por_celula pontos em média
+        self.celula = max(math.sqrt(largura * altura * pontos_por_celula / n), 1e-9)
+        self.colunas = int(largura / self.celula) + 1
+        self.linhas = int(altura / self.celula) + 1
+
+        chaves = self.chave(self.x, self.y)
+        ordem = np.argsort(chaves, kind='stable')
+        self.ids, self.x, self.y = self.ids[ordem], self.x[ordem], self.y[ordem]
+        chaves_unicas, inicios, contagens = np.unique(chaves[ordem], return_index=True, return_counts=True)
+        self.celulas = {int(c): (int(i), int(i + k)) for c, i, k in zip(chaves_unicas, inicios, contagens)}
+
+    def chave(self, x, y):
+        cx = np.floor((x - self.min_x) / self.celula).astype(np.int64)
+        cy = np.floor((y - self.min_y) / self.celula).astype(np.int64)
+        return cy * self.colunas + cx
+
+    def mais_proximo(self, px, py, raio_max=None):
+        """Retorna (id, distância) do ponto mais próximo, ou (None, inf)"""
+        if not self.celulas or not (math.isfinite(px) and math.isfinite(py)):
+            return None, math.inf
+        cx = math.floor((px - self.min_x) / self.celula)
+        cy = math.floor((py - self.min_y) / self.celula)
+        melhor_id, melhor_dist = None, math.inf
+        # Longe da grade, a busca começa no primeiro anel que a toca, e não na célula da consulta
+        anel, limite_aneis = aneis_na_grade(cx, cy, self.colunas, self.linhas)
+        while anel <= limite_aneis:
+            # Nenhum ponto mais próximo pode estar além deste anel
+            if (anel - 1) * self.celula > melhor_dist:
+                break
+            if raio_max is not None and (anel - 1) * self.celula > raio_max:
+                break
+            for gx, gy in self.celulas_do_anel(cx, cy, anel, self.colunas, self.linhas):
+                intervalo = self.celulas.get(gy * self.colunas + gx)
+                if intervalo is None:
+                    continue
+                i, j = intervalo
+                dist = np.hypot(self.x[i:j] - px, self.y[i:j] - py)
+                k = int(np.argmin(dist))
+                if dist[k] < melhor_dist:
+                    melhor_id, melhor_dist = int(self.ids[i + k]), float(dist[k])
+            anel += 1
+        if raio_max is not None and melhor_dist > raio_max:
+            return None, math.inf
+        return melhor_id, melhor_dist
+
+    @staticmethod
+    def celulas_do_anel(cx, cy, anel, colunas, linhas):
+        """Células do anel em torno de (cx, cy) que ficam dentro da grade colunas × linhas"""
+        if anel == 0:
+            if 0 <= cx < colunas and 0 <= cy < linhas:
+                yield cx, cy
+            return
+        x0, x1 = max(cx - anel, 0), min(cx + anel, colunas - 1)
+        for gy in (cy - anel, cy + anel):
+            if 0 <= gy < linhas:
+                for gx in range(x0, x1 + 1):
+                    yield gx, gy
+        y0, y1 = max(cy - anel + 1, 0), min(cy + anel - 1, linhas - 1)
+        for gx in (cx - anel, cx + anel):
+            if 0 <= gx < colunas:
+                for gy in range(y0, y1 + 1):
+                    yield gx, gy
+
+class GradeSegmentos:
+    """Índice espacial em grade uniforme para encontrar o segmento mais próximo
+
+    Cada segmento é registrado em todas as células da sua caixa envolvente.
+    A consulta percorre anéis de células como na GradeEspacial e projeta o
+    ponto sobre todos os candidatos do anel de uma vez, com NumPy.
+    """
+
+    def __init__(self, x1, y1, x2, y2, segmentos_por_celula=2):
+        self.x1 = np.asarray(x1, dtype=float)
+        self.y1 = np.asarray(y1, dtype=float)
+        self.x2 = np.asarray(x2, dtype=float)
+        self.y2 = np.asarray(y2, dtype=float)
+        n = len(self.x1)
+        self.celulas = {}
+        if n == 0:
+            self.min_x = self.min_y = 0.0
+            self.celula = 1.0
+            self.colunas = 1
+            self.linhas = 1
+            return
+        menor_x, maior_x = np.minimum(self.x1, self.x2), np.maximum(self.x1, self.x2)
+        menor_y, maior_y = np.minimum(self.y1, self.y2), np.maximum(self.y1, self.y2)
+        self.min_x, self.min_y = float(menor_x.min()), float(menor_y.min())
+        largura = max(float(maior_x.max()) - self.min_x, 1e-9)
+        altura = max(float(maior_y.max()) - self.min_y, 1e-9)
+        # Células ao menos do tamanho médio de um segmento, para que cada um ocupe poucas
+        comprimento_medio = float(np.hypot(maior_x - menor_x, maior_y - menor_y).mean())
+        self.celula = max(math.sqrt(largura * altura * segmentos_por_celula / n), comprimento_medio, 1e-9)
+        self.colunas = int(largura / self.celula) + 1
+        self.linhas = int(altura / self.celula) + 1
+
+        cx1 = np.floor((menor_x - self.min_x) / self.celula).astype(np.int64)
+        cx2 = np.floor((maior_x - self.min_x) / self.celula).astype(np.int64)
+        cy1 = np.floor((menor_y - self.min_y) / self.celula).astype(np.int64)
+        cy2 = np.floor((maior_y - self.min_y) / self.celula).astype(np.int64)
+        larguras = cx2 - cx1 + 1
+        ocupadas = larguras * (cy2 - cy1 + 1)
+        # Uma entrada (célula, segmento) para cada célula da caixa envolvente
+        segmentos = np.repeat(np.arange(n, dtype=np.int64), ocupadas)
+        deslocamento = np.arange(len(segmentos)) - np.repeat(np.cumsum(ocupadas) - ocupadas, ocupadas)
+        larguras = np.repeat(larguras, ocupadas)
+        gx = np.repeat(cx1, ocupadas) + deslocamento % larguras
+        gy = np.repeat(cy1, ocupadas) + deslocamento // larguras
+        chaves = gy * self.colunas + gx
+        ordem = np.argsort(chaves, kind='stable')
+        self.membros = segmentos[ordem]
+        chaves_unicas, inicios, contagens = np.unique(chaves[ordem], return_index=True, return_counts=True)
+        self.celulas = {int(c): (int(i), int(i + k)) for c, i, k in zip(chaves_unicas, inicios, contagens)}
+
+    def mais_proximo(self, px, py, raio_max=None):
+        """Retorna (segmento, distância, fração ao longo do segmento), ou (None, inf, None)"""
+        if not self.celulas or not (math.isfinite(px) and math.isfinite(py)):
+            return None, math.inf, None
+        cx = math.floor((px - self.min_x) / self.celula)
+        cy = math.floor((py - self.min_y) / self.celula)
+        melhor, melhor_dist, melhor_fracao = None, math.inf, None
+        # Longe da grade, a busca começa no primeiro anel que a toca, e não na célula da consulta
+        anel, limite_aneis = aneis_na_grade(cx, cy, self.colunas, self.linhas)
+        while anel <= limite_aneis:
+            # Nenhum segmento mais próximo pode estar além deste anel
+            if (anel - 1) * self.celula > melhor_dist:
+                break
+            if raio_max is not None and (anel - 1) * self.celula > raio_max:
+                break
+            intervalos = [self.celulas.get(gy * self.colunas + gx)
+                          for gx, gy in GradeEspacial.celulas_do_anel(cx, cy, anel, self.colunas, self.linhas)]
+            candidatos = [self.membros[i:j] for i, j in filter(None, intervalos)]
+            if candidatos:
+                s = np.concatenate(candidatos)
+                dx = self.x2[s] - self.x1[s]
+                dy = self.y2[s] - self.y1[s]
+                comprimento2 = dx * dx + dy * dy
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    t = ((px - self.x1[s]) * dx + (py - self.y1[s]) * dy) / comprimento2
+                t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+                dist = np.hypot(self.x1[s] + t * dx - px, self.y1[s] + t * dy - py)
+                k = int(np.argmin(dist))
+                if dist[k] < melhor_dist:
+                    melhor, melhor_dist, melhor_fracao = int(s[k]), float(dist[k]), float(t[k])
+            anel += 1
+        if raio_max is not None and melhor_dist > raio_max:
+            return None, math.inf, None
+        return melhor, melhor_dist, melhor_fracao
@@ -0,0 +1,844 @@
+import json
+import os
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import chain
+import xml.etree.ElementTree as ET
+import numpy as np
+from busca import INF
+from colunas import FLAG_MAO_UNICA, FLAG_VELOCIDADE, TabelaVertices, TabelaArestas
+from componentes import IndiceComponentes
+from conversoes import TabelaConversoes, vizinhos_na_via
+from indice_vertices import IndiceVertices
+from metricas import METRICAS, METRICA_PADRAO, VELOCIDADE_PADRAO_KMH, velocidade_via
+from pois import TAGS_POI, IndicePOI
+from registro import obter_logger, registrar_fase
+
+log = obter_logger('grafo')
+
+# Parâmetros da zona UTM 23S (baseado no código C)
+A = 6378137.0            # Semi-eixo maior WGS84
+F = 1.0 / 298.257223563  # Achatamento
+K0 = 0.9996
+LON0_DEG = -45.0         # longitude central da zona 23S
+PI = 3.14159265358979323846
+
+# Fases do carregamento, na ordem em que são executadas
+FASES_CARREGAMENTO = ['leitura', 'interpretacao', 'projecao', 'adjacencia', 'preprocessamento']
+
+TAMANHO_BLOCO_LEITURA = 1 << 20  # 1 MiB por bloco lido/interpretado
+
+TAGS_VIA = ('highway', 'maxspeed', 'surface')  # Tags das vias usadas nas métricas de peso
+TAGS_SENTIDO = ('oneway', 'junction')  # Tags que tornam a via de mão única
+
+# Sentido de cada arco do CSR completo (atributo 'sentido'): bit 0 marca o arco contrário ao da
+# aresta, bit 1 a aresta de mão única. Cada visão deixa de fora um dos valores (None: nenhum).
+ARCO_CONTRARIO = 1
+ARCO_MAO_UNICA = 2
+VISOES = {'nao_direcionado': None,
+          'direcionado': ARCO_CONTRARIO | ARCO_MAO_UNICA,  # sem a contramão das vias de mão única
+          'reverso': ARCO_MAO_UNICA}  # arcos invertidos: sem o sentido próprio das de mão única
+# Índices calculados sobre os arcos (componentes, rótulos de hubs), que não passam de uma visão a outra
+INDICES_POR_VISAO = ('componentes_', 'hubs_')
+
+def converter_para_utm(lat_deg, lon_deg):
+    """Converte coordenadas geográficas para UTM (baseado no código C)
+
+    Aceita números ou arrays NumPy (converte todos os pontos de uma vez).
+    """
+    e2 = F * (2 - F)                    # excentricidade ao quadrado
+    ep2 = e2 / (1 - e2)                 # excentricidade secundária ao quadrado
+    lat = lat_deg * PI / 180.0
+    lon = lon_deg * PI / 180.0
+    lon0 = LON0_DEG * PI / 180.0
+
+    N = A / np.sqrt(1 - e2 * np.sin(lat) * np.sin(lat))
+    T = np.tan(lat) * np.tan(lat)
+    C = ep2 * np.cos(lat) * np.cos(lat)
+    A_val = (lon - lon0) * np.cos(lat)
+
+    # Cálculo do arco meridional com mais termos
+    M = A * ((1 - e2/4 - 3*e2*e2/64 - 5*e2*e2*e2/256) * lat
+      - (3*e2/8 + 3*e2*e2/32 + 45*e2*e2*e2/1024) * np.sin(2*lat)
+      + (15*e2*e2/256 + 45*e2*e2*e2/1024) * np.sin(4*lat)
+      - (35*e2*e2*e2/3072) * np.sin(6*lat))
+
+    # Coordenada leste (X)
+    x = K0 * N * (A_val + (1 - T + C) * A_val**3/6
+         + (5 - 18*T + T*T + 72*C - 58*ep2) * A_val**5/120) + 500000.0
+
+    # Coordenada norte (Y)
+    y = K0 * (M + N * np.tan(lat) * (A_val*A_val/2 + (5 - T + 9*C + 4*C*C) * A_val**4/24
+         + (61 - 58*T + T*T + 600*C - 330*ep2) * A_val**6/720))
+
+    # Ajusta para hemisfério sul
+    y = y + np.where(np.asarray(lat_deg) < 0, 10000000.0, 0.0)
+
+    if np.ndim(x) == 0:
+        return float(x), float(y)
+    return x, y
+
+def reduzir_escala(x, y, redutor=2):
+    """Reduz a escala dos pontos (baseado no código C), alterando os arrays x e y
+
+    Retorna os parâmetros da transformação, usados por `projetar_latlon` para
+    levar novas coordenadas ao mesmo sistema.
+    """
+    if not len(x):
+        return None
+
+    min_x = float(x.min())
+    min_y = float(y.min())
+
+    x -= min_x
+    x /= redutor
+    y -= min_y
+    y /= redutor
+
+    # Rotação vertical para que (0,0) seja no canto superior esquerdo
+    max_y = float(y.max())
+    np.subtract(max_y, y, out=y)
+
+    return {'min_x': min_x, 'min_y': min_y, 'max_y': max_y, 'redutor': redutor}
+
+def projetar_latlon(lat, lon, projecao):
+    """Converte lat/lon para as coordenadas do grafo, com a mesma transformação do carregamento"""
+    x, y = converter_para_utm(lat, lon)
+    return ((x - projecao['min_x']) / projecao['redutor'],
+            projecao['max_y'] - (y - projecao['min_y']) / projecao['redutor'])
+
+class CarregamentoCancelado(Exception):
+    """Indica que o carregamento foi interrompido pelo usuário"""
+
+class MonitorFases:
+    """Mede o tempo de cada fase do carregamento e repassa o progresso"""
+
+    def __init__(self, progresso=None, cancelado=None):
+        self.progresso = progresso    # progresso(fase, fracao, tempo_ms ou None)
+        self.cancelado = cancelado    # objeto com is_set() (ex.: threading.Event)
+        self.tempos_ms = {}
+        self.fase_atual = None
+
+    @contextmanager
+    def fase(self, nome):
+        self.fase_atual = nome
+        self.avancar(0.0)
+        inicio = time.perf_counter()
+        yield self
+        self.tempos_ms[nome] = (time.perf_counter() - inicio) * 1000
+        registrar_fase(log, 'carregamento', self.tempos_ms[nome], etapa=nome)
+        if self.progresso is not None:
+            self.progresso(nome, 1.0, self.tempos_ms[nome])
+
+    def avancar(self, fracao):
+        """Informa o avanço da fase atual e verifica o cancelamento"""
+        if self.cancelado is not None and self.cancelado.is_set():
+            raise CarregamentoCancelado()
+        if self.progresso is not None:
+            self.progresso(self.fase_atual, fracao, None)
+
+def ler_bytes(caminho_arquivo, monitor=None):
+    """Lê o arquivo inteiro em blocos, informando o progresso"""
+    tamanho = max(os.path.getsize(caminho_arquivo), 1)
+    blocos = []
+    lidos = 0
+    with open(caminho_arquivo, 'rb') as arquivo:
+        while True:
+            bloco = arquivo.read(TAMANHO_BLOCO_LEITURA)
+            if not bloco:
+                break
+            blocos.append(bloco)
+            lidos += len(bloco)
+            if monitor is not None:
+                monitor.avancar(lidos / tamanho)
+    return b''.join(blocos)
+
+def obter_tag(elemento, chave):
+    """Retorna o valor de uma <tag> do elemento OSM, ou None"""
+    for tag in elemento.findall('tag'):
+        if tag.get('k') == chave:
+            return tag.get('v')
+    return None
+
+@dataclass
+class NosOSM:
+    """Nós do OSM em colunas, na ordem do id interno"""
+    indice: dict      # id original do OSM -> id interno
+    lat: np.ndarray
+    lon: np.ndarray
+    nomes: dict       # id interno -> nomes (do próprio nó e das vias que passam por ele)
+    x: np.ndarray = None  # Coordenadas projetadas, preenchidas por projetar_osm
+    y: np.ndarray = None
+    pois: list = field(default_factory=list)  # (id interno, tags) dos nós com TAGS_POI
+    restricoes: list = field(default_factory=list)  # (tipo, vizinhos de origem, via, vizinhos de destino)
+
+    def __len__(self):
+        return len(self.lat)
+
+def interpretar_osm(conteudo, monitor=None):
+    """Interpreta o XML do OSM e retorna os nós (NosOSM) e as vias
+
+    As tags guardadas de cada via são as das métricas (TAGS_VIA) e, se ela
+    é um ponto de interesse, as de TAGS_POI com o nome.
+    """
+    # Alimentar o parser em blocos permite informar progresso e cancelar
+    parser = ET.XMLPullParser(events=('start',))
+    root = None
+    total = max(len(conteudo), 1)
+    for inicio in range(0, len(conteudo), TAMANHO_BLOCO_LEITURA):
+        parser.feed(conteudo[inicio:inicio + TAMANHO_BLOCO_LEITURA])
+        for _, elemento in parser.read_events():
+            if root is None:
+                root = elemento
+        if monitor is not None:
+            monitor.avancar(min(inicio + TAMANHO_BLOCO_LEITURA, total) / total)
+    parser.close()
+
+    # Nós em colunas: o dicionário só guarda a troca de id original por id interno
+    indice = {}   # id_original -> id_interno
+    lat = []
+    lon = []
+    nomes = {}    # id_interno -> lista de nomes
+    ways = []     # lista de vias: (nós, tags)
+    nos_das_vias = {}  # id original da via -> nós, para as restrições de conversão
+    pois = []     # nós que são pontos de interesse: (id_interno, tags)
+
+    # Processar nós
+    for node in root.findall('.//node'):
+        node_id_attr = node.get('id')
+        lat_attr = node.get('lat')
+        lon_attr = node.get('lon')
+
+        if node_id_attr is None or lat_attr is None or lon_attr is None:
+            continue
+
+        id_interno = len(lat)
+        indice[int(node_id_attr)] = id_interno
+        lat.append(float(lat_attr))
+        lon.append(float(lon_attr))
+        tags = {tag.get('k'): tag.get('v') for tag in node.findall('tag')}
+        nome = tags.get('name')
+        if nome:
+            nomes[id_interno] = [nome]
+        if any(chave in tags for chave in TAGS_POI):
+            pois.append((id_interno, {chave: tags[chave] for chave in (*TAGS_POI, 'name') if chave in tags}))
+
+    # Processar vias
+    for way in root.findall('.//way'):
+        nome_via = obter_tag(way, 'name')
+        tags = {tag.get('k'): tag.get('v') for tag in way.findall('tag')
+                if tag.get('k') in TAGS_VIA or tag.get('k') in TAGS_SENTIDO or tag.get('k') in TAGS_POI}
+        if nome_via and any(chave in tags for chave in TAGS_POI):
+            tags['name'] = nome_via
+        way_nodes = []
+        for nd in way.findall('nd'):
+            ref_attr = nd.get('ref')
+            if ref_attr is None:
+                continue
+
+            id_interno = indice.get(int(ref_attr))
+            if id_interno is not None:
+                way_nodes.append(id_interno)
+                # Os nós herdam o nome da via, para a busca por nome
+                if nome_via:
+                    nomes_no = nomes.setdefault(id_interno, [])
+                    if nome_via not in nomes_no:
+                        nomes_no.append(nome_via)
+
+        if len(way_nodes) > 1:
+            ways.append((way_nodes, tags))
+            nos_das_vias[int(way.get('id', -1))] = way_nodes
+
+    # Restrições de conversão com um nó como passagem (via por vias inteiras fica de fora)
+    restricoes = []
+    for relacao in root.findall('.//relation'):
+        if obter_tag(relacao, 'type') != 'restriction':
+            continue
+        tipo = obter_tag(relacao, 'restriction') or obter_tag(relacao, 'restriction:motorcar')
+        membros = {'from': [], 'via': [], 'to': []}
+        for membro in relacao.findall('member'):
+            if membro.get('role') in membros and membro.get('ref') is not None:
+                membros[membro.get('role')].append((membro.get('type'), int(membro.get('ref'))))
+        if not tipo or len(membros['via']) != 1 or membros['via'][0][0] != 'node':
+            continue
+        via = indice.get(membros['via'][0][1])
+        if via is None:
+            continue
+        de, para = ([vizinho for tipo_membro, ref in membros[papel] if tipo_membro == 'way' and ref in nos_das_vias
+                     for vizinho in vizinhos_na_via(nos_das_vias[ref], via)] for papel in ('from', 'to'))
+        if de and para:
+            restricoes.append((tipo, de, via, para))
+
+    return NosOSM(indice, np.array(lat, dtype=np.float64), np.array(lon, dtype=np.float64), nomes,
+                  pois=pois, restricoes=restricoes), ways
+
+def projetar_osm(nos, monitor=None):
+    """Converte os nós para UTM e reduz a escala; retorna os parâmetros da projeção"""
+    nos.x, nos.y = converter_para_utm(nos.lat, nos.lon)
+    if monitor is not None:
+        monitor.avancar(0.5)
+
+    # Reduzir escala
+    return reduzir_escala(nos.x, nos.y)
+
+def sentido_via(tags):
+    """1 se a via só pode ser percorrida na ordem dos nós, -1 se só na ordem inversa, 0 se nos dois"""
+    oneway = tags.get('oneway')
+    if oneway in ('yes', 'true', '1'):
+        return 1
+    if oneway in ('-1', 'reverse'):
+        return -1
+    # Rotatórias são de mão única implícita
+    if oneway != 'no' and tags.get('junction') in ('roundabout', 'circular'):
+        return 1
+    return 0
+
+def montar_osm(nos, ways):
+    """Converte nós e vias projetados em tabelas de vértices e arestas (formato .poly)"""
+    vertices = TabelaVertices(id=np.arange(len(nos)), x=nos.x, y=nos.y)
+    if not ways:
+        return vertices, TabelaArestas()
+
+    # Todas as vias em sequência; os pares que cruzam o fim de uma via são descartados
+    tamanhos = np.array([len(way) for way, _ in ways], dtype=np.int64)
+    sequencia = np.fromiter(chain.from_iterable(way for way, _ in ways), dtype=np.int64,
+                            count=int(tamanhos.sum()))
+    continua = np.ones(len(sequencia) - 1, dtype=bool)
+    continua[np.cumsum(tamanhos)[:-1] - 1] = False
+    orig = sequencia[:-1][continua]
+    dest = sequencia[1:][continua]
+    velocidade = np.repeat([velocidade_via(tags) for _, tags in ways], tamanhos - 1)
+    sentido = np.repeat([sentido_via(tags) for _, tags in ways], tamanhos - 1)
+    # Vias com oneway=-1 são gravadas no sentido permitido
+    inverter = sentido < 0
+    orig, dest = np.where(inverter, dest, orig), np.where(inverter, orig, dest)
+    distancia = np.sqrt((nos.x[dest] - nos.x[orig])**2 + (nos.y[dest] - nos.y[orig])**2)
+    flags = np.where(sentido != 0, FLAG_VELOCIDADE | FLAG_MAO_UNICA, FLAG_VELOCIDADE).astype(np.uint8)
+    arestas = TabelaArestas(orig=orig, dest=dest, dist=distancia, velocidade=velocidade, flags=flags)
+    return vertices, arestas
+
+def processar_arquivo_osm(caminho_arquivo):
+    """Processa arquivo OSM e retorna as tabelas de vértices e arestas"""
+    try:
+        nos, ways = interpretar_osm(ler_bytes(caminho_arquivo))
+        projetar_osm(nos)
+        return montar_osm(nos, ways)
+
+    except Exception as e:
+        raise Exception(f"Erro ao processar arquivo OSM: {str(e)}")
+
+# Um vértice ou aresta avulso (ex.: criado na edição); os grafos carregados
+# guardam os dados em colunas (TabelaVertices e TabelaArestas)
+@dataclass(slots=True)
+class Vertices:
+    id: int
+    x: float
+    y: float
+
+@dataclass(slots=True)
+class Arestas:
+    orig: int
+    dest: int
+    dist: float  # Peso da aresta
+    velocidade: float = None  # m/s, estimada pelas tags do OSM; None usa a padrão
+    mao_unica: bool = False  # Só orig -> dest quando o grafo é direcionado
+
+LINHAS_BLOCO_POLY = 65536  # Linhas do .poly convertidas de uma vez
+
+def _ler_colunas(linhas, inicio, total, colunas, monitor=None):
+    """Lê `total` linhas numéricas a partir de `inicio` como um array (total x colunas)
+
+    Blocos de linhas com a mesma quantidade de campos são convertidos de
+    uma vez pelo NumPy; um bloco irregular (linhas mais curtas ou mais
+    longas) é lido linha a linha, completando com zeros os campos ausentes.
+    """
+    dados = np.zeros((total, colunas))
+    for i in range(0, total, LINHAS_BLOCO_POLY):
+        bloco = linhas[inicio + i:inicio + min(i + LINHAS_BLOCO_POLY, total)]
+        largura = len(bloco[0].split()) if bloco else 0
+        try:
+            valores = np.fromstring(" ".join(bloco), sep=" ") if largura else np.zeros(0)
+        except ValueError:
+            valores = np.zeros(0)  # Texto não numérico: a leitura linha a linha aponta o erro
+        if largura and len(valores) == largura * len(bloco) and len(bloco[-1].split()) == largura:
+            dados[i:i + len(bloco), :min(largura, colunas)] = valores.reshape(len(bloco), largura)[:, :colunas]
+        else:
+            for j, linha in enumerate(bloco):
+                campos = [float(valor) for valor in linha.split()[:colunas]]
+                dados[i + j, :len(campos)] = campos
+        if monitor is not None:
+            monitor.avancar((inicio + i + len(bloco)) / len(linhas))
+    return dados
+
+def interpretar_poly(linhas, monitor=None):
+    """Interpreta as linhas de um arquivo .poly em tabelas de vértices e arestas
+
+    Linhas de aresta: id orig dest peso [sentido]. Com a quinta coluna,
+    sentido diferente de zero é mão única e zero é mão dupla; arquivos sem
+    ela têm só arcos (cada linha vale no sentido orig -> dest quando o
+    grafo é direcionado), e todas as arestas ficam de mão única.
+    """
+    totalVertices = int(linhas[0].split()[0])
+    dados = _ler_colunas(linhas, 1, totalVertices, 3, monitor)
+    vertices = TabelaVertices(id=dados[:, 0].astype(np.int64), x=dados[:, 1], y=dados[:, 2])
+    pos_arestas = totalVertices + 1
+    totalArestas = int(linhas[pos_arestas].split()[0])
+    dados = _ler_colunas(linhas, pos_arestas + 1, totalArestas, 5, monitor)
+    com_sentido = totalArestas > 0 and len(linhas[pos_arestas + 1].split()) >= 5
+    mao_unica = dados[:, 4] != 0 if com_sentido else np.ones(totalArestas, dtype=bool)
+    arestas = TabelaArestas(orig=dados[:, 1].astype(np.int64), dest=dados[:, 2].astype(np.int64),
+                            dist=dados[:, 3], flags=np.where(mao_unica, FLAG_MAO_UNICA, 0).astype(np.uint8))
+    return vertices, arestas
+
+def ler_arquivo_poly(caminho_arquivo):
+    """Lê um arquivo .poly e retorna as tabelas de vértices e arestas"""
+    with open(caminho_arquivo, 'r') as arquivo:
+        linhas = [linha.strip() for linha in arquivo.readlines()]
+    return interpretar_poly(linhas)
+
+def construir_matriz_adjacencia(vertices, arestas, direcionado, monitor=None):
+    """Constrói a matriz de adjacência com pesos euclidianos"""
+    vertices = TabelaVertices.de_objetos(vertices)
+    arestas = TabelaArestas.de_objetos(arestas)
+    totalVertices = len(vertices)
+    matrizAdj = []
+    for i in range(totalVertices):
+        matrizAdj.append([INF] * totalVertices)
+        if monitor is not None and i % 256 == 0:
+            monitor.avancar(0.9 * i / max(totalVertices, 1))
+    # Coordenadas por id; ids sem vértice ficam NaN e a aresta fica com peso infinito
+    xs = np.full(totalVertices, np.nan)
+    ys = np.full(totalVertices, np.nan)
+    ids = vertices.id
+    dentro = (ids >= 0) & (ids < totalVertices)
+    xs[ids[dentro]] = vertices.x[dentro]
+    ys[ids[dentro]] = vertices.y[dentro]
+    orig, dest = arestas.orig, arestas.dest
+    validas = (orig >= 0) & (orig < totalVertices) & (dest >= 0) & (dest < totalVertices)
+    orig, dest = orig[validas], dest[validas]
+    distancias = np.sqrt((xs[orig] - xs[dest])**2 + (ys[orig] - ys[dest])**2)
+    distancias[np.isnan(distancias)] = INF
+    # Sentido contrário: em todas no grafo não direcionado, só nas de mão dupla no direcionado
+    contrario = ~arestas.mao_unica()[validas] if direcionado else np.ones(len(orig), dtype=bool)
+    for u, v, dist, volta in zip(orig.tolist(), dest.tolist(), distancias.tolist(), contrario.tolist()):
+        matrizAdj[u][v] = dist
+        if volta:
+            matrizAdj[v][u] = dist
+    return matrizAdj
+
+def normalizar_colunas(vertices):
+    """Coordenadas x e y normalizadas para [0, 1], um array por eixo, na ordem das linhas"""
+    vertices = TabelaVertices.de_objetos(vertices)
+    def norm(valores):
+        if not len(valores) or valores.max() - valores.min() == 0:
+            return np.full(len(valores), 0.5)
+        return (valores - valores.min()) / (valores.max() - valores.min())
+    return norm(vertices.x), norm(vertices.y)
+
+def normalizar_posicoes(vertices):
+    """Retorna um dicionário com as posições dos vértices normalizadas para [0, 1]"""
+    vertices = TabelaVertices.de_objetos(vertices)
+    xs, ys = normalizar_colunas(vertices)
+    return dict(zip(vertices.id.tolist(), zip(xs.tolist(), ys.tolist())))
+
+@dataclass
+class GrafoCarregado:
+    """Resultado do carregamento, pronto para ser trocado na interface"""
+    vertices: TabelaVertices
+    arestas: TabelaArestas
+    matrizAdj: list
+    direcionado: bool
+    formato: str  # 'poly' ou 'osm'
+    posicoes: dict
+    indice: IndiceVertices
+    tempos_ms: dict = field(default_factory=dict)
+    projecao: dict = None  # Parâmetros de projetar_latlon (apenas OSM)
+    restricoes: list = field(default_factory=list)  # Restrições de conversão (apenas OSM), como em NosOSM
+
+def carregar_grafo(caminho_arquivo, direcionado=False, progresso=None, cancelado=None):
+    """Carrega um .poly ou .osm em fases (leitura → interpretação → projeção →
+    adjacência → pré-processamento), informando progresso e tempo de cada fase
+    """
+    monitor = MonitorFases(progresso, cancelado)
+    formato = 'osm' if caminho_arquivo.lower().endswith('.osm') else 'poly'
+    nomes = {}
+    projecao = None
+    restricoes = []
+
+    with monitor.fase('leitura'):
+        conteudo = ler_bytes(caminho_arquivo, monitor)
+
+    try:
+        with monitor.fase('interpretacao'):
+            if formato == 'osm':
+                nos, ways = interpretar_osm(conteudo, monitor)
+            else:
+                linhas = [linha.strip() for linha in conteudo.decode().splitlines()]
+                vertices, arestas = interpretar_poly(linhas, monitor)
+            del conteudo
+
+        with monitor.fase('projecao'):
+            # Arquivos .poly já estão em coordenadas planas
+            if formato == 'osm':
+                projecao = projetar_osm(nos, monitor)
+                vertices, arestas = montar_osm(nos, ways)
+                nomes = nos.nomes
+                restricoes = nos.restricoes
+    except CarregamentoCancelado:
+        raise
+    except Exception as e:
+        if formato == 'osm':
+            raise Exception(f"Erro ao processar arquivo OSM: {str(e)}")
+        raise
+
+    with monitor.fase('adjacencia'):
+        matrizAdj = construir_matriz_adjacencia(vertices, arestas, direcionado, monitor)
+
+    with monitor.fase('preprocessamento'):
+        posicoes = normalizar_posicoes(vertices)
+        monitor.avancar(0.5)
+        indice = IndiceVertices(vertices, nomes)
+
+    return GrafoCarregado(vertices, arestas, matrizAdj, direcionado, formato,
+                          posicoes, indice, monitor.tempos_ms, projecao, restricoes)
+
+# Formato compilado: cabeçalho + metadados JSON + arrays alinhados, lidos via mmap
+MAGICO_COMPILADO = b'GRAFOCSR'
+VERSAO_COMPILADO = 1
+ALINHAMENTO_COMPILADO = 64
+
+def salvar_compilado(caminho_arquivo, arrays, meta=None):
+    """Grava arrays NumPy nomeados e metadados no formato de grafo compilado"""
+    arrays = dict(arrays)
+    descricao = {}
+    deslocamento = 0
+    for nome, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[nome] = array
+        descricao[nome] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': deslocamento}
+        deslocamento += -(-array.nbytes // ALINHAMENTO_COMPILADO) * ALINHAMENTO_COMPILADO
+    cabecalho = json.dumps({'arrays': descricao, 'meta': meta or {}}).encode()
+    inicio_dados = -(-(16 + len(cabecalho)) // ALINHAMENTO_COMPILADO) * ALINHAMENTO_COMPILADO
+    with open(caminho_arquivo, 'wb') as arquivo:
+        arquivo.write(MAGICO_COMPILADO)
+        arquivo.write(struct.pack('<II', VERSAO_COMPILADO, len(cabecalho)))
+        arquivo.write(cabecalho)
+        for nome, array in arrays.items():
+            arquivo.seek(inicio_dados + descricao[nome]['offset'])
+            arquivo.write(array.tobytes())
+
+def abrir_compilado(caminho_arquivo, mmap=True):
+    """Abre um grafo compilado; com mmap, os arrays são compartilhados entre processos"""
+    with open(caminho_arquivo, 'rb') as arquivo:
+        if arquivo.read(8) != MAGICO_COMPILADO:
+            raise ValueError(f"{caminho_arquivo} não é um grafo compilado")
+        versao, tamanho = struct.unpack('<II', arquivo.read(8))
+        if versao != VERSAO_COMPILADO:
+            raise ValueError(f"Versão de grafo compilado não suportada: {versao}")
+        cabecalho = json.loads(arquivo.read(tamanho))
+        inicio_dados = -(-(16 + tamanho) // ALINHAMENTO_COMPILADO) * ALINHAMENTO_COMPILADO
+        arrays = {}
+        for nome, desc in cabecalho['arrays'].items():
+            dtype = np.dtype(desc['dtype'])
+            shape = tuple(desc['shape'])
+            offset = inicio_dados + desc['offset']
+            if mmap:
+                if int(np.prod(shape)) == 0:
+                    arrays[nome] = np.zeros(shape, dtype=dtype)
+                else:
+                    arrays[nome] = np.memmap(caminho_arquivo, dtype=dtype, mode='r', offset=offset, shape=shape)
+            else:
+                arquivo.seek(offset)
+                arrays[nome] = np.frombuffer(arquivo.read(dtype.itemsize * int(np.prod(shape))),
+                                             dtype=dtype).reshape(shape)
+    return arrays, cabecalho['meta']
+
+class GrafoCSR:
+    """Adjacência compacta (CSR): os vizinhos de u são destinos[inicio[u]:inicio[u + 1]]
+
+    A topologia (inicio, destinos, coordenadas e atributos por aresta) é
+    montada uma vez; cada métrica de peso é só mais um array alinhado a
+    `destinos`, calculado por `personalizar` a partir dos atributos. `pesos`
+    é o array da métrica ativa, o que os algoritmos de busca leem. Índices
+    derivados da topologia (ex.: componentes) ficam em `indices` e também
+    são gravados no formato compilado.
+
+    Montado a partir das tabelas, o grafo guarda os dois sentidos de todas
+    as arestas (o CSR completo, com o atributo 'sentido' por arco); as
+    visões direcionada (respeita a mão única), reversa (para buscas para
+    trás) e não direcionada saem dele por filtro e ficam em `visoes`,
+    compartilhadas por todas as métricas.
+    """
+
+    def __init__(self, inicio, destinos, pesos, x, y, direcionado=False, atributos=None, metricas=None,
+                 metrica=METRICA_PADRAO, projecao=None, indices=None, visao=None, visoes=None):
+        self.inicio = inicio      # int64, tamanho n + 1
+        self.destinos = destinos  # int32, tamanho m
+        self.pesos = pesos        # float64, tamanho m
+        self.x = x                # float64, coordenadas por id
+        self.y = y
+        self.direcionado = direcionado
+        self.atributos = atributos if atributos is not None else {}  # nome -> array por aresta
+        self.metricas = metricas if metricas is not None else {metrica: pesos}  # nome -> pesos
+        self.metrica = metrica
+        self.projecao = projecao  # Parâmetros de projetar_latlon, se o grafo veio do OSM
+        self.indices = indices if indices is not None else {}  # nome -> array derivado da topologia
+        self.visao = visao or ('direcionado' if direcionado else 'nao_direcionado')  # chave de VISOES
+        self.visoes = visoes if visoes is not None else {self.visao: self}  # nome -> GrafoCSR, na métrica base
+
+    @property
+    def totalVertices(self):
+        return len(self.inicio) - 1
+
+    @property
+    def totalArestas(self):
+        return len(self.destinos)
+
+    @classmethod
+    def de_arestas(cls, vertices, arestas, direcionado=False):
+        """Monta o CSR a partir das tabelas (ou listas) de vértices e arestas, com todas as métricas padrão
+
+        Monta sempre o CSR completo; `direcionado` escolhe a visão devolvida,
+        e as outras saem dela por `visao` sem voltar às tabelas.
+        """
+        vertices = TabelaVertices.de_objetos(vertices)
+        arestas = TabelaArestas.de_objetos(arestas)
+        ids = vertices.id
+        n = int(ids.max()) + 1 if len(ids) else 0
+        x = np.zeros(n)
+        y = np.zeros(n)
+        existe = np.zeros(n, dtype=bool)
+        x[ids] = vertices.x
+        y[ids] = vertices.y
+        existe[ids] = True
+        orig = arestas.orig
+        dest = arestas.dest
+        velocidade = arestas.velocidades(VELOCIDADE_PADRAO_KMH / 3.6)
+        peso_arquivo = arestas.dist
+        validas = (orig < n) & (dest < n)
+        validas[validas] = existe[orig[validas]] & existe[dest[validas]]
+        orig, dest = orig[validas], dest[validas]
+        velocidade, peso_arquivo = velocidade[validas], peso_arquivo[validas]
+        mao_unica = np.where(arestas.mao_unica()[validas], ARCO_MAO_UNICA, 0).astype(np.uint8)
+        # Os dois sentidos de toda aresta; o contrário é marcado e as visões filtram
+        orig, dest = np.concatenate([orig, dest]), np.concatenate([dest, orig])
+        velocidade = np.concatenate([velocidade, velocidade])
+        peso_arquivo = np.concatenate([peso_arquivo, peso_arquivo])
+        sentido = np.concatenate([mao_unica, mao_unica | ARCO_CONTRARIO])
+        ordem = np.argsort(orig, kind='stable')
+        orig, dest = orig[ordem], dest[ordem]
+        atributos = {
+            'comprimento': np.hypot(x[orig] - x[dest], y[orig] - y[dest]),
+            'velocidade': velocidade[ordem],
+            'peso_arquivo': peso_arquivo[ordem],
+            'sentido': sentido[ordem],
+        }
+        inicio = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(orig, minlength=n), out=inicio[1:])
+        grafo = cls(inicio, dest.astype(np.int32), atributos['comprimento'], x, y, False, atributos)
+        for nome, funcao in METRICAS.items():
+            grafo.personalizar(nome, funcao)
+        return grafo.visao_sentido(direcionado)
+
+    def visao_sentido(self, direcionado, reverso=False):
+        """Visão direcionada ou não (ou a reversa, com `reverso`), na métrica ativa"""
+        return self.visao_de('reverso' if reverso else 'direcionado' if direcionado else 'nao_direcionado')
+
+    def visao_de(self, nome):
+        """O mesmo grafo na visão `nome` de VISOES, na métrica ativa
+
+        As visões saem do CSR completo filtrando arcos pelo atributo
+        'sentido' (sem voltar às tabelas) e são montadas uma vez por grafo.
+        Sem o completo, como num compilado direcionado, ele é refeito a
+        partir da visão direcionada.
+        """
+        if nome not in self.visoes:
+            direcionada = self.visoes.get('direcionado')
+            if ('nao_direcionado' not in self.visoes and direcionada is not None
+                    and 'sentido' in direcionada.atributos):
+                self.visoes['nao_direcionado'] = direcionada._completar()
+        if nome not in self.visoes:
+            completo = self.visoes.get('nao_direcionado')
+            if completo is None or 'sentido' not in completo.atributos:
+                raise ValueError(f"A visão '{nome}' precisa do CSR completo, com o sentido de cada arco")
+            self.visoes[nome] = completo._filtrar(nome)
+        return self.visoes[nome].com_metrica(self.metrica)
+
+    def _completar(self):
+        """CSR completo a partir desta visão direcionada: devolve a contramão das vias de mão única"""
+        sentido = np.asarray(self.atributos['sentido'])
+        n = self.totalVertices
+        origens = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.inicio))
+        destinos = np.asarray(self.destinos, dtype=np.int64)
+        # Na visão direcionada, a via de mão única só tem o arco no sentido próprio
+        unicas = np.flatnonzero(sentido == ARCO_MAO_UNICA)
+        orig = np.concatenate([origens, destinos[unicas]])
+        dest = np.concatenate([destinos, origens[unicas]])
+        ordem = np.argsort(orig, kind='stable')
+
+        def estender(array, contrarios=None):
+            array = np.asarray(array)
+            return np.concatenate([array, array[unicas] if contrarios is None else contrarios])[ordem]
+
+        atributos = {chave: estender(array) for chave, array in self.atributos.items()}
+        atributos['sentido'] = estender(sentido, sentido[unicas] | ARCO_CONTRARIO)
+        metricas = {chave: estender(array) for chave, array in self.metricas.items()}
+        inicio = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(orig, minlength=n), out=inicio[1:])
+        indices = {chave: array for chave, array in self.indices.items()
+                   if not chave.startswith(INDICES_POR_VISAO)}
+        return GrafoCSR(inicio, dest[ordem].astype(np.int32), metricas[self.metrica], self.x, self.y, False,
+                        atributos, metricas, self.metrica, self.projecao, indices, 'nao_direcionado', self.visoes)
+
+    def _filtrar(self, nome):
+        """Visão montada a partir deste CSR completo, sem os arcos que VISOES exclui"""
+        manter = np.asarray(self.atributos['sentido']) != VISOES[nome]
+        n = self.totalVertices
+        origens = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.inicio))
+        inicio = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origens[manter], minlength=n), out=inicio[1:])
+        atributos = {chave: np.asarray(array)[manter] for chave, array in self.atributos.items()}
+        metricas = {chave: np.asarray(array)[manter] for chave, array in self.metricas.items()}
+        # Índices por vértice valem em todas as visões; os que dependem dos arcos ficam de fora
+        indices = {chave: array for chave, array in self.indices.items()
+                   if not chave.startswith(INDICES_POR_VISAO)}
+        return GrafoCSR(inicio, np.asarray(self.destinos)[manter], metricas[self.metrica], self.x, self.y,
+                        VISOES[nome] is not None, atributos, metricas, self.metrica, self.projecao, indices,
+                        nome, self.visoes)
+
+    def personalizar(self, nome, funcao):
+        """Segunda fase: calcula os pesos de uma métrica a partir dos atributos, sem refazer a topologia
+
+        `funcao` recebe o dicionário de atributos por aresta (arrays NumPy) e
+        devolve um array de pesos do mesmo tamanho.
+        """
+        pesos = np.ascontiguousarray(funcao(self.atributos), dtype=np.float64)
+        if pesos.shape != (self.totalArestas,):
+            raise ValueError(f"A métrica '{nome}' deve ter um peso por aresta")
+        if len(pesos) and pesos.min() < 0:
+            raise ValueError(f"A métrica '{nome}' tem pesos negativos")
+        self.metricas[nome] = pesos
+        if nome == self.metrica:
+            self.pesos = pesos
+        return pesos
+
+    def com_metrica(self, nome):
+        """Visão do mesmo grafo com outra métrica ativa; os arrays são compartilhados"""
+        if nome == self.metrica:
+            return self
+        if nome not in self.metricas:
+            raise ValueError(f"Métrica desconhecida: {nome} (disponíveis: {', '.join(self.metricas)})")
+        return GrafoCSR(self.inicio, self.destinos, self.metricas[nome], self.x, self.y,
+                        self.direcionado, self.atributos, self.metricas, nome, self.projecao, self.indices,
+                        self.visao, self.visoes)
+
+    def transposto(self):
+        """Grafo com as arestas invertidas; o não direcionado já é simétrico e volta ele mesmo
+
+        Com o CSR completo disponível, é a visão reversa (ou a direcionada,
+        para a reversa), montada uma vez; sem ele, as arestas são reordenadas.
+        """
+        if not self.direcionado:
+            return self
+        if 'nao_direcionado' in self.visoes and self.visao in ('direcionado', 'reverso'):
+            return self.visao_de('direcionado' if self.visao == 'reverso' else 'reverso')
+        n = self.totalVertices
+        origens = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.inicio))
+        ordem = np.argsort(self.destinos, kind='stable')
+        inicio = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.destinos, minlength=n), out=inicio[1:])
+        atributos = {nome: np.asarray(array)[ordem] for nome, array in self.atributos.items()}
+        metricas = {nome: np.asarray(array)[ordem] for nome, array in self.metricas.items()}
+        return GrafoCSR(inicio, origens[ordem], metricas[self.metrica], self.x, self.y, True,
+                        atributos, metricas, self.metrica, self.projecao,
+                        visao='direcionado' if self.visao == 'reverso' else 'reverso')
+
+    def salvar(self, caminho_arquivo):
+        """Grava o grafo no formato compilado, com os atributos e todas as métricas"""
+        arrays = {'inicio': self.inicio, 'destinos': self.destinos, 'pesos': self.pesos,
+                  'x': self.x, 'y': self.y}
+        for nome, array in self.atributos.items():
+            arrays[f'atributo_{nome}'] = array
+        for nome, array in self.metricas.items():
+            if nome != self.metrica:
+                arrays[f'metrica_{nome}'] = array
+        for nome, array in self.indices.items():
+            arrays[f'indice_{nome}'] = array
+        salvar_compilado(caminho_arquivo, arrays,
+                         {'direcionado': self.direcionado, 'metrica': self.metrica,
+                          'projecao': self.projecao, 'visao': self.visao})
+
+    @classmethod
+    def carregar(cls, caminho_arquivo, mmap=True):
+        """Lê um grafo compilado"""
+        arrays, meta = abrir_compilado(caminho_arquivo, mmap)
+        metrica = meta.get('metrica', METRICA_PADRAO)
+        atributos = {nome[len('atributo_'):]: array for nome, array in arrays.items()
+                     if nome.startswith('atributo_')}
+        metricas = {nome[len('metrica_'):]: array for nome, array in arrays.items()
+                    if nome.startswith('metrica_')}
+        metricas[metrica] = arrays['pesos']
+        indices = {nome[len('indice_'):]: array for nome, array in arrays.items()
+                   if nome.startswith('indice_')}
+        return cls(arrays['inicio'], arrays['destinos'], arrays['pesos'],
+                   arrays['x'], arrays['y'], meta.get('direcionado', False), atributos, metricas, metrica,
+                   meta.get('projecao'), indices, meta.get('visao'))
+
+def na_visao(grafo, direcionado):
+    """Grafo compilado no tipo pedido, pela visão correspondente do CSR gravado
+
+    Compilados com o sentido de cada arco dão os dois tipos; os gravados
+    antes do sentido por aresta só servem no tipo em que foram compilados.
+    """
+    if grafo.direcionado == direcionado:
+        return grafo
+    if grafo.visao not in ('nao_direcionado', 'direcionado') or 'sentido' not in grafo.atributos:
+        tipo = "direcionado" if grafo.direcionado else "não direcionado"
+        raise ValueError(f"O grafo compilado é {tipo} e não tem o sentido das arestas; "
+                         f"compile-o de novo {'com' if direcionado else 'sem'} --direcionado")
+    return grafo.visao_sentido(direcionado)
+
+def carregar_csr(caminho_arquivo, direcionado=False, mmap=True):
+    """Carrega um .poly, .osm ou grafo compilado diretamente como CSR"""
+    if caminho_arquivo.lower().endswith('.osm'):
+        nos, ways = interpretar_osm(ler_bytes(caminho_arquivo))
+        projecao = projetar_osm(nos)
+        vertices, arestas = montar_osm(nos, ways)
+        # Direcionado, o OSM respeita as vias de mão única (oneway)
+        grafo = GrafoCSR.de_arestas(vertices, arestas, direcionado)
+        for visao in grafo.visoes.values():
+            visao.projecao = projecao
+        IndicePOI.do_osm(nos, ways).anexar(grafo)
+        TabelaConversoes.do_osm(nos.restricoes, grafo).anexar(grafo)
+        return grafo
+    with open(caminho_arquivo, 'rb') as arquivo:
+        compilado = arquivo.read(len(MAGICO_COMPILADO)) == MAGICO_COMPILADO
+    if compilado:
+        return na_visao(GrafoCSR.carregar(caminho_arquivo, mmap), direcionado)
+    vertices, arestas = ler_arquivo_poly(caminho_arquivo)
+    return GrafoCSR.de_arestas(vertices, arestas, direcionado)
+
+def preparar_compilado(caminho_arquivo, direcionado=False):
+    """Garante um grafo compilado para abrir via mmap
+
+    Retorna (caminho_compilado, caminho_temporario); o segundo é None quando
+    o arquivo já estava compilado no tipo pedido e, caso contrário, deve ser
+    removido pelo chamador ao terminar. Um compilado pedido no outro tipo é
+    regravado com a visão correspondente, para os processos também abrirem
+    só ela via mmap.
+    """
+    with open(caminho_arquivo, 'rb') as arquivo:
+        if arquivo.read(len(MAGICO_COMPILADO)) == MAGICO_COMPILADO:
+            grafo = GrafoCSR.carregar(caminho_arquivo, mmap=True)
+            if grafo is na_visao(grafo, direcionado):
+                return caminho_arquivo, None
+    grafo = carregar_csr(caminho_arquivo, direcionado)
+    # Componentes calculadas uma vez aqui; os processos as leem do arquivo
+    IndiceComponentes.do_grafo(grafo)
+    descritor, caminho_temporario = tempfile.mkstemp(suffix='.grafo')
+    os.close(descritor)
+    grafo.salvar(caminho_temporario)
+    return caminho_temporario, caminho_temporario
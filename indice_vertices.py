@@ -0,0 +1,101 @@
+import unicodedata
+from bisect import bisect_left, bisect_right
+from colunas import TabelaVertices
+
+FIM_PREFIXO = '\U0010ffff'  # Maior caractere possível, fecha o intervalo de um prefixo
+
+def normalizar_texto(texto):
+    """Converte para minúsculas e remove acentos, para buscas tolerantes"""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower().strip()
+
+class IndiceVertices:
+    """Índice de prefixos sobre ids de vértices e nomes do OSM
+
+    As chaves ficam em uma lista ordenada (uma trie achatada): os vértices
+    cujo id ou nome começa com um prefixo ocupam um intervalo contíguo,
+    encontrado por busca binária em O(log n), e os resultados são gerados
+    sob demanda, sem montar a lista inteira.
+    """
+
+    def __init__(self, vertices=(), nomes=None):
+        # id -> (x, y), para descrever os resultados; guarda as coordenadas e não
+        # o vértice, que numa tabela é só uma visão da linha e muda com remoções
+        self.posicoes = {}
+        self.nomes = {}      # id -> lista de nomes
+        tabela = TabelaVertices.de_objetos(vertices)
+        pares = []
+        for vertice_id, x, y in zip(tabela.id.tolist(), tabela.x.tolist(), tabela.y.tolist()):
+            self.posicoes[vertice_id] = (x, y)
+            nomes_vertice = (nomes or {}).get(vertice_id)
+            if nomes_vertice:
+                self.nomes[vertice_id] = nomes_vertice
+            for chave in self.chaves_vertice(vertice_id):
+                pares.append((chave, vertice_id))
+        pares.sort()
+        self.chaves = [chave for chave, _ in pares]
+        self.ids = [vid for _, vid in pares]
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    def chaves_vertice(self, vertice_id):
+        """Chaves indexadas para um vértice: o id e cada sufixo de palavra dos nomes"""
+        chaves = [str(vertice_id)]
+        for nome in self.nomes.get(vertice_id, ()):
+            palavras = normalizar_texto(nome).split()
+            for i in range(len(palavras)):
+                chaves.append(' '.join(palavras[i:]))
+        return chaves
+
+    def adicionar(self, vertice, nomes=None):
+        """Insere um vértice novo no índice"""
+        self.posicoes[vertice.id] = (vertice.x, vertice.y)
+        if nomes:
+            self.nomes[vertice.id] = nomes
+        for chave in self.chaves_vertice(vertice.id):
+            i = bisect_right(self.chaves, chave)
+            self.chaves.insert(i, chave)
+            self.ids.insert(i, vertice.id)
+
+    def remover(self, vertice_id):
+        """Remove um vértice do índice"""
+        if vertice_id not in self.posicoes:
+            return
+        for chave in self.chaves_vertice(vertice_id):
+            i = bisect_left(self.chaves, chave)
+            while i < len(self.chaves) and self.chaves[i] == chave:
+                if self.ids[i] == vertice_id:
+                    del self.chaves[i]
+                    del self.ids[i]
+                    break
+                i += 1
+        del self.posicoes[vertice_id]
+        self.nomes.pop(vertice_id, None)
+
+    def buscar(self, prefixo):
+        """Gera, sob demanda, os ids dos vértices cujo id ou nome começa com o prefixo"""
+        prefixo = normalizar_texto(prefixo)
+        if not prefixo:
+            # Sem filtro: todos os vértices na ordem de inserção
+            yield from self.posicoes
+            return
+        inicio = bisect_left(self.chaves, prefixo)
+        fim = bisect_left(self.chaves, prefixo + FIM_PREFIXO, inicio)
+        vistos = set()
+        for i in range(inicio, fim):
+            vertice_id = self.ids[i]
+            if vertice_id not in vistos:
+                vistos.add(vertice_id)
+                yield vertice_id
+
+    def descrever(self, vertice_id):
+        """Texto exibido para um vértice: id, coordenadas e o primeiro nome, se houver"""
+        posicao = self.posicoes.get(vertice_id)
+        if posicao is None:
+            return ""
+        texto = f"{vertice_id} ({posicao[0]:.1f}, {posicao[1]:.1f})"
+        nomes = self.nomes.get(vertice_id)
+        if nomes:
+            texto += f" - {nomes[0]}"
+        return texto
@@ -0,0 +1,75 @@
+import math
+from busca import dijkstra_limitado
+
+SETORES_POLIGONO = 72  # Setores angulares usados no contorno de cada faixa
+
+def pontos_de_corte(csr, custos, orcamento, x, y):
+    """Pontos onde o orçamento se esgota no meio de uma aresta
+
+    Para cada aresta (u, v) com u alcançado e custo[u] + peso > orçamento, o
+    ponto fica na fração (orçamento - custo[u]) / peso do segmento u -> v.
+    """
+    inicio = csr.inicio
+    destinos = csr.destinos
+    pesos = csr.pesos
+    pontos = []
+    for u, custo in custos.items():
+        if custo > orcamento:
+            continue
+        restante = orcamento - custo
+        for i in range(inicio[u], inicio[u + 1]):
+            peso = pesos[i]
+            if peso > restante:
+                v = destinos[i]
+                t = restante / peso
+                pontos.append((x[u] + t * (x[v] - x[u]), y[u] + t * (y[v] - y[u])))
+    return pontos
+
+def poligono_radial(pontos, centro, setores=SETORES_POLIGONO):
+    """Contorno em estrela: o ponto mais distante do centro em cada setor angular
+
+    Acompanha reentrâncias do alcance (é côncavo), ao contrário do fecho convexo.
+    Retorna uma lista vazia quando há menos de três setores ocupados.
+    """
+    cx, cy = centro
+    mais_distantes = {}
+    for px, py in pontos:
+        dx, dy = px - cx, py - cy
+        raio = dx * dx + dy * dy
+        if raio == 0:
+            continue
+        setor = int((math.atan2(dy, dx) + math.pi) / (2 * math.pi) * setores) % setores
+        if raio > mais_distantes.get(setor, (0,))[0]:
+            mais_distantes[setor] = (raio, (px, py))
+    if len(mais_distantes) < 3:
+        return []
+    return [mais_distantes[setor][1] for setor in sorted(mais_distantes)]
+
+def calcular_isocronas(csr, inicio, orcamentos, x=None, y=None, setores=SETORES_POLIGONO,
+                       cancelado=None, progresso=None):
+    """Áreas alcançáveis a partir de `inicio` para vários orçamentos em uma única busca
+
+    A busca vai até o maior orçamento; cada faixa reaproveita os custos já
+    calculados. `x` e `y` são as coordenadas por id usadas nos contornos
+    (padrão: as do próprio grafo), o que permite calculá-los direto nas
+    posições normalizadas da tela. Retorna um dicionário com os custos, as
+    estatísticas e as faixas em ordem crescente de orçamento, cada uma com
+    os vértices alcançados e o polígono do contorno.
+    """
+    x = csr.x if x is None else x
+    y = csr.y if y is None else y
+    orcamentos = sorted(set(orcamentos))
+    custos, estatisticas = dijkstra_limitado(csr, inicio, orcamentos[-1], cancelado, progresso)
+
+    centro = (x[inicio], y[inicio])
+    faixas = []
+    for orcamento in orcamentos:
+        alcancados = [v for v, custo in custos.items() if custo <= orcamento]
+        pontos = [(x[v], y[v]) for v in alcancados]
+        pontos.extend(pontos_de_corte(csr, custos, orcamento, x, y))
+        faixas.append({
+            'orcamento': orcamento,
+            'vertices': alcancados,
+            'poligono': poligono_radial(pontos, centro, setores),
+        })
+    return {'custos': custos, 'faixas': faixas, 'estatisticas': estatisticas}
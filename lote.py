@@ -0,0 +1,188 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from busca import INF, dijkstra_csr
+from componentes import IndiceComponentes, resposta_sem_caminho
+from grafo import carregar_csr, preparar_compilado
+from metricas import METRICA_PADRAO
+from rastreamento import ExportadorRastros
+from registro import configurar_registro
+from rotulos import RotulosHub
+
+TAMANHO_LOTE = 64  # Pares de origem-destino enviados por tarefa
+
+_grafo = None  # Grafo aberto via mmap em cada processo de trabalho
+_componentes = None  # Índice de componentes de _grafo
+_rotulos = None  # Rótulos de hubs da métrica, se o grafo compilado os tiver
+_buscar = dijkstra_csr  # Substituído pela versão rastreada quando há --rastro
+
+def _iniciar_processo(caminho_compilado, metrica=METRICA_PADRAO, direcionado=False):
+    global _grafo, _componentes, _rotulos
+    _grafo = carregar_csr(caminho_compilado, direcionado).com_metrica(metrica)
+    _componentes = IndiceComponentes.do_grafo(_grafo)
+    _rotulos = RotulosHub.do_grafo(_grafo)
+
+def rotear_pares(grafo, pares, incluir_caminho=True, buscar=dijkstra_csr, componentes=None):
+    """Calcula as rotas de uma lista de pares (origem, destino)
+
+    Com o índice de `componentes`, pares sem caminho possível são
+    respondidos sem busca.
+    """
+    resultados = []
+    for origem, destino in pares:
+        resultado = {'origem': origem, 'destino': destino}
+        if not (0 <= origem < grafo.totalVertices and 0 <= destino < grafo.totalVertices):
+            resultado['erro'] = "vértice inexistente"
+            resultados.append(resultado)
+            continue
+        if componentes is not None and not componentes.alcancavel(origem, destino):
+            caminho, custo, estatisticas = resposta_sem_caminho()
+        else:
+            caminho, custo, estatisticas = buscar(grafo, origem, destino)
+        resultado['custo'] = custo if custo < INF else None
+        resultado['saltos'] = len(caminho) - 1 if caminho else None
+        if incluir_caminho:
+            resultado['caminho'] = caminho
+        resultado['tempo_ms'] = estatisticas['tempo_ms']
+        resultado['nos_explorados'] = estatisticas['nos_explorados']
+        resultados.append(resultado)
+    return resultados
+
+def _rotear_lote(tarefa):
+    pares, incluir_caminho = tarefa
+    buscar = _buscar
+    if _rotulos is not None and _buscar is dijkstra_csr:
+        # Rótulos de hubs no grafo compilado dispensam a busca (o rastro ainda a exige)
+        buscar = _rotear_rotulos
+    return rotear_pares(_grafo, pares, incluir_caminho, buscar, _componentes)
+
+def _rotear_rotulos(grafo, origem, destino):
+    return _rotulos.rota(origem, destino)
+
+def ler_pares(arquivo):
+    """Lê pares origem,destino de um CSV, ignorando cabeçalho e linhas inválidas"""
+    for linha in csv.reader(arquivo):
+        if len(linha) < 2:
+            continue
+        try:
+            yield int(linha[0]), int(linha[1])
+        except ValueError:
+            continue
+
+def agrupar(iteravel, tamanho):
+    lote = []
+    for item in iteravel:
+        lote.append(item)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def executar_lote(caminho_grafo, pares, saida, processos=None, direcionado=False, incluir_caminho=True,
+                  metrica=METRICA_PADRAO, rastro=None):
+    """Roteia os pares em um pool de processos e escreve cada resultado (JSON por linha) ao terminar
+
+    O grafo é carregado uma vez e compilado em um arquivo temporário, que
+    cada processo abre via mmap; as páginas são compartilhadas pelo sistema
+    operacional em vez de a adjacência ser serializada a cada tarefa.
+    Com `rastro`, o rastro de cada consulta é gravado nesse arquivo e as
+    consultas rodam em um único processo.
+    """
+    global _buscar
+    inicio = time.perf_counter()
+    caminho_compilado, caminho_temporario = preparar_compilado(caminho_grafo, direcionado)
+    tempo_carga = time.perf_counter() - inicio
+    # Valida a métrica antes de iniciar os processos
+    carregar_csr(caminho_compilado, direcionado).com_metrica(metrica)
+
+    total = 0
+    inicio_consultas = time.perf_counter()
+    try:
+        tarefas = ((lote, incluir_caminho) for lote in agrupar(pares, TAMANHO_LOTE))
+        if rastro is not None:
+            _iniciar_processo(caminho_compilado, metrica, direcionado)
+            with ExportadorRastros(rastro) as exportador:
+                _buscar = exportador.envolver(dijkstra_csr)
+                try:
+                    total = _escrever_resultados(map(_rotear_lote, tarefas), saida)
+                finally:
+                    _buscar = dijkstra_csr
+        elif processos == 1:
+            _iniciar_processo(caminho_compilado, metrica, direcionado)
+            resultados_lotes = map(_rotear_lote, tarefas)
+            total = _escrever_resultados(resultados_lotes, saida)
+        else:
+            with Pool(processos, initializer=_iniciar_processo,
+                      initargs=(caminho_compilado, metrica, direcionado)) as pool:
+                total = _escrever_resultados(pool.imap_unordered(_rotear_lote, tarefas), saida)
+    finally:
+        if caminho_temporario is not None:
+            os.remove(caminho_temporario)
+    tempo_consultas = time.perf_counter() - inicio_consultas
+
+    return {
+        'consultas': total,
+        'tempo_carga_s': tempo_carga,
+        'tempo_consultas_s': tempo_consultas,
+        'consultas_por_s': total / tempo_consultas if tempo_consultas > 0 else float('inf'),
+    }
+
+def _escrever_resultados(resultados_lotes, saida):
+    total = 0
+    for resultados in resultados_lotes:
+        for resultado in resultados:
+            saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+        saida.flush()
+        total += len(resultados)
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="dijkstra.py lote",
+        description="Calcula menores caminhos em lote para pares origem-destino")
+    parser.add_argument('grafo', help="arquivo .poly, .osm ou grafo compilado")
+    parser.add_argument('--pares', default='-',
+                        help="CSV com origem,destino por linha ('-' para a entrada padrão)")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="número de processos (padrão: número de CPUs)")
+    parser.add_argument('--direcionado', action='store_true',
+                        help="respeitar a mão única das arestas (coluna do .poly, oneway do OSM)")
+    parser.add_argument('--metrica', default=METRICA_PADRAO,
+                        help="pesos usados nas rotas: comprimento, tempo ou arquivo (padrão: comprimento)")
+    parser.add_argument('--rastro', metavar='ARQUIVO',
+                        help="grava o rastro de cada consulta em JSON Lines (usa um único processo)")
+    parser.add_argument('--sem-caminho', action='store_true', help="omitir a lista de vértices do caminho")
+    parser.add_argument('--compilar', metavar='SAIDA',
+                        help="apenas grava o grafo no formato compilado e termina")
+    args = parser.parse_args(argv)
+    configurar_registro()
+
+    if args.compilar:
+        grafo = carregar_csr(args.grafo, args.direcionado)
+        IndiceComponentes.do_grafo(grafo)
+        grafo.salvar(args.compilar)
+        print(f"Grafo compilado: {grafo.totalVertices} vértices, {grafo.totalArestas} arestas -> {args.compilar}",
+              file=sys.stderr)
+        return 0
+
+    entrada = sys.stdin if args.pares == '-' else open(args.pares, newline='')
+    try:
+        resumo = executar_lote(args.grafo, ler_pares(entrada), sys.stdout, args.processos,
+                               args.direcionado, not args.sem_caminho, args.metrica, args.rastro)
+    except ValueError as erro:
+        parser.error(str(erro))
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+    print(f"{resumo['consultas']} consultas em {resumo['tempo_consultas_s']:.2f} s "
+          f"({resumo['consultas_por_s']:.1f} consultas/s; carga {resumo['tempo_carga_s']:.2f} s)",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
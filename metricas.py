@@ -0,0 +1,65 @@
+import re
+import numpy as np
+
+METROS_POR_UNIDADE = 2.0  # reduzir_escala divide as coordenadas UTM por 2
+VELOCIDADE_PADRAO_KMH = 30.0
+
+# Velocidade típica por tipo de via (tag highway), usada quando não há maxspeed
+VELOCIDADES_VIA_KMH = {
+    'motorway': 100, 'motorway_link': 60, 'trunk': 80, 'trunk_link': 50,
+    'primary': 60, 'primary_link': 40, 'secondary': 50, 'secondary_link': 40,
+    'tertiary': 40, 'tertiary_link': 30, 'unclassified': 30, 'residential': 30,
+    'living_street': 10, 'service': 20, 'track': 15, 'cycleway': 15,
+    'footway': 5, 'pedestrian': 5, 'path': 5, 'steps': 3, 'corridor': 5,
+}
+
+# Redução da velocidade conforme o pavimento (tag surface)
+FATORES_SUPERFICIE = {
+    'paved': 1.0, 'asphalt': 1.0, 'concrete': 1.0, 'paving_stones': 0.9, 'sett': 0.8,
+    'cobblestone': 0.7, 'compacted': 0.8, 'fine_gravel': 0.75, 'gravel': 0.7, 'unpaved': 0.6,
+    'dirt': 0.5, 'earth': 0.5, 'ground': 0.5, 'grass': 0.4, 'sand': 0.4, 'mud': 0.3,
+}
+
+def ler_maxspeed(valor):
+    """Converte o valor da tag maxspeed para km/h; None se não for numérico (ex.: 'BR:urban')"""
+    if not valor:
+        return None
+    correspondencia = re.match(r'\s*(\d+(?:\.\d+)?)\s*(mph|knots)?', valor)
+    if correspondencia is None:
+        return None
+    velocidade = float(correspondencia.group(1))
+    if correspondencia.group(2) == 'mph':
+        velocidade *= 1.609344
+    elif correspondencia.group(2) == 'knots':
+        velocidade *= 1.852
+    return velocidade if velocidade > 0 else None
+
+def velocidade_via(tags):
+    """Velocidade estimada em m/s a partir das tags highway, maxspeed e surface"""
+    velocidade = ler_maxspeed(tags.get('maxspeed'))
+    if velocidade is None:
+        velocidade = VELOCIDADES_VIA_KMH.get(tags.get('highway'), VELOCIDADE_PADRAO_KMH)
+    velocidade *= FATORES_SUPERFICIE.get(tags.get('surface'), 1.0)
+    return velocidade / 3.6
+
+# Funções de personalização: recebem os atributos por aresta e devolvem os pesos
+
+def comprimento(atributos):
+    """Comprimento euclidiano da aresta, nas unidades das coordenadas"""
+    return atributos['comprimento']
+
+def tempo_percurso(atributos):
+    """Tempo de percurso em segundos pela velocidade estimada da via"""
+    return atributos['comprimento'] * METROS_POR_UNIDADE / atributos['velocidade']
+
+def peso_arquivo(atributos):
+    """Peso lido do arquivo .poly; arestas sem peso usam o comprimento"""
+    pesos = atributos['peso_arquivo']
+    return np.where(pesos > 0, pesos, atributos['comprimento'])
+
+METRICAS = {
+    'comprimento': comprimento,
+    'tempo': tempo_percurso,
+    'arquivo': peso_arquivo,
+}
+METRICA_PADRAO = 'comprimento'
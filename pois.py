@@ -0,0 +1,236 @@
+import argparse
+import json
+import sys
+import time
+from itertools import chain
+import numpy as np
+from busca import dijkstra_mais_proximos, dijkstra_multiorigem
+from espacial import GradeEspacial
+from registro import obter_logger, configurar_registro, registrar_fase
+
+log = obter_logger('pois')
+
+TAGS_POI = ('amenity', 'building', 'leisure')  # Tags que tornam um nó ou via do OSM um ponto de interesse
+CAMPOS = ('categorias', 'inicio', 'poi', 'vertices', 'distancias', 'nomes')
+
+def categorias_poi(tags):
+    """Categorias 'chave=valor' de um elemento do OSM, ex.: ['amenity=restaurant']"""
+    return [f"{chave}={tags[chave]}" for chave in TAGS_POI if tags.get(chave)]
+
+def extrair_pois(nos, ways):
+    """POIs dos nós e vias do OSM: (categorias, nome, x, y) nas coordenadas projetadas
+
+    Um POI desenhado como via (prédio, estacionamento, praça) fica no centro
+    dos seus nós.
+    """
+    pois = []
+    for id_interno, tags in nos.pois:
+        pois.append((categorias_poi(tags), tags.get('name', ''), float(nos.x[id_interno]),
+                     float(nos.y[id_interno])))
+    for way, tags in ways:
+        categorias = categorias_poi(tags)
+        if categorias:
+            contorno = np.unique(way)
+            pois.append((categorias, tags.get('name', ''), float(nos.x[contorno].mean()),
+                         float(nos.y[contorno].mean())))
+    return pois
+
+class IndicePOI:
+    """Pontos de interesse por categoria, ancorados em vértices do grafo
+
+    Cada POI do OSM (nó ou via com amenity, building ou leisure) fica
+    ligado ao vértice de via mais próximo, a âncora: prédios e praças não
+    estão sobre as ruas. Os arrays seguem o formato CSR, uma entrada por par
+    (POI, categoria), agrupadas por categoria: as entradas da categoria c
+    são inicio[c]:inicio[c + 1]. `poi` numera os POIs, o que junta as
+    entradas de um POI com mais de uma categoria.
+    """
+
+    def __init__(self, categorias, inicio, poi, vertices, distancias, nomes):
+        self.categorias = categorias  # Nomes 'chave=valor', em ordem
+        self.inicio = inicio          # int64, tamanho len(categorias) + 1
+        self.poi = poi                # int32, por entrada
+        self.vertices = vertices      # int32, âncora de cada entrada
+        self.distancias = distancias  # float64, do POI até a âncora, nas unidades das coordenadas
+        self.nomes = nomes
+
+    @classmethod
+    def montar(cls, pois, x, y, ancoras=None):
+        """Índice a partir de (categorias, nome, x, y), ancorando cada POI no vértice mais próximo
+
+        `ancoras` são os vértices aceitos como âncora (padrão: todos).
+        """
+        ancoras = np.arange(len(x)) if ancoras is None else np.asarray(ancoras)
+        grade = GradeEspacial(ancoras, np.asarray(x)[ancoras], np.asarray(y)[ancoras])
+        entradas = []
+        for numero, (categorias, nome, px, py) in enumerate(pois):
+            vertice, distancia = grade.mais_proximo(px, py)
+            if vertice is None:
+                continue
+            entradas.extend((categoria, nome or '', numero, vertice, distancia) for categoria in categorias)
+        entradas.sort(key=lambda entrada: (entrada[0], entrada[2]))
+        colunas = list(zip(*entradas)) or [(), (), (), (), ()]
+        categorias, contagens = np.unique(np.array(colunas[0], dtype=str), return_counts=True)
+        inicio = np.zeros(len(categorias) + 1, dtype=np.int64)
+        np.cumsum(contagens, out=inicio[1:])
+        return cls(categorias, inicio, np.array(colunas[2], dtype=np.int32), np.array(colunas[3], dtype=np.int32),
+                   np.array(colunas[4], dtype=np.float64), np.array(colunas[1], dtype=str))
+
+    @classmethod
+    def do_osm(cls, nos, ways):
+        """Índice dos POIs do OSM já projetado, com âncoras só nos vértices de vias (highway)"""
+        estradas = [way for way, tags in ways if 'highway' in tags]
+        ancoras = np.unique(np.fromiter(chain.from_iterable(estradas), dtype=np.int64)) if estradas else None
+        return cls.montar(extrair_pois(nos, ways), nos.x, nos.y, ancoras)
+
+    # Formato compilado: arrays em csr.indices
+
+    def anexar(self, csr):
+        """Guarda o índice em csr.indices, para ir ao arquivo compilado"""
+        for campo in CAMPOS:
+            csr.indices[f'poi_{campo}'] = getattr(self, campo)
+
+    @classmethod
+    def do_grafo(cls, csr):
+        """Índice lido de csr.indices; None se o grafo não tem POIs (ex.: veio de um .poly)"""
+        if 'poi_categorias' not in csr.indices:
+            return None
+        return cls(*(csr.indices[f'poi_{campo}'] for campo in CAMPOS))
+
+    # Consultas
+
+    def __len__(self):
+        """Número de POIs"""
+        return len(np.unique(self.poi))
+
+    def contagens(self):
+        """Número de POIs por categoria"""
+        return {str(categoria): int(total)
+                for categoria, total in zip(self.categorias, np.diff(self.inicio))}
+
+    def selecionar(self, consulta):
+        """Entradas da categoria, uma por POI
+
+        A consulta é uma categoria ('amenity=restaurant'), uma chave
+        ('amenity': todos os valores) ou um valor ('restaurant': todas as chaves).
+        """
+        if '=' in consulta:
+            escolhidas = [i for i, categoria in enumerate(self.categorias) if categoria == consulta]
+        else:
+            escolhidas = [i for i, categoria in enumerate(self.categorias) if consulta in categoria.split('=', 1)]
+        if not escolhidas:
+            raise ValueError(f"Nenhum POI da categoria: {consulta}")
+        entradas = np.concatenate([np.arange(self.inicio[i], self.inicio[i + 1]) for i in escolhidas])
+        _, primeiras = np.unique(self.poi[entradas], return_index=True)
+        return entradas[np.sort(primeiras)]
+
+    def descrever(self, entrada):
+        """Dados de uma entrada do índice"""
+        categoria = int(np.searchsorted(self.inicio, entrada, side='right')) - 1
+        return {
+            'poi': int(self.poi[entrada]),
+            'categoria': str(self.categorias[categoria]),
+            'nome': str(self.nomes[entrada]) or None,
+            'vertice': int(self.vertices[entrada]),
+            'distancia_ancora': float(self.distancias[entrada]),
+        }
+
+    def mais_proximos(self, csr, origem, consulta, k=1, **opcoes):
+        """Os k POIs da categoria mais próximos de `origem`, em uma única busca
+
+        Retorna (lista de dicionários em ordem de custo, com o caminho até a
+        âncora, estatisticas); POIs na mesma âncora saem em ordem de número.
+        """
+        entradas = self.selecionar(consulta)
+        por_vertice = {}
+        for entrada in entradas.tolist():
+            por_vertice.setdefault(int(self.vertices[entrada]), []).append(entrada)
+        alvos = {vertice: len(lista) for vertice, lista in por_vertice.items()}
+        encontrados, estatisticas = dijkstra_mais_proximos(csr, origem, alvos, k, **opcoes)
+        resultado = []
+        for vertice, custo, caminho in encontrados:
+            for entrada in por_vertice[vertice][:k - len(resultado)]:
+                resultado.append({**self.descrever(entrada), 'custo': custo, 'caminho': caminho})
+        return resultado, estatisticas
+
+    def areas_atendimento(self, csr, consulta, **opcoes):
+        """POI da categoria mais próximo de cada vértice, em uma única busca com todos como origem
+
+        No grafo direcionado o custo é o do vértice até o POI (a busca corre
+        sobre o grafo transposto). Retorna (custos, entradas, estatisticas):
+        arrays por vértice com o custo até o POI (INF se nenhum é alcançável)
+        e a entrada do índice do POI (-1 se nenhum).
+        """
+        entradas = self.selecionar(consulta)
+        # POIs com a mesma âncora são indistinguíveis pela rede: vale o primeiro
+        vertices, primeiras = np.unique(self.vertices[entradas], return_index=True)
+        custos, donos, estatisticas = dijkstra_multiorigem(csr.transposto(), vertices.tolist(), **opcoes)
+        donos = np.array(donos, dtype=np.int64)
+        return (np.array(custos, dtype=np.float64),
+                np.where(donos >= 0, entradas[primeiras][donos], -1), estatisticas)
+
+def main(argv=None):
+    from grafo import carregar_csr
+
+    parser = argparse.ArgumentParser(
+        prog="dijkstra.py pois",
+        description="Consulta os pontos de interesse (amenity, building, leisure) de um grafo do OSM")
+    parser.add_argument('grafo', help="arquivo .osm ou grafo compilado a partir dele")
+    parser.add_argument('--categoria', help="categoria (amenity=restaurant), chave (amenity) ou valor (restaurant); "
+                                             "sem ela, lista as categorias")
+    parser.add_argument('--origem', type=int, help="vértice de partida dos k mais próximos")
+    parser.add_argument('-k', type=int, default=1, help="número de POIs mais próximos (padrão: 1)")
+    parser.add_argument('--atendimento', action='store_true',
+                        help="atribui cada vértice ao POI mais próximo e resume a área de cada um")
+    parser.add_argument('--metrica', default=None, help="pesos da busca (padrão: a métrica do grafo)")
+    args = parser.parse_args(argv)
+    configurar_registro()
+
+    grafo = carregar_csr(args.grafo)
+    if args.metrica:
+        try:
+            grafo = grafo.com_metrica(args.metrica)
+        except ValueError as erro:
+            parser.error(str(erro))
+    indice = IndicePOI.do_grafo(grafo)
+    if indice is None:
+        parser.error("o grafo não tem POIs (use um .osm ou um grafo compilado a partir dele)")
+    if args.categoria is None:
+        for categoria, total in sorted(indice.contagens().items(), key=lambda item: (-item[1], item[0])):
+            print(f"{total:6d}  {categoria}")
+        return 0
+    if args.origem is None and not args.atendimento:
+        parser.error("informe --origem ou --atendimento")
+    if args.origem is not None and not 0 <= args.origem < grafo.totalVertices:
+        parser.error(f"vértice inexistente: {args.origem}")
+
+    try:
+        if args.origem is not None:
+            resultado, estatisticas = indice.mais_proximos(grafo, args.origem, args.categoria, args.k)
+            for item in resultado:
+                print(json.dumps(item, ensure_ascii=False))
+        if args.atendimento:
+            inicio = time.perf_counter()
+            custos, entradas, estatisticas = indice.areas_atendimento(grafo, args.categoria)
+            registrar_fase(log, 'atendimento', (time.perf_counter() - inicio) * 1000, categoria=args.categoria)
+            alcancados = entradas >= 0
+            selecionadas = indice.selecionar(args.categoria)
+            linha = np.full(len(indice.poi), -1, dtype=np.int64)
+            linha[selecionadas] = np.arange(len(selecionadas))
+            linhas = linha[entradas[alcancados]]
+            atendidos = np.bincount(linhas, minlength=len(selecionadas))
+            maximos = np.zeros(len(selecionadas))
+            np.maximum.at(maximos, linhas, custos[alcancados])
+            for i, entrada in enumerate(selecionadas.tolist()):
+                print(json.dumps({**indice.descrever(entrada), 'vertices_atendidos': int(atendidos[i]),
+                                  'custo_maximo': float(maximos[i]) if atendidos[i] else None},
+                                 ensure_ascii=False))
+            print(f"{int(alcancados.sum())} de {grafo.totalVertices} vértices alcançam um POI", file=sys.stderr)
+    except ValueError as erro:
+        parser.error(str(erro))
+    print(f"Busca: {estatisticas['tempo_ms']:.1f} ms, {estatisticas['nos_explorados']} vértices fechados",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import functools
+import json
+import threading
+import time
+
+class RastroBusca:
+    """Eventos de uma busca, coletados pelos callbacks ao_fechar e ao_relaxar dos motores
+
+    Cada vértice fechado é guardado com o instante (ns desde o início do
+    rastro) e o custo; cada relaxação, com a aresta e o novo custo.
+    """
+
+    def __init__(self):
+        self.inicio_ns = time.perf_counter_ns()
+        self.fechados = []  # [instante_ns, vértice, custo]
+        self.relaxacoes = []  # [u, v, custo]
+
+    def ao_fechar(self, u, custo):
+        self.fechados.append([time.perf_counter_ns() - self.inicio_ns, u, custo])
+
+    def ao_relaxar(self, u, v, custo):
+        self.relaxacoes.append([u, v, custo])
+
+    def callbacks(self):
+        """Argumentos nomeados a repassar ao motor de busca"""
+        return {'ao_fechar': self.ao_fechar, 'ao_relaxar': self.ao_relaxar}
+
+class ExportadorRastros:
+    """Grava um rastro por consulta em JSON Lines, para análise fora do programa
+
+    Cada linha traz o motor, os argumentos da consulta (sem o grafo), as
+    estatísticas e os eventos do RastroBusca. Pode ser usado por várias
+    threads; as linhas são acrescentadas ao arquivo.
+    """
+
+    def __init__(self, caminho_arquivo):
+        self.caminho_arquivo = caminho_arquivo
+        self.arquivo = open(caminho_arquivo, 'a', encoding='utf-8')
+        self.trava = threading.Lock()
+        self.consultas = 0
+
+    def envolver(self, funcao, motor=None):
+        """Versão de `funcao` (um motor de busca) que grava o rastro de cada chamada
+
+        O primeiro argumento posicional é o grafo e não entra no registro.
+        """
+        motor = motor or funcao.__name__
+
+        @functools.wraps(funcao)
+        def rastreada(grafo, *argumentos, **opcoes):
+            rastro = RastroBusca()
+            resultado = funcao(grafo, *argumentos, **opcoes, **rastro.callbacks())
+            self.gravar(motor, argumentos, resultado, rastro)
+            return resultado
+        return rastreada
+
+    def gravar(self, motor, argumentos, resultado, rastro):
+        partes = resultado if isinstance(resultado, tuple) else (resultado,)
+        estatisticas = next((parte for parte in partes if isinstance(parte, dict) and 'nos_explorados' in parte),
+                            None)
+        registro = {
+            'motor': motor,
+            'argumentos': [_serializavel(argumento) for argumento in argumentos],
+            'estatisticas': estatisticas,
+            'fechados': rastro.fechados,
+            'relaxacoes': rastro.relaxacoes,
+        }
+        linha = json.dumps(registro, ensure_ascii=False, default=float)
+        with self.trava:
+            self.arquivo.write(linha + "\n")
+            self.arquivo.flush()
+            self.consultas += 1
+
+    def fechar(self):
+        with self.trava:
+            self.arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+def _serializavel(valor):
+    # Listas grandes (ex.: coordenadas por vértice) ficam só com o tamanho
+    if isinstance(valor, (list, tuple)) and len(valor) > 64:
+        return f"<{len(valor)} itens>"
+    if isinstance(valor, (int, float, str, bool)) or valor is None:
+        return valor
+    if isinstance(valor, (list, tuple)):
+        return [_serializavel(item) for item in valor]
+    return repr(valor)
@@ -0,0 +1,70 @@
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+
+RAIZ = 'dijkstra'  # Logger pai de todos os módulos do programa
+VARIAVEL_NIVEL = 'DIJKSTRA_LOG'  # ex.: DEBUG, INFO, WARNING
+VARIAVEL_FORMATO = 'DIJKSTRA_LOG_FORMATO'  # 'texto' ou 'json'
+FORMATO_TEXTO = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Atributos que todo LogRecord já tem; o resto veio de `extra`
+_CAMPOS_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+def obter_logger(nome):
+    """Logger de um módulo, filho de RAIZ"""
+    return logging.getLogger(f"{RAIZ}.{nome}")
+
+class FormatadorJSON(logging.Formatter):
+    """Um objeto JSON por linha, com os campos passados em `extra` no primeiro nível"""
+
+    def format(self, record):
+        dados = {
+            'instante': record.created,
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        dados.update((chave, valor) for chave, valor in vars(record).items() if chave not in _CAMPOS_PADRAO)
+        if record.exc_info:
+            dados['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+def configurar_registro(nivel=None, formato=None, destino=None):
+    """Configura a saída dos registros do programa (padrão: variáveis de ambiente)
+
+    Sem DIJKSTRA_LOG, só avisos e erros são emitidos, e as mensagens de
+    nível DEBUG nem chegam a ser formatadas. Os registros vão para a saída
+    de erro, em texto ou JSON por linha (DIJKSTRA_LOG_FORMATO=json).
+    """
+    nivel = (nivel or os.environ.get(VARIAVEL_NIVEL) or 'WARNING').upper()
+    formato = (formato or os.environ.get(VARIAVEL_FORMATO) or 'texto').lower()
+    manipulador = logging.StreamHandler(destino or sys.stderr)
+    manipulador.setFormatter(FormatadorJSON() if formato == 'json' else logging.Formatter(FORMATO_TEXTO))
+    logger = logging.getLogger(RAIZ)
+    logger.setLevel(nivel)
+    logger.handlers[:] = [manipulador]
+    logger.propagate = False
+    return logger
+
+def registrar_fase(logger, fase, duracao_ms, nivel=logging.INFO, **campos):
+    """Emite o registro estruturado de uma fase já medida"""
+    if logger.isEnabledFor(nivel):
+        detalhes = " ".join(f"{chave}={valor}" for chave, valor in campos.items())
+        logger.log(nivel, "%s: %.1f ms %s", fase, duracao_ms, detalhes,
+                   extra={'fase': fase, 'duracao_ms': duracao_ms, **campos})
+
+@contextlib.contextmanager
+def cronometrar(logger, fase, nivel=logging.INFO, **campos):
+    """Mede o bloco e emite um registro estruturado com `fase`, `duracao_ms` e `campos`
+
+    O dicionário entregue ao bloco aceita campos calculados lá dentro (ex.:
+    nós explorados). Com o nível desligado, o custo é ler o relógio.
+    """
+    inicio = time.perf_counter_ns()
+    try:
+        yield campos
+    finally:
+        registrar_fase(logger, fase, (time.perf_counter_ns() - inicio) / 1e6, nivel, **campos)
@@ -0,0 +1,143 @@
+import os
+import time
+from multiprocessing import Pool
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from PIL import Image
+from colunas import TabelaVertices, TabelaArestas
+from grafo import normalizar_colunas, normalizar_posicoes
+
+MARGEM = 0.02  # Margem em torno do grafo, em coordenadas normalizadas
+
+class RenderizadorRotas:
+    """Renderiza rotas sobre o grafo sem janela (backends Agg e SVG)
+
+    A camada de fundo (todas as arestas e vértices) é desenhada uma única
+    vez; cada rota só restaura esse fundo e desenha o próprio traçado.
+    """
+
+    def __init__(self, vertices, arestas, largura_px=1600, altura_px=1000, dpi=100,
+                 tamanho_vertices=1):
+        self.largura_px = largura_px
+        self.altura_px = altura_px
+        self.dpi = dpi
+        vertices = TabelaVertices.de_objetos(vertices)
+        arestas = TabelaArestas.de_objetos(arestas)
+        self.posicoes = normalizar_posicoes(vertices)
+        self.pontos = np.column_stack(normalizar_colunas(vertices))
+        # Segmentos das arestas cujos dois extremos existem, a partir das colunas
+        linha_orig = vertices.linhas(arestas.orig)
+        linha_dest = vertices.linhas(arestas.dest)
+        validas = (linha_orig >= 0) & (linha_dest >= 0)
+        self.segmentos = np.stack([self.pontos[linha_orig[validas]], self.pontos[linha_dest[validas]]], axis=1)
+        self.tamanho_vertices = tamanho_vertices
+        self.fundo = self.renderizar_fundo()
+        self._figura = None  # Figura reutilizada entre rotas, criada sob demanda
+
+    def __getstate__(self):
+        # A figura do matplotlib não é enviada para outros processos
+        estado = self.__dict__.copy()
+        estado['_figura'] = None
+        return estado
+
+    def nova_figura(self):
+        """Cria uma figura sem pyplot, com os eixos cobrindo toda a imagem"""
+        figura = Figure(figsize=(self.largura_px / self.dpi, self.altura_px / self.dpi), dpi=self.dpi)
+        canvas = FigureCanvasAgg(figura)
+        ax = figura.add_axes([0, 0, 1, 1])
+        ax.set_xlim(-MARGEM, 1 + MARGEM)
+        ax.set_ylim(-MARGEM, 1 + MARGEM)
+        ax.set_axis_off()
+        return figura, canvas, ax
+
+    def renderizar_fundo(self):
+        """Desenha arestas e vértices uma vez e guarda os pixels RGBA"""
+        figura, canvas, ax = self.nova_figura()
+        ax.add_collection(LineCollection(self.segmentos, colors='black', linewidths=0.5))
+        if len(self.pontos) and self.tamanho_vertices > 0:
+            ax.scatter(self.pontos[:, 0], self.pontos[:, 1], s=self.tamanho_vertices, c='lightblue')
+        canvas.draw()
+        return np.asarray(canvas.buffer_rgba()).copy()
+
+    def preparar_figura(self):
+        """Figura com o fundo pronto e os artistas da rota, reaproveitada entre rotas"""
+        if self._figura is None:
+            figura, canvas, ax = self.nova_figura()
+            figura.figimage(self.fundo, origin='upper')
+            linha, = ax.plot([], [], color='red', linewidth=2, animated=True)
+            origem, = ax.plot([], [], 'o', color='green', markersize=6, animated=True)
+            destino, = ax.plot([], [], 'o', color='red', markersize=6, animated=True)
+            canvas.draw()
+            regiao_fundo = canvas.copy_from_bbox(figura.bbox)
+            self._figura = (figura, canvas, ax, linha, origem, destino, regiao_fundo)
+        return self._figura
+
+    def renderizar(self, caminho, arquivo):
+        """Renderiza uma rota (lista de ids) em .png ou .svg, conforme a extensão"""
+        figura, canvas, ax, linha, origem, destino, regiao_fundo = self.preparar_figura()
+        pontos = np.array([self.posicoes[v] for v in caminho if v in self.posicoes], dtype=float).reshape(-1, 2)
+        linha.set_data(pontos[:, 0], pontos[:, 1])
+        origem.set_data(pontos[:1, 0], pontos[:1, 1])
+        destino.set_data(pontos[-1:, 0], pontos[-1:, 1])
+
+        if arquivo.lower().endswith('.svg'):
+            # No SVG o fundo entra como imagem embutida e a rota como vetor
+            for artista in (linha, origem, destino):
+                artista.set_animated(False)
+            try:
+                figura.savefig(arquivo, format='svg')
+            finally:
+                for artista in (linha, origem, destino):
+                    artista.set_animated(True)
+            return arquivo
+
+        canvas.restore_region(regiao_fundo)
+        for artista in (linha, origem, destino):
+            ax.draw_artist(artista)
+        # Compressão rápida: a codificação PNG domina o tempo por imagem
+        Image.fromarray(np.asarray(canvas.buffer_rgba())).save(arquivo, 'PNG', compress_level=1)
+        return arquivo
+
+_renderizador = None  # Renderizador de cada processo de trabalho
+
+def _iniciar_processo(renderizador):
+    global _renderizador
+    _renderizador = renderizador
+
+def _renderizar_tarefa(tarefa):
+    caminho, arquivo = tarefa
+    return _renderizador.renderizar(caminho, arquivo)
+
+def renderizar_rotas(grafo, rotas, pasta_saida, formato='png', processos=None,
+                     largura_px=1600, altura_px=1000, dpi=100):
+    """Renderiza várias rotas do grafo carregado em paralelo
+
+    `grafo` é qualquer objeto com `vertices` e `arestas` (ex.: GrafoCarregado)
+    e `rotas` é uma lista de caminhos (listas de ids). O fundo é preparado
+    uma vez e enviado a cada processo na inicialização. Retorna os arquivos
+    gerados e a taxa em imagens por segundo.
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    inicio = time.perf_counter()
+    renderizador = RenderizadorRotas(grafo.vertices, grafo.arestas, largura_px, altura_px, dpi)
+    tempo_fundo = time.perf_counter() - inicio
+
+    tarefas = [(caminho, os.path.join(pasta_saida, f"rota_{i:05d}.{formato}"))
+               for i, caminho in enumerate(rotas)]
+    inicio_rotas = time.perf_counter()
+    if processos == 1 or len(tarefas) <= 1:
+        arquivos = [renderizador.renderizar(caminho, arquivo) for caminho, arquivo in tarefas]
+    else:
+        with Pool(processos, initializer=_iniciar_processo, initargs=(renderizador,)) as pool:
+            arquivos = pool.map(_renderizar_tarefa, tarefas, chunksize=max(1, len(tarefas) // 64))
+    tempo_rotas = time.perf_counter() - inicio_rotas
+
+    return {
+        'arquivos': arquivos,
+        'imagens': len(arquivos),
+        'tempo_fundo_s': tempo_fundo,
+        'tempo_rotas_s': tempo_rotas,
+        'imagens_por_s': len(arquivos) / tempo_rotas if tempo_rotas > 0 else float('inf'),
+    }
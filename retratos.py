@@ -0,0 +1,325 @@
+import heapq
+import time
+from itertools import chain, count
+import numpy as np
+from busca import (INF, BuscaCancelada, contadores_fila, espaco_da_thread, montar_estatisticas,
+                   reconstruir_caminho)
+from colunas import FLAG_MAO_UNICA, FLAG_VELOCIDADE, TabelaVertices, TabelaArestas
+from grafo import GrafoCSR
+from metricas import METRICAS, METRICA_PADRAO, VELOCIDADE_PADRAO_KMH
+
+LIMITE_HISTORICO = 200  # Retratos guardados para desfazer; os mais antigos saem primeiro
+
+class BaseRetratos:
+    """Grafo base compartilhado por todos os retratos; as tabelas não são mais alteradas
+
+    O CSR completo da base é montado uma vez; as visões direcionada e não
+    direcionada saem dele e servem a consultas em qualquer retrato.
+    """
+
+    def __init__(self, vertices, arestas):
+        self.vertices = vertices
+        self.arestas = arestas
+        self.chaves = count(len(arestas))  # Chaves das arestas novas, depois das linhas da base
+        self._csr = None
+
+    def csr(self, direcionado=False):
+        if self._csr is None:
+            self._csr = GrafoCSR.de_arestas(self.vertices, self.arestas)
+        return self._csr.visao_sentido(direcionado)
+
+class Retrato:
+    """Versão imutável do grafo: a base compartilhada mais os deltas das edições
+
+    Cada edição devolve um retrato novo que só copia os deltas (linhas da
+    base removidas, arestas e vértices acrescentados, vértices da base
+    removidos), nunca as tabelas da base; desfazer e refazer são trocar de
+    retrato. As arestas têm uma chave estável: a linha, na base, ou um
+    número novo, o que permite comparar dois retratos pelos deltas.
+    """
+    __slots__ = ('base', 'removidas', 'novas', 'removidos', 'novos', '_arcos')
+
+    def __init__(self, base, removidas=frozenset(), novas=(), removidos=frozenset(), novos=()):
+        self.base = base
+        self.removidas = removidas  # Linhas da base
+        self.novas = novas          # (chave, orig, dest, dist, velocidade ou None, mão única)
+        self.removidos = removidos  # Ids de vértices da base
+        self.novos = novos          # (id, x, y)
+        self._arcos = {}            # (direcionado, métrica) -> (arcos bloqueados da base, arcos novos)
+
+    @classmethod
+    def do_grafo(cls, vertices, arestas):
+        """Retrato sem edições sobre uma base com as tabelas dadas"""
+        return cls(BaseRetratos(vertices, arestas))
+
+    def _com(self, removidas=None, novas=None, removidos=None, novos=None):
+        return Retrato(self.base,
+                       self.removidas if removidas is None else removidas,
+                       self.novas if novas is None else novas,
+                       self.removidos if removidos is None else removidos,
+                       self.novos if novos is None else novos)
+
+    @property
+    def edicoes(self):
+        """Tamanho dos deltas em relação à base"""
+        return len(self.removidas) + len(self.novas) + len(self.removidos) + len(self.novos)
+
+    # Edições: cada uma devolve um retrato novo
+
+    def com_vertice(self, vertice_id, x, y):
+        return self._com(novos=self.novos + ((vertice_id, x, y),))
+
+    def com_aresta(self, orig, dest, dist, velocidade=None, mao_unica=False):
+        return self._com(novas=self.novas + ((next(self.base.chaves), orig, dest, dist, velocidade, mao_unica),))
+
+    def sem_aresta(self, orig, dest, ambos_sentidos=False):
+        """Retrato sem a primeira aresta orig -> dest (na ordem das tabelas); o mesmo se não houver"""
+        arestas = self.base.arestas
+        mascara = (arestas.orig == orig) & (arestas.dest == dest)
+        if ambos_sentidos:
+            mascara |= (arestas.orig == dest) & (arestas.dest == orig)
+        for linha in np.flatnonzero(mascara).tolist():
+            if linha not in self.removidas:
+                return self._com(removidas=self.removidas | {linha})
+        for i, (_, a, b, *_) in enumerate(self.novas):
+            if (a, b) == (orig, dest) or (ambos_sentidos and (a, b) == (dest, orig)):
+                return self._com(novas=self.novas[:i] + self.novas[i + 1:])
+        return self
+
+    def sem_vertice(self, vertice_id):
+        """Retrato sem o vértice e as arestas que tocam nele"""
+        arestas = self.base.arestas
+        incidentes = set(np.flatnonzero((arestas.orig == vertice_id) | (arestas.dest == vertice_id)).tolist())
+        novas = tuple(aresta for aresta in self.novas if vertice_id not in (aresta[1], aresta[2]))
+        novos = tuple(vertice for vertice in self.novos if vertice[0] != vertice_id)
+        removidos = self.removidos
+        if len(novos) == len(self.novos):
+            removidos = removidos | {vertice_id}
+        return self._com(self.removidas | incidentes, novas, removidos, novos)
+
+    # Leitura
+
+    def tabelas(self):
+        """Tabelas de vértices e arestas deste retrato (novas; as da base não mudam)"""
+        base = self.base
+        manter = ~np.isin(base.vertices.id, np.fromiter(self.removidos, dtype=np.int64))
+        vertices = TabelaVertices(
+            id=np.concatenate([base.vertices.id[manter], [v[0] for v in self.novos]]),
+            x=np.concatenate([base.vertices.x[manter], [v[1] for v in self.novos]]),
+            y=np.concatenate([base.vertices.y[manter], [v[2] for v in self.novos]]))
+        manter = np.ones(len(base.arestas), dtype=bool)
+        manter[np.fromiter(self.removidas, dtype=np.int64)] = False
+        arestas = TabelaArestas(
+            orig=np.concatenate([base.arestas.orig[manter], [a[1] for a in self.novas]]),
+            dest=np.concatenate([base.arestas.dest[manter], [a[2] for a in self.novas]]),
+            dist=np.concatenate([base.arestas.dist[manter], [a[3] for a in self.novas]]),
+            velocidade=np.concatenate([base.arestas.velocidade[manter], [a[4] or 0.0 for a in self.novas]]),
+            flags=np.concatenate([base.arestas.flags[manter],
+                                  [(FLAG_VELOCIDADE if a[4] else 0) | (FLAG_MAO_UNICA if a[5] else 0)
+                                   for a in self.novas]]).astype(np.uint8))
+        return vertices, arestas
+
+    def diferenca(self, outro):
+        """O que muda de self para `outro`: (pares (orig, dest) de arestas que saem ou entram, vértices que
+        saem, vértices que entram como (id, x, y))"""
+        arestas = self.base.arestas
+        linhas = sorted(self.removidas ^ outro.removidas)
+        pares = list(zip(arestas.orig[linhas].tolist(), arestas.dest[linhas].tolist()))
+        minhas = {aresta[0]: aresta for aresta in self.novas}
+        dele = {aresta[0]: aresta for aresta in outro.novas}
+        pares.extend((aresta[1], aresta[2]) for chave, aresta in minhas.items() if chave not in dele)
+        pares.extend((aresta[1], aresta[2]) for chave, aresta in dele.items() if chave not in minhas)
+        saem = sorted(outro.removidos - self.removidos) + [v[0] for v in self.novos if v not in outro.novos]
+        entram = [(int(vertice.id), vertice.x, vertice.y) for vertice in
+                  (self.base.vertices.por_id(vid) for vid in sorted(self.removidos - outro.removidos))]
+        entram.extend(v for v in outro.novos if v not in self.novos)
+        return pares, saem, entram
+
+    def arcos(self, direcionado=False, metrica=METRICA_PADRAO):
+        """Delta em arcos sobre o CSR da base: ({u: posições bloqueadas}, {u: [(v, peso)]} dos arcos novos)
+
+        A aresta removida bloqueia, na linha de `orig` do CSR, o primeiro arco
+        para `dest` com o mesmo peso do arquivo (e o contrário, se a visão
+        tem o arco de volta); só duplicatas exatas ficam indistinguíveis.
+        """
+        chave = (direcionado, metrica)
+        if chave not in self._arcos:
+            csr = self.base.csr(direcionado)
+            arestas = self.base.arestas
+            peso_arquivo = csr.atributos['peso_arquivo']
+            bloqueados = {}
+            mao_unica = arestas.mao_unica()
+            for linha in self.removidas:
+                orig, dest, dist = int(arestas.orig[linha]), int(arestas.dest[linha]), float(arestas.dist[linha])
+                sentidos = [(orig, dest)] if direcionado and mao_unica[linha] else [(orig, dest), (dest, orig)]
+                for u, v in sentidos:
+                    if u >= csr.totalVertices:
+                        continue
+                    do_vertice = bloqueados.setdefault(u, set())
+                    for i in range(csr.inicio[u], csr.inicio[u + 1]):
+                        if csr.destinos[i] == v and peso_arquivo[i] == dist and i not in do_vertice:
+                            do_vertice.add(i)
+                            break
+            novos = {}
+            if self.novas:
+                coordenadas = {v[0]: (v[1], v[2]) for v in self.novos}
+                vivos = [a for a in self.novas if self._existe(a[1], coordenadas) and self._existe(a[2], coordenadas)]
+                pontos = [(self._coordenadas(a[1], coordenadas), self._coordenadas(a[2], coordenadas)) for a in vivos]
+                atributos = {
+                    'comprimento': np.array([np.hypot(p[0] - q[0], p[1] - q[1]) for p, q in pontos]),
+                    'velocidade': np.array([a[4] or VELOCIDADE_PADRAO_KMH / 3.6 for a in vivos]),
+                    'peso_arquivo': np.array([a[3] for a in vivos], dtype=np.float64),
+                }
+                pesos = np.asarray(METRICAS[metrica](atributos), dtype=np.float64).tolist() if vivos else []
+                for aresta, peso in zip(vivos, pesos):
+                    novos.setdefault(aresta[1], []).append((aresta[2], peso))
+                    if not (direcionado and aresta[5]):
+                        novos.setdefault(aresta[2], []).append((aresta[1], peso))
+            self._arcos[chave] = (bloqueados, novos)
+        return self._arcos[chave]
+
+    def _existe(self, vertice_id, coordenadas):
+        if vertice_id in coordenadas:
+            return True
+        return vertice_id not in self.removidos and self.base.vertices.posicao(vertice_id) >= 0
+
+    def _coordenadas(self, vertice_id, coordenadas):
+        if vertice_id in coordenadas:
+            return coordenadas[vertice_id]
+        csr = self.base.csr()
+        return float(csr.x[vertice_id]), float(csr.y[vertice_id])
+
+class HistoricoRetratos:
+    """Retratos em sequência para desfazer e refazer; cada um guarda só os seus deltas"""
+
+    def __init__(self, retrato, limite=LIMITE_HISTORICO):
+        self.retratos = [retrato]
+        self.posicao = 0
+        self.limite = limite
+
+    @property
+    def atual(self):
+        return self.retratos[self.posicao]
+
+    def registrar(self, retrato):
+        """Acrescenta o retrato de uma edição; as versões desfeitas depois da atual são descartadas"""
+        del self.retratos[self.posicao + 1:]
+        self.retratos.append(retrato)
+        if len(self.retratos) > self.limite:
+            del self.retratos[0]
+        self.posicao = len(self.retratos) - 1
+
+    def pode_desfazer(self):
+        return self.posicao > 0
+
+    def pode_refazer(self):
+        return self.posicao < len(self.retratos) - 1
+
+    def desfazer(self):
+        if self.pode_desfazer():
+            self.posicao -= 1
+        return self.atual
+
+    def refazer(self):
+        if self.pode_refazer():
+            self.posicao += 1
+        return self.atual
+
+def dijkstra_retrato(retrato, inicio, fim, metrica=METRICA_PADRAO, direcionado=False, cancelado=None,
+                     progresso=None, intervalo_progresso=200, ao_fechar=None, ao_relaxar=None, espaco=None):
+    """Dijkstra em um retrato, lendo o CSR da base e os deltas sem montar o grafo do retrato
+
+    Arcos da base bloqueados pelo retrato são pulados, e os arcos novos de
+    cada vértice vêm depois dos da base. Retorna o mesmo que dijkstra_csr.
+    """
+    inicio_ns = time.perf_counter_ns()
+    csr = retrato.base.csr(direcionado).com_metrica(metrica)
+    bloqueados, novos = retrato.arcos(direcionado, metrica)
+    ini = memoryview(csr.inicio)
+    destinos = memoryview(csr.destinos)
+    pesos = memoryview(csr.pesos)
+    totalBase = len(ini) - 1
+    totalVertices = max([totalBase, inicio + 1, fim + 1] + [v[0] + 1 for v in retrato.novos])
+
+    espaco = espaco if espaco is not None else espaco_da_thread()
+    with espaco.reservar(totalVertices) as geracao:
+        dist, prev, marca, fechado = espaco.dist, espaco.prev, espaco.marca, espaco.fechado
+        dist[inicio] = 0.0
+        prev[inicio] = -1
+        marca[inicio] = geracao
+        fila = [(0.0, inicio)]
+        nos_explorados = 0
+        remocoes = 0
+        fronteira_maxima = 0
+        arestas_relaxadas = 0
+
+        while fila:
+            if len(fila) > fronteira_maxima:
+                fronteira_maxima = len(fila)
+            d, u = heapq.heappop(fila)
+            remocoes += 1
+            if fechado[u] == geracao:
+                continue
+            fechado[u] = geracao
+            nos_explorados += 1
+            if ao_fechar is not None:
+                ao_fechar(u, d)
+
+            if nos_explorados % intervalo_progresso == 0:
+                if cancelado is not None and cancelado.is_set():
+                    raise BuscaCancelada()
+                if progresso is not None:
+                    progresso(nos_explorados)
+
+            if u == fim:
+                break
+
+            # Arcos da base (menos os bloqueados) e depois os novos, sem montar listas por vértice
+            if u < totalBase:
+                primeira, ultima = ini[u], ini[u + 1]
+                vizinhos = zip(destinos[primeira:ultima], pesos[primeira:ultima])
+                fora = bloqueados.get(u)
+                if fora:
+                    vizinhos = [(v, peso) for i, (v, peso) in enumerate(vizinhos, primeira) if i not in fora]
+                arestas_relaxadas += ultima - primeira
+            else:
+                vizinhos = ()
+            extras = novos.get(u)
+            if extras:
+                vizinhos = chain(vizinhos, extras)
+                arestas_relaxadas += len(extras)
+            for v, peso in vizinhos:
+                nd = d + peso
+                if marca[v] != geracao or nd < dist[v]:
+                    marca[v] = geracao
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(fila, (nd, v))
+                    if ao_relaxar is not None:
+                        ao_relaxar(u, v, nd)
+
+        contadores = contadores_fila(remocoes, nos_explorados, fila, fronteira_maxima, arestas_relaxadas)
+        if marca[fim] != geracao:
+            return None, INF, montar_estatisticas(inicio_ns, nos_explorados, INF, **contadores)
+
+        custo_total = dist[fim]
+        caminho = reconstruir_caminho(prev, fim)
+    estatisticas = montar_estatisticas(inicio_ns, nos_explorados, custo_total, **contadores)
+    return caminho, custo_total, estatisticas
+
+def comparar_retratos(retratos, inicio, fim, metrica=METRICA_PADRAO, direcionado=False, cancelado=None,
+                      progresso=None):
+    """A mesma rota em cada retrato, sobre a base compartilhada
+
+    Retorna (lista de {'caminho', 'custo'} na ordem dos retratos, estatísticas
+    somadas: tempo e vértices fechados).
+    """
+    inicio_ns = time.perf_counter_ns()
+    rotas = []
+    explorados = 0
+    for retrato in retratos:
+        caminho, custo, estatisticas = dijkstra_retrato(retrato, inicio, fim, metrica, direcionado,
+                                                        cancelado=cancelado, progresso=progresso)
+        rotas.append({'caminho': caminho or [], 'custo': custo})
+        explorados += estatisticas['nos_explorados']
+    return rotas, montar_estatisticas(inicio_ns, explorados, rotas[0]['custo'] if rotas else INF)
@@ -0,0 +1,355 @@
+import argparse
+import heapq
+import random
+import sys
+import time
+import numpy as np
+from busca import INF, montar_estatisticas
+from componentes import IndiceComponentes
+from grafo import carregar_csr
+from metricas import METRICA_PADRAO
+from registro import obter_logger, configurar_registro, registrar_fase
+
+log = obter_logger('rotulos')
+
+AMOSTRAS_ORDEM = 32  # Árvores de caminhos mínimos usadas para ordenar os hubs
+CAMPOS = ('inicio', 'hubs', 'dist', 'pais')
+CAMPOS_DISCO = ('tamanhos', 'deltas', 'dist', 'pais')  # Rótulos comprimidos no grafo compilado
+
+def _arvore_caminhos(inicio, destinos, pesos, raiz):
+    """Dijkstra completo: ordem de fechamento e predecessor de cada vértice alcançado"""
+    dist = {raiz: 0.0}
+    pai = {raiz: -1}
+    fechados = []
+    visitados = set()
+    fila = [(0.0, raiz)]
+    while fila:
+        d, u = heapq.heappop(fila)
+        if u in visitados:
+            continue
+        visitados.add(u)
+        fechados.append(u)
+        for i in range(inicio[u], inicio[u + 1]):
+            v = destinos[i]
+            nd = d + pesos[i]
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                pai[v] = u
+                heapq.heappush(fila, (nd, v))
+    return fechados, pai
+
+def ordem_hubs(csr, amostras=AMOSTRAS_ORDEM, semente=0):
+    """Vértices do mais ao menos importante, na ordem em que viram hubs
+
+    Soma o tamanho da subárvore de cada vértice em árvores de caminhos
+    mínimos a partir de raízes sorteadas: como numa ordem de contração,
+    vértices por onde passam muitos caminhos vêm primeiro e podam mais as
+    buscas seguintes. Empates pelo grau.
+    """
+    n = csr.totalVertices
+    inicio = memoryview(np.asarray(csr.inicio))
+    destinos = memoryview(np.asarray(csr.destinos))
+    pesos = memoryview(np.asarray(csr.pesos))
+    cobertura = np.zeros(n)
+    sorteio = random.Random(semente)
+    for _ in range(min(amostras, n)):
+        fechados, pai = _arvore_caminhos(inicio, destinos, pesos, sorteio.randrange(n))
+        tamanho = dict.fromkeys(fechados, 1)
+        for v in reversed(fechados):
+            p = pai[v]
+            if p >= 0:
+                tamanho[p] += tamanho[v]
+        for v, t in tamanho.items():
+            cobertura[v] += t
+    grau = np.diff(np.asarray(csr.inicio))
+    return np.lexsort((np.arange(n), -grau, -cobertura)).astype(np.int32)
+
+def _busca_podada(inicio, destinos, pesos, raiz, posto, rotulo_raiz, hubs, dists, pais, provisorio):
+    """Dijkstra a partir do hub `raiz` que não expande vértices já cobertos por hubs anteriores
+
+    `rotulo_raiz` é o rótulo do lado oposto da raiz; `hubs`, `dists` e
+    `pais` são os rótulos que recebem a entrada (posto, distância, pai).
+    """
+    for h, d in zip(*rotulo_raiz):
+        provisorio[h] = d
+    dist = {raiz: 0.0}
+    pai = {raiz: -1}
+    visitados = set()
+    fila = [(0.0, raiz)]
+    while fila:
+        d, u = heapq.heappop(fila)
+        if u in visitados:
+            continue
+        visitados.add(u)
+        # Poda: algum hub anterior já dá distância tão boa quanto d
+        coberto = False
+        for h, dh in zip(hubs[u], dists[u]):
+            if provisorio[h] + dh <= d:
+                coberto = True
+                break
+        if coberto:
+            continue
+        hubs[u].append(posto)
+        dists[u].append(d)
+        pais[u].append(pai[u])
+        for i in range(inicio[u], inicio[u + 1]):
+            v = destinos[i]
+            nd = d + pesos[i]
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                pai[v] = u
+                heapq.heappush(fila, (nd, v))
+    for h in rotulo_raiz[0]:
+        provisorio[h] = INF
+    return len(visitados)
+
+def _compactar(hubs, dists, pais):
+    """Listas por vértice -> arrays concatenados (inicio, hubs, dist, pais)"""
+    inicio = np.zeros(len(hubs) + 1, dtype=np.int64)
+    np.cumsum([len(h) for h in hubs], out=inicio[1:])
+    return (inicio,
+            np.fromiter((h for lista in hubs for h in lista), dtype=np.int32, count=inicio[-1]),
+            np.fromiter((d for lista in dists for d in lista), dtype=np.float64, count=inicio[-1]),
+            np.fromiter((p for lista in pais for p in lista), dtype=np.int32, count=inicio[-1]))
+
+def _menor_inteiro(minimo, maximo):
+    """Menor tipo inteiro do NumPy que representa de `minimo` a `maximo`"""
+    tipos = (np.uint8, np.uint16, np.uint32) if minimo >= 0 else (np.int8, np.int16, np.int32)
+    for tipo in tipos:
+        if np.iinfo(tipo).min <= minimo and maximo <= np.iinfo(tipo).max:
+            return tipo
+    return np.int64
+
+def _comprimir(inicio, hubs, dist, pais):
+    """Rótulos (inicio, hubs, dist, pais) -> arrays de CAMPOS_DISCO
+
+    Os postos dos hubs, crescentes em cada rótulo, viram diferenças para o
+    anterior (o primeiro fica absoluto); tamanhos, diferenças e pais vão no
+    menor tipo inteiro que os comporta, e as distâncias em float32 quando
+    todas voltam exatas (pesos inteiros, como os do .poly), senão em float64.
+    """
+    tamanhos = np.diff(inicio)
+    deltas = np.diff(hubs.astype(np.int64), prepend=0)
+    primeiros = inicio[:-1][tamanhos > 0]
+    deltas[primeiros] = hubs[primeiros]
+    dist32 = dist.astype(np.float32)
+    if np.array_equal(dist32.astype(np.float64), dist):
+        dist = dist32
+    return (tamanhos.astype(_menor_inteiro(0, int(tamanhos.max(initial=0)))),
+            deltas.astype(_menor_inteiro(0, int(deltas.max(initial=0)))),
+            dist,
+            pais.astype(_menor_inteiro(-1, int(pais.max(initial=0)))))
+
+def _descomprimir(tamanhos, deltas, dist, pais):
+    """Arrays de CAMPOS_DISCO -> rótulos (inicio, hubs, dist, pais) prontos para consulta"""
+    inicio = np.zeros(len(tamanhos) + 1, dtype=np.int64)
+    np.cumsum(tamanhos, out=inicio[1:])
+    soma = np.cumsum(deltas, dtype=np.int64)
+    # Cada rótulo recomeça do zero: desconta a soma acumulada até o seu início
+    antes = np.concatenate(([0], soma))[inicio[:-1]]
+    hubs = (soma - np.repeat(antes, np.asarray(tamanhos, dtype=np.int64))).astype(np.int32)
+    return inicio, hubs, np.asarray(dist, dtype=np.float64), np.asarray(pais, dtype=np.int32)
+
+class RotulosHub:
+    """Rótulos de hubs (2-hop labeling) para distâncias exatas sem busca
+
+    Cada vértice u guarda os hubs h, ordenados pelo posto, com d(u, h) no
+    rótulo de saída e d(h, u) no de entrada; d(u, v) é o menor d(u, h) +
+    d(h, v) entre os hubs comuns, achado pela intersecção de dois arrays
+    ordenados. Cada entrada guarda também o vizinho de u no caminho até o
+    hub, de onde o caminho é desempacotado. No grafo não direcionado os
+    dois rótulos são o mesmo. A construção é a rotulagem podada por marcos
+    (pruned landmark labeling), sobre a métrica ativa do CSR.
+    """
+
+    def __init__(self, ordem, saida, entrada=None, metrica=METRICA_PADRAO):
+        self.ordem = ordem  # posto -> vértice
+        self.saida = saida  # (inicio, hubs, dist, pais)
+        self.entrada = entrada if entrada is not None else saida
+        self.metrica = metrica
+
+    @property
+    def direcionado(self):
+        return self.entrada is not self.saida
+
+    @classmethod
+    def construir(cls, csr, ordem=None, cancelado=None):
+        """Constrói os rótulos da métrica ativa de `csr` (um hub por vez, na `ordem`)"""
+        n = csr.totalVertices
+        if ordem is None:
+            ordem = ordem_hubs(csr)
+        inicio = memoryview(np.asarray(csr.inicio))
+        destinos = memoryview(np.asarray(csr.destinos))
+        pesos = memoryview(np.asarray(csr.pesos))
+        provisorio = [INF] * n
+        entrada = ([[] for _ in range(n)], [[] for _ in range(n)], [[] for _ in range(n)])
+        if csr.direcionado:
+            transposto = csr.transposto()
+            inicio_t = memoryview(np.asarray(transposto.inicio))
+            destinos_t = memoryview(np.asarray(transposto.destinos))
+            pesos_t = memoryview(np.asarray(transposto.pesos))
+            saida = ([[] for _ in range(n)], [[] for _ in range(n)], [[] for _ in range(n)])
+        else:
+            saida = entrada
+        for posto, raiz in enumerate(ordem.tolist()):
+            if cancelado is not None and cancelado.is_set():
+                return None
+            # Para frente: d(raiz, v) no rótulo de entrada de v
+            _busca_podada(inicio, destinos, pesos, raiz, posto, (saida[0][raiz], saida[1][raiz]),
+                          *entrada, provisorio)
+            if csr.direcionado:
+                # Para trás: d(v, raiz) no rótulo de saída de v
+                _busca_podada(inicio_t, destinos_t, pesos_t, raiz, posto, (entrada[0][raiz], entrada[1][raiz]),
+                              *saida, provisorio)
+        compacta_entrada = _compactar(*entrada)
+        compacta_saida = _compactar(*saida) if csr.direcionado else compacta_entrada
+        return cls(np.asarray(ordem, dtype=np.int32), compacta_saida, compacta_entrada, csr.metrica)
+
+    # Formato compilado: arrays comprimidos em csr.indices, por métrica
+
+    def anexar(self, csr):
+        """Guarda os rótulos comprimidos em csr.indices, para irem ao arquivo compilado"""
+        prefixo = f'hubs_{self.metrica}'
+        csr.indices[f'{prefixo}_ordem'] = self.ordem
+        for sentido, arrays in (('saida', self.saida), ('entrada', self.entrada)):
+            if sentido == 'entrada' and not self.direcionado:
+                break
+            for campo, array in zip(CAMPOS_DISCO, _comprimir(*arrays)):
+                csr.indices[f'{prefixo}_{sentido}_{campo}'] = array
+
+    @classmethod
+    def do_grafo(cls, csr):
+        """Rótulos da métrica ativa de `csr` lidos de csr.indices; None se não foram construídos
+
+        Os rótulos são descomprimidos aqui, uma vez por processo.
+        """
+        prefixo = f'hubs_{csr.metrica}'
+        if f'{prefixo}_ordem' not in csr.indices:
+            return None
+        rotulos = []
+        for sentido in ('saida', 'entrada'):
+            if f'{prefixo}_{sentido}_deltas' in csr.indices:
+                rotulos.append(_descomprimir(*(csr.indices[f'{prefixo}_{sentido}_{campo}']
+                                               for campo in CAMPOS_DISCO)))
+            elif f'{prefixo}_{sentido}_hubs' in csr.indices:
+                # Grafo compilado antes da compressão dos rótulos
+                rotulos.append(tuple(csr.indices[f'{prefixo}_{sentido}_{campo}'] for campo in CAMPOS))
+            else:
+                rotulos.append(None)
+        return cls(csr.indices[f'{prefixo}_ordem'], rotulos[0], rotulos[1], csr.metrica)
+
+    # Consultas
+
+    def _melhor_hub(self, u, v):
+        """(custo, posto do hub, posição no rótulo de saída de u, posição no de entrada de v)"""
+        inicio_s, hubs_s, dist_s, _ = self.saida
+        inicio_e, hubs_e, dist_e, _ = self.entrada
+        a, b = int(inicio_s[u]), int(inicio_s[u + 1])
+        c, d = int(inicio_e[v]), int(inicio_e[v + 1])
+        _, i, j = np.intersect1d(hubs_s[a:b], hubs_e[c:d], assume_unique=True, return_indices=True)
+        if not len(i):
+            return INF, -1, -1, -1
+        somas = dist_s[a:b][i] + dist_e[c:d][j]
+        k = int(somas.argmin())
+        return float(somas[k]), int(hubs_s[a + i[k]]), a + int(i[k]), c + int(j[k])
+
+    def distancia(self, u, v):
+        """Custo do menor caminho de u até v (INF se não há caminho)"""
+        if u == v:
+            return 0.0
+        return self._melhor_hub(u, v)[0]
+
+    def tabela(self, origens, destinos):
+        """Matriz de custos, uma linha por origem (None se inalcançável)"""
+        return [[custo if custo < INF else None for custo in (self.distancia(u, v) for v in destinos)]
+                for u in origens]
+
+    def _subir(self, rotulos, v, posto, posicao):
+        """Vértices de v até o hub `posto`, seguindo os pais guardados nas entradas"""
+        inicio, hubs, _, pais = rotulos
+        caminho = [v]
+        while True:
+            pai = int(pais[posicao])
+            if pai < 0:
+                return caminho
+            caminho.append(pai)
+            a, b = int(inicio[pai]), int(inicio[pai + 1])
+            posicao = a + int(np.searchsorted(hubs[a:b], posto))
+
+    def rota(self, u, v):
+        """(caminho, custo, estatisticas) como dijkstra_csr, sem busca no grafo"""
+        inicio_ns = time.perf_counter_ns()
+        if u == v:
+            return [u], 0.0, montar_estatisticas(inicio_ns, 0, 0.0)
+        custo, posto, posicao_u, posicao_v = self._melhor_hub(u, v)
+        if custo == INF:
+            return None, INF, montar_estatisticas(inicio_ns, 0, INF)
+        ida = self._subir(self.saida, u, posto, posicao_u)
+        volta = self._subir(self.entrada, v, posto, posicao_v)
+        caminho = ida + volta[-2::-1]
+        return caminho, custo, montar_estatisticas(inicio_ns, 0, custo)
+
+    def estatisticas(self):
+        """Tamanho dos rótulos: entradas totais, média e máximo por vértice, bytes em memória e no disco"""
+        tamanhos = np.diff(self.saida[0])
+        if self.direcionado:
+            tamanhos = tamanhos + np.diff(self.entrada[0])
+        rotulos = (self.saida, self.entrada) if self.direcionado else (self.saida,)
+        return {
+            'entradas': int(tamanhos.sum()),
+            'media_por_vertice': float(tamanhos.mean()) if len(tamanhos) else 0.0,
+            'maximo_por_vertice': int(tamanhos.max()) if len(tamanhos) else 0,
+            'bytes': int(self.ordem.nbytes + sum(array.nbytes for arrays in rotulos for array in arrays)),
+            'bytes_disco': int(self.ordem.nbytes + sum(array.nbytes for arrays in rotulos
+                                                       for array in _comprimir(*arrays))),
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="dijkstra.py rotulos",
+        description="Constrói rótulos de hubs para consultas de distância sem busca e grava o grafo compilado")
+    parser.add_argument('grafo', help="arquivo .poly, .osm ou grafo compilado")
+    parser.add_argument('--saida', required=True, help="grafo compilado de saída, com os rótulos")
+    parser.add_argument('--metrica', action='append',
+                        help="métrica dos rótulos (pode repetir; padrão: comprimento)")
+    parser.add_argument('--direcionado', action='store_true',
+                        help="respeitar a mão única das arestas (coluna do .poly, oneway do OSM)")
+    parser.add_argument('--consultas', type=int, default=1000,
+                        help="pares sorteados para medir o tempo das consultas (padrão: 1000)")
+    args = parser.parse_args(argv)
+    configurar_registro()
+
+    grafo = carregar_csr(args.grafo, args.direcionado, mmap=False)
+    IndiceComponentes.do_grafo(grafo)
+    sorteio = random.Random(0)
+    pares = [(sorteio.randrange(grafo.totalVertices), sorteio.randrange(grafo.totalVertices))
+             for _ in range(args.consultas)]
+    for metrica in args.metrica or [METRICA_PADRAO]:
+        try:
+            csr = grafo.com_metrica(metrica)
+        except ValueError as erro:
+            parser.error(str(erro))
+        inicio = time.perf_counter()
+        ordem = ordem_hubs(csr)
+        tempo_ordem = time.perf_counter() - inicio
+        rotulos = RotulosHub.construir(csr, ordem)
+        tempo_total = time.perf_counter() - inicio
+        rotulos.anexar(grafo)
+        registrar_fase(log, 'construcao', tempo_total * 1000, estrutura='rotulos_hub', metrica=metrica)
+
+        inicio = time.perf_counter()
+        for u, v in pares:
+            rotulos.distancia(u, v)
+        tempo_consulta = (time.perf_counter() - inicio) / max(len(pares), 1)
+        estatisticas = rotulos.estatisticas()
+        print(f"{metrica}: {grafo.totalVertices} vértices, construção em {tempo_total:.1f} s "
+              f"(ordem {tempo_ordem:.1f} s); {estatisticas['entradas']} entradas, "
+              f"{estatisticas['media_por_vertice']:.1f} por vértice (máximo {estatisticas['maximo_por_vertice']}), "
+              f"{estatisticas['bytes'] / 2**20:.1f} MB ({estatisticas['bytes_disco'] / 2**20:.1f} MB no disco); "
+              f"consulta média {tempo_consulta * 1e6:.1f} µs",
+              file=sys.stderr)
+    grafo.salvar(args.saida)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,557 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from ajuste import AjustadorPontos, rota_entre_pontos
+from busca import INF, dijkstra_csr, dijkstra_um_para_muitos
+from componentes import IndiceComponentes, resposta_sem_caminho
+from conversoes import TabelaConversoes, dijkstra_conversoes
+from delta import ParticaoArestas, delta_stepping, escolher_delta
+from espacial import GradeEspacial
+from grafo import carregar_csr, preparar_compilado, projetar_latlon
+from metricas import METRICA_PADRAO
+from pois import IndicePOI
+from registro import obter_logger, configurar_registro, registrar_fase
+from rotulos import RotulosHub
+
+log = obter_logger('servidor')
+
+# Limites dos buckets dos histogramas de latência, em milissegundos
+LIMITES_HISTOGRAMA_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# A partir de tantos destinos, a linha da tabela vem da árvore inteira por delta-stepping:
+# a busca um-para-muitos só para quando fecha o último, o que com muitos destinos é quase o grafo todo
+DESTINOS_DELTA = 64
+TAMANHO_MAXIMO_CABECALHO = 64 * 1024
+TAMANHO_MAXIMO_CORPO = 4 * 1024 * 1024  # Folga para tabelas grandes em JSON
+MOTIVOS_STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                  413: "Payload Too Large", 500: "Internal Server Error"}
+
+class ErroRequisicao(Exception):
+    """Erro que vira uma resposta HTTP com o status indicado"""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+class Histograma:
+    """Histograma cumulativo de latências no formato do Prometheus"""
+
+    def __init__(self, limites=LIMITES_HISTOGRAMA_MS):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor_ms):
+        for i, limite in enumerate(self.limites):
+            if valor_ms <= limite:
+                self.contagens[i] += 1
+                break
+        else:
+            self.contagens[-1] += 1
+        self.soma += valor_ms
+        self.total += 1
+
+    def linhas(self, nome, rotulos):
+        acumulado = 0
+        for limite, contagem in zip(self.limites + ('+Inf',), self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}'
+        yield f'{nome}_sum{{{rotulos}}} {self.soma:.3f}'
+        yield f'{nome}_count{{{rotulos}}} {self.total}'
+
+class CacheLRU:
+    """Cache de resultados com descarte do item usado há mais tempo"""
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.itens = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        if chave in self.itens:
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return self.itens[chave]
+        self.falhas += 1
+        return None
+
+    def guardar(self, chave, valor):
+        if self.capacidade <= 0:
+            return
+        self.itens[chave] = valor
+        self.itens.move_to_end(chave)
+        while len(self.itens) > self.capacidade:
+            self.itens.popitem(last=False)
+
+_grafo = None  # Grafo aberto via mmap em cada processo de trabalho
+_rotulos = {}  # Métrica -> RotulosHub gravados no grafo compilado
+_particoes = {}  # Métrica -> ParticaoArestas do delta-stepping, montada na primeira tabela grande
+_conversoes = None  # TabelaConversoes gravada no grafo compilado
+
+def _iniciar_processo(caminho_compilado, direcionado=False):
+    global _grafo, _rotulos, _conversoes
+    _grafo = carregar_csr(caminho_compilado, direcionado)
+    _rotulos = carregar_rotulos(_grafo)
+    _conversoes = TabelaConversoes.do_grafo(_grafo)
+
+def carregar_rotulos(grafo):
+    """Rótulos de hubs presentes no grafo compilado, por métrica"""
+    rotulos = {}
+    for metrica in grafo.metricas:
+        encontrados = RotulosHub.do_grafo(grafo.com_metrica(metrica))
+        if encontrados is not None:
+            rotulos[metrica] = encontrados
+    return rotulos
+
+def _calcular_rota(origem, destino, metrica=METRICA_PADRAO):
+    return _resultado_rota(origem, destino, metrica, *dijkstra_csr(_grafo.com_metrica(metrica), origem, destino))
+
+def _calcular_rota_conversoes(origem, destino, metrica=METRICA_PADRAO):
+    caminho, custo, estatisticas = dijkstra_conversoes(_grafo.com_metrica(metrica), origem, destino, _conversoes)
+    return {**_resultado_rota(origem, destino, metrica, caminho, custo, estatisticas), 'conversoes': True}
+
+def _resultado_rota(origem, destino, metrica, caminho, custo, estatisticas):
+    return {
+        'origem': origem,
+        'destino': destino,
+        'metrica': metrica,
+        'custo': custo if custo < INF else None,
+        'saltos': len(caminho) - 1 if caminho else None,
+        'caminho': caminho,
+        'tempo_ms': estatisticas['tempo_ms'],
+        'nos_explorados': estatisticas['nos_explorados'],
+    }
+
+def _calcular_rota_pontos(origem, destino, metrica=METRICA_PADRAO):
+    resultado = rota_entre_pontos(_grafo.com_metrica(metrica), origem, destino)
+    estatisticas = resultado.pop('estatisticas')
+    resultado.update(origem=origem.como_dict(), destino=destino.como_dict(), metrica=metrica,
+                     tempo_ms=estatisticas['tempo_ms'], nos_explorados=estatisticas['nos_explorados'])
+    return resultado
+
+def _calcular_pois(origem, categoria, k, metrica=METRICA_PADRAO):
+    resultado, estatisticas = IndicePOI.do_grafo(_grafo).mais_proximos(_grafo.com_metrica(metrica), origem,
+                                                                        categoria, k)
+    return {'origem': origem, 'categoria': categoria, 'metrica': metrica, 'pois': resultado,
+            'tempo_ms': estatisticas['tempo_ms'], 'nos_explorados': estatisticas['nos_explorados']}
+
+def _calcular_linha_tabela(origem, destinos, metrica=METRICA_PADRAO):
+    if metrica in _rotulos:
+        return _rotulos[metrica].tabela([origem], destinos)[0]
+    csr = _grafo.com_metrica(metrica)
+    if len(destinos) < DESTINOS_DELTA:
+        return dijkstra_um_para_muitos(csr, origem, destinos)
+    if metrica not in _particoes:
+        _particoes[metrica] = ParticaoArestas(csr, escolher_delta(csr.pesos))
+    custos, _, _ = delta_stepping(csr, origem, particao=_particoes[metrica])
+    return [custo if custo < INF else None for custo in custos[destinos].tolist()]
+
+class ServidorRotas:
+    """Serviço HTTP assíncrono de rotas com o grafo, o índice espacial e o cache residentes
+
+    As buscas rodam em um pool de processos que abre o grafo compilado via
+    mmap; a conexão aceita keep-alive e pipelining (as respostas saem na
+    ordem das requisições).
+    """
+
+    def __init__(self, caminho_grafo, processos=None, tamanho_cache=10000, direcionado=False):
+        inicio = time.perf_counter()
+        self.caminho_compilado, self.caminho_temporario = preparar_compilado(caminho_grafo, direcionado)
+        self.grafo = carregar_csr(self.caminho_compilado, direcionado)
+        self.grade = GradeEspacial(np.arange(self.grafo.totalVertices), self.grafo.x, self.grafo.y)
+        self.ajustador = AjustadorPontos(self.grafo)
+        self.componentes = IndiceComponentes.do_grafo(self.grafo)
+        self.rotulos = carregar_rotulos(self.grafo)
+        self.pois = IndicePOI.do_grafo(self.grafo)
+        self.conversoes = TabelaConversoes.do_grafo(self.grafo)
+        self.sem_caminho = 0  # Rotas respondidas pelo índice de componentes, sem busca
+        # 'spawn': criar processos com fork a partir do laço de eventos, com a
+        # thread de gerenciamento do pool ativa, pode travar o processo filho
+        self.executor = ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_iniciar_processo,
+                                            initargs=(self.caminho_compilado, direcionado))
+        self.cache = CacheLRU(tamanho_cache)
+        self.histogramas = {}
+        self.respostas_por_status = {}
+        self.em_andamento = 0
+        self.tempo_carga_s = time.perf_counter() - inicio
+        self.rotas = {
+            '/route': self.rota,
+            '/table': self.tabela,
+            '/nearest': self.mais_proximo,
+            '/pois': self.pois_proximos,
+            '/snap': self.ajustar,
+            '/metrics': self.metricas,
+        }
+
+    def fechar(self):
+        self.executor.shutdown(cancel_futures=True)
+        if self.caminho_temporario is not None:
+            os.remove(self.caminho_temporario)
+            self.caminho_temporario = None
+
+    async def iniciar(self, host='127.0.0.1', porta=8080):
+        # O limite do leitor vale para o cabeçalho: além dele, readuntil falha e a resposta é 413
+        return await asyncio.start_server(self.tratar_conexao, host, porta, limit=TAMANHO_MAXIMO_CABECALHO)
+
+    # Protocolo HTTP/1.1
+
+    async def tratar_conexao(self, reader, writer):
+        """Lê requisições em sequência e responde na mesma ordem"""
+        pendentes = asyncio.Queue()
+        escritor = asyncio.create_task(self.escrever_respostas(pendentes, writer))
+        try:
+            while not escritor.done():
+                try:
+                    requisicao = await self.ler_requisicao(reader)
+                except ErroRequisicao as erro:
+                    await pendentes.put((self.resposta_pronta(erro.status, {'erro': erro.mensagem}), False))
+                    break
+                if requisicao is None:
+                    break
+                metodo, alvo, manter_conexao, corpo = requisicao
+                tarefa = asyncio.ensure_future(self.responder(metodo, alvo, corpo))
+                await pendentes.put((tarefa, manter_conexao))
+                if not manter_conexao:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await pendentes.put(None)
+            await escritor
+            writer.close()
+
+    async def ler_requisicao(self, reader):
+        """Retorna (método, alvo, manter_conexão, corpo), ou None no fim da conexão"""
+        try:
+            bruto = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as erro:
+            if erro.partial.strip():
+                raise ErroRequisicao(400, "requisição incompleta")
+            return None
+        except asyncio.LimitOverrunError:
+            raise ErroRequisicao(413, "cabeçalho muito grande")
+        linhas = bruto.decode('latin-1').split('\r\n')
+        partes = linhas[0].split()
+        if len(partes) != 3 or not partes[2].startswith('HTTP/'):
+            raise ErroRequisicao(400, "linha de requisição inválida")
+        metodo, alvo, versao = partes
+        cabecalhos = {}
+        for linha in linhas[1:]:
+            if ':' in linha:
+                nome, valor = linha.split(':', 1)
+                cabecalhos[nome.strip().lower()] = valor.strip()
+        conexao = cabecalhos.get('connection', '').lower()
+        if versao == 'HTTP/1.0':
+            manter_conexao = conexao == 'keep-alive'
+        else:
+            manter_conexao = conexao != 'close'
+        corpo = b''
+        try:
+            tamanho = int(cabecalhos.get('content-length', '0') or 0)
+        except ValueError:
+            raise ErroRequisicao(400, "Content-Length inválido")
+        if tamanho < 0:
+            raise ErroRequisicao(400, "Content-Length inválido")
+        if tamanho > TAMANHO_MAXIMO_CORPO:
+            raise ErroRequisicao(413, "corpo muito grande")
+        if tamanho > 0:
+            corpo = await reader.readexactly(tamanho)
+        return metodo, alvo, manter_conexao, corpo
+
+    async def escrever_respostas(self, pendentes, writer):
+        """Envia as respostas na ordem de chegada das requisições (pipelining)"""
+        while True:
+            item = await pendentes.get()
+            if item is None:
+                return
+            tarefa, manter_conexao = item
+            status, tipo, corpo = await tarefa
+            cabecalho = (f"HTTP/1.1 {status} {MOTIVOS_STATUS.get(status, '')}\r\n"
+                         f"Content-Type: {tipo}\r\n"
+                         f"Content-Length: {len(corpo)}\r\n"
+                         f"Connection: {'keep-alive' if manter_conexao else 'close'}\r\n\r\n")
+            try:
+                writer.write(cabecalho.encode('latin-1') + corpo)
+                await writer.drain()
+            except ConnectionError:
+                return
+            if not manter_conexao:
+                return
+
+    def resposta_pronta(self, status, dados):
+        futuro = asyncio.get_running_loop().create_future()
+        futuro.set_result((status, 'application/json', json.dumps(dados, ensure_ascii=False).encode()))
+        return futuro
+
+    async def responder(self, metodo, alvo, corpo):
+        """Despacha a requisição e registra a latência por endpoint"""
+        inicio = time.perf_counter()
+        partes = urlsplit(alvo)
+        caminho = partes.path
+        self.em_andamento += 1
+        try:
+            if caminho not in self.rotas:
+                raise ErroRequisicao(404, f"endpoint desconhecido: {caminho}")
+            if metodo not in ('GET', 'POST'):
+                raise ErroRequisicao(405, f"método não suportado: {metodo}")
+            parametros = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+            if corpo:
+                try:
+                    parametros.update(json.loads(corpo))
+                except (ValueError, TypeError):
+                    raise ErroRequisicao(400, "corpo JSON inválido")
+            resultado = await self.rotas[caminho](parametros)
+            if isinstance(resultado, str):
+                status, tipo, dados = 200, 'text/plain; version=0.0.4', resultado.encode()
+            else:
+                status, tipo = 200, 'application/json'
+                dados = json.dumps(resultado, ensure_ascii=False).encode()
+        except ErroRequisicao as erro:
+            status, tipo = erro.status, 'application/json'
+            dados = json.dumps({'erro': erro.mensagem}, ensure_ascii=False).encode()
+        except Exception as erro:
+            log.exception("Erro ao atender %s %s", metodo, alvo)
+            status, tipo = 500, 'application/json'
+            dados = json.dumps({'erro': str(erro)}, ensure_ascii=False).encode()
+        finally:
+            self.em_andamento -= 1
+        endpoint = caminho if caminho in self.rotas else 'outros'
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        self.histogramas.setdefault(endpoint, Histograma()).observar(duracao_ms)
+        registrar_fase(log, 'consulta', duracao_ms, logging.DEBUG, endpoint=endpoint, status=status)
+        self.respostas_por_status[status] = self.respostas_por_status.get(status, 0) + 1
+        return status, tipo, dados
+
+    # Endpoints
+
+    def vertice(self, parametros, nome):
+        try:
+            valor = int(parametros[nome])
+        except KeyError:
+            raise ErroRequisicao(400, f"parâmetro obrigatório: {nome}")
+        except (TypeError, ValueError):
+            raise ErroRequisicao(400, f"parâmetro inválido: {nome}")
+        if not 0 <= valor < self.grafo.totalVertices:
+            raise ErroRequisicao(400, f"vértice inexistente: {valor}")
+        return valor
+
+    def lista_vertices(self, parametros, nome):
+        valor = parametros.get(nome)
+        if valor is None:
+            raise ErroRequisicao(400, f"parâmetro obrigatório: {nome}")
+        if isinstance(valor, str):
+            valor = [parte for parte in valor.split(',') if parte]
+        return [self.vertice({nome: item}, nome) for item in valor]
+
+    def booleano(self, parametros, nome):
+        """Opção liga/desliga da query string ou do corpo JSON; ausente é desligada"""
+        valor = parametros.get(nome, False)
+        if isinstance(valor, str):
+            valor = valor.strip().lower()
+        if valor in (None, False, 0, '0', 'false', ''):
+            return False
+        if valor in (True, 1, '1', 'true'):
+            return True
+        raise ErroRequisicao(400, f"parâmetro inválido: {nome} (use 0/1 ou false/true)")
+
+    def metrica(self, parametros):
+        nome = parametros.get('metrica', METRICA_PADRAO)
+        if nome not in self.grafo.metricas:
+            raise ErroRequisicao(400, f"métrica desconhecida: {nome} (disponíveis: {', '.join(self.grafo.metricas)})")
+        return nome
+
+    def coordenadas(self, parametros, prefixo=''):
+        """(x, y) no sistema do grafo a partir de {prefixo}lat/lon ou {prefixo}x/y; None se ausentes"""
+        try:
+            if f'{prefixo}lat' in parametros or f'{prefixo}lon' in parametros:
+                if self.grafo.projecao is None:
+                    raise ErroRequisicao(400, "o grafo não tem projeção geográfica; use x e y")
+                coordenadas = projetar_latlon(float(parametros[f'{prefixo}lat']),
+                                              float(parametros[f'{prefixo}lon']), self.grafo.projecao)
+            elif f'{prefixo}x' in parametros or f'{prefixo}y' in parametros:
+                coordenadas = float(parametros[f'{prefixo}x']), float(parametros[f'{prefixo}y'])
+            else:
+                return None
+        except KeyError as erro:
+            raise ErroRequisicao(400, f"parâmetro obrigatório: {erro.args[0]}")
+        except (TypeError, ValueError, OverflowError):
+            raise ErroRequisicao(400, "coordenadas inválidas")
+        # 'nan' e 'inf' passam por float(), mas não localizam nada na grade
+        if not all(math.isfinite(valor) for valor in coordenadas):
+            raise ErroRequisicao(400, "coordenadas inválidas")
+        return coordenadas
+
+    def ponto_ajustado(self, parametros, prefixo=''):
+        coordenadas = self.coordenadas(parametros, prefixo)
+        if coordenadas is None:
+            raise ErroRequisicao(400, f"parâmetros obrigatórios: {prefixo}lat e {prefixo}lon, ou {prefixo}x e {prefixo}y")
+        raio = parametros.get('raio')
+        try:
+            raio = float(raio) if raio is not None else None
+        except (TypeError, ValueError):
+            raise ErroRequisicao(400, "parâmetro inválido: raio")
+        ponto = self.ajustador.ajustar(*coordenadas, raio)
+        if ponto is None:
+            raise ErroRequisicao(404, "nenhuma aresta no raio informado")
+        return ponto
+
+    async def rota(self, parametros):
+        if 'origem' not in parametros and 'destino' not in parametros:
+            return await self.rota_pontos(parametros)
+        origem = self.vertice(parametros, 'origem')
+        destino = self.vertice(parametros, 'destino')
+        metrica = self.metrica(parametros)
+        conversoes = self.booleano(parametros, 'conversoes')
+        if conversoes and self.conversoes is None:
+            raise ErroRequisicao(404, "o grafo não tem restrições de conversão")
+        chave = (origem, destino, metrica, conversoes)
+        if not self.componentes.alcancavel(origem, destino):
+            self.sem_caminho += 1
+            return _resultado_rota(origem, destino, metrica, *resposta_sem_caminho())
+        if metrica in self.rotulos and not conversoes:
+            # Rótulos de hubs: microssegundos, sem passar pelo pool nem pelo cache (mas não conhecem as conversões)
+            return _resultado_rota(origem, destino, metrica, *self.rotulos[metrica].rota(origem, destino))
+        resultado = self.cache.obter(chave)
+        if resultado is None:
+            loop = asyncio.get_running_loop()
+            calcular = _calcular_rota_conversoes if conversoes else _calcular_rota
+            resultado = await loop.run_in_executor(self.executor, calcular, origem, destino, metrica)
+            self.cache.guardar(chave, resultado)
+        return resultado
+
+    async def rota_pontos(self, parametros):
+        """Rota entre coordenadas arbitrárias, ajustadas às arestas mais próximas (nós fantasmas)"""
+        origem = self.ponto_ajustado(parametros, 'origem_')
+        destino = self.ponto_ajustado(parametros, 'destino_')
+        metrica = self.metrica(parametros)
+        chave = (origem.u, origem.v, origem.fracao, destino.u, destino.v, destino.fracao, metrica)
+        if not any(self.componentes.alcancavel(a, b) for a in (origem.u, origem.v) for b in (destino.u, destino.v)):
+            self.sem_caminho += 1
+            _, _, estatisticas = resposta_sem_caminho()
+            return {'caminho': None, 'custo': None, 'geometria': None, 'origem': origem.como_dict(),
+                    'destino': destino.como_dict(), 'metrica': metrica, 'tempo_ms': estatisticas['tempo_ms'],
+                    'nos_explorados': 0}
+        resultado = self.cache.obter(chave)
+        if resultado is None:
+            loop = asyncio.get_running_loop()
+            resultado = await loop.run_in_executor(self.executor, _calcular_rota_pontos, origem, destino, metrica)
+            self.cache.guardar(chave, resultado)
+        return resultado
+
+    async def tabela(self, parametros):
+        origens = self.lista_vertices(parametros, 'origens')
+        destinos = self.lista_vertices(parametros, 'destinos')
+        metrica = self.metrica(parametros)
+        loop = asyncio.get_running_loop()
+        # Uma busca um-para-muitos por origem, distribuídas pelo pool
+        linhas = await asyncio.gather(*(loop.run_in_executor(self.executor, _calcular_linha_tabela, origem, destinos, metrica)
+                                        for origem in origens))
+        return {'origens': origens, 'destinos': destinos, 'metrica': metrica, 'custos': linhas}
+
+    async def mais_proximo(self, parametros):
+        coordenadas = self.coordenadas(parametros)
+        if coordenadas is None:
+            raise ErroRequisicao(400, "parâmetros obrigatórios: lat e lon, ou x e y")
+        x, y = coordenadas
+        vertice_id, distancia = self.grade.mais_proximo(x, y)
+        if vertice_id is None:
+            raise ErroRequisicao(404, "grafo vazio")
+        return {'id': vertice_id, 'x': float(self.grafo.x[vertice_id]), 'y': float(self.grafo.y[vertice_id]),
+                'distancia': distancia}
+
+    async def pois_proximos(self, parametros):
+        """Os k POIs de uma categoria mais próximos da origem, em uma única busca"""
+        if self.pois is None:
+            raise ErroRequisicao(404, "o grafo não tem POIs")
+        origem = self.vertice(parametros, 'origem')
+        categoria = parametros.get('categoria')
+        if not categoria:
+            raise ErroRequisicao(400, "parâmetro obrigatório: categoria")
+        try:
+            k = int(parametros.get('k', 1))
+        except (TypeError, ValueError):
+            raise ErroRequisicao(400, "parâmetro inválido: k")
+        if k < 1:
+            raise ErroRequisicao(400, "parâmetro inválido: k")
+        metrica = self.metrica(parametros)
+        try:
+            self.pois.selecionar(categoria)
+        except ValueError as erro:
+            raise ErroRequisicao(404, str(erro))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _calcular_pois, origem, categoria, k, metrica)
+
+    async def ajustar(self, parametros):
+        return self.ponto_ajustado(parametros).como_dict()
+
+    async def metricas(self, parametros):
+        linhas = ["# TYPE dijkstra_requisicao_duracao_ms histogram"]
+        for endpoint, histograma in sorted(self.histogramas.items()):
+            linhas.extend(histograma.linhas("dijkstra_requisicao_duracao_ms", f'endpoint="{endpoint}"'))
+        linhas.append("# TYPE dijkstra_respostas_total counter")
+        for status, total in sorted(self.respostas_por_status.items()):
+            linhas.append(f'dijkstra_respostas_total{{status="{status}"}} {total}')
+        linhas.append("# TYPE dijkstra_cache_acertos_total counter")
+        linhas.append(f"dijkstra_cache_acertos_total {self.cache.acertos}")
+        linhas.append("# TYPE dijkstra_cache_falhas_total counter")
+        linhas.append(f"dijkstra_cache_falhas_total {self.cache.falhas}")
+        linhas.append("# TYPE dijkstra_cache_itens gauge")
+        linhas.append(f"dijkstra_cache_itens {len(self.cache.itens)}")
+        linhas.append("# TYPE dijkstra_rotas_sem_caminho_total counter")
+        linhas.append(f"dijkstra_rotas_sem_caminho_total {self.sem_caminho}")
+        linhas.append("# TYPE dijkstra_requisicoes_em_andamento gauge")
+        linhas.append(f"dijkstra_requisicoes_em_andamento {self.em_andamento}")
+        return "\n".join(linhas) + "\n"
+
+async def servir(caminho_grafo, host='127.0.0.1', porta=8080, processos=None, tamanho_cache=10000,
+                 direcionado=False):
+    """Carrega o grafo e atende requisições até ser interrompido"""
+    servidor = ServidorRotas(caminho_grafo, processos, tamanho_cache, direcionado)
+    try:
+        servidor_tcp = await servidor.iniciar(host, porta)
+        print(f"Grafo carregado em {servidor.tempo_carga_s:.2f} s "
+              f"({servidor.grafo.totalVertices} vértices, {servidor.grafo.totalArestas} arestas)",
+              file=sys.stderr)
+        print(f"Servindo em http://{host}:{porta} (/route, /table, /nearest, /pois, /metrics)", file=sys.stderr)
+        async with servidor_tcp:
+            await servidor_tcp.serve_forever()
+    finally:
+        servidor.fechar()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="dijkstra.py servir",
+        description="Serviço HTTP local de rotas com o grafo mantido em memória")
+    parser.add_argument('grafo', help="arquivo .poly, .osm ou grafo compilado")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--processos', type=int, default=None,
+                        help="número de processos de busca (padrão: número de CPUs)")
+    parser.add_argument('--cache', type=int, default=10000, help="rotas mantidas no cache de resultados")
+    parser.add_argument('--direcionado', action='store_true',
+                        help="respeitar a mão única das arestas (coluna do .poly, oneway do OSM)")
+    args = parser.parse_args(argv)
+    configurar_registro()
+    try:
+        asyncio.run(servir(args.grafo, args.host, args.porta, args.processos, args.cache, args.direcionado))
+    except KeyboardInterrupt:
+        pass
+    except ValueError as erro:
+        parser.error(str(erro))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import math
+import os
+import random
+import sys
+
+import pytest
+
+# Os módulos ficam na raiz do repositório, fora de um pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grafo import Arestas, Vertices  # noqa: E402
+
+SEMENTES = range(8)
+
+def sortear_grafo(semente, vertices=30, arestas=70, mao_unica=0.3):
+    """Vértices no quadrado 1000 × 1000 e arestas sorteadas, com pesos de até o dobro do comprimento
+
+    Nem todo par se alcança: os grafos pequenos e esparsos têm ilhas, e os
+    motores precisam concordar também nos pares sem caminho.
+    """
+    sorteio = random.Random(semente)
+    lista_vertices = [Vertices(i, sorteio.uniform(0, 1000), sorteio.uniform(0, 1000)) for i in range(vertices)]
+    lista_arestas = []
+    for _ in range(arestas):
+        u, v = sorteio.sample(range(vertices), 2)
+        a, b = lista_vertices[u], lista_vertices[v]
+        comprimento = math.hypot(a.x - b.x, a.y - b.y)
+        lista_arestas.append(Arestas(u, v, comprimento * sorteio.uniform(1, 2),
+                                     velocidade=sorteio.choice([None, 8.0, 15.0]),
+                                     mao_unica=sorteio.random() < mao_unica))
+    return lista_vertices, lista_arestas
+
+def custos_iguais(a, b):
+    return a == b or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+@pytest.fixture(params=SEMENTES)
+def semente(request):
+    return request.param
+
+@pytest.fixture(params=[False, True], ids=['nao_direcionado', 'direcionado'])
+def direcionado(request):
+    return request.param
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from busca import INF, EspacoBusca, dijkstra, dijkstra_csr, dijkstra_um_para_muitos
+from conftest import custos_iguais, sortear_grafo
+from grafo import GrafoCSR, construir_matriz_adjacencia
+
+def bellman_ford(csr, inicio):
+    """Referência sem fila: relaxa todos os arcos até nada mudar"""
+    dist = [INF] * csr.totalVertices
+    dist[inicio] = 0.0
+    arcos = [(u, int(csr.destinos[i]), float(csr.pesos[i]))
+             for u in range(csr.totalVertices) for i in range(csr.inicio[u], csr.inicio[u + 1])]
+    for _ in range(csr.totalVertices):
+        mudou = False
+        for u, v, peso in arcos:
+            if dist[u] + peso < dist[v]:
+                dist[v] = dist[u] + peso
+                mudou = True
+        if not mudou:
+            break
+    return dist
+
+def custo_do_caminho(csr, caminho):
+    total = 0.0
+    for u, v in zip(caminho, caminho[1:]):
+        total += min(float(csr.pesos[i]) for i in range(csr.inicio[u], csr.inicio[u + 1])
+                     if csr.destinos[i] == v)
+    return total
+
+def test_dijkstra_csr_igual_a_bellman_ford(semente, direcionado):
+    csr = GrafoCSR.de_arestas(*sortear_grafo(semente), direcionado)
+    for inicio in range(0, csr.totalVertices, 3):
+        referencia = bellman_ford(csr, inicio)
+        for fim in range(csr.totalVertices):
+            caminho, custo, estatisticas = dijkstra_csr(csr, inicio, fim)
+            assert custos_iguais(custo, referencia[fim])
+            if caminho is None:
+                assert referencia[fim] == INF
+            else:
+                assert caminho[0] == inicio and caminho[-1] == fim
+                assert custos_iguais(custo_do_caminho(csr, caminho), custo)
+
+def test_matriz_e_um_para_muitos_iguais_ao_csr(semente, direcionado):
+    vertices, arestas = sortear_grafo(semente)
+    csr = GrafoCSR.de_arestas(vertices, arestas, direcionado)
+    matriz = construir_matriz_adjacencia(vertices, arestas, direcionado)
+    alvos = list(range(csr.totalVertices))
+    for inicio in range(0, csr.totalVertices, 4):
+        custos = dijkstra_um_para_muitos(csr, inicio, alvos)
+        for fim in alvos:
+            _, custo, _ = dijkstra_csr(csr, inicio, fim)
+            assert custos_iguais(dijkstra(matriz, inicio, fim)[1], custo)
+            assert custos[fim] == (None if custo == INF else custo)
+
+def test_espaco_reaproveitado_entre_grafos_e_consultas():
+    # Um espaço só, alternando grafos de tamanhos diferentes: gerações antigas não podem vazar
+    espaco = EspacoBusca()
+    grafos = [GrafoCSR.de_arestas(*sortear_grafo(semente, vertices=10 + 15 * semente)) for semente in range(4)]
+    sorteio = random.Random(0)
+    for _ in range(300):
+        csr = sorteio.choice(grafos)
+        inicio, fim = sorteio.randrange(csr.totalVertices), sorteio.randrange(csr.totalVertices)
+        caminho, custo, _ = dijkstra_csr(csr, inicio, fim, espaco=espaco)
+        assert (caminho, custo) == dijkstra_csr(csr, inicio, fim, espaco=EspacoBusca())[:2]
+    assert len(espaco) == max(csr.totalVertices for csr in grafos)
+
+def test_espaco_em_uso_recusa_segunda_busca():
+    espaco = EspacoBusca(4)
+    with espaco.reservar(4):
+        with pytest.raises(RuntimeError):
+            with espaco.reservar(4):
+                pass
+    with espaco.reservar(4) as geracao:
+        assert geracao == 2
+
+def test_origem_igual_ao_destino_custa_zero_float():
+    csr = GrafoCSR.de_arestas(*sortear_grafo(0))
+    caminho, custo, _ = dijkstra_csr(csr, 5, 5)
+    assert caminho == [5]
+    assert custo == 0.0 and isinstance(custo, float)
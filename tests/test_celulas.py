@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from busca import dijkstra_csr
+from celulas import SobreposicaoCRP
+from conftest import custos_iguais, sortear_grafo
+from grafo import Arestas, GrafoCSR, Vertices
+
+TAMANHO_CELULA = 4  # Células pequenas, para que os grafos sorteados tenham várias por nível
+
+def conferir_rotas(sobreposicao, csr):
+    for origem in range(0, csr.totalVertices, 3):
+        for destino in range(csr.totalVertices):
+            caminho, custo, _ = sobreposicao.rota(origem, destino)
+            referencia = dijkstra_csr(csr, origem, destino)[1]
+            assert custos_iguais(custo, referencia), (origem, destino)
+            if caminho is not None:
+                assert caminho[0] == origem and caminho[-1] == destino
+                # O caminho desempacotado anda só por arcos do grafo
+                for u, v in zip(caminho, caminho[1:]):
+                    assert v in csr.destinos[csr.inicio[u]:csr.inicio[u + 1]]
+
+@pytest.mark.parametrize('niveis', [1, 2, 3])
+def test_rota_igual_ao_dijkstra_csr(semente, direcionado, niveis):
+    csr = GrafoCSR.de_arestas(*sortear_grafo(semente, vertices=40, arestas=90), direcionado)
+    sobreposicao = SobreposicaoCRP.construir(csr, TAMANHO_CELULA, niveis)
+    conferir_rotas(sobreposicao, csr)
+
+def test_personalizar_outra_metrica(semente, direcionado):
+    csr = GrafoCSR.de_arestas(*sortear_grafo(semente, vertices=40, arestas=90), direcionado)
+    sobreposicao = SobreposicaoCRP.construir(csr, TAMANHO_CELULA)
+    tempo = csr.com_metrica('tempo')
+    sobreposicao.personalizar(tempo)
+    conferir_rotas(sobreposicao, tempo)
+
+def test_atualizar_so_as_celulas_editadas(semente, direcionado):
+    vertices, arestas = sortear_grafo(semente, vertices=40, arestas=90)
+    sobreposicao = SobreposicaoCRP.construir(GrafoCSR.de_arestas(vertices, arestas, direcionado), TAMANHO_CELULA)
+    sorteio = random.Random(semente)
+    # Remove algumas arestas, acrescenta outras e um vértice novo ligado ao grafo
+    removidas = sorteio.sample(range(len(arestas)), 5)
+    editados = [(arestas[i].orig, arestas[i].dest) for i in removidas]
+    arestas = [aresta for i, aresta in enumerate(arestas) if i not in removidas]
+    vertices = vertices + [Vertices(len(vertices), 500.0, 500.0)]
+    for _ in range(5):
+        u, v = sorteio.sample(range(len(vertices)), 2)
+        arestas.append(Arestas(u, v, sorteio.uniform(10, 800), mao_unica=sorteio.random() < 0.5))
+        editados.append((u, v))
+    arestas.append(Arestas(len(vertices) - 1, 0, 50.0))
+    editados.append((len(vertices) - 1, 0))
+    editado = GrafoCSR.de_arestas(vertices, arestas, direcionado)
+    refeitas = sobreposicao.atualizar(editado, editados)
+    assert 0 < refeitas < sum(len(set(sobreposicao.celula[nivel])) for nivel in range(1, sobreposicao.niveis + 1))
+    conferir_rotas(sobreposicao, editado)
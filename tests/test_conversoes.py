@@ -0,0 +1,95 @@
+import heapq
+import random
+
+import pytest
+
+from busca import INF, dijkstra_csr
+from conftest import custos_iguais, sortear_grafo
+from conversoes import TabelaConversoes, dijkstra_conversoes
+from grafo import Arestas, GrafoCSR, Vertices
+
+def referencia_por_arcos(csr, inicio, fim, tabela, custo_retorno=0.0):
+    """Dijkstra explícito sobre o grafo de arestas: um estado por arco, sem atalhos"""
+    if inicio == fim:
+        return 0.0
+    custos = {}
+    for de, via, para, custo in tabela:
+        custos[de, via, para] = max(custo, custos.get((de, via, para), 0.0))
+    origens = [u for u in range(csr.totalVertices) for _ in range(csr.inicio[u], csr.inicio[u + 1])]
+    dist = {}
+    fila = [(float(csr.pesos[f]), f) for f in range(csr.inicio[inicio], csr.inicio[inicio + 1])]
+    heapq.heapify(fila)
+    while fila:
+        d, f = heapq.heappop(fila)
+        if f in dist:
+            continue
+        dist[f] = d
+        u, v = origens[f], int(csr.destinos[f])
+        if v == fim:
+            return d
+        for g in range(csr.inicio[v], csr.inicio[v + 1]):
+            w = int(csr.destinos[g])
+            extra = custos.get((u, v, w), 0.0)
+            if extra >= INF:
+                continue
+            if w == u:
+                extra += custo_retorno
+            heapq.heappush(fila, (d + extra + float(csr.pesos[g]), g))
+    return INF
+
+def sortear_trios(csr, semente, quantidade=25):
+    """Conversões (de, via, para) que existem no grafo, metade proibidas e metade com custo"""
+    sorteio = random.Random(semente)
+    origens = [u for u in range(csr.totalVertices) for _ in range(csr.inicio[u], csr.inicio[u + 1])]
+    trios = []
+    for _ in range(quantidade):
+        f = sorteio.randrange(csr.totalArestas)
+        v = int(csr.destinos[f])
+        saidas = csr.destinos[csr.inicio[v]:csr.inicio[v + 1]]
+        if len(saidas):
+            custo = INF if sorteio.random() < 0.5 else sorteio.uniform(0, 300)
+            trios.append((origens[f], v, int(sorteio.choice(saidas)), custo))
+    return trios
+
+def test_sem_conversoes_igual_ao_dijkstra_csr(semente, direcionado):
+    csr = GrafoCSR.de_arestas(*sortear_grafo(semente), direcionado)
+    vazia = TabelaConversoes.montar([])
+    for inicio in range(0, csr.totalVertices, 3):
+        for fim in range(csr.totalVertices):
+            referencia = dijkstra_csr(csr, inicio, fim)[1]
+            assert custos_iguais(dijkstra_conversoes(csr, inicio, fim)[1], referencia)
+            assert custos_iguais(dijkstra_conversoes(csr, inicio, fim, vazia)[1], referencia)
+
+@pytest.mark.parametrize('custo_retorno', [0.0, 250.0])
+def test_tabela_e_retorno_iguais_a_busca_por_arcos(semente, direcionado, custo_retorno):
+    csr = GrafoCSR.de_arestas(*sortear_grafo(semente), direcionado)
+    trios = sortear_trios(csr, semente)
+    tabela = TabelaConversoes.montar(trios)
+    for inicio in range(0, csr.totalVertices, 3):
+        for fim in range(csr.totalVertices):
+            caminho, custo, _ = dijkstra_conversoes(csr, inicio, fim, tabela, custo_retorno=custo_retorno)
+            assert custos_iguais(custo, referencia_por_arcos(csr, inicio, fim, trios, custo_retorno))
+            assert custo >= dijkstra_csr(csr, inicio, fim)[1] - 1e-9
+            if caminho is not None:
+                assert caminho[0] == inicio and caminho[-1] == fim
+                proibidas = {trio[:3] for trio in trios if trio[3] >= INF}
+                assert not any(trio in proibidas for trio in zip(caminho, caminho[1:], caminho[2:]))
+
+def test_tabela_guardada_no_grafo():
+    csr = GrafoCSR.de_arestas(*sortear_grafo(1))
+    assert TabelaConversoes.do_grafo(csr) is None
+    trios = sortear_trios(csr, 1)
+    TabelaConversoes.montar(trios).anexar(csr)
+    lida = TabelaConversoes.do_grafo(csr)
+    assert len(lida) == len({trio[:3] for trio in trios})
+    assert all(lida.por_via()[via][de, para] >= custo for de, via, para, custo in trios)
+
+def test_custos_de_esquerda_e_direita():
+    # Cruzamento em 1: chegando de 0 (sul, y para baixo), 2 fica à esquerda (oeste) e 3 à direita
+    vertices = [Vertices(0, 0.0, 100.0), Vertices(1, 0.0, 0.0), Vertices(2, -100.0, 0.0),
+                Vertices(3, 100.0, 0.0), Vertices(4, 0.0, -100.0)]
+    arestas = [Arestas(0, 1, 100.0), Arestas(1, 2, 100.0), Arestas(1, 3, 100.0), Arestas(1, 4, 100.0)]
+    csr = GrafoCSR.de_arestas(vertices, arestas)
+    assert dijkstra_conversoes(csr, 0, 2, custo_esquerda=30.0, custo_direita=7.0)[1] == 230.0
+    assert dijkstra_conversoes(csr, 0, 3, custo_esquerda=30.0, custo_direita=7.0)[1] == 207.0
+    assert dijkstra_conversoes(csr, 0, 4, custo_esquerda=30.0, custo_direita=7.0)[1] == 200.0
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from busca import INF, dijkstra_csr
+from conftest import custos_iguais, sortear_grafo
+from delta import ParticaoArestas, delta_stepping, escolher_delta
+from grafo import GrafoCSR
+
+def custos_referencia(csr, inicio):
+    return [dijkstra_csr(csr, inicio, fim)[1] for fim in range(csr.totalVertices)]
+
+@pytest.mark.parametrize('fator', [0.05, 1.0, None, 1e6], ids=['estreito', 'unitario', 'padrao', 'um_bucket'])
+def test_custos_iguais_ao_dijkstra_csr(semente, direcionado, fator):
+    csr = GrafoCSR.de_arestas(*sortear_grafo(semente), direcionado)
+    delta = None if fator is None else escolher_delta(csr.pesos) * fator
+    for inicio in range(0, csr.totalVertices, 5):
+        custos, _, _ = delta_stepping(csr, inicio, delta)
+        for fim, referencia in enumerate(custos_referencia(csr, inicio)):
+            assert custos_iguais(float(custos[fim]), referencia)
+
+def test_pais_formam_arvore_de_caminhos_minimos(semente, direcionado):
+    csr = GrafoCSR.de_arestas(*sortear_grafo(semente), direcionado)
+    custos, pais, _ = delta_stepping(csr, 0)
+    assert pais[0] == -1
+    for v in range(csr.totalVertices):
+        u = int(pais[v])
+        if u < 0:
+            continue
+        arcos = range(csr.inicio[u], csr.inicio[u + 1])
+        assert any(csr.destinos[i] == v and custos_iguais(custos[u] + csr.pesos[i], custos[v]) for i in arcos)
+
+def test_orcamento_corta_os_mais_distantes(semente):
+    csr = GrafoCSR.de_arestas(*sortear_grafo(semente))
+    referencia = custos_referencia(csr, 0)
+    alcancaveis = sorted(custo for custo in referencia if custo < INF)
+    orcamento = alcancaveis[len(alcancaveis) // 2]
+    custos, pais, estatisticas = delta_stepping(csr, 0, orcamento=orcamento)
+    for v, custo in enumerate(referencia):
+        if custo <= orcamento:
+            assert custos_iguais(float(custos[v]), custo)
+        else:
+            assert custos[v] == INF and pais[v] == -1
+    assert estatisticas['nos_explorados'] == sum(custo <= orcamento for custo in referencia)
+
+def test_particao_reaproveitada_entre_origens():
+    csr = GrafoCSR.de_arestas(*sortear_grafo(3))
+    particao = ParticaoArestas(csr, escolher_delta(csr.pesos))
+    for inicio in range(csr.totalVertices):
+        custos, _, _ = delta_stepping(csr, inicio, particao=particao)
+        assert np.array_equal(custos, delta_stepping(csr, inicio)[0])
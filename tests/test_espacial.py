@@ -0,0 +1,79 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from espacial import GradeEspacial, GradeSegmentos, aneis_na_grade
+
+def consultas(sorteio, quantidade=150):
+    """Pontos dentro da área, logo fora dela e muito longe, em todas as direções"""
+    pontos = [(sorteio.uniform(-50, 1050), sorteio.uniform(-50, 1050)) for _ in range(quantidade)]
+    pontos += [(sorteio.uniform(-1, 1) * 10 ** sorteio.randint(4, 15), sorteio.uniform(-1, 1) * 10 ** sorteio.randint(4, 15))
+               for _ in range(quantidade // 3)]
+    return pontos + [(1e12, -1e12), (-1e15, 500.0), (500.0, 1e15)]
+
+def distancia_segmento(px, py, x1, y1, x2, y2):
+    dx, dy = x2 - x1, y2 - y1
+    comprimento2 = dx * dx + dy * dy
+    t = 0.0 if comprimento2 == 0 else min(max(((px - x1) * dx + (py - y1) * dy) / comprimento2, 0.0), 1.0)
+    return math.hypot(x1 + t * dx - px, y1 + t * dy - py)
+
+@pytest.mark.parametrize('semente', range(5))
+def test_ponto_mais_proximo_igual_a_forca_bruta(semente):
+    sorteio = random.Random(semente)
+    n = sorteio.choice([1, 7, 300])
+    x = np.array([sorteio.uniform(0, 1000) for _ in range(n)])
+    y = np.array([sorteio.uniform(0, 1000) for _ in range(n)])
+    grade = GradeEspacial(np.arange(n) + 100, x, y)
+    for px, py in consultas(sorteio):
+        vertice_id, distancia = grade.mais_proximo(px, py)
+        referencia = np.hypot(x - px, y - py)
+        assert math.isclose(distancia, float(referencia.min()), rel_tol=1e-12)
+        assert math.isclose(referencia[vertice_id - 100], distancia, rel_tol=1e-12)
+        raio = sorteio.uniform(0, 200)
+        vertice_id, distancia = grade.mais_proximo(px, py, raio)
+        if referencia.min() <= raio:
+            assert math.isclose(distancia, float(referencia.min()), rel_tol=1e-12)
+        else:
+            assert vertice_id is None and distancia == math.inf
+
+@pytest.mark.parametrize('semente', range(5))
+def test_segmento_mais_proximo_igual_a_forca_bruta(semente):
+    sorteio = random.Random(semente)
+    n = sorteio.choice([1, 7, 300])
+    x1, y1 = np.array([[sorteio.uniform(0, 1000) for _ in range(n)] for _ in range(2)])
+    x2 = x1 + np.array([sorteio.uniform(-80, 80) for _ in range(n)])
+    y2 = y1 + np.array([sorteio.uniform(-80, 80) for _ in range(n)])
+    grade = GradeSegmentos(x1, y1, x2, y2)
+    for px, py in consultas(sorteio):
+        segmento, distancia, fracao = grade.mais_proximo(px, py)
+        referencia = [distancia_segmento(px, py, *s) for s in zip(x1, y1, x2, y2)]
+        assert math.isclose(distancia, min(referencia), rel_tol=1e-9)
+        assert math.isclose(referencia[segmento], distancia, rel_tol=1e-9)
+        assert 0.0 <= fracao <= 1.0
+
+@pytest.mark.parametrize('px, py', [(math.nan, 1.0), (1.0, math.inf), (-math.inf, math.nan)])
+def test_coordenadas_nao_finitas(px, py):
+    pontos = GradeEspacial([0, 1], [0.0, 10.0], [0.0, 10.0])
+    assert pontos.mais_proximo(px, py) == (None, math.inf)
+    segmentos = GradeSegmentos([0.0], [0.0], [10.0], [10.0])
+    assert segmentos.mais_proximo(px, py) == (None, math.inf, None)
+
+def test_grades_vazias_e_pontos_repetidos():
+    assert GradeEspacial([], [], []).mais_proximo(1.0, 1.0) == (None, math.inf)
+    assert GradeSegmentos([], [], [], []).mais_proximo(1.0, 1.0) == (None, math.inf, None)
+    repetidos = GradeEspacial([3, 4, 5], [7.0] * 3, [7.0] * 3)
+    assert repetidos.mais_proximo(1e9, -1e9)[1] == math.hypot(1e9 - 7, -1e9 - 7)
+
+@pytest.mark.parametrize('cx, cy', [(0, 0), (4, 2), (-1000, 3), (2, 10 ** 9), (-7, -9), (50, 50)])
+def test_aneis_cobrem_a_grade_exatamente_uma_vez(cx, cy):
+    colunas, linhas = 9, 5
+    primeiro, ultimo = aneis_na_grade(cx, cy, colunas, linhas)
+    if abs(cx) + abs(cy) < 1000:
+        # Anéis antes do primeiro e depois do último não têm células da grade
+        for anel in list(range(primeiro)) + [ultimo + 1, ultimo + 2]:
+            assert not list(GradeEspacial.celulas_do_anel(cx, cy, anel, colunas, linhas))
+    celulas = [celula for anel in range(primeiro, ultimo + 1)
+               for celula in GradeEspacial.celulas_do_anel(cx, cy, anel, colunas, linhas)]
+    assert sorted(celulas) == [(gx, gy) for gx in range(colunas) for gy in range(linhas)]
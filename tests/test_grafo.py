@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from busca import dijkstra_csr
+from conftest import custos_iguais, sortear_grafo
+from grafo import GrafoCSR, carregar_csr, preparar_compilado
+
+@pytest.mark.parametrize('compilado_direcionado', [False, True])
+def test_compilado_aberto_nos_dois_tipos(tmp_path, semente, compilado_direcionado, direcionado):
+    vertices, arestas = sortear_grafo(semente)
+    caminho = str(tmp_path / 'grafo.grafo')
+    GrafoCSR.de_arestas(vertices, arestas, compilado_direcionado).salvar(caminho)
+    grafo = carregar_csr(caminho, direcionado)
+    referencia = GrafoCSR.de_arestas(vertices, arestas, direcionado)
+    assert grafo.direcionado == direcionado and grafo.totalArestas == referencia.totalArestas
+    for inicio in range(0, grafo.totalVertices, 4):
+        for fim in range(grafo.totalVertices):
+            assert custos_iguais(dijkstra_csr(grafo, inicio, fim)[1], dijkstra_csr(referencia, inicio, fim)[1])
+    # Os processos do lote e do servidor abrem o arquivo preparado já no tipo pedido
+    compilado, temporario = preparar_compilado(caminho, direcionado)
+    assert (temporario is None) == (compilado_direcionado == direcionado)
+    try:
+        assert GrafoCSR.carregar(compilado, mmap=False).direcionado == direcionado
+    finally:
+        if temporario is not None:
+            os.remove(temporario)
+
+@pytest.mark.parametrize('compilado_direcionado', [False, True])
+def test_compilado_sem_sentido_so_no_proprio_tipo(tmp_path, compilado_direcionado):
+    grafo = GrafoCSR.de_arestas(*sortear_grafo(0), compilado_direcionado)
+    del grafo.atributos['sentido']
+    caminho = str(tmp_path / 'antigo.grafo')
+    grafo.salvar(caminho)
+    assert carregar_csr(caminho, compilado_direcionado).direcionado == compilado_direcionado
+    with pytest.raises(ValueError, match='compile-o de novo'):
+        carregar_csr(caminho, not compilado_direcionado)
@@ -0,0 +1,107 @@
+import random
+
+import numpy as np
+import pytest
+
+from busca import dijkstra_csr
+from colunas import TabelaArestas, TabelaVertices
+from conftest import custos_iguais, sortear_grafo
+from grafo import GrafoCSR
+from metricas import METRICAS
+from retratos import HistoricoRetratos, Retrato, comparar_retratos, dijkstra_retrato
+
+def retrato_sorteado(semente):
+    vertices, arestas = sortear_grafo(semente)
+    return Retrato.do_grafo(TabelaVertices.de_objetos(vertices), TabelaArestas.de_objetos(arestas))
+
+def editar(retrato, sorteio):
+    """Uma edição sorteada: vértice ou aresta, acrescentado ou removido"""
+    vertices, arestas = retrato.tabelas()
+    vivos = vertices.id.tolist()
+    operacao = sorteio.choice(['com_aresta', 'com_aresta', 'sem_aresta', 'sem_aresta', 'com_vertice', 'sem_vertice'])
+    if operacao == 'com_aresta':
+        u, v = sorteio.sample(vivos, 2)
+        return retrato.com_aresta(u, v, sorteio.uniform(10, 900), sorteio.choice([None, 12.0]), sorteio.random() < 0.4)
+    if operacao == 'sem_aresta' and len(arestas):
+        linha = sorteio.randrange(len(arestas))
+        return retrato.sem_aresta(int(arestas.orig[linha]), int(arestas.dest[linha]))
+    if operacao == 'com_vertice':
+        novo = max(vivos) + 1
+        retrato = retrato.com_vertice(novo, sorteio.uniform(0, 1000), sorteio.uniform(0, 1000))
+        return retrato.com_aresta(novo, sorteio.choice(vivos), sorteio.uniform(10, 900))
+    return retrato.sem_vertice(sorteio.choice(vivos))
+
+def historico_sorteado(semente, edicoes=15):
+    sorteio = random.Random(semente)
+    historico = HistoricoRetratos(retrato_sorteado(semente))
+    for _ in range(edicoes):
+        historico.registrar(editar(historico.atual, sorteio))
+    return historico
+
+def conferir_retrato(retrato, metrica, direcionado):
+    vertices, arestas = retrato.tabelas()
+    csr = GrafoCSR.de_arestas(vertices, arestas, direcionado).com_metrica(metrica)
+    ids = vertices.id.tolist()
+    for inicio in ids[::4]:
+        for fim in ids:
+            caminho, custo, _ = dijkstra_retrato(retrato, inicio, fim, metrica, direcionado)
+            assert custos_iguais(custo, dijkstra_csr(csr, inicio, fim)[1]), (inicio, fim)
+            if caminho is not None:
+                assert caminho[0] == inicio and caminho[-1] == fim
+
+@pytest.mark.parametrize('metrica', sorted(METRICAS))
+def test_cada_versao_igual_ao_dijkstra_csr(semente, direcionado, metrica):
+    historico = historico_sorteado(semente)
+    for retrato in historico.retratos[::3]:
+        conferir_retrato(retrato, metrica, direcionado)
+
+def test_desfazer_e_refazer_voltam_as_mesmas_versoes(semente):
+    historico = historico_sorteado(semente)
+    versoes = list(historico.retratos)
+    tabelas = [retrato.tabelas() for retrato in versoes]
+    assert not historico.pode_refazer()
+    for i in range(len(versoes) - 1, 0, -1):
+        assert historico.pode_desfazer()
+        assert historico.desfazer() is versoes[i - 1]
+    assert not historico.pode_desfazer()
+    assert historico.desfazer() is versoes[0]
+    for i in range(1, len(versoes)):
+        assert historico.refazer() is versoes[i]
+    assert not historico.pode_refazer()
+    assert historico.refazer() is versoes[-1]
+    # Os retratos são imutáveis: voltar a uma versão dá as mesmas tabelas de antes
+    for retrato, (vertices, arestas) in zip(versoes, tabelas):
+        novas_vertices, novas_arestas = retrato.tabelas()
+        assert np.array_equal(novas_vertices.id, vertices.id)
+        assert np.array_equal(novas_arestas.orig, arestas.orig) and np.array_equal(novas_arestas.dest, arestas.dest)
+
+def test_desfeito_e_editado_descarta_o_refazer():
+    historico = historico_sorteado(2, edicoes=5)
+    historico.desfazer()
+    historico.desfazer()
+    anterior = historico.atual
+    editado = editar(anterior, random.Random(99))
+    historico.registrar(editado)
+    assert len(historico.retratos) == 5 and historico.atual is editado
+    assert not historico.pode_refazer()
+    assert historico.desfazer() is anterior
+
+def test_limite_descarta_os_mais_antigos():
+    historico = HistoricoRetratos(retrato_sorteado(0), limite=4)
+    sorteio = random.Random(0)
+    registrados = []
+    for _ in range(10):
+        registrados.append(editar(historico.atual, sorteio))
+        historico.registrar(registrados[-1])
+    assert historico.retratos == registrados[-4:] and historico.atual is registrados[-1]
+    while historico.pode_desfazer():
+        historico.desfazer()
+    assert historico.atual is registrados[-4]
+
+def test_comparar_retratos_igual_a_cada_versao(semente):
+    historico = historico_sorteado(semente, edicoes=6)
+    vertices, _ = historico.retratos[0].tabelas()
+    inicio, fim = int(vertices.id[0]), int(vertices.id[-1])
+    rotas, _ = comparar_retratos(historico.retratos, inicio, fim)
+    for rota, retrato in zip(rotas, historico.retratos):
+        assert rota['custo'] == dijkstra_retrato(retrato, inicio, fim)[1]
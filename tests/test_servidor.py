@@ -0,0 +1,134 @@
+import asyncio
+import json
+import math
+import time
+
+import pytest
+
+from conftest import sortear_grafo
+from servidor import TAMANHO_MAXIMO_CABECALHO, TAMANHO_MAXIMO_CORPO, ErroRequisicao, ServidorRotas
+
+@pytest.fixture(scope='module')
+def servidor(tmp_path_factory):
+    """Serviço sobre um .poly sorteado; as requisições testadas não chegam ao pool de processos"""
+    vertices, arestas = sortear_grafo(0)
+    linhas = [f"{len(vertices)} 2 0 1"]
+    linhas += [f"{v.id} {v.x} {v.y}" for v in vertices]
+    linhas.append(f"{len(arestas)} 1")
+    linhas += [f"{i} {a.orig} {a.dest} {a.dist} {int(a.mao_unica)}" for i, a in enumerate(arestas)]
+    caminho = tmp_path_factory.mktemp('servidor') / 'grafo.poly'
+    caminho.write_text("\n".join(linhas) + "\n")
+    servidor = ServidorRotas(str(caminho), processos=1)
+    yield servidor
+    servidor.fechar()
+
+def enviar(servidor, bruto, fechar_escrita=False):
+    """Manda os bytes numa conexão nova e devolve (status, corpo JSON) da primeira resposta"""
+    async def conversar():
+        aceitador = await servidor.iniciar('127.0.0.1', 0)
+        try:
+            porta = aceitador.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', porta)
+            writer.write(bruto)
+            if fechar_escrita:
+                writer.write_eof()
+            await writer.drain()
+            resposta = await asyncio.wait_for(reader.read(), 10)
+            writer.close()
+            return resposta
+        finally:
+            aceitador.close()
+            await aceitador.wait_closed()
+
+    cabecalho, _, corpo = asyncio.run(conversar()).partition(b'\r\n\r\n')
+    return int(cabecalho.split()[1]), json.loads(corpo)
+
+def get(servidor, alvo):
+    return enviar(servidor, f"GET {alvo} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n".encode())
+
+def post(servidor, alvo, content_length, corpo=b''):
+    return enviar(servidor, (f"POST {alvo} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n"
+                             f"Content-Length: {content_length}\r\n\r\n").encode() + corpo)
+
+@pytest.mark.parametrize('valor', ['abc', '-5', '1.5', '0x10'])
+def test_content_length_invalido(servidor, valor):
+    status, corpo = post(servidor, '/nearest?x=1&y=1', valor)
+    assert status == 400 and 'Content-Length' in corpo['erro']
+
+def test_corpo_acima_do_limite(servidor):
+    status, _ = post(servidor, '/nearest?x=1&y=1', TAMANHO_MAXIMO_CORPO + 1)
+    assert status == 413
+
+def test_corpo_json_invalido(servidor):
+    status, _ = post(servidor, '/nearest', 5, b'{x: 1')
+    assert status == 400
+
+def test_corpo_json_valido(servidor):
+    corpo = json.dumps({'x': 500, 'y': 500}).encode()
+    status, resposta = post(servidor, '/nearest', len(corpo), corpo)
+    assert status == 200 and 'id' in resposta
+
+def test_cabecalho_muito_grande(servidor):
+    bruto = b"GET /nearest?x=1&y=1 HTTP/1.1\r\nX-Grande: " + b"a" * (TAMANHO_MAXIMO_CABECALHO + 1) + b"\r\n\r\n"
+    assert enviar(servidor, bruto)[0] == 413
+
+@pytest.mark.parametrize('bruto', [b"GET /nearest\r\n\r\n", b"OLA\r\n\r\n", b"GET /nearest?x=1&y=1 FTP/1.1\r\n\r\n"])
+def test_linha_de_requisicao_invalida(servidor, bruto):
+    assert enviar(servidor, bruto)[0] == 400
+
+def test_requisicao_incompleta(servidor):
+    assert enviar(servidor, b"GET /nearest?x=1&y=1 HTTP/1.1\r\nHost:", fechar_escrita=True)[0] == 400
+
+def test_endpoint_e_metodo(servidor):
+    assert get(servidor, '/nada')[0] == 404
+    bruto = b"DELETE /nearest?x=1&y=1 HTTP/1.1\r\nConnection: close\r\n\r\n"
+    assert enviar(servidor, bruto)[0] == 405
+
+@pytest.mark.parametrize('consulta', ['x=nan&y=1', 'x=1&y=inf', 'x=-inf&y=1', 'x=1e400&y=1', 'x=abc&y=1', 'x=1'])
+@pytest.mark.parametrize('endpoint', ['/nearest', '/snap'])
+def test_coordenadas_invalidas(servidor, endpoint, consulta):
+    assert get(servidor, f'{endpoint}?{consulta}')[0] == 400
+
+def test_latlon_sem_projecao(servidor):
+    status, corpo = get(servidor, '/nearest?lat=-16.6&lon=-49.2')
+    assert status == 400 and 'projeção' in corpo['erro']
+
+@pytest.mark.parametrize('x, y', [(1e12, -1e12), (-3e9, 500.0), (500.0, 7e15)])
+def test_consultas_muito_distantes(servidor, x, y):
+    grafo = servidor.grafo
+    inicio = time.perf_counter()
+    status, proximo = get(servidor, f'/nearest?x={x!r}&y={y!r}')
+    assert status == 200
+    distancias = [math.hypot(grafo.x[v] - x, grafo.y[v] - y) for v in range(grafo.totalVertices)]
+    assert math.isclose(proximo['distancia'], min(distancias))
+    status, ajustado = get(servidor, f'/snap?x={x!r}&y={y!r}')
+    assert status == 200 and 'distancia' in ajustado
+    # Sem limitar os anéis à grade, cada consulta dessas percorria bilhões de anéis vazios
+    assert time.perf_counter() - inicio < 5
+
+@pytest.mark.parametrize('valor', ['talvez', '2', 'sim', '-1'])
+def test_conversoes_invalida(servidor, valor):
+    status, corpo = get(servidor, f'/route?origem=0&destino=1&conversoes={valor}')
+    assert status == 400 and 'conversoes' in corpo['erro']
+
+def test_conversoes_ligada_sem_tabela(servidor):
+    # O .poly não tem restrições: ligada, a opção é recusada antes da busca
+    assert get(servidor, '/route?origem=0&destino=1&conversoes=true')[0] == 404
+
+@pytest.mark.parametrize('valor, esperado', [
+    (None, False), (False, False), (0, False), ('0', False), ('false', False), (' FALSE ', False), ('', False),
+    (True, True), (1, True), ('1', True), ('true', True), ('True', True),
+])
+def test_booleano(servidor, valor, esperado):
+    assert servidor.booleano({'opcao': valor}, 'opcao') is esperado
+    assert servidor.booleano({}, 'opcao') is False
+
+@pytest.mark.parametrize('valor', ['talvez', 2, 0.5, [1], 'yes'])
+def test_booleano_invalido(servidor, valor):
+    with pytest.raises(ErroRequisicao) as erro:
+        servidor.booleano({'opcao': valor}, 'opcao')
+    assert erro.value.status == 400
+
+@pytest.mark.parametrize('consulta', ['origem=-1&destino=0', 'origem=0&destino=99999', 'origem=a&destino=0', 'destino=0'])
+def test_vertices_invalidos(servidor, consulta):
+    assert get(servidor, f'/route?{consulta}')[0] == 400